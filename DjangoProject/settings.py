@@ -39,6 +39,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'solvabilite_app.middleware.MetriquesMiddleware',  # en premier : mesure toute la chaîne
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -119,7 +120,10 @@ LOGOUT_REDIRECT_URL = '/solvabilite/'
 LOGIN_URL = '/solvabilite/connexion/'
 
 # CORRECTION : Configuration des sessions pour résoudre "Session data corrupted"
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Cache d'abord, base de données en secours ; une session non modifiée n'est
+# réécrite (expiration repoussée) qu'une fois par SESSION_INTERVALLE_ECRITURE secondes
+SESSION_ENGINE = 'solvabilite_app.sessions'
+SESSION_INTERVALLE_ECRITURE = env.int('SESSION_INTERVALLE_ECRITURE', default=300)
 SESSION_COOKIE_AGE = 1209600  # 2 semaines en secondes
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SECURE = False  # Mettez True en production avec HTTPS
@@ -140,9 +144,124 @@ REGULATEUR_API_KEY = env('REGULATEUR_API_KEY', default='demo-key')
 MARKET_DATA_URL = env('MARKET_DATA_URL', default='https://api.marketdata.demo')
 MARKET_DATA_KEY = env('MARKET_DATA_KEY', default='demo-key')
 
+# Sessions HTTP partagées des APIs externes : nouvelles tentatives (backoff
+# exponentiel plafonné + gigue), taille du pool de connexions, délais
+# (connexion, lecture) en secondes par point d'accès
+SOLVABILITE_API_EXTERNES = {
+    'TENTATIVES': env.int('SOLVABILITE_API_TENTATIVES', default=3),
+    'BACKOFF': 0.5,
+    'BACKOFF_MAX': 10,
+    'GIGUE': 0.5,
+    'TAILLE_POOL': 10,
+    'DELAIS': {
+        'declaration': (3.05, 30),
+        'taux_sans_risque': (3.05, 5),
+    },
+    # Transport : 'reel', 'simulation' (réponses synthétiques, sans réseau),
+    # 'enregistrement' ou 'rejeu' des échanges de FICHIER_ECHANGES, avec
+    # latence (s) et taux d'erreurs injectés en rejeu et en simulation
+    'TRANSPORT': env('SOLVABILITE_API_TRANSPORT', default='simulation' if DEBUG else 'reel'),
+    'FICHIER_ECHANGES': env('SOLVABILITE_API_FICHIER_ECHANGES', default=None),
+    'LATENCE_INJECTEE': None,
+    'TAUX_ERREUR_INJECTE': 0.0,
+    'ERREUR_INJECTEE': 'statut',
+    'GRAINE': None,
+    # Disjoncteur : ouvert après SEUIL_ECHECS échecs en FENETRE_ECHECS s, essai
+    # après DELAI_REOUVERTURE s. Cloison : CONCURRENCE_MAX appels simultanés par
+    # service et par processus, ATTENTE_CLOISON s d'attente au plus d'une place
+    'SEUIL_ECHECS': 5,
+    'FENETRE_ECHECS': 60,
+    'DELAI_REOUVERTURE': 30,
+    'CONCURRENCE_MAX': 4,
+    'ATTENTE_CLOISON': 0.5,
+}
+
+# Données de marché : durée de fraîcheur (s) avant rafraîchissement en
+# arrière-plan, délai (s) avant un nouvel essai après un échec du fournisseur
+SOLVABILITE_DONNEES_MARCHE = {
+    'TTL': env.int('SOLVABILITE_DONNEES_MARCHE_TTL', default=900),
+    'DELAI_APRES_ECHEC': 60,
+}
+
+# Courbes des taux (Smith-Wilson) : UFR par devise, vitesse de convergence
+# par défaut, grille des facteurs d'actualisation précalculés (années, points par an)
+SOLVABILITE_COURBES_TAUX = {
+    'UFR': {'EUR': 0.033},
+    'UFR_DEFAUT': 0.033,
+    'ALPHA': 0.1,
+    'MATURITE_MAX': 150,
+    'POINTS_PAR_AN': 12,
+}
+
+# Envoi en masse des déclarations : threads d'envoi, débit maximal
+# (déclarations/s), taille des paquets réservés, délai (s) avant reprise
+# d'une soumission restée EN_COURS après une interruption
+SOLVABILITE_DECLARATIONS = {
+    'THREADS': 8,
+    'DEBIT_MAX': env.int('SOLVABILITE_DECLARATIONS_DEBIT_MAX', default=10),
+    'TAILLE_PAQUET': 100,
+    'DELAI_REPRISE': 300,
+}
+
+# Cache : LocMem par défaut, partagé entre processus via CACHE_URL (ex. redis://...)
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Cache des indicateurs par compagnie (LRU en processus + backend ci-dessus).
+# Avec LocMem et plusieurs workers, les invalidations restent locales au
+# worker : les indicateurs peuvent alors avoir jusqu'à TTL s de retard
+SOLVABILITE_CACHE = {
+    'ALIAS': 'default',
+    'TTL': env.int('SOLVABILITE_CACHE_TTL', default=300),
+    'LRU_TAILLE': env.int('SOLVABILITE_CACHE_LRU_TAILLE', default=256),
+    'LRU_TTL': 30,
+}
+
+# Flux SSE des calculs : 'memoire' (un seul processus) ou 'sondage' (plusieurs workers).
+# Sous WSGI, chaque flux ouvert occupe un thread : il dure DUREE_MAX_WSGI s (0 :
+# rattrapage puis fermeture) et le navigateur se reconnecte après RECONNEXION_WSGI_MS
+SOLVABILITE_DIFFUSION = {
+    'MODE': env('SOLVABILITE_DIFFUSION_MODE', default='memoire'),
+    'INTERVALLE_SONDAGE': env.int('SOLVABILITE_DIFFUSION_INTERVALLE', default=5),
+    'BATTEMENT': 15,
+    'DUREE_MAX': 3600,
+    'DUREE_MAX_WSGI': env.int('SOLVABILITE_DIFFUSION_DUREE_MAX_WSGI', default=0),
+    'RECONNEXION_WSGI_MS': 15000,
+}
+
 # Configuration PDF
 XHTML2PDF_DEBUG = DEBUG
 
+# Cache disque des rapports PDF (sous MEDIA_ROOT, éviction LRU au-delà de TAILLE_MAX octets)
+SOLVABILITE_RAPPORTS_CACHE = {
+    'REPERTOIRE': 'rapports_cache',
+    'TAILLE_MAX': env.int('SOLVABILITE_RAPPORTS_CACHE_TAILLE_MAX', default=200 * 1024 * 1024),
+}
+
+# Rendu des rapports PDF : moteur ('reportlab' ou 'xhtml2pdf'), moteur de secours
+# en cas d'échec (None pour aucun), budget par rendu en secondes et en pages
+SOLVABILITE_RAPPORTS_PDF = {
+    'MOTEUR': env('SOLVABILITE_RAPPORTS_MOTEUR', default='reportlab'),
+    'SECOURS': 'reportlab',
+    'DUREE_MAX': 10,
+    'PAGES_MAX': 50,
+}
+
+# Vues asynchrones des tableaux de bord (/solvabilite/async/...) : désactivées,
+# elles ne réduisent pas la latence sous charge (benchmarks/latence_async.py)
+SOLVABILITE_VUES_ASYNC = env.bool('SOLVABILITE_VUES_ASYNC', default=False)
+
+# Métriques Prometheus (/metrics) : avec plusieurs workers, répertoire partagé
+# où chaque processus écrit ses valeurs toutes les INTERVALLE_ECRITURE s (à
+# vider au démarrage du service). Jeton Bearer exigé par /metrics ; sans jeton,
+# accès réservé aux administrateurs connectés (libre avec DEBUG)
+SOLVABILITE_METRIQUES = {
+    'REPERTOIRE_MULTIPROCESSUS': env('SOLVABILITE_METRIQUES_REPERTOIRE', default=None),
+    'INTERVALLE_ECRITURE': 5,
+    'JETON': env('SOLVABILITE_METRIQUES_JETON', default=None),
+}
+
 # CORRECTION : Configuration de logging pour le débogage
 LOGGING = {
     'version': 1,
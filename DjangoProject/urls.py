@@ -7,6 +7,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import RedirectView
 
+from solvabilite_app import views as solvabilite_views
+
 urlpatterns = [
     # Page d'administration Django
     path('admin/', admin.site.urls),
@@ -16,6 +18,9 @@ urlpatterns = [
 
     # Inclusion des URLs de l'application solvabilité
     path('solvabilite/', include('solvabilite_app.urls')),
+
+    # Métriques au format Prometheus, à l'emplacement attendu par les collecteurs
+    path('metrics', solvabilite_views.metriques, name='metriques'),
 ]
 
 # Configuration pour servir les fichiers médias en mode développement
@@ -0,0 +1,70 @@
+"""
+Actualisation vectorisée de flux de trésorerie avec une courbe Smith-Wilson
+(services.courbe_taux) : durée de construction de la courbe, puis débit
+d'actualisation d'un lot de vecteurs de flux, échéancier commun ou propre à
+chaque vecteur. La courbe est construite en mémoire : aucune base n'est nécessaire.
+
+Exemple :
+    python benchmarks/actualisation.py --vecteurs 50000 --echeances 60
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DjangoProject.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from solvabilite_app.services.courbe_taux import CourbeSmithWilson  # noqa: E402
+
+# Courbe EUR indicative (taux zéro-coupon annuels)
+MATURITES = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 12, 15, 20]
+TAUX = [0.0238, 0.0226, 0.0222, 0.0223, 0.0226, 0.0230, 0.0234, 0.0238, 0.0242, 0.0246, 0.0252, 0.0258, 0.0255]
+
+
+def chronometrer(fonction, repetitions):
+    fonction()  # chauffe
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        durees.append(time.perf_counter() - debut)
+    return statistics.median(durees)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vecteurs', type=int, default=50000)
+    parser.add_argument('--echeances', type=int, default=60)
+    parser.add_argument('--repetitions', type=int, default=20)
+    args = parser.parse_args()
+
+    construction = chronometrer(lambda: CourbeSmithWilson(MATURITES, TAUX, ufr=0.033, alpha=0.1), args.repetitions)
+    courbe = CourbeSmithWilson(MATURITES, TAUX, ufr=0.033, alpha=0.1)
+
+    generateur = np.random.default_rng(0)
+    flux = generateur.uniform(0, 1000, size=(args.vecteurs, args.echeances))
+    echeances = np.arange(1, args.echeances + 1) - 0.5  # flux en milieu d'année
+    echeances_par_vecteur = echeances + generateur.uniform(0, 0.5, size=flux.shape)
+
+    commun = chronometrer(lambda: courbe.actualiser(flux, echeances), args.repetitions)
+    par_vecteur = chronometrer(lambda: courbe.actualiser(flux, echeances_par_vecteur), args.repetitions)
+    print(json.dumps({
+        'construction_courbe_ms': round(construction * 1000, 2),
+        'echeancier_commun': {'duree_ms': round(commun * 1000, 2),
+                              'vecteurs_par_seconde': round(args.vecteurs / commun)},
+        'echeancier_par_vecteur': {'duree_ms': round(par_vecteur * 1000, 2),
+                                   'vecteurs_par_seconde': round(args.vecteurs / par_vecteur)},
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
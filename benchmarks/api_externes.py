@@ -0,0 +1,121 @@
+"""
+Débit de l'envoi des déclarations et latence des lectures de données de
+marché, hors ligne : les API externes sont rejouées (transport 'rejeu')
+depuis un fichier d'échanges enregistrés, avec latence et erreurs injectées.
+Une base SQLite temporaire est créée pour l'occasion ; aucun réseau n'est utilisé.
+
+Enregistrer des échanges (transport 'enregistrement') contre un serveur, par
+exemple le serveur factice (manage.py serveur_api_factice) :
+    SOLVABILITE_API_TRANSPORT=enregistrement SOLVABILITE_API_FICHIER_ECHANGES=echanges.jsonl ...
+
+Exemple :
+    python benchmarks/api_externes.py --compagnies 500 --latence 0.02 --taux-erreur 0.05 --threads 8
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DjangoProject.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+
+FICHIER_ECHANGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'api_externes.jsonl')
+
+
+def preparer_base(nombre):
+    from solvabilite_app.models import Compagnie, DonneesSolvabilite
+
+    call_command('migrate', verbosity=0)
+    compagnies = Compagnie.objects.bulk_create([
+        Compagnie(nom=f'Compagnie {numero}', siren=f'{100000000 + numero}', date_creation=date(2000, 1, 1),
+                  capital_social=1000000)
+        for numero in range(nombre)
+    ])
+    DonneesSolvabilite.objects.bulk_create([
+        DonneesSolvabilite(compagnie=compagnie, date_reference=date(2024, 12, 31), fonds_propres=1500000,
+                           scr_marche=450000, scr_credit=120000, mcr=220000, ratio_solvabilite=176.5)
+        for compagnie in compagnies
+    ])
+
+
+def mesurer_declarations(threads, debit):
+    from solvabilite_app.services.declarations import progression, soumettre_declarations
+
+    bilan = soumettre_declarations(date(2024, 12, 31), threads=threads, debit=debit)
+    # Seconde exécution : reprise des déclarations en échec
+    reprise = soumettre_declarations(date(2024, 12, 31), threads=threads, debit=debit)
+    return {
+        'envoyees': bilan['envoyees'],
+        'echecs': bilan['echecs'],
+        'duree_s': bilan['duree_s'],
+        'declarations_par_seconde': round(bilan['envoyees'] / bilan['duree_s'], 1) if bilan['duree_s'] else None,
+        'envoyees_a_la_reprise': reprise['envoyees'],
+        'envoyees_au_total': progression(date(2024, 12, 31))['par_statut']['ENVOYEE'],
+    }
+
+
+def mesurer_donnees_marche(lectures):
+    from solvabilite_app.services.donnees_marche import donnees_marche
+
+    # Un aller-retour chez le fournisseur, puis des lectures servies par le cache
+    debut = time.perf_counter()
+    donnees_marche.rafraichir('taux_sans_risque')
+    aller_retour = time.perf_counter() - debut
+    durees = []
+    for _ in range(lectures):
+        debut = time.perf_counter()
+        donnees_marche.lire('taux_sans_risque')
+        durees.append(time.perf_counter() - debut)
+    durees.sort()
+    return {
+        'appel_fournisseur_ms': round(aller_retour * 1000, 2),
+        'lectures': lectures,
+        'mediane_us': round(statistics.median(durees) * 1e6, 1),
+        'p99_us': round(durees[int(0.99 * (len(durees) - 1))] * 1e6, 1),
+        'max_ms': round(durees[-1] * 1000, 2),
+        'cache': {cle: valeur for cle, valeur in donnees_marche.statistiques().items() if cle != 'valeurs'},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fichier', default=FICHIER_ECHANGES, help="Fichier d'échanges enregistrés")
+    parser.add_argument('--compagnies', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--debit', type=float, default=0, help='Déclarations par seconde au plus (0 : sans limite)')
+    parser.add_argument('--latence', type=float, help='Latence injectée en secondes (défaut : durées enregistrées)')
+    parser.add_argument('--taux-erreur', type=float, default=0.0)
+    parser.add_argument('--lectures', type=int, default=10000, help='Lectures du taux sans risque')
+    parser.add_argument('--graine', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as repertoire:
+        settings.DATABASES['default']['NAME'] = os.path.join(repertoire, 'benchmark.sqlite3')
+        api = dict(settings.SOLVABILITE_API_EXTERNES, TRANSPORT='rejeu', FICHIER_ECHANGES=args.fichier,
+                   LATENCE_INJECTEE=args.latence, TAUX_ERREUR_INJECTE=args.taux_erreur, GRAINE=args.graine,
+                   BACKOFF=0.05, GIGUE=0.05, CONCURRENCE_MAX=args.threads)
+        with override_settings(SOLVABILITE_API_EXTERNES=api):
+            preparer_base(args.compagnies)
+            rapport = {
+                'declarations': mesurer_declarations(args.threads, args.debit),
+                'donnees_marche': mesurer_donnees_marche(args.lectures),
+            }
+            from solvabilite_app.services.external_apis import metriques_api
+            rapport['api_externes'] = metriques_api.statistiques()
+    print(json.dumps(rapport, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Comparaison de latence entre les vues synchrones et asynchrones des tableaux
+de bord, sous un serveur ASGI et avec des clients concurrents. Les vues
+asynchrones ne sont servies qu'avec SOLVABILITE_VUES_ASYNC.
+
+Exemple :
+    SOLVABILITE_VUES_ASYNC=1 uvicorn DjangoProject.asgi:application --workers 1 &
+    python benchmarks/latence_async.py --url http://127.0.0.1:8000 \\
+        --utilisateur admin@exemple.fr --mot-de-passe secret --clients 20 --requetes 400
+"""
+import argparse
+import http.cookiejar
+import json
+import re
+import statistics
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+PAIRES = [
+    ('tableau_de_bord', '/solvabilite/tableau-de-bord/', '/solvabilite/async/tableau-de-bord/'),
+    ('indicateurs', '/solvabilite/indicateurs/', '/solvabilite/async/indicateurs/'),
+    ('executive', '/solvabilite/tableau-bord-executive/', '/solvabilite/async/tableau-bord-executive/'),
+]
+
+
+def ouvrir_session(base_url, utilisateur, mot_de_passe):
+    """Connexion par le formulaire (jeton CSRF compris), retourne un opener authentifié"""
+    cookies = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(cookies))
+    page = opener.open(f'{base_url}/solvabilite/connexion/').read().decode('utf-8')
+    jeton = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page).group(1)
+    donnees = urllib.parse.urlencode({
+        'csrfmiddlewaretoken': jeton,
+        'username': utilisateur,
+        'password': mot_de_passe,
+    }).encode('utf-8')
+    requete = urllib.request.Request(f'{base_url}/solvabilite/connexion/', data=donnees,
+                                     headers={'Referer': f'{base_url}/solvabilite/connexion/'})
+    opener.open(requete).read()
+    if not any(cookie.name == 'sessionid' for cookie in cookies):
+        raise SystemExit("Échec de connexion : vérifier l'utilisateur et le mot de passe")
+    return opener
+
+
+def percentile(valeurs, rang):
+    valeurs = sorted(valeurs)
+    position = min(len(valeurs) - 1, max(0, int(round(rang / 100 * (len(valeurs) - 1)))))
+    return valeurs[position]
+
+
+def mesurer(openers, url, nb_requetes):
+    """Lance nb_requetes GET répartis sur les clients, retourne les statistiques en ms"""
+
+    def client(opener, nombre):
+        durees = []
+        for _ in range(nombre):
+            debut = time.perf_counter()
+            with opener.open(url) as reponse:
+                reponse.read()
+            durees.append((time.perf_counter() - debut) * 1000)
+        return durees
+
+    par_client = max(1, nb_requetes // len(openers))
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(openers)) as pool:
+        resultats = list(pool.map(client, openers, [par_client] * len(openers)))
+    duree_totale = time.perf_counter() - debut
+
+    durees = [duree for resultat in resultats for duree in resultat]
+    return {
+        'requetes': len(durees),
+        'debit_rps': round(len(durees) / duree_totale, 1),
+        'moyenne_ms': round(statistics.mean(durees), 2),
+        'p50_ms': round(percentile(durees, 50), 2),
+        'p95_ms': round(percentile(durees, 95), 2),
+        'p99_ms': round(percentile(durees, 99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--utilisateur', required=True)
+    parser.add_argument('--mot-de-passe', required=True)
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--requetes', type=int, default=400)
+    args = parser.parse_args()
+
+    openers = [ouvrir_session(args.url, args.utilisateur, args.mot_de_passe) for _ in range(args.clients)]
+
+    rapport = {}
+    for nom, chemin_sync, chemin_async in PAIRES:
+        # Chauffe (cache des indicateurs, connexions) avant chaque mesure
+        mesurer(openers, args.url + chemin_sync, args.clients)
+        mesurer(openers, args.url + chemin_async, args.clients)
+        rapport[nom] = {
+            'sync': mesurer(openers, args.url + chemin_sync, args.requetes),
+            'async': mesurer(openers, args.url + chemin_async, args.requetes),
+        }
+
+    print(json.dumps(rapport, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
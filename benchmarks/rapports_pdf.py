@@ -0,0 +1,65 @@
+"""
+Débit du rendu des rapports PDF (construire_rapport_pdf), en PDF par seconde,
+pour chaque type de rapport. Les données sont des instances non enregistrées :
+aucune base n'est nécessaire, seul le rendu ReportLab est mesuré.
+
+Exemple :
+    python benchmarks/rapports_pdf.py --iterations 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DjangoProject.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from solvabilite_app.models import Compagnie, DonneesSolvabilite  # noqa: E402
+from solvabilite_app.utils.rapport_pdf import TYPES_RAPPORTS, construire_rapport_pdf  # noqa: E402
+
+
+def donnees_exemple():
+    compagnie = Compagnie(nom='Compagnie Exemple', siren='123456789', type_compagnie='ASSURANCE_MIXTE',
+                          capital_social=1000000, date_creation=date(2000, 1, 1))
+    donnees = DonneesSolvabilite(
+        compagnie=compagnie, date_reference=date(2024, 12, 31),
+        fonds_propres=1500000, passif_technique=800000, prime_annuelle=400000, placements=2000000,
+        immobilisations=300000, charges_sinistres=250000, scr_marche=450000, scr_credit=120000,
+        scr_vie=90000, scr_non_vie=150000, scr_operational=40000, mcr=220000, ratio_solvabilite=176.5,
+    )
+    return compagnie, donnees
+
+
+def mesurer(rapport_type, compagnie, donnees, iterations):
+    construire_rapport_pdf(rapport_type, compagnie, donnees, 'Régulateur')  # chauffe
+    durees = []
+    for _ in range(iterations):
+        debut = time.perf_counter()
+        construire_rapport_pdf(rapport_type, compagnie, donnees, 'Régulateur')
+        durees.append(time.perf_counter() - debut)
+    return {
+        'pdf_par_seconde': round(len(durees) / sum(durees), 1),
+        'mediane_ms': round(statistics.median(durees) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    compagnie, donnees = donnees_exemple()
+    rapport = {rapport_type: mesurer(rapport_type, compagnie, donnees, args.iterations)
+               for rapport_type in TYPES_RAPPORTS}
+    print(json.dumps(rapport, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Débit du tableau de bord sous lectures concurrentes, selon le moteur de
+sessions : 'db' (une écriture django_session par requête avec
+SESSION_SAVE_EVERY_REQUEST) contre 'solvabilite_app.sessions' (écritures
+regroupées). Les requêtes passent par le client de test Django, chaque
+client dans son thread avec sa propre connexion à la base.
+
+Exemple :
+    python benchmarks/sessions_concurrentes.py --utilisateur admin@exemple.fr --clients 16 --requetes 2000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DjangoProject.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import close_old_connections, connection  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from solvabilite_app.models import Utilisateur  # noqa: E402
+
+MOTEURS = {
+    'db': 'django.contrib.sessions.backends.db',
+    'ecritures_regroupees': 'solvabilite_app.sessions',
+}
+URL = '/solvabilite/tableau-de-bord/'
+
+
+def percentile(valeurs, rang):
+    valeurs = sorted(valeurs)
+    position = min(len(valeurs) - 1, max(0, int(round(rang / 100 * (len(valeurs) - 1)))))
+    return valeurs[position]
+
+
+class CompteurEcrituresSession:
+    """execute_wrapper : compte les INSERT / UPDATE sur django_session"""
+
+    def __init__(self):
+        self.ecritures = 0
+        self._verrou = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if 'django_session' in sql and sql.lstrip().upper().startswith(('INSERT', 'UPDATE')):
+            with self._verrou:
+                self.ecritures += 1
+        return execute(sql, params, many, context)
+
+
+def mesurer(moteur, user, nb_clients, nb_requetes):
+    settings.SESSION_ENGINE = moteur
+    # Le moteur est lu à la création du client (chargement des middlewares)
+    clients = []
+    for _ in range(nb_clients):
+        client = Client(SERVER_NAME='localhost')
+        client.force_login(user)
+        client.get(URL)  # chauffe : cache des indicateurs, première écriture de session
+        clients.append(client)
+
+    compteur = CompteurEcrituresSession()
+
+    def executer(client, nombre):
+        durees = []
+        try:
+            with connection.execute_wrapper(compteur):
+                for _ in range(nombre):
+                    debut = time.perf_counter()
+                    reponse = client.get(URL)
+                    durees.append((time.perf_counter() - debut) * 1000)
+                    if reponse.status_code != 200:
+                        raise SystemExit(f"{URL} a répondu {reponse.status_code}")
+        finally:
+            close_old_connections()
+        return durees
+
+    par_client = max(1, nb_requetes // nb_clients)
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=nb_clients) as pool:
+        resultats = list(pool.map(executer, clients, [par_client] * nb_clients))
+    duree_totale = time.perf_counter() - debut
+
+    durees = [duree for resultat in resultats for duree in resultat]
+    return {
+        'requetes': len(durees),
+        'debit_rps': round(len(durees) / duree_totale, 1),
+        'moyenne_ms': round(statistics.mean(durees), 2),
+        'p50_ms': round(percentile(durees, 50), 2),
+        'p95_ms': round(percentile(durees, 95), 2),
+        'p99_ms': round(percentile(durees, 99), 2),
+        'ecritures_session': compteur.ecritures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--utilisateur', required=True, help="Nom d'utilisateur ou email")
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requetes', type=int, default=2000)
+    args = parser.parse_args()
+
+    user = Utilisateur.objects.filter(username=args.utilisateur).first() or \
+        Utilisateur.objects.filter(email=args.utilisateur).first()
+    if user is None:
+        raise SystemExit(f"Utilisateur introuvable : {args.utilisateur}")
+
+    rapport = {nom: mesurer(moteur, user, args.clients, args.requetes) for nom, moteur in MOTEURS.items()}
+    print(json.dumps(rapport, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
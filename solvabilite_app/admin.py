@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Utilisateur, Compagnie, DonneesSolvabilite, CalculSCR
+from .models import (
+    Utilisateur, Compagnie, DonneesSolvabilite, CalculSCR, CourbeTaux, DonneeMarche, SoumissionDeclaration
+)
 
 
 @admin.register(Utilisateur)
@@ -30,10 +32,31 @@ class CompagnieAdmin(admin.ModelAdmin):
     search_fields = ('nom', 'siren')
 
 
+class EquilibreBilanFilter(admin.SimpleListFilter):
+    """Filtre sur l'écart actif/passif calculé en SQL"""
+    title = "équilibre du bilan"
+    parameter_name = 'equilibre'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('equilibre', 'Équilibré'),
+            ('desequilibre', 'Déséquilibré'),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == 'equilibre':
+            return queryset.filter(ecart_bilan=0)
+        if self.value() == 'desequilibre':
+            return queryset.bilan_desequilibre()
+        return queryset
+
+
 @admin.register(DonneesSolvabilite)
 class DonneesSolvabiliteAdmin(admin.ModelAdmin):
-    list_display = ('compagnie', 'date_reference', 'fonds_propres', 'total_scr', 'ratio_solvabilite')
-    list_filter = ('date_reference', 'compagnie')
+    list_display = ('compagnie', 'date_reference', 'fonds_propres', 'total_scr', 'ratio_solvabilite',
+                    'equilibre_bilan')
+    list_filter = ('date_reference', 'compagnie', EquilibreBilanFilter)
+    list_select_related = ('compagnie',)
     search_fields = ('compagnie__nom',)
     readonly_fields = ('date_saisie',)
 
@@ -52,6 +75,17 @@ class DonneesSolvabiliteAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals()
+
+    @admin.display(description='SCR Total', ordering='scr_total')
+    def total_scr(self, obj):
+        return obj.scr_total
+
+    @admin.display(description='Écart actif/passif', ordering='ecart_bilan')
+    def equilibre_bilan(self, obj):
+        return obj.ecart_bilan
+
 
 @admin.register(CalculSCR)
 class CalculSCRAdmin(admin.ModelAdmin):
@@ -67,4 +101,27 @@ class CalculSCRAdmin(admin.ModelAdmin):
         ('Résultats', {
             'fields': ('resultat_scr', 'parametres_calcul')
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(SoumissionDeclaration)
+class SoumissionDeclarationAdmin(admin.ModelAdmin):
+    list_display = ('compagnie', 'date_reference', 'statut', 'tentatives', 'reference', 'date_envoi')
+    list_filter = ('statut', 'date_reference')
+    list_select_related = ('compagnie',)
+    search_fields = ('compagnie__nom', 'compagnie__siren', 'reference')
+    readonly_fields = ('cle_idempotence', 'execution', 'date_creation', 'date_maj', 'date_envoi')
+    raw_id_fields = ('compagnie', 'donnees')
+
+
+@admin.register(DonneeMarche)
+class DonneeMarcheAdmin(admin.ModelAdmin):
+    list_display = ('cle', 'valeur', 'date_obtention')
+    readonly_fields = ('date_obtention',)
+
+
+@admin.register(CourbeTaux)
+class CourbeTauxAdmin(admin.ModelAdmin):
+    list_display = ('devise', 'date_reference', 'ufr', 'alpha', 'source', 'date_import')
+    list_filter = ('devise',)
+    readonly_fields = ('date_import',)
@@ -4,3 +4,7 @@ class SolvabiliteAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'solvabilite_app'
     verbose_name = 'Application Solvabilité II'
+
+    def ready(self):
+        # Branchement des signaux d'invalidation du cache des indicateurs
+        from . import signals  # noqa: F401
@@ -0,0 +1,85 @@
+"""
+Modèle d'autorisation : rôles, permissions métier et périmètre de données.
+
+Les permissions de chaque rôle sont compilées une fois, à l'import, en
+frozensets : un contrôle est un test d'appartenance en temps constant.
+L'ensemble de l'utilisateur est mémorisé sur l'instance
+(Utilisateur.permissions_metier), donc calculé au plus une fois par requête.
+"""
+from datetime import datetime, timedelta
+
+PERMISSIONS_ROLES = {
+    'ACTUAIRE': ['calcul_scr', 'calcul_avance', 'voir_indicateurs', 'exporter_rapports',
+                 'voir_rapports_techniques'],
+    'RISK_MANAGER': ['calcul_scr', 'voir_indicateurs', 'exporter_rapports', 'voir_rapports_risques',
+                     'gestion_risques'],
+    'CONTROLEUR': ['voir_indicateurs', 'exporter_rapports', 'voir_rapports_conformite'],
+    'DG': ['voir_indicateurs', 'exporter_rapports', 'voir_rapports_strategiques', 'voir_rapports_risques',
+           'prise_decision'],
+    'CLIENT': ['voir_indicateurs_publics', 'voir_rapports_publics'],
+    'CONSULTANT': ['voir_indicateurs', 'exporter_rapports', 'analyses_consultation'],
+    'REGULATEUR': ['voir_indicateurs', 'exporter_rapports', 'supervision', 'audit'],
+    'RH': ['gestion_utilisateurs', 'voir_indicateurs_rh'],
+}
+
+# Permissions qu'aucun rôle métier ne porte
+PERMISSIONS_ADMINISTRATION = frozenset({'toutes_permissions', 'envoyer_declarations'})
+
+# L'administrateur dispose de toutes les permissions métier
+TOUTES_PERMISSIONS = frozenset(
+    {permission for permissions in PERMISSIONS_ROLES.values() for permission in permissions}
+    | PERMISSIONS_ADMINISTRATION
+)
+
+PERMISSIONS_PAR_ROLE = {role: frozenset(permissions) for role, permissions in PERMISSIONS_ROLES.items()}
+PERMISSIONS_PAR_ROLE['ADMIN'] = TOUTES_PERMISSIONS
+
+AUCUNE_PERMISSION = frozenset()
+
+# Rôles autorisés à consulter les données de toutes les compagnies
+ROLES_VISION_GLOBALE = frozenset({'ADMIN', 'REGULATEUR'})
+
+# Rôles dont l'historique est limité aux 12 derniers mois
+ROLES_HISTORIQUE_RESTREINT = frozenset({'CLIENT', 'CONSULTANT'})
+DUREE_HISTORIQUE_RESTREINT_JOURS = 365
+
+
+def permissions_role(role):
+    """Ensemble (figé) des permissions d'un rôle"""
+    return PERMISSIONS_PAR_ROLE.get(role, AUCUNE_PERMISSION)
+
+
+def a_permission(user, permission):
+    return permission in user.permissions_metier
+
+
+def vision_globale(user):
+    return user.role in ROLES_VISION_GLOBALE
+
+
+def historique_restreint(user):
+    return user.role in ROLES_HISTORIQUE_RESTREINT
+
+
+def peut_voir_compagnie(user, compagnie_id):
+    return vision_globale(user) or (user.compagnie_id is not None and user.compagnie_id == compagnie_id)
+
+
+def restreindre_aux_compagnies(queryset, user, champ_compagnie='compagnie'):
+    """
+    Limite un queryset aux lignes des compagnies visibles par l'utilisateur :
+    aucun filtre en vision globale, sinon un seul prédicat sur la clé étrangère.
+    """
+    if vision_globale(user):
+        return queryset
+    if not user.compagnie_id:
+        return queryset.none()
+    return queryset.filter(**{f'{champ_compagnie}_id': user.compagnie_id})
+
+
+def limiter_historique(queryset, user, champ_date):
+    """Limite l'historique aux 12 derniers mois pour les rôles restreints"""
+    if not historique_restreint(user):
+        return queryset
+    depuis = datetime.now() - timedelta(days=DUREE_HISTORIQUE_RESTREINT_JOURS)
+    return queryset.filter(**{f'{champ_date}__gte': depuis})
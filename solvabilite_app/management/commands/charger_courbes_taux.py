@@ -0,0 +1,111 @@
+"""
+Charge des courbes des taux depuis des fichiers locaux (aucun accès réseau).
+
+Formats acceptés :
+- CSV, une ligne par point : devise,date_reference,maturite,taux
+  (colonnes optionnelles ufr et alpha, lues sur la première ligne de chaque courbe) ;
+- JSON, une liste de courbes :
+  [{"devise": "EUR", "date_reference": "2024-12-31", "maturites": [1, 2, ...], "taux": [...],
+    "ufr": 0.033, "alpha": 0.1}, ...]
+
+Chaque courbe est ajustée (Smith-Wilson) avant d'être enregistrée : une courbe
+invalide est signalée et ignorée. Une courbe existante (même devise et date) est remplacée.
+
+Exemple :
+    python manage.py charger_courbes_taux courbes_eiopa_2024.csv --pourcentage
+"""
+import csv
+import json
+import time
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from solvabilite_app.models import CourbeTaux
+from solvabilite_app.services.courbe_taux import CourbeSmithWilson, configuration_courbes, ufr_devise
+
+
+def lire_csv(chemin, separateur):
+    points = defaultdict(list)
+    parametres = {}
+    with open(chemin, newline='', encoding='utf-8-sig') as fichier:
+        for ligne in csv.DictReader(fichier, delimiter=separateur):
+            cle = (ligne['devise'].strip().upper(), date.fromisoformat(ligne['date_reference'].strip()))
+            points[cle].append((float(ligne['maturite']), float(ligne['taux'])))
+            if cle not in parametres:
+                parametres[cle] = {nom: float(ligne[nom]) for nom in ('ufr', 'alpha') if ligne.get(nom)}
+    courbes = []
+    for (devise, date_reference), valeurs in points.items():
+        valeurs.sort()
+        courbes.append({
+            'devise': devise, 'date_reference': date_reference,
+            'maturites': [maturite for maturite, _ in valeurs], 'taux': [taux for _, taux in valeurs],
+            **parametres[(devise, date_reference)],
+        })
+    return courbes
+
+
+def lire_json(chemin):
+    with open(chemin, encoding='utf-8') as fichier:
+        courbes = json.load(fichier)
+    for courbe in courbes:
+        courbe['devise'] = courbe['devise'].upper()
+        courbe['date_reference'] = date.fromisoformat(courbe['date_reference'])
+    return courbes
+
+
+class Command(BaseCommand):
+    help = "Charge des courbes des taux zéro-coupon depuis des fichiers CSV ou JSON locaux"
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichiers', nargs='+')
+        parser.add_argument('--separateur', default=',', help='Séparateur des fichiers CSV')
+        parser.add_argument('--pourcentage', action='store_true', help='Taux (et UFR) exprimés en pourcentage')
+        parser.add_argument('--ufr', type=float, help="UFR à appliquer (défaut : colonne ufr, sinon configuration)")
+        parser.add_argument('--alpha', type=float,
+                            help='Vitesse de convergence (défaut : colonne alpha, sinon configuration)')
+
+    def handle(self, *args, **options):
+        configuration = configuration_courbes()
+        diviseur = 100 if options['pourcentage'] else 1
+        enregistrees = ignorees = 0
+        debut = time.perf_counter()
+
+        for nom_fichier in options['fichiers']:
+            chemin = Path(nom_fichier)
+            if not chemin.exists():
+                raise CommandError(f"Fichier introuvable : {chemin}")
+            try:
+                if chemin.suffix.lower() == '.json':
+                    courbes = lire_json(chemin)
+                else:
+                    courbes = lire_csv(chemin, options['separateur'])
+            except (KeyError, ValueError, json.JSONDecodeError) as e:
+                raise CommandError(f"{chemin} illisible : {e}")
+
+            for courbe in courbes:
+                taux = [valeur / diviseur for valeur in courbe['taux']]
+                ufr = options['ufr'] if options['ufr'] is not None else courbe.get('ufr')
+                ufr = ufr / diviseur if ufr is not None else ufr_devise(courbe['devise'])
+                alpha = options['alpha'] or courbe.get('alpha') or configuration['ALPHA']
+                libelle = f"{courbe['devise']} au {courbe['date_reference']}"
+                try:
+                    CourbeSmithWilson(courbe['maturites'], taux, ufr, alpha,
+                                      configuration['MATURITE_MAX'], configuration['POINTS_PAR_AN'])
+                except (ValueError, TypeError, ArithmeticError) as e:
+                    self.stderr.write(f"Courbe {libelle} ignorée : {e}")
+                    ignorees += 1
+                    continue
+                CourbeTaux.objects.update_or_create(
+                    devise=courbe['devise'], date_reference=courbe['date_reference'],
+                    defaults={'maturites': list(courbe['maturites']), 'taux': taux, 'ufr': ufr, 'alpha': alpha,
+                              'source': chemin.name},
+                )
+                enregistrees += 1
+                self.stdout.write(f"  {libelle} : {len(taux)} points, UFR {ufr:.2%}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{enregistrees} courbe(s) chargée(s), {ignorees} ignorée(s) en {time.perf_counter() - debut:.2f} s"
+        ))
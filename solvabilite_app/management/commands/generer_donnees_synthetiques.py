@@ -0,0 +1,54 @@
+"""
+Génère des données synthétiques de volumétrie : compagnies, utilisateurs et
+historique trimestriel de données de solvabilité et de calculs SCR, avec des
+sous-risques corrélés. Résultat reproductible pour une graine et des
+paramètres donnés ; une nouvelle exécution ajoute de nouvelles compagnies.
+
+Les utilisateurs générés (synthetique0000000, ...) partagent le mot de passe
+--mot-de-passe.
+
+Exemple (10 millions de lignes d'historique) :
+    python manage.py generer_donnees_synthetiques --compagnies 125000 --annees 10 --utilisateurs 20000
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from solvabilite_app.services.donnees_synthetiques import TAILLE_PAQUET, generer_donnees_synthetiques
+
+
+class Command(BaseCommand):
+    help = "Génère compagnies, utilisateurs et historique de solvabilité synthétiques (tests de charge)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compagnies', type=int, default=1000)
+        parser.add_argument('--utilisateurs', type=int, default=0)
+        parser.add_argument('--annees', type=int, default=10, help="Années d'historique trimestriel par compagnie")
+        parser.add_argument('--graine', type=int, default=0)
+        parser.add_argument('--date-fin', type=date.fromisoformat,
+                            help='Dernière date de référence AAAA-MM-JJ (défaut : dernière fin de trimestre)')
+        parser.add_argument('--mot-de-passe', default='synthetique', help='Mot de passe des utilisateurs générés')
+        parser.add_argument('--taille-paquet', type=int, default=TAILLE_PAQUET,
+                            help="Lignes d'historique par transaction")
+
+    def handle(self, *args, **options):
+        if options['compagnies'] < 1 or options['annees'] < 1 or options['utilisateurs'] < 0:
+            raise CommandError("--compagnies et --annees doivent être positifs, --utilisateurs ne peut être négatif")
+        lignes = options['compagnies'] * options['annees'] * 4
+        self.stdout.write(
+            f"{options['compagnies']} compagnies, {options['utilisateurs']} utilisateurs, "
+            f"{lignes} données et {lignes} calculs (graine {options['graine']})"
+        )
+
+        def afficher(bilan):
+            self.stdout.write(f"  {bilan['donnees']}/{lignes} trimestres générés ({bilan['duree_s']} s)")
+
+        bilan = generer_donnees_synthetiques(
+            options['compagnies'], utilisateurs=options['utilisateurs'], annees=options['annees'],
+            graine=options['graine'], date_fin=options['date_fin'], mot_de_passe=options['mot_de_passe'],
+            taille_paquet=options['taille_paquet'], rappel=afficher,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{bilan['compagnies']} compagnies, {bilan['utilisateurs']} utilisateurs, {bilan['donnees']} données "
+            f"et {bilan['calculs']} calculs en {bilan['duree_s']} s ({bilan['lignes_par_seconde']} lignes/s)"
+        ))
@@ -0,0 +1,213 @@
+"""
+Génération en masse des rapports PDF de toutes les compagnies (clôture trimestrielle).
+
+Les dernières données de chaque compagnie sont chargées en une seule requête
+préchargée, puis le rendu ReportLab, limité par le CPU, est réparti sur un
+ProcessPoolExecutor. Les PDF sont écrits dans un répertoire ou une archive ZIP
+(« - » : archive ZIP sur la sortie standard). Avec --pack, chaque type de
+rapport donne un seul PDF regroupant toutes les compagnies (une par page).
+Les graphiques utilisent l'historique des ratios, chargé lui aussi en une
+seule requête et réduit avant le rendu.
+
+Exemples :
+    python manage.py generer_rapports --sortie rapports_T4.zip
+    python manage.py generer_rapports --sortie rapports/ --types synthese risques --processus 4
+    python manage.py generer_rapports --sortie - --compagnies 542107651 > axa.zip
+    python manage.py generer_rapports --sortie packs/ --pack --types synthese
+"""
+import math
+import os
+import statistics
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import OuterRef, Prefetch, Subquery
+
+from solvabilite_app.models import Compagnie, DonneesSolvabilite, Utilisateur
+from solvabilite_app.services.indicateurs import series_ratio_compagnies
+from solvabilite_app.utils.pdf_generator import MOTEURS, rendre_rapport
+from solvabilite_app.utils.rapport_pdf import NB_POINTS_GRAPHIQUES, TYPES_RAPPORTS, construire_pack_pdf
+
+
+def _initialiser_processus():
+    """Processus démarrés par « spawn » (macOS, Windows) : Django n'y est pas encore chargé"""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def _rendre(rapport_type, compagnie, donnees_recentes, series, role_affiche, moteur, nom_fichier):
+    """Tâche exécutée dans un processus fils : (nom du fichier, octets PDF, durée du rendu en s)"""
+    debut = time.perf_counter()
+    pdf = rendre_rapport(rapport_type, compagnie, donnees_recentes, role_affiche, moteur=moteur, series=series)
+    return nom_fichier, pdf, time.perf_counter() - debut
+
+
+def _rendre_pack(rapport_type, rapports, role_affiche, nom_fichier):
+    """Un PDF pour toutes les compagnies (moteur ReportLab)"""
+    debut = time.perf_counter()
+    pdf = construire_pack_pdf(rapport_type, rapports, role_affiche)
+    return nom_fichier, pdf, time.perf_counter() - debut
+
+
+def _rendre_lot(taches):
+    """Plusieurs rapports par aller-retour entre processus (moins de sérialisation)"""
+    return [fonction(*arguments) for fonction, arguments in taches]
+
+
+def charger_compagnies(sirens=None):
+    """Compagnies avec leurs dernières données (attribut dernieres_donnees : liste de 0 ou 1 élément)"""
+    derniere_par_compagnie = DonneesSolvabilite.objects.filter(
+        compagnie=OuterRef('compagnie')
+    ).order_by('-date_reference', '-pk').values('pk')[:1]
+    compagnies = Compagnie.objects.prefetch_related(Prefetch(
+        'donneessolvabilite_set',
+        queryset=DonneesSolvabilite.objects.with_totals().filter(pk=Subquery(derniere_par_compagnie)),
+        to_attr='dernieres_donnees',
+    ))
+    if sirens:
+        compagnies = compagnies.filter(siren__in=sirens)
+    return list(compagnies)
+
+
+class _SortieRepertoire:
+    def __init__(self, chemin):
+        self.chemin = Path(chemin)
+        self.chemin.mkdir(parents=True, exist_ok=True)
+
+    def ecrire(self, nom_fichier, contenu):
+        destination = self.chemin / nom_fichier
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        destination.write_bytes(contenu)
+
+    def fermer(self):
+        pass
+
+
+class _SortieZip:
+    """Archive écrite au fil de l'eau ; accepte un flux non positionnable (sortie standard)"""
+
+    def __init__(self, fichier):
+        # Les PDF sont déjà compressés : stockés tels quels
+        self.archive = zipfile.ZipFile(fichier, mode='w', compression=zipfile.ZIP_STORED)
+
+    def ecrire(self, nom_fichier, contenu):
+        self.archive.writestr(nom_fichier, contenu)
+
+    def fermer(self):
+        self.archive.close()
+
+
+class Command(BaseCommand):
+    help = 'Génère les rapports PDF de toutes les compagnies en parallèle (répertoire ou archive ZIP)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sortie', required=True,
+                            help="Répertoire, fichier .zip, ou « - » pour une archive ZIP sur la sortie standard")
+        parser.add_argument('--types', nargs='+', choices=TYPES_RAPPORTS, default=list(TYPES_RAPPORTS),
+                            help='Types de rapports à générer (tous par défaut)')
+        parser.add_argument('--compagnies', nargs='+', metavar='SIREN',
+                            help='Limiter aux compagnies indiquées (toutes par défaut)')
+        parser.add_argument('--role', choices=[role for role, _ in Utilisateur.ROLE_CHOICES], default='REGULATEUR',
+                            help='Profil indiqué dans les rapports')
+        parser.add_argument('--moteur', choices=list(MOTEURS), default='reportlab',
+                            help='Moteur de rendu (reportlab : voie rapide pour les volumes)')
+        parser.add_argument('--pack', action='store_true',
+                            help='Un seul PDF par type de rapport pour toutes les compagnies (moteur reportlab)')
+        parser.add_argument('--processus', type=int, default=os.cpu_count() or 1,
+                            help='Nombre de processus de rendu (0 : rendu dans le processus courant)')
+
+    def handle(self, *args, **options):
+        sortie_standard = options['sortie'] == '-'
+        # Sur la sortie standard, la progression et le bilan passent sur stderr
+        journal = self.stderr if sortie_standard else self.stdout
+
+        if options['pack'] and options['moteur'] != 'reportlab':
+            raise CommandError("--pack n'est disponible qu'avec le moteur reportlab")
+
+        debut = time.perf_counter()
+        compagnies = charger_compagnies(options['compagnies'])
+        if not compagnies:
+            raise CommandError("Aucune compagnie à traiter")
+        series = series_ratio_compagnies([compagnie.pk for compagnie in compagnies], NB_POINTS_GRAPHIQUES)
+        duree_chargement = time.perf_counter() - debut
+
+        role_affiche = dict(Utilisateur.ROLE_CHOICES)[options['role']]
+        horodatage = datetime.now().strftime('%Y%m%d')
+        rapports = [
+            (compagnie, compagnie.dernieres_donnees[0] if compagnie.dernieres_donnees else None,
+             series.get(compagnie.pk))
+            for compagnie in compagnies
+        ]
+        if options['pack']:
+            taches = [
+                (_rendre_pack, (rapport_type, rapports, role_affiche,
+                                f"pack_rapports_{rapport_type}_{horodatage}.pdf"))
+                for rapport_type in options['types']
+            ]
+        else:
+            taches = [
+                (_rendre, (rapport_type, compagnie, donnees, series_compagnie, role_affiche, options['moteur'],
+                           f"{compagnie.siren}/rapport_solvabilite_{rapport_type}_{horodatage}.pdf"))
+                for compagnie, donnees, series_compagnie in rapports
+                for rapport_type in options['types']
+            ]
+
+        if sortie_standard:
+            sortie = _SortieZip(sys.stdout.buffer)
+        elif options['sortie'].lower().endswith('.zip'):
+            sortie = _SortieZip(options['sortie'])
+        else:
+            sortie = _SortieRepertoire(options['sortie'])
+
+        durees = []
+        taille_totale = 0
+        debut_rendu = time.perf_counter()
+        try:
+            for nom_fichier, pdf, duree in self._executer(taches, options['processus']):
+                sortie.ecrire(nom_fichier, pdf)
+                durees.append(duree)
+                taille_totale += len(pdf)
+                if options['verbosity'] >= 2:
+                    journal.write(f"{nom_fichier} ({len(pdf)} octets, {duree * 1000:.0f} ms)")
+        finally:
+            sortie.fermer()
+        duree_totale = time.perf_counter() - debut_rendu
+
+        durees.sort()
+        libelle = 'packs' if options['pack'] else 'rapports'
+        journal.write(self.style.SUCCESS(
+            f"{len(durees)} {libelle} pour {len(compagnies)} compagnies en {duree_totale:.2f} s "
+            f"({len(durees) / duree_totale:.1f} PDF/s, {taille_totale / 1024 / 1024:.1f} Mo)"
+        ))
+        journal.write(
+            f"Chargement des données : {duree_chargement * 1000:.0f} ms ; rendu par PDF : "
+            f"moyenne {statistics.mean(durees) * 1000:.0f} ms, "
+            f"médiane {statistics.median(durees) * 1000:.0f} ms, "
+            f"p95 {durees[math.ceil(0.95 * (len(durees) - 1))] * 1000:.0f} ms, "
+            f"max {durees[-1] * 1000:.0f} ms"
+        )
+
+    def _executer(self, taches, nb_processus):
+        """Résultats des tâches au fur et à mesure de leur achèvement"""
+        if nb_processus <= 0:
+            for fonction, arguments in taches:
+                yield fonction(*arguments)
+            return
+
+        # Environ quatre lots par processus : équilibre la charge sans multiplier les échanges
+        taille_lot = max(1, len(taches) // (nb_processus * 4))
+        with ProcessPoolExecutor(max_workers=nb_processus, initializer=_initialiser_processus) as pool:
+            futures = [
+                pool.submit(_rendre_lot, taches[position:position + taille_lot])
+                for position in range(0, len(taches), taille_lot)
+            ]
+            for future in as_completed(futures):
+                yield from future.result()
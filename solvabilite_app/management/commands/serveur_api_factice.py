@@ -0,0 +1,32 @@
+"""
+Lance le serveur factice des APIs externes (régulateur et données de marché).
+
+Exemple, avec REGULATEUR_API_URL et MARKET_DATA_URL pointant sur le serveur :
+    python manage.py serveur_api_factice --port 8099 --latence 0.05 --taux-erreur 0.1
+"""
+from django.core.management.base import BaseCommand
+
+from solvabilite_app.utils.serveur_api_factice import ServeurFactice
+
+
+class Command(BaseCommand):
+    help = "Serveur HTTP factice des APIs externes (latence et erreurs 503 injectables)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hote', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8099)
+        parser.add_argument('--latence', type=float, default=0.0, help='Latence ajoutée à chaque réponse (secondes)')
+        parser.add_argument('--taux-erreur', type=float, default=0.0, help='Part des réponses en 503 (0 à 1)')
+        parser.add_argument('--verbeux', action='store_true', help='Journaliser chaque requête')
+
+    def handle(self, *args, **options):
+        serveur = ServeurFactice((options['hote'], options['port']), latence=options['latence'],
+                                 taux_erreur=options['taux_erreur'], verbeux=options['verbeux'])
+        self.stdout.write(f"Serveur factice sur {serveur.url} (Ctrl+C pour arrêter)")
+        try:
+            serveur.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            serveur.server_close()
+            self.stdout.write(f"Arrêt : {serveur.compteurs}")
@@ -0,0 +1,52 @@
+"""
+Envoie au régulateur les déclarations de toutes les compagnies pour une date
+de référence. Relancer la commande après une interruption reprend les envois
+là où ils s'étaient arrêtés.
+
+Exemple :
+    python manage.py soumettre_declarations --date-reference 2024-12-31 --threads 8 --debit 20
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from solvabilite_app.services.declarations import (
+    configuration_declarations, date_reference_courante, progression, soumettre_declarations
+)
+
+
+class Command(BaseCommand):
+    help = "Envoi concurrent et reprenable des déclarations de solvabilité au régulateur"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-reference', type=date.fromisoformat,
+                            help='Date de référence AAAA-MM-JJ (défaut : la plus récente des données)')
+        parser.add_argument('--threads', type=int, help="Nombre de threads d'envoi (défaut : configuration)")
+        parser.add_argument('--debit', type=float, help='Déclarations par seconde au plus (0 : sans limite)')
+        parser.add_argument('--sans-relance-echecs', action='store_true',
+                            help='Ne pas renvoyer les déclarations en échec lors des exécutions précédentes')
+
+    def handle(self, *args, **options):
+        date_reference = options['date_reference'] or date_reference_courante()
+        if date_reference is None:
+            raise CommandError("Aucune donnée à déclarer")
+        configuration = configuration_declarations()
+        debit_max = configuration['DEBIT_MAX'] if options['debit'] is None else options['debit']
+        self.stdout.write(
+            f"Déclarations au {date_reference} : {options['threads'] or configuration['THREADS']} threads, "
+            + (f"{debit_max:g} déclarations/s au plus" if debit_max else "débit non limité")
+        )
+
+        def afficher(etat):
+            self.stdout.write(f"  {etat['par_statut']['ENVOYEE']}/{etat['total']} envoyées "
+                              f"({etat['pourcentage_envoye']} %), {etat['par_statut']['ECHEC']} en échec")
+
+        bilan = soumettre_declarations(date_reference, threads=options['threads'], debit=options['debit'],
+                                       relancer_echecs=not options['sans_relance_echecs'], rappel=afficher)
+        etat = progression(date_reference)
+        debit = bilan['envoyees'] / bilan['duree_s'] if bilan['duree_s'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{bilan['envoyees']} envoyées, {bilan['echecs']} échecs en {bilan['duree_s']} s "
+            f"({debit:.1f}/s) ; {bilan['creees']} soumissions créées. "
+            f"Total : {etat['par_statut']['ENVOYEE']}/{etat['total']} envoyées."
+        ))
@@ -0,0 +1,81 @@
+"""
+Test de charge de l'application : utilisateurs virtuels par rôle (scénarios
+pondérés de utils.injecteur_charge), débit et latences p50 / p95 / p99 par
+point d'accès, en JSON. Plusieurs niveaux de concurrence peuvent être
+enchaînés pour repérer celui où la latence se dégrade.
+
+Exemples :
+    python manage.py generer_donnees_synthetiques --compagnies 200 --utilisateurs 500 --annees 5
+    python manage.py tester_charge --concurrence 1,4,8 --duree 30 --sortie charge_v2.json
+    python manage.py tester_charge --transport http --url http://127.0.0.1:8000 --concurrence 16,32
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from solvabilite_app.utils.injecteur_charge import POIDS_ROLES, executer_test_charge
+
+
+def _entiers(valeur):
+    return [int(niveau) for niveau in valeur.split(',') if niveau]
+
+
+def _poids_roles(valeur):
+    """ACTUAIRE=3,DG=1 -> {'ACTUAIRE': 3.0, 'DG': 1.0}"""
+    poids = {}
+    for element in valeur.split(','):
+        role, _, poids_role = element.partition('=')
+        poids[role.strip().upper()] = float(poids_role or 1)
+    return poids
+
+
+class Command(BaseCommand):
+    help = "Test de charge par rôles sur les URL de l'application (client de test ou HTTP), rapport JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrence', type=_entiers, default=[4],
+                            help="Utilisateurs virtuels simultanés, un ou plusieurs paliers (ex. 1,4,16)")
+        parser.add_argument('--duree', type=float, default=30, help='Durée de chaque palier (secondes)')
+        parser.add_argument('--transport', choices=['client', 'http'], default='client')
+        parser.add_argument('--url', help="URL du serveur en transport http (ex. http://127.0.0.1:8000)")
+        parser.add_argument('--roles', type=_poids_roles,
+                            help=f"Poids des rôles (défaut : {','.join(f'{r}={p}' for r, p in POIDS_ROLES.items())})")
+        parser.add_argument('--prefixe', default='synthetique', help='Préfixe des comptes utilisés')
+        parser.add_argument('--mot-de-passe', default='synthetique')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Temps de réflexion moyen entre deux actions (secondes, loi exponentielle)')
+        parser.add_argument('--montee', type=float, default=0.0, help='Étalement des démarrages (secondes)')
+        parser.add_argument('--requetes-max', type=int, help='Requêtes au plus par utilisateur virtuel')
+        parser.add_argument('--graine', type=int, default=0)
+        parser.add_argument('--etiquette', default='', help='Libellé du rapport (version testée)')
+        parser.add_argument('--sortie', help='Fichier JSON du rapport (défaut : sortie standard)')
+
+    def handle(self, *args, **options):
+        if not options['concurrence'] or min(options['concurrence']) < 1:
+            raise CommandError("--concurrence : un ou plusieurs entiers positifs")
+        roles_inconnus = set(options['roles'] or ()) - set(POIDS_ROLES)
+        if roles_inconnus:
+            raise CommandError(f"Rôles sans scénario : {', '.join(sorted(roles_inconnus))}")
+        try:
+            rapport = executer_test_charge(
+                options['concurrence'], options['duree'], transport=options['transport'], url=options['url'],
+                etiquette=options['etiquette'], poids_roles=options['roles'], prefixe=options['prefixe'],
+                mot_de_passe=options['mot_de_passe'], pause=options['pause'], montee=options['montee'],
+                graine=options['graine'], requetes_max=options['requetes_max'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        contenu = json.dumps(rapport, indent=2, ensure_ascii=False)
+        if options['sortie']:
+            with open(options['sortie'], 'w', encoding='utf-8') as fichier:
+                fichier.write(contenu)
+        else:
+            self.stdout.write(contenu)
+        for palier in rapport['paliers']:
+            ensemble = palier['ensemble'] or {}
+            self.stderr.write(
+                f"{palier['concurrence']} utilisateurs : {ensemble.get('debit_rps')} req/s, "
+                f"p50 {ensemble.get('p50_ms')} ms, p95 {ensemble.get('p95_ms')} ms, p99 {ensemble.get('p99_ms')} ms, "
+                f"{ensemble.get('erreurs')} erreurs"
+            )
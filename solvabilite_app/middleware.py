@@ -0,0 +1,78 @@
+"""
+Mesure de chaque requête HTTP pour /metrics : durée et statut par vue
+(nom de route, borné), et nombre et durée des requêtes SQL exécutées.
+
+Pour une réponse en flux (SSE, exports), la durée mesurée s'arrête à l'envoi
+des en-têtes. En mode asynchrone, les requêtes SQL s'exécutent dans les
+threads de sync_to_async et ne sont pas comptées.
+"""
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+
+from .services.metriques import duree_requetes_http, duree_sql, requetes_http, requetes_sql
+
+VUE_NON_RESOLUE = '<non_resolue>'
+# Méthodes exposées telles quelles ; les autres sont regroupées (cardinalité bornée)
+METHODES = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class CompteurSQL:
+    """execute_wrapper : nombre et durée cumulée des requêtes SQL"""
+
+    def __init__(self):
+        self.nombre = 0
+        self.duree = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duree += time.perf_counter() - debut
+            self.nombre += 1
+
+
+def _vue(request):
+    resolution = getattr(request, 'resolver_match', None)
+    return resolution.view_name if resolution is not None else VUE_NON_RESOLUE
+
+
+class MetriquesMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        compteur = CompteurSQL()
+        debut = time.perf_counter()
+        with ExitStack() as pile:
+            for alias in connections:
+                pile.enter_context(connections[alias].execute_wrapper(compteur))
+            response = self.get_response(request)
+        vue = _vue(request)
+        self._enregistrer(vue, request.method, response.status_code, time.perf_counter() - debut)
+        requetes_sql.observer(compteur.nombre, vue)
+        if compteur.nombre:
+            duree_sql.inc(vue, valeur=compteur.duree)
+        return response
+
+    async def __acall__(self, request):
+        debut = time.perf_counter()
+        response = await self.get_response(request)
+        self._enregistrer(_vue(request), request.method, response.status_code, time.perf_counter() - debut)
+        return response
+
+    @staticmethod
+    def _enregistrer(vue, methode, statut, duree):
+        methode = methode if methode in METHODES else 'AUTRE'
+        duree_requetes_http.observer(duree, vue, methode)
+        requetes_http.inc(vue, methode, str(statut))
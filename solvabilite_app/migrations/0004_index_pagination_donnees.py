@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solvabilite_app', '0003_alter_donneessolvabilite_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='utilisateur',
+            name='role',
+            field=models.CharField(choices=[('ACTUAIRE', 'Actuaire'), ('RISK_MANAGER', 'Risk Manager'), ('CONTROLEUR', 'Contrôleur de Gestion'), ('DG', 'Directeur Général'), ('CONSULTANT', 'Consultant'), ('ADMIN', 'Administrateur'), ('REGULATEUR', 'Régulateur'), ('CLIENT', 'Client'), ('RH', 'Responsable RH')], default='CLIENT', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='donneessolvabilite',
+            index=models.Index(fields=['date_reference', 'id'], name='donnees_date_ref_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donneessolvabilite',
+            index=models.Index(fields=['compagnie', 'date_reference', 'id'], name='donnees_cie_date_ref_idx'),
+        ),
+    ]
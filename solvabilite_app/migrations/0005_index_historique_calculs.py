@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solvabilite_app', '0004_index_pagination_donnees'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calculscr',
+            index=models.Index(fields=['date_calcul', 'id'], name='calcul_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solvabilite_app', '0005_index_historique_calculs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SoumissionDeclaration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle_idempotence', models.CharField(max_length=64, unique=True)),
+                ('date_reference', models.DateField()),
+                ('statut', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('EN_COURS', "En cours d'envoi"), ('ENVOYEE', 'Envoyée'), ('ECHEC', 'Échec')], default='EN_ATTENTE', max_length=20)),
+                ('execution', models.CharField(blank=True, max_length=32)),
+                ('tentatives', models.PositiveIntegerField(default=0)),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('derniere_erreur', models.TextField(blank=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_maj', models.DateTimeField(default=django.utils.timezone.now)),
+                ('date_envoi', models.DateTimeField(blank=True, null=True)),
+                ('compagnie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='solvabilite_app.compagnie')),
+                ('donnees', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='solvabilite_app.donneessolvabilite')),
+            ],
+            options={
+                'verbose_name': 'Soumission de déclaration',
+                'verbose_name_plural': 'Soumissions de déclarations',
+                'ordering': ['date_reference', 'compagnie'],
+                'indexes': [models.Index(fields=['date_reference', 'statut'], name='soumission_date_statut_idx')],
+            },
+        ),
+    ]
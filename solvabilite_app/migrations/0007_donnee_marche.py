@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solvabilite_app', '0006_soumission_declaration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DonneeMarche',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle', models.CharField(max_length=50, unique=True)),
+                ('valeur', models.FloatField()),
+                ('date_obtention', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Donnée de marché',
+                'verbose_name_plural': 'Données de marché',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solvabilite_app', '0007_donnee_marche'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourbeTaux',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('devise', models.CharField(max_length=3)),
+                ('date_reference', models.DateField()),
+                ('maturites', models.JSONField(help_text='Maturités observées, en années')),
+                ('taux', models.JSONField(help_text='Taux zéro-coupon correspondants (0.03 pour 3 %)')),
+                ('ufr', models.FloatField(verbose_name='Ultimate Forward Rate')),
+                ('alpha', models.FloatField(default=0.1, verbose_name="Vitesse de convergence vers l'UFR")),
+                ('source', models.CharField(blank=True, max_length=200)),
+                ('date_import', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Courbe des taux',
+                'verbose_name_plural': 'Courbes des taux',
+                'ordering': ['devise', '-date_reference'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='courbetaux',
+            constraint=models.UniqueConstraint(fields=('devise', 'date_reference'), name='courbe_devise_date_unique'),
+        ),
+    ]
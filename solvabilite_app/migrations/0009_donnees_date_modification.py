@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solvabilite_app', '0008_courbe_taux'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donneessolvabilite',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
+from django.db.models import ExpressionWrapper, F, Q
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .autorisations import permissions_role
 
 
 class Compagnie(models.Model):
@@ -74,6 +78,47 @@ class Utilisateur(AbstractUser):
         """Retourne l'affichage du rôle"""
         return dict(self.ROLE_CHOICES).get(self.role, self.role)
 
+    @cached_property
+    def permissions_metier(self):
+        """Permissions métier du rôle, mémorisées sur l'instance (une fois par requête)"""
+        return permissions_role(self.role)
+
+    def refresh_from_db(self, *args, **kwargs):
+        self.__dict__.pop('permissions_metier', None)
+        super().refresh_from_db(*args, **kwargs)
+
+
+def champ_montant():
+    """output_field des totaux annotés : une instance par expression"""
+    return models.DecimalField(max_digits=17, decimal_places=2)
+
+
+class DonneesSolvabiliteQuerySet(models.QuerySet):
+    """QuerySet exposant les totaux calculés par la base de données"""
+
+    def with_totals(self):
+        """
+        Annote scr_total, actif_total, passif_total et ecart_bilan en SQL (tri,
+        filtres, listes). Figés au chargement : après modification d'une instance,
+        utiliser les propriétés total_scr, total_actif, ...
+        """
+        return self.annotate(
+            scr_total=ExpressionWrapper(
+                F('scr_marche') + F('scr_credit') + F('scr_vie') + F('scr_non_vie') + F('scr_operational'),
+                output_field=champ_montant()
+            ),
+            actif_total=ExpressionWrapper(F('placements') + F('immobilisations'), output_field=champ_montant()),
+            passif_total=ExpressionWrapper(F('fonds_propres') + F('passif_technique'),
+                                           output_field=champ_montant()),
+        ).annotate(
+            ecart_bilan=ExpressionWrapper(F('actif_total') - F('passif_total'), output_field=champ_montant())
+        )
+
+    def bilan_desequilibre(self, tolerance=0):
+        """Lignes dont l'écart actif/passif dépasse la tolérance (valeur absolue)"""
+        qs = self if 'ecart_bilan' in self.query.annotations else self.with_totals()
+        return qs.filter(Q(ecart_bilan__gt=tolerance) | Q(ecart_bilan__lt=-tolerance))
+
 
 class DonneesSolvabilite(models.Model):
     compagnie = models.ForeignKey(Compagnie, on_delete=models.CASCADE)
@@ -118,11 +163,20 @@ class DonneesSolvabilite(models.Model):
     details_risques = models.JSONField(default=dict, blank=True)
 
     date_saisie = models.DateTimeField(auto_now_add=True)
+    # Dernière modification : validateurs HTTP (ETag / Last-Modified) des API
+    date_modification = models.DateTimeField(auto_now=True)
+
+    objects = DonneesSolvabiliteQuerySet.as_manager()
 
     class Meta:
         ordering = ['-date_reference']
         verbose_name = "Données de Solvabilité"
         verbose_name_plural = "Données de Solvabilité"
+        indexes = [
+            # Pagination par clé (date_reference, id), globale ou par compagnie
+            models.Index(fields=['date_reference', 'id'], name='donnees_date_ref_id_idx'),
+            models.Index(fields=['compagnie', 'date_reference', 'id'], name='donnees_cie_date_ref_idx'),
+        ]
 
     def __str__(self):
         return f"Données {self.compagnie} - {self.date_reference}"
@@ -172,6 +226,9 @@ class DonneesSolvabilite(models.Model):
 
         super().save(*args, **kwargs)
 
+    # Calculées depuis les champs de l'instance : toujours à jour, même après
+    # une modification en mémoire (les annotations de with_totals() ne le sont pas)
+
     @property
     def total_scr(self):
         """Calcule le SCR total automatiquement"""
@@ -180,6 +237,7 @@ class DonneesSolvabilite(models.Model):
                 self.scr_non_vie) + float(self.scr_operational)
         except (TypeError, ValueError):
             return 0.0
+
     @property
     def total_actif(self):
         """Calcule le total actif"""
@@ -207,6 +265,10 @@ class CalculSCR(models.Model):
         verbose_name = "Calcul SCR"
         verbose_name_plural = "Calculs SCR"
         ordering = ['-date_calcul']
+        indexes = [
+            # Pagination par clé de l'historique des calculs
+            models.Index(fields=['date_calcul', 'id'], name='calcul_date_id_idx'),
+        ]
 
     def __str__(self):
         return f"SCR {self.resultat_scr} - {self.date_calcul.strftime('%d/%m/%Y')}"
@@ -216,4 +278,87 @@ class CalculSCR(models.Model):
         """Calcule le ratio de solvabilité"""
         if self.resultat_scr and self.resultat_scr > 0:
             return (float(self.donnees.fonds_propres) / float(self.resultat_scr)) * 100
-        return 0
\ No newline at end of file
+        return 0
+
+
+class SoumissionDeclaration(models.Model):
+    """
+    État de l'envoi au régulateur de la déclaration d'une compagnie pour une
+    date de référence. La clé d'idempotence (SIREN + date de référence) est
+    transmise à chaque envoi : un lot interrompu peut être repris sans risque
+    de double déclaration.
+    """
+    STATUT_CHOICES = [
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_COURS', 'En cours d\'envoi'),
+        ('ENVOYEE', 'Envoyée'),
+        ('ECHEC', 'Échec'),
+    ]
+
+    cle_idempotence = models.CharField(max_length=64, unique=True)
+    compagnie = models.ForeignKey(Compagnie, on_delete=models.CASCADE)
+    donnees = models.ForeignKey(DonneesSolvabilite, on_delete=models.CASCADE)
+    date_reference = models.DateField()
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='EN_ATTENTE')
+    execution = models.CharField(max_length=32, blank=True)
+    tentatives = models.PositiveIntegerField(default=0)
+    reference = models.CharField(max_length=100, blank=True)
+    derniere_erreur = models.TextField(blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_maj = models.DateTimeField(default=timezone.now)
+    date_envoi = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Soumission de déclaration"
+        verbose_name_plural = "Soumissions de déclarations"
+        ordering = ['date_reference', 'compagnie']
+        indexes = [
+            # Progression et reprise d'un lot : comptage et sélection par statut
+            models.Index(fields=['date_reference', 'statut'], name='soumission_date_statut_idx'),
+        ]
+
+    def __str__(self):
+        return f"Déclaration {self.compagnie} - {self.date_reference} ({self.get_statut_display()})"
+
+
+class DonneeMarche(models.Model):
+    """
+    Dernière valeur valide d'une donnée de marché (taux sans risque, ...),
+    relue si le fournisseur est indisponible
+    """
+    cle = models.CharField(max_length=50, unique=True)
+    valeur = models.FloatField()
+    date_obtention = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Donnée de marché"
+        verbose_name_plural = "Données de marché"
+
+    def __str__(self):
+        return f"{self.cle} = {self.valeur} ({self.date_obtention:%d/%m/%Y %H:%M})"
+
+
+class CourbeTaux(models.Model):
+    """
+    Courbe des taux zéro-coupon observés (taux annuels composés) d'une devise à
+    une date ; l'extrapolation jusqu'à l'UFR est calculée par services.courbe_taux.
+    """
+    devise = models.CharField(max_length=3)
+    date_reference = models.DateField()
+    maturites = models.JSONField(help_text="Maturités observées, en années")
+    taux = models.JSONField(help_text="Taux zéro-coupon correspondants (0.03 pour 3 %)")
+    ufr = models.FloatField(verbose_name="Ultimate Forward Rate")
+    alpha = models.FloatField(default=0.1, verbose_name="Vitesse de convergence vers l'UFR")
+    source = models.CharField(max_length=200, blank=True)
+    date_import = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Courbe des taux"
+        verbose_name_plural = "Courbes des taux"
+        ordering = ['devise', '-date_reference']
+        constraints = [
+            models.UniqueConstraint(fields=['devise', 'date_reference'], name='courbe_devise_date_unique'),
+        ]
+
+    def __str__(self):
+        return f"Courbe {self.devise} au {self.date_reference}"
@@ -0,0 +1,170 @@
+"""
+Cache des données de tableau de bord par compagnie.
+
+Deux niveaux : un LRU en mémoire du processus, puis le backend de cache
+Django configuré (SOLVABILITE_CACHE['ALIAS']). Les clés incluent une version
+de données par compagnie, incrémentée par les signaux de sauvegarde et de
+suppression : une compagnie dont les données n'ont pas changé est servie
+sans requête SQL.
+
+Les entrées du LRU expirent après LRU_TTL secondes : avec un backend propre
+à chaque processus (LocMem) et plusieurs workers, une invalidation faite par
+un autre worker n'atteint pas ce processus, et la donnée servie peut alors
+avoir au plus TTL secondes de retard (CACHE_URL partagé pour l'éviter).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .metriques import evenements_cache
+
+CONFIGURATION_DEFAUT = {
+    'ALIAS': 'default',
+    'TTL': 300,
+    'LRU_TAILLE': 256,
+    'LRU_TTL': 30,
+    'PREFIXE': 'solvabilite',
+}
+
+
+def _configuration():
+    configuration = dict(CONFIGURATION_DEFAUT)
+    configuration.update(getattr(settings, 'SOLVABILITE_CACHE', {}))
+    return configuration
+
+
+class CacheLRU:
+    """LRU borné et thread-safe, local au processus ; entrées expirées après ttl secondes (None : jamais)"""
+
+    def __init__(self, taille_max, ttl=None):
+        self.taille_max = taille_max
+        self.ttl = ttl
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def get(self, cle, defaut=None):
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None:
+                return defaut
+            expiration, valeur = entree
+            if expiration is not None and time.monotonic() >= expiration:
+                del self._entrees[cle]
+                return defaut
+            self._entrees.move_to_end(cle)
+            return valeur
+
+    def set(self, cle, valeur):
+        expiration = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._verrou:
+            self._entrees[cle] = (expiration, valeur)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+
+    def supprimer_si(self, predicat):
+        with self._verrou:
+            for cle in [cle for cle in self._entrees if predicat(cle)]:
+                del self._entrees[cle]
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+
+    def __len__(self):
+        return len(self._entrees)
+
+
+class CacheIndicateurs:
+    """Cache versionné par compagnie, avec compteurs de succès / échecs"""
+
+    def __init__(self):
+        configuration = _configuration()
+        self.alias = configuration['ALIAS']
+        self.ttl = configuration['TTL']
+        self.prefixe = configuration['PREFIXE']
+        self.lru = CacheLRU(configuration['LRU_TAILLE'], min(configuration['LRU_TTL'], self.ttl))
+        self._verrou_stats = threading.Lock()
+        self._stats = {
+            'succes_lru': 0,
+            'succes_partage': 0,
+            'echecs': 0,
+            'invalidations': 0,
+        }
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def _incrementer(self, compteur):
+        with self._verrou_stats:
+            self._stats[compteur] += 1
+        evenements_cache.inc('indicateurs', compteur)
+
+    def _cle_version(self, compagnie_id):
+        return f'{self.prefixe}:version:{compagnie_id}'
+
+    def version(self, compagnie_id):
+        """Version courante des données d'une compagnie (créée si absente)"""
+        cle = self._cle_version(compagnie_id)
+        version = self.backend.get(cle)
+        if version is None:
+            # Valeur initiale unique : une version perdue (redémarrage, éviction)
+            # ne peut pas faire ressortir une entrée périmée du LRU.
+            self.backend.add(cle, time.time_ns(), timeout=None)
+            version = self.backend.get(cle)
+        return version
+
+    def obtenir(self, compagnie_id, nom, construire, rafraichir=False):
+        """Retourne la valeur en cache, ou la construit et la stocke (toujours si rafraichir)"""
+        version = self.version(compagnie_id)
+        cle_locale = (compagnie_id, nom, version)
+
+        valeur = None if rafraichir else self.lru.get(cle_locale)
+        if valeur is not None:
+            self._incrementer('succes_lru')
+            return valeur
+
+        cle_partagee = f'{self.prefixe}:donnees:{compagnie_id}:{version}:{nom}'
+        valeur = None if rafraichir else self.backend.get(cle_partagee)
+        if valeur is not None:
+            self._incrementer('succes_partage')
+            self.lru.set(cle_locale, valeur)
+            return valeur
+
+        self._incrementer('echecs')
+        valeur = construire()
+        self.backend.set(cle_partagee, valeur, timeout=self.ttl)
+        self.lru.set(cle_locale, valeur)
+        return valeur
+
+    def invalider(self, compagnie_id):
+        """Change la version de la compagnie : toutes ses entrées deviennent obsolètes"""
+        self._incrementer('invalidations')
+        cle = self._cle_version(compagnie_id)
+        try:
+            self.backend.incr(cle)
+        except ValueError:
+            self.backend.set(cle, time.time_ns(), timeout=None)
+        self.lru.supprimer_si(lambda cle_locale: cle_locale[0] == compagnie_id)
+
+    def statistiques(self):
+        with self._verrou_stats:
+            stats = dict(self._stats)
+        lectures = stats['succes_lru'] + stats['succes_partage'] + stats['echecs']
+        stats['taux_succes'] = round((stats['succes_lru'] + stats['succes_partage']) / lectures, 4) if lectures else 0.0
+        stats['entrees_lru'] = len(self.lru)
+        return stats
+
+    def reinitialiser(self):
+        """Vide le LRU et remet les compteurs à zéro (tests, benchmarks)"""
+        self.lru.vider()
+        with self._verrou_stats:
+            for compteur in self._stats:
+                self._stats[compteur] = 0
+
+
+cache_indicateurs = CacheIndicateurs()
@@ -0,0 +1,224 @@
+"""
+Cache disque des rapports PDF générés.
+
+Un rapport est identifié par (compagnie, type de rapport, rôle, état des
+données de la compagnie en base) : tant que les données ne changent pas, le
+même fichier est resservi sans nouveau rendu ReportLab. L'état est lu en base
+(champs affichés de la compagnie, dernière modification et nombre des données,
+dernier calcul) et non dans la
+version de cache_indicateurs, propre à chaque processus avec LocMem alors que
+les fichiers sont partagés.
+
+Les fichiers sont écrits sous MEDIA_ROOT de façon atomique (fichier temporaire
+puis os.replace) et évincés du moins récemment servi au plus récent au-delà de
+TAILLE_MAX octets.
+Les demandes simultanées d'un même rapport attendent un rendu unique.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from ..models import CalculSCR, DonneesSolvabilite
+from .metriques import evenements_cache
+
+CONFIGURATION_DEFAUT = {
+    'REPERTOIRE': 'rapports_cache',
+    'TAILLE_MAX': 200 * 1024 * 1024,
+}
+
+# À incrémenter quand la mise en page des rapports change
+VERSION_GABARIT = 2
+
+
+def etat_donnees(compagnie):
+    """Empreinte en base des données d'une compagnie : change à chaque écriture ou suppression"""
+    if compagnie is None:
+        return ''
+    donnees = DonneesSolvabilite.objects.filter(compagnie_id=compagnie.pk).aggregate(
+        derniere_maj=Max('date_modification'), nombre=Count('id')
+    )
+    calculs = CalculSCR.objects.filter(donnees__compagnie_id=compagnie.pk).aggregate(
+        dernier=Max('id'), nombre=Count('id')
+    )
+    derniere_maj = donnees['derniere_maj']
+    return ':'.join([
+        str(compagnie.pk),
+        compagnie.nom,
+        compagnie.siren,
+        compagnie.type_compagnie,
+        derniere_maj.isoformat() if derniere_maj else '',
+        str(donnees['nombre']),
+        str(calculs['dernier'] or ''),
+        str(calculs['nombre']),
+    ])
+
+
+def _configuration():
+    configuration = dict(CONFIGURATION_DEFAUT)
+    configuration.update(getattr(settings, 'SOLVABILITE_RAPPORTS_CACHE', {}))
+    return configuration
+
+
+class CacheRapports:
+    """Fichiers PDF sur disque, LRU borné en taille, rendus coalescés par clé"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._verrous_cles = {}
+        self._stats = {
+            'succes': 0,
+            'succes_apres_attente': 0,
+            'rendus': 0,
+            'evictions': 0,
+        }
+
+    @property
+    def repertoire(self):
+        repertoire = Path(_configuration()['REPERTOIRE'])
+        if not repertoire.is_absolute():
+            repertoire = Path(settings.MEDIA_ROOT) / repertoire
+        return repertoire
+
+    @property
+    def taille_max(self):
+        return _configuration()['TAILLE_MAX']
+
+    def _incrementer(self, compteur):
+        with self._verrou:
+            self._stats[compteur] += 1
+        evenements_cache.inc('rapports_pdf', compteur)
+
+    def cle(self, compagnie, rapport_type, role):
+        """Empreinte identifiant le rapport pour l'état courant des données en base"""
+        identite = f'{VERSION_GABARIT}:{rapport_type}:{role}:{etat_donnees(compagnie)}'
+        return hashlib.sha256(identite.encode('utf-8')).hexdigest()[:32]
+
+    def _chemin(self, cle):
+        return self.repertoire / f'{cle}.pdf'
+
+    def _ouvrir_existant(self, chemin):
+        try:
+            fichier = open(chemin, 'rb')
+        except FileNotFoundError:
+            return None
+        # Marque le fichier comme récemment servi (ordre d'éviction)
+        try:
+            os.utime(chemin)
+        except OSError:
+            pass
+        return fichier
+
+    def _acquerir(self, cle):
+        with self._verrou:
+            entree = self._verrous_cles.setdefault(cle, [threading.Lock(), 0])
+            entree[1] += 1
+        return entree
+
+    def _liberer(self, cle, entree):
+        with self._verrou:
+            entree[1] -= 1
+            if entree[1] == 0:
+                del self._verrous_cles[cle]
+
+    def ouvrir(self, cle, generer):
+        """
+        Fichier binaire ouvert du rapport ; generer() (octets PDF) n'est appelé
+        qu'en l'absence du fichier, et une seule fois pour des appels simultanés.
+        """
+        chemin = self._chemin(cle)
+        fichier = self._ouvrir_existant(chemin)
+        if fichier is not None:
+            self._incrementer('succes')
+            return fichier
+
+        entree = self._acquerir(cle)
+        try:
+            with entree[0]:
+                fichier = self._ouvrir_existant(chemin)
+                if fichier is not None:
+                    self._incrementer('succes_apres_attente')
+                    return fichier
+
+                contenu = generer()
+                self._incrementer('rendus')
+                self._ecrire(chemin, contenu)
+                fichier = open(chemin, 'rb')
+        finally:
+            self._liberer(cle, entree)
+
+        self._evincer(garder=chemin)
+        return fichier
+
+    def _ecrire(self, chemin, contenu):
+        chemin.parent.mkdir(parents=True, exist_ok=True)
+        descripteur, temporaire = tempfile.mkstemp(dir=chemin.parent, suffix='.tmp')
+        try:
+            with os.fdopen(descripteur, 'wb') as sortie:
+                sortie.write(contenu)
+            os.replace(temporaire, chemin)
+        except BaseException:
+            try:
+                os.unlink(temporaire)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def _evincer(self, garder=None):
+        """Supprime les rapports les moins récemment servis au-delà de la taille maximale"""
+        fichiers = []
+        taille_totale = 0
+        try:
+            entrees = list(os.scandir(self.repertoire))
+        except FileNotFoundError:
+            return
+        for entree in entrees:
+            if not entree.name.endswith('.pdf'):
+                continue
+            try:
+                stat = entree.stat()
+            except FileNotFoundError:
+                continue
+            fichiers.append((stat.st_mtime, stat.st_size, entree.path))
+            taille_totale += stat.st_size
+
+        if taille_totale <= self.taille_max:
+            return
+        for _, taille, chemin in sorted(fichiers):
+            if taille_totale <= self.taille_max:
+                break
+            if garder is not None and chemin == str(garder):
+                continue
+            try:
+                os.unlink(chemin)
+            except FileNotFoundError:
+                continue
+            taille_totale -= taille
+            self._incrementer('evictions')
+
+    def statistiques(self):
+        with self._verrou:
+            stats = dict(self._stats)
+        demandes = stats['succes'] + stats['succes_apres_attente'] + stats['rendus']
+        stats['taux_succes'] = round((demandes - stats['rendus']) / demandes, 4) if demandes else 0.0
+        return stats
+
+    def vider(self):
+        """Supprime tous les rapports en cache (tests, changement de gabarit)"""
+        try:
+            entrees = list(os.scandir(self.repertoire))
+        except FileNotFoundError:
+            return
+        for entree in entrees:
+            if entree.name.endswith('.pdf'):
+                try:
+                    os.unlink(entree.path)
+                except FileNotFoundError:
+                    pass
+
+
+cache_rapports = CacheRapports()
@@ -0,0 +1,292 @@
+"""
+Calcul SCR avancé par lots : validation de chaque ligne selon les règles de
+CalculSCRAvanceForm, calcul vectorisé du SCR / MCR / ratio sur tout le lot,
+puis enregistrement en deux bulk_create dans une seule transaction.
+"""
+import time
+
+import numpy as np
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.forms.utils import ErrorDict
+
+from ..forms import CalculSCRAvanceForm
+from ..models import CalculSCR, Compagnie, DonneesSolvabilite
+from . import metriques
+from .cache_indicateurs import cache_indicateurs
+from .diffusion import concentrateur, evenement_calcul
+from .donnees_marche import donnees_marche
+from .indicateurs import determiner_statut_solvabilite
+
+TAILLE_LOT_MAX = 10000
+TAILLE_LOT_INSERTION = 500
+
+# Sous-risques de chaque module, dans l'ordre de la matrice de corrélation
+SOUS_RISQUES = {
+    'marche': [('taux', 'risque_taux'), ('actions', 'risque_actions'), ('immobilier', 'risque_immobilier')],
+    'credit': [('contrepartie', 'risque_contrepartie'), ('spread', 'risque_spread'),
+               ('concentration', 'concentration')],
+    'vie': [('mortalite', 'mortalite'), ('longevite', 'longevite'), ('rachat', 'rachat')],
+    'non_vie': [('primes', 'risque_primes'), ('sinistres', 'risque_sinistres'), ('catastrophes', 'catastrophes')],
+}
+MODULES = list(SOUS_RISQUES)
+
+# Corrélations de la formule standard (mêmes coefficients que calculer_scr_standard)
+CORRELATIONS = np.array([
+    [1.00, 0.25, 0.25, 0.50],
+    [0.25, 1.00, 0.25, 0.25],
+    [0.25, 0.25, 1.00, 0.25],
+    [0.50, 0.25, 0.25, 1.00],
+])
+
+CHAMPS_BILAN = ['fonds_propres', 'passif_technique', 'prime_annuelle', 'placements', 'immobilisations',
+                'charges_sinistres']
+
+# DonneesSolvabilite.ratio_solvabilite : max_digits=5, decimal_places=2
+RATIO_MAX = 999.99
+
+_ABSENT = object()
+
+
+class ValidateurLot:
+    """
+    Applique les règles de CalculSCRAvanceForm à chaque ligne en réutilisant
+    une seule instance du formulaire : instancier un formulaire par ligne
+    (copie profonde des champs) coûterait plus que le calcul lui-même.
+    Le nettoyage d'un champ ne dépend que de la valeur saisie : les valeurs
+    répétées d'un lot (dates de référence, sous-risques nuls) ne sont
+    nettoyées qu'une fois.
+    """
+
+    def __init__(self):
+        self.formulaire = CalculSCRAvanceForm()
+        # Les sous-risques absents valent 0, comme les valeurs initiales du formulaire
+        self.defauts = {
+            nom: champ.widget.attrs.get('value')
+            for nom, champ in self.formulaire.fields.items()
+        }
+        self._nettoyes = {}
+
+    def _nettoyer(self, nom, champ, valeur):
+        cle = (nom, type(valeur), valeur)
+        try:
+            resultat = self._nettoyes.get(cle, _ABSENT)
+        except TypeError:
+            # Valeur non hachable (liste, objet JSON) : pas de mémorisation
+            return champ.clean(valeur)
+        if resultat is _ABSENT:
+            try:
+                resultat = champ.clean(valeur)
+            except ValidationError as erreur:
+                resultat = erreur
+            self._nettoyes[cle] = resultat
+        if isinstance(resultat, ValidationError):
+            raise resultat
+        return resultat
+
+    def valider(self, ligne):
+        """Retourne (cleaned_data, erreurs) pour une ligne (dict)"""
+        formulaire = self.formulaire
+        formulaire.cleaned_data = {}
+        formulaire._errors = ErrorDict()
+        for nom, champ in formulaire.fields.items():
+            valeur = ligne.get(nom)
+            if valeur in (None, ''):
+                valeur = self.defauts[nom]
+            try:
+                formulaire.cleaned_data[nom] = self._nettoyer(nom, champ, valeur)
+            except ValidationError as erreur:
+                formulaire.add_error(nom, erreur)
+        formulaire.clean()
+        erreurs = {champ: [str(message) for message in messages] for champ, messages in formulaire._errors.items()}
+        return formulaire.cleaned_data, erreurs
+
+
+def compagnies_autorisees(user):
+    """Compagnies pour lesquelles l'utilisateur peut soumettre : la sienne et celles de son groupe"""
+    if user.role == 'ADMIN':
+        return Compagnie.objects.all()
+    if not user.compagnie_id:
+        return Compagnie.objects.none()
+    groupe = user.compagnie.groupe
+    if groupe:
+        return Compagnie.objects.filter(groupe=groupe)
+    return Compagnie.objects.filter(pk=user.compagnie_id)
+
+
+def calculer_lot(matrice_modules, scr_operational, fonds_propres, prime_annuelle, passif_technique):
+    """
+    SCR, MCR et ratio de toutes les lignes en une passe vectorisée.
+    matrice_modules : tableau (n, 4) des modules marché, crédit, vie, non-vie.
+    """
+    scr_base = np.sqrt(np.einsum('ij,jk,ik->i', matrice_modules, CORRELATIONS, matrice_modules))
+    scr = scr_base + scr_operational
+
+    mcr_calcule = np.maximum(prime_annuelle * 0.25, passif_technique * 0.15)
+    mcr = np.maximum(scr * 0.25, np.minimum(mcr_calcule, scr * 0.45))
+
+    ratio = np.divide(fonds_propres * 100, scr, out=np.zeros_like(scr), where=scr > 0)
+    return scr, mcr, ratio
+
+
+def _resultats_ligne(donnees, scr, mcr, ratio, scenario):
+    """parametres_calcul d'une ligne, au format de sauvegarder_calcul_avance"""
+    statut, couleur_statut = determiner_statut_solvabilite(ratio)
+    modules = {module: float(donnees[module]) for module in MODULES}
+    total_modules = sum(modules.values())
+    if total_modules > 0:
+        modules = {
+            module: {'valeur': valeur, 'pourcentage': round(valeur / total_modules * 100, 1)}
+            for module, valeur in modules.items()
+        }
+    modules['operational'] = float(donnees['scr_operational'])
+
+    resultats = {
+        'scr': round(scr, 2),
+        'mcr': round(mcr, 2),
+        'ratio': round(ratio, 2),
+        'statut': statut,
+        'couleur_statut': couleur_statut,
+        'date_reference': donnees['date_reference'].isoformat(),
+        'modules': modules,
+        'sous_risques': {
+            module: {cle: float(donnees[champ]) for cle, champ in sous_risques}
+            for module, sous_risques in SOUS_RISQUES.items()
+        },
+    }
+    resultats.update({champ: float(donnees[champ]) for champ in CHAMPS_BILAN})
+    if scenario:
+        resultats['scenario'] = scenario
+    return resultats
+
+
+def _details_risques(donnees):
+    """details_risques tel que DonneesSolvabilite.save() le construit (bulk_create ne l'appelle pas)"""
+    details = {}
+    for module, sous_risques in SOUS_RISQUES.items():
+        details[module] = {cle: float(donnees[champ]) for cle, champ in sous_risques}
+        details[module]['total'] = float(donnees[module])
+    return details
+
+
+def _notifier(derniers):
+    """Invalide le cache et diffuse le dernier calcul de chaque compagnie du lot"""
+    for compagnie_id, (calcul, donnees) in derniers.items():
+        cache_indicateurs.invalider(compagnie_id)
+        concentrateur.publier(compagnie_id, evenement_calcul(calcul, donnees))
+
+
+def traiter_lot(user, lignes, tout_ou_rien=False):
+    """
+    Valide, calcule et enregistre un lot de lignes (liste de dicts).
+    Retourne un rapport : résultats par ligne valide, erreurs par ligne invalide.
+    Avec tout_ou_rien, aucune ligne n'est enregistrée si une seule est invalide.
+    """
+    validateur = ValidateurLot()
+    compagnies = {compagnie.siren: compagnie for compagnie in compagnies_autorisees(user)}
+    compagnie_defaut = user.compagnie if user.compagnie_id else None
+
+    valides = []
+    erreurs = []
+    for numero, ligne in enumerate(lignes, start=1):
+        if not isinstance(ligne, dict):
+            erreurs.append({'ligne': numero, 'erreurs': {'__all__': ["La ligne doit être un objet"]}})
+            continue
+
+        donnees, erreurs_ligne = validateur.valider(ligne)
+
+        siren = str(ligne.get('compagnie') or '').strip()
+        compagnie = compagnies.get(siren) if siren else compagnie_defaut
+        if compagnie is None:
+            erreurs_ligne.setdefault('compagnie', []).append(
+                "Compagnie inconnue ou non autorisée" if siren else "Aucune compagnie associée au compte"
+            )
+
+        if erreurs_ligne:
+            erreurs.append({'ligne': numero, 'erreurs': erreurs_ligne})
+            continue
+
+        for module, sous_risques in SOUS_RISQUES.items():
+            donnees[module] = sum(donnees[champ] for _, champ in sous_risques)
+        valides.append((numero, compagnie, str(ligne.get('scenario') or '')[:100], donnees))
+
+    rapport = {'nb_lignes': len(lignes), 'resultats': [], 'erreurs': erreurs}
+    if not valides:
+        return rapport
+
+    def colonne(nom):
+        return np.fromiter((float(donnees[nom]) for _, _, _, donnees in valides), dtype=float, count=len(valides))
+
+    debut = time.perf_counter()
+    matrice_modules = np.column_stack([colonne(module) for module in MODULES])
+    scr, mcr, ratio = calculer_lot(matrice_modules, colonne('scr_operational'), colonne('fonds_propres'),
+                                   colonne('prime_annuelle'), colonne('passif_technique'))
+    metriques.duree_calculs.observer(time.perf_counter() - debut, 'lot')
+    metriques.calculs.inc('lot', valeur=len(valides))
+
+    # Une seule lecture (non bloquante) des données de marché pour tout le lot
+    marche = donnees_marche.metadonnees()
+    a_enregistrer = []
+    for position, (numero, compagnie, scenario, donnees) in enumerate(valides):
+        ratio_ligne = round(float(ratio[position]), 2)
+        if ratio_ligne > RATIO_MAX:
+            erreurs.append({'ligne': numero, 'erreurs': {
+                'ratio': [f"Ratio de solvabilité {ratio_ligne} % hors limites (max {RATIO_MAX} %)"]
+            }})
+            continue
+        resultats = _resultats_ligne(donnees, float(scr[position]), float(mcr[position]), ratio_ligne, scenario)
+        resultats['donnees_marche'] = marche
+        a_enregistrer.append((numero, compagnie, donnees, resultats))
+
+    erreurs.sort(key=lambda erreur: erreur['ligne'])
+    if tout_ou_rien and erreurs:
+        return rapport
+
+    with transaction.atomic():
+        lignes_donnees = DonneesSolvabilite.objects.bulk_create([
+            DonneesSolvabilite(
+                compagnie=compagnie,
+                date_reference=donnees['date_reference'],
+                **{champ: donnees[champ] for champ in CHAMPS_BILAN},
+                scr_marche=donnees['marche'],
+                scr_credit=donnees['credit'],
+                scr_vie=donnees['vie'],
+                scr_non_vie=donnees['non_vie'],
+                scr_operational=donnees['scr_operational'],
+                **{champ: donnees[champ] for sous_risques in SOUS_RISQUES.values() for _, champ in sous_risques},
+                mcr=resultats['mcr'],
+                ratio_solvabilite=resultats['ratio'],
+                details_risques=_details_risques(donnees),
+            )
+            for _, compagnie, donnees, resultats in a_enregistrer
+        ], batch_size=TAILLE_LOT_INSERTION)
+
+        calculs = CalculSCR.objects.bulk_create([
+            CalculSCR(
+                donnees=ligne_donnees,
+                methode_calcul='AVANCE',
+                parametres_calcul=resultats,
+                resultat_scr=resultats['scr'],
+            )
+            for ligne_donnees, (_, _, _, resultats) in zip(lignes_donnees, a_enregistrer)
+        ], batch_size=TAILLE_LOT_INSERTION)
+
+        # bulk_create n'envoie pas post_save : invalidation et diffusion explicites
+        derniers = {}
+        for calcul, ligne_donnees in zip(calculs, lignes_donnees):
+            derniers[ligne_donnees.compagnie_id] = (calcul, ligne_donnees)
+        transaction.on_commit(lambda: _notifier(derniers))
+
+    for calcul, (numero, compagnie, _, resultats) in zip(calculs, a_enregistrer):
+        rapport['resultats'].append({
+            'ligne': numero,
+            'calcul_id': calcul.pk,
+            'compagnie': compagnie.siren,
+            'date_reference': resultats['date_reference'],
+            'scenario': resultats.get('scenario', ''),
+            'scr': resultats['scr'],
+            'mcr': resultats['mcr'],
+            'ratio': resultats['ratio'],
+            'statut': resultats['statut'],
+        })
+    return rapport
@@ -0,0 +1,158 @@
+"""
+Courbes des taux sans risque : interpolation et extrapolation Smith-Wilson
+jusqu'à l'UFR, actualisation vectorisée de flux de trésorerie.
+
+À partir des taux zéro-coupon observés d'une CourbeTaux, la méthode de
+Smith-Wilson donne les facteurs d'actualisation à toute maturité, avec un taux
+forward qui converge vers l'UFR (vitesse alpha). Le système linéaire n'est
+résolu qu'une fois par courbe : les facteurs sont précalculés sur une grille
+(POINTS_PAR_AN points par an jusqu'à MATURITE_MAX) et mémorisés par courbe ;
+une maturité quelconque est ensuite obtenue par interpolation linéaire du
+logarithme des facteurs (forward constant entre deux points de grille).
+"""
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+
+from ..models import CourbeTaux
+
+CONFIGURATION_DEFAUT = {
+    # UFR réglementaire par devise (taux annuel), UFR_DEFAUT pour les autres
+    'UFR': {'EUR': 0.033},
+    'UFR_DEFAUT': 0.033,
+    'ALPHA': 0.1,
+    'MATURITE_MAX': 150,
+    'POINTS_PAR_AN': 12,
+}
+
+
+def configuration_courbes():
+    configuration = dict(CONFIGURATION_DEFAUT)
+    configuration.update(getattr(settings, 'SOLVABILITE_COURBES_TAUX', {}))
+    return configuration
+
+
+def ufr_devise(devise):
+    configuration = configuration_courbes()
+    return configuration['UFR'].get(devise, configuration['UFR_DEFAUT'])
+
+
+def _noyau_wilson(t, u, omega, alpha):
+    """Matrice W(t_i, u_j) du noyau de Wilson (t et u : vecteurs de maturités)"""
+    t = t[:, np.newaxis]
+    u = u[np.newaxis, :]
+    minimum = np.minimum(t, u)
+    maximum = np.maximum(t, u)
+    return np.exp(-omega * (t + u)) * (
+        alpha * minimum - 0.5 * np.exp(-alpha * maximum) * (np.exp(alpha * minimum) - np.exp(-alpha * minimum))
+    )
+
+
+class CourbeSmithWilson:
+    """Courbe ajustée sur les taux observés, facteurs d'actualisation précalculés sur la grille"""
+
+    def __init__(self, maturites, taux, ufr, alpha, maturite_max=150, points_par_an=12):
+        self.maturites = np.asarray(maturites, dtype=float)
+        self.taux = np.asarray(taux, dtype=float)
+        if self.maturites.ndim != 1 or self.maturites.shape != self.taux.shape or not len(self.maturites):
+            raise ValueError("Maturités et taux doivent être deux listes de même longueur, non vides")
+        if not np.all(np.isfinite(self.maturites)) or not np.all(np.isfinite(self.taux)):
+            raise ValueError("Maturités et taux doivent être des nombres finis")
+        if self.maturites[0] <= 0 or np.any(np.diff(self.maturites) <= 0):
+            raise ValueError("Les maturités doivent être positives et strictement croissantes")
+        if alpha <= 0:
+            raise ValueError("alpha doit être strictement positif")
+
+        self.ufr = ufr
+        self.alpha = alpha
+        self.omega = np.log1p(ufr)
+
+        prix = (1 + self.taux) ** -self.maturites
+        self._zeta = np.linalg.solve(_noyau_wilson(self.maturites, self.maturites, self.omega, alpha),
+                                     prix - np.exp(-self.omega * self.maturites))
+
+        self.points_par_an = points_par_an
+        self.grille = np.linspace(0, maturite_max, int(maturite_max * points_par_an) + 1)
+        self._log_facteurs_grille = np.log(self._facteurs_exacts(self.grille))
+        self._pentes = np.diff(self._log_facteurs_grille)
+
+    def _facteurs_exacts(self, maturites):
+        noyau = _noyau_wilson(maturites, self.maturites, self.omega, self.alpha)
+        return np.exp(-self.omega * maturites) + noyau @ self._zeta
+
+    def facteurs_actualisation(self, maturites):
+        """Facteurs d'actualisation P(t), pour un tableau de maturités de forme quelconque"""
+        forme = np.shape(maturites)
+        maturites = np.atleast_1d(np.asarray(maturites, dtype=float))
+        fin = self.grille[-1]
+        # Grille régulière : l'intervalle se calcule directement (sans recherche
+        # dichotomique comme np.interp), puis interpolation en place
+        position = np.clip(maturites * self.points_par_an, 0, len(self._pentes))
+        indices = np.minimum(position.astype(np.intp), len(self._pentes) - 1)
+        position -= indices
+        log_facteurs = self._pentes[indices]
+        log_facteurs *= position
+        log_facteurs += self._log_facteurs_grille[indices]
+        # Au-delà de la grille, le forward est égal à l'UFR
+        au_dela = maturites > fin
+        if np.any(au_dela):
+            log_facteurs[au_dela] = self._log_facteurs_grille[-1] - self.omega * (maturites[au_dela] - fin)
+        return np.exp(log_facteurs, out=log_facteurs).reshape(forme)
+
+    def taux_zero_coupon(self, maturites):
+        """Taux zéro-coupon annuels composés"""
+        maturites = np.asarray(maturites, dtype=float)
+        facteurs = self.facteurs_actualisation(maturites)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(maturites > 0, facteurs ** (-1 / maturites) - 1, self.taux[0])
+
+    def taux_forward(self, maturites, duree=1.0):
+        """Taux forward annuels entre t et t + duree"""
+        maturites = np.asarray(maturites, dtype=float)
+        return (self.facteurs_actualisation(maturites) / self.facteurs_actualisation(maturites + duree)) \
+            ** (1 / duree) - 1
+
+    def actualiser(self, flux, maturites=None):
+        """
+        Valeurs actuelles de flux de trésorerie, en un seul calcul.
+        flux : tableau (..., m) — un vecteur de m flux par ligne (des dizaines de milliers de lignes possibles) ;
+        maturites : échéances (m,) communes à toutes les lignes, ou de même forme que flux ;
+        par défaut, flux annuels de fin d'année (1, 2, ..., m).
+        """
+        flux = np.asarray(flux, dtype=float)
+        if maturites is None:
+            maturites = np.arange(1, flux.shape[-1] + 1, dtype=float)
+        maturites = np.asarray(maturites, dtype=float)
+        if maturites.ndim == 1:
+            # Échéancier commun : un produit matriciel
+            return flux @ self.facteurs_actualisation(maturites)
+        return np.einsum('...i,...i->...', flux, self.facteurs_actualisation(maturites))
+
+
+@lru_cache(maxsize=32)
+def _courbe_memorisee(maturites, taux, ufr, alpha, maturite_max, points_par_an):
+    return CourbeSmithWilson(maturites, taux, ufr, alpha, maturite_max, points_par_an)
+
+
+def courbe_smith_wilson(courbe):
+    """Courbe calculée d'une CourbeTaux, mémorisée : le système n'est résolu qu'une fois par contenu de courbe"""
+    configuration = configuration_courbes()
+    return _courbe_memorisee(tuple(courbe.maturites), tuple(courbe.taux), courbe.ufr, courbe.alpha,
+                             configuration['MATURITE_MAX'], configuration['POINTS_PAR_AN'])
+
+
+def courbe_taux(devise='EUR', date_reference=None):
+    """Courbe calculée la plus récente de la devise à la date (ou à ce jour)"""
+    courbes = CourbeTaux.objects.filter(devise=devise)
+    if date_reference is not None:
+        courbes = courbes.filter(date_reference__lte=date_reference)
+    courbe = courbes.order_by('-date_reference').first()
+    if courbe is None:
+        raise CourbeTaux.DoesNotExist(f"Aucune courbe des taux {devise} au {date_reference or 'jour'}")
+    return courbe_smith_wilson(courbe)
+
+
+def actualiser(flux, maturites=None, devise='EUR', date_reference=None):
+    """Valeurs actuelles de flux (voir CourbeSmithWilson.actualiser) avec la courbe de la devise à la date"""
+    return courbe_taux(devise, date_reference).actualiser(flux, maturites)
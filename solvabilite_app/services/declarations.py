@@ -0,0 +1,220 @@
+"""
+Envoi en masse des déclarations de solvabilité au régulateur.
+
+Une ligne SoumissionDeclaration par compagnie et date de référence porte
+l'état de l'envoi. Un lot :
+1. crée les soumissions manquantes (dernière saisie de chaque compagnie à la date) ;
+2. réserve les soumissions à envoyer par paquets (statut EN_COURS + identifiant
+   d'exécution), ce qui empêche deux exécutions d'envoyer la même ligne ;
+3. envoie le paquet depuis un pool de threads borné, sous limite de débit ;
+4. enregistre chaque résultat dès sa réception.
+
+Seul le thread principal écrit en base ; les threads d'envoi ne font que des
+appels HTTP. Après une interruption, une nouvelle exécution reprend les
+soumissions non envoyées, y compris celles restées EN_COURS au-delà du délai
+de reprise : la clé d'idempotence transmise rend ce renvoi sans effet côté régulateur.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from ..models import Compagnie, DonneesSolvabilite, SoumissionDeclaration
+from .external_apis import RegulateurAPIClient
+
+CONFIGURATION_DEFAUT = {
+    'THREADS': 8,
+    'DEBIT_MAX': 10,  # déclarations par seconde
+    'TAILLE_PAQUET': 100,
+    'DELAI_REPRISE': 300,  # secondes avant de reprendre une soumission EN_COURS
+}
+
+
+def configuration_declarations():
+    configuration = dict(CONFIGURATION_DEFAUT)
+    configuration.update(getattr(settings, 'SOLVABILITE_DECLARATIONS', {}))
+    return configuration
+
+
+def cle_idempotence(siren, date_reference):
+    """Clé stable d'une déclaration : la même compagnie et la même date donnent toujours la même clé"""
+    return hashlib.sha256(f"{siren}:{date_reference.isoformat()}".encode()).hexdigest()
+
+
+class LimiteurDebit:
+    """Seau à jetons partagé par les threads : au plus `debit` acquisitions par seconde, rafale de `rafale`"""
+
+    def __init__(self, debit, rafale=1):
+        self.intervalle = 1.0 / debit if debit else 0.0
+        self.rafale = rafale
+        self._verrou = threading.Lock()
+        self._jetons = float(rafale)
+        self._dernier = time.monotonic()
+
+    def acquerir(self):
+        if not self.intervalle:
+            return
+        while True:
+            with self._verrou:
+                maintenant = time.monotonic()
+                self._jetons = min(self.rafale, self._jetons + (maintenant - self._dernier) / self.intervalle)
+                self._dernier = maintenant
+                if self._jetons >= 1:
+                    self._jetons -= 1
+                    return
+                attente = (1 - self._jetons) * self.intervalle
+            time.sleep(attente)
+
+
+# =============================================
+# PRÉPARATION ET PROGRESSION
+# =============================================
+
+def date_reference_courante():
+    """Date de référence la plus récente des données saisies"""
+    return DonneesSolvabilite.objects.aggregate(date=Max('date_reference'))['date']
+
+
+def preparer_soumissions(date_reference):
+    """Crée les soumissions manquantes pour la date ; retourne le nombre de soumissions créées"""
+    existantes = set(SoumissionDeclaration.objects.filter(date_reference=date_reference)
+                     .values_list('compagnie_id', flat=True))
+    # Dernière saisie de chaque compagnie à cette date
+    dernieres = (DonneesSolvabilite.objects.filter(date_reference=date_reference, compagnie__actif=True)
+                 .exclude(compagnie_id__in=existantes)
+                 .values('compagnie_id').annotate(donnees_id=Max('id')))
+    sirens = dict(Compagnie.objects.filter(pk__in=[ligne['compagnie_id'] for ligne in dernieres])
+                  .values_list('pk', 'siren'))
+    soumissions = [
+        SoumissionDeclaration(
+            cle_idempotence=cle_idempotence(sirens[ligne['compagnie_id']], date_reference),
+            compagnie_id=ligne['compagnie_id'], donnees_id=ligne['donnees_id'], date_reference=date_reference,
+        )
+        for ligne in dernieres
+    ]
+    SoumissionDeclaration.objects.bulk_create(soumissions, batch_size=500, ignore_conflicts=True)
+    return len(soumissions)
+
+
+def progression(date_reference):
+    """Compteurs par statut des soumissions d'une date de référence"""
+    comptes = dict(SoumissionDeclaration.objects.filter(date_reference=date_reference)
+                   .values_list('statut').annotate(nombre=Count('id')).order_by())
+    par_statut = {statut: comptes.get(statut, 0) for statut, _ in SoumissionDeclaration.STATUT_CHOICES}
+    total = sum(par_statut.values())
+    return {
+        'date_reference': date_reference.isoformat(),
+        'total': total,
+        'par_statut': par_statut,
+        'pourcentage_envoye': round(par_statut['ENVOYEE'] / total * 100, 1) if total else 0.0,
+        'termine': total > 0 and par_statut['EN_ATTENTE'] == par_statut['EN_COURS'] == 0,
+    }
+
+
+# =============================================
+# ENVOI
+# =============================================
+
+def _reserver(date_reference, execution, taille, relancer_echecs, delai_reprise):
+    """Réserve un paquet de soumissions pour cette exécution ; retourne les lignes réservées"""
+    a_envoyer = Q(statut='EN_ATTENTE') | Q(statut='EN_COURS', date_maj__lt=timezone.now() - delai_reprise)
+    if relancer_echecs:
+        a_envoyer |= Q(statut='ECHEC')
+    candidates = list(SoumissionDeclaration.objects.filter(a_envoyer, date_reference=date_reference)
+                      .exclude(execution=execution)
+                      .order_by('pk').values_list('pk', flat=True)[:taille])
+    if not candidates:
+        return []
+    # La condition est réévaluée par l'UPDATE : une ligne prise entre-temps par
+    # une autre exécution n'est pas réservée deux fois
+    SoumissionDeclaration.objects.filter(a_envoyer, pk__in=candidates).update(
+        statut='EN_COURS', execution=execution, date_maj=timezone.now())
+    return list(SoumissionDeclaration.objects.filter(pk__in=candidates, execution=execution, statut='EN_COURS'))
+
+
+def _envoyer(client, limiteur, soumission, donnees):
+    limiteur.acquerir()
+    return client.envoyer_declaration_solvabilite(donnees, cle_idempotence=soumission.cle_idempotence)
+
+
+def _enregistrer(soumission, resultat):
+    maintenant = timezone.now()
+    if resultat.get('success'):
+        champs = {'statut': 'ENVOYEE', 'reference': resultat.get('reference') or '', 'derniere_erreur': '',
+                  'date_envoi': maintenant}
+    else:
+        champs = {'statut': 'ECHEC', 'derniere_erreur': resultat.get('error', '')}
+    SoumissionDeclaration.objects.filter(pk=soumission.pk).update(
+        tentatives=soumission.tentatives + 1, date_maj=maintenant, **champs)
+    return champs['statut']
+
+
+def soumettre_declarations(date_reference, threads=None, debit=None, relancer_echecs=True, rappel=None):
+    """
+    Envoie toutes les déclarations non encore acceptées pour la date de référence.
+    rappel(progression) est appelé après chaque paquet. Retourne le bilan de l'exécution.
+    """
+    configuration = configuration_declarations()
+    threads = threads or configuration['THREADS']
+    debit = configuration['DEBIT_MAX'] if debit is None else debit
+    delai_reprise = timedelta(seconds=configuration['DELAI_REPRISE'])
+    execution = uuid.uuid4().hex
+    bilan = {'execution': execution, 'creees': preparer_soumissions(date_reference),
+             'envoyees': 0, 'echecs': 0, 'duree_s': 0.0}
+
+    # Lot : les threads attendent leur place dans la cloison au lieu d'être rejetés
+    client = RegulateurAPIClient(attente_cloison=None)
+    limiteur = LimiteurDebit(debit, rafale=threads)
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='declaration') as pool:
+        while True:
+            paquet = _reserver(date_reference, execution, configuration['TAILLE_PAQUET'], relancer_echecs,
+                               delai_reprise)
+            if not paquet:
+                break
+            donnees = DonneesSolvabilite.objects.with_totals().select_related('compagnie').in_bulk(
+                [soumission.donnees_id for soumission in paquet])
+            envois = {pool.submit(_envoyer, client, limiteur, soumission, donnees[soumission.donnees_id]): soumission
+                      for soumission in paquet}
+            for envoi in as_completed(envois):
+                try:
+                    resultat = envoi.result()
+                except Exception as e:
+                    resultat = {'success': False, 'error': f"Erreur inattendue: {e}"}
+                statut = _enregistrer(envois[envoi], resultat)
+                bilan['envoyees' if statut == 'ENVOYEE' else 'echecs'] += 1
+            if rappel:
+                rappel(progression(date_reference))
+    bilan['duree_s'] = round(time.perf_counter() - debut, 2)
+    return bilan
+
+
+# Exécution lancée depuis l'application web (une seule à la fois par processus)
+_execution_en_cours = threading.Lock()
+
+
+def lancer_en_arriere_plan(date_reference, **options):
+    """Démarre l'envoi dans un thread ; False si un envoi est déjà en cours dans ce processus"""
+    if not _execution_en_cours.acquire(blocking=False):
+        return False
+
+    def executer():
+        from django.db import connection
+        try:
+            soumettre_declarations(date_reference, **options)
+        finally:
+            connection.close()
+            _execution_en_cours.release()
+
+    threading.Thread(target=executer, name='envoi-declarations', daemon=True).start()
+    return True
+
+
+def envoi_en_cours():
+    return _execution_en_cours.locked()
@@ -0,0 +1,240 @@
+"""
+Diffusion en direct des nouveaux calculs SCR (Server-Sent Events).
+
+Un concentrateur par processus répartit les évènements entre les abonnés
+d'une compagnie. Deux sources l'alimentent :
+- mode 'memoire' : sauvegarder_calcul_scr / sauvegarder_calcul_avance
+  publient après le commit de la transaction (transaction.on_commit) ;
+- mode 'sondage' : un thread unique par processus interroge la base à
+  intervalle fixe pour toutes les compagnies suivies, en une requête.
+  À utiliser quand plusieurs processus servent l'application : un calcul
+  enregistré par un autre worker n'atteint pas le concentrateur local.
+
+Sous WSGI, chaque flux ouvert occupe un thread du serveur : le flux y est
+court (DUREE_MAX_WSGI secondes, 0 par défaut) et EventSource se reconnecte
+après RECONNEXION_WSGI_MS avec Last-Event-ID, ce qui revient à un sondage
+des calculs manqués. Le flux long (DUREE_MAX) est réservé à ASGI.
+
+Chaque abonné dispose d'une file bornée ; si un client lent la laisse se
+remplir, les évènements les plus anciens sont abandonnés (seul le dernier
+état compte pour un tableau de bord).
+"""
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from ..models import CalculSCR
+from .indicateurs import determiner_statut_solvabilite
+
+logger = logging.getLogger(__name__)
+
+CONFIGURATION_DEFAUT = {
+    'MODE': 'memoire',
+    'INTERVALLE_SONDAGE': 5,
+    'BATTEMENT': 15,
+    'DUREE_MAX': 3600,
+    'TAILLE_FILE': 100,
+    'RECONNEXION_MS': 5000,
+    # Sous WSGI, une connexion ouverte occupe un thread : flux court, puis reconnexion
+    'DUREE_MAX_WSGI': 0,
+    'RECONNEXION_WSGI_MS': 15000,
+}
+
+
+def configuration_diffusion():
+    configuration = dict(CONFIGURATION_DEFAUT)
+    configuration.update(getattr(settings, 'SOLVABILITE_DIFFUSION', {}))
+    return configuration
+
+
+def evenement_calcul(calcul, donnees):
+    """Charge utile diffusée pour un calcul et sa ligne de données"""
+    ratio = float(donnees.ratio_solvabilite)
+    statut, couleur_statut = determiner_statut_solvabilite(ratio)
+    return {
+        'id': calcul.id,
+        'compagnie_id': donnees.compagnie_id,
+        'date_calcul': calcul.date_calcul.isoformat(),
+        'date_reference': donnees.date_reference.isoformat(),
+        'methode_calcul': calcul.methode_calcul,
+        'ratio_solvabilite': round(ratio, 2),
+        'scr_total': round(float(calcul.resultat_scr), 2),
+        'mcr': round(float(donnees.mcr), 2),
+        'fonds_propres': round(float(donnees.fonds_propres), 2),
+        'statut': statut,
+        'couleur_statut': couleur_statut,
+    }
+
+
+def formater_sse(evenement):
+    """Trame SSE d'un évènement de calcul"""
+    donnees = json.dumps(evenement, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {evenement['id']}\nevent: calcul\ndata: {donnees}\n\n"
+
+
+def calculs_depuis(compagnie_ids, dernier_id, limite=50):
+    """Évènements des calculs postérieurs à dernier_id (rattrapage, sondage)"""
+    calculs = CalculSCR.objects.select_related('donnees').defer('parametres_calcul').filter(
+        donnees__compagnie_id__in=compagnie_ids, id__gt=dernier_id
+    ).order_by('id')[:limite]
+    return [evenement_calcul(calcul, calcul.donnees) for calcul in calculs]
+
+
+def dernier_calcul_id(compagnie_id):
+    """Identifiant du dernier calcul de la compagnie (0 si aucun)"""
+    return CalculSCR.objects.filter(donnees__compagnie_id=compagnie_id).order_by('-id').values_list(
+        'id', flat=True).first() or 0
+
+
+# =============================================
+# ABONNEMENTS
+# =============================================
+
+class Abonnement(ABC):
+    """File bornée d'un client ; les plus anciens évènements cèdent la place"""
+
+    def __init__(self, compagnie_id, taille_file):
+        self.compagnie_id = compagnie_id
+        self.taille_file = taille_file
+
+    @abstractmethod
+    def deposer(self, evenement):
+        """Ajoute l'évènement à la file ; appelé par le concentrateur, depuis n'importe quel thread"""
+
+
+class AbonnementThread(Abonnement):
+    """Abonné servi par un thread (WSGI) : lecture bloquante avec délai"""
+
+    def __init__(self, compagnie_id, taille_file):
+        super().__init__(compagnie_id, taille_file)
+        self.file = queue.Queue(maxsize=taille_file)
+
+    def deposer(self, evenement):
+        while True:
+            try:
+                self.file.put_nowait(evenement)
+                return
+            except queue.Full:
+                try:
+                    self.file.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def attendre(self, delai):
+        try:
+            return self.file.get(timeout=delai)
+        except queue.Empty:
+            return None
+
+
+class AbonnementAsync(Abonnement):
+    """Abonné servi par la boucle asyncio (ASGI) : dépôt thread-safe"""
+
+    def __init__(self, compagnie_id, taille_file):
+        super().__init__(compagnie_id, taille_file)
+        self.boucle = asyncio.get_running_loop()
+        self.file = asyncio.Queue(maxsize=taille_file)
+
+    def _deposer(self, evenement):
+        if self.file.full():
+            self.file.get_nowait()
+        self.file.put_nowait(evenement)
+
+    def deposer(self, evenement):
+        self.boucle.call_soon_threadsafe(self._deposer, evenement)
+
+    async def attendre(self, delai):
+        try:
+            return await asyncio.wait_for(self.file.get(), timeout=delai)
+        except asyncio.TimeoutError:
+            return None
+
+
+# =============================================
+# CONCENTRATEUR
+# =============================================
+
+class ConcentrateurDiffusion:
+    """Publication / abonnement par compagnie, local au processus"""
+
+    def __init__(self):
+        self._abonnes = defaultdict(set)
+        self._dernier_id = {}
+        self._verrou = threading.Lock()
+        self._sondeur = None
+
+    def abonner(self, abonnement):
+        with self._verrou:
+            self._abonnes[abonnement.compagnie_id].add(abonnement)
+        if configuration_diffusion()['MODE'] == 'sondage':
+            self._demarrer_sondeur()
+        return abonnement
+
+    def desabonner(self, abonnement):
+        with self._verrou:
+            abonnes = self._abonnes.get(abonnement.compagnie_id)
+            if abonnes is not None:
+                abonnes.discard(abonnement)
+                if not abonnes:
+                    del self._abonnes[abonnement.compagnie_id]
+
+    def publier(self, compagnie_id, evenement):
+        """Transmet l'évènement aux abonnés de la compagnie, une seule fois par calcul"""
+        with self._verrou:
+            if evenement['id'] <= self._dernier_id.get(compagnie_id, 0):
+                return 0
+            self._dernier_id[compagnie_id] = evenement['id']
+            abonnes = list(self._abonnes.get(compagnie_id, ()))
+        for abonnement in abonnes:
+            abonnement.deposer(evenement)
+        return len(abonnes)
+
+    def compagnies_suivies(self):
+        with self._verrou:
+            return list(self._abonnes)
+
+    def statistiques(self):
+        with self._verrou:
+            return {
+                'mode': configuration_diffusion()['MODE'],
+                'compagnies_suivies': len(self._abonnes),
+                'abonnes': sum(len(abonnes) for abonnes in self._abonnes.values()),
+            }
+
+    def _demarrer_sondeur(self):
+        with self._verrou:
+            if self._sondeur is not None and self._sondeur.is_alive():
+                return
+            self._sondeur = threading.Thread(target=self._sonder, name='sondeur-diffusion', daemon=True)
+            self._sondeur.start()
+
+    def _sonder(self):
+        """Boucle du mode 'sondage' : une requête par intervalle pour tout le processus"""
+        try:
+            dernier_id = CalculSCR.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        finally:
+            close_old_connections()
+        while True:
+            time.sleep(configuration_diffusion()['INTERVALLE_SONDAGE'])
+            compagnie_ids = self.compagnies_suivies()
+            if not compagnie_ids:
+                continue
+            try:
+                for evenement in calculs_depuis(compagnie_ids, dernier_id, limite=500):
+                    dernier_id = max(dernier_id, evenement['id'])
+                    self.publier(evenement['compagnie_id'], evenement)
+            except Exception:
+                logger.exception("Échec du sondage des calculs SCR")
+            finally:
+                close_old_connections()
+
+
+concentrateur = ConcentrateurDiffusion()
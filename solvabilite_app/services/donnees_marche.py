@@ -0,0 +1,166 @@
+"""
+Cache des données de marché (taux sans risque, ...) avec rafraîchissement
+en arrière-plan (stale-while-revalidate).
+
+Une lecture ne bloque jamais sur le réseau :
+- valeur fraîche (âge < TTL) : servie telle quelle ;
+- valeur périmée : servie, et un rafraîchissement est lancé dans un thread ;
+- rien en mémoire : dernière valeur valide enregistrée en base (DonneeMarche),
+  sinon valeur par défaut, et rafraîchissement lancé.
+Un seul rafraîchissement par donnée à la fois ; après un échec, le suivant
+attend DELAI_APRES_ECHEC secondes. Chaque lecture renvoie ses métadonnées
+de fraîcheur (source, date d'obtention, âge), enregistrées avec les calculs.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone as tz
+
+from django.conf import settings
+from django.db import connection
+
+from ..models import DonneeMarche
+from .external_apis import MarketDataClient
+from .metriques import evenements_cache
+
+logger = logging.getLogger(__name__)
+
+CONFIGURATION_DEFAUT = {
+    'TTL': 900,
+    'DELAI_APRES_ECHEC': 60,
+}
+
+# Donnée -> (fonction de récupération auprès du fournisseur, valeur par défaut)
+SOURCES = {
+    'taux_sans_risque': (lambda: MarketDataClient().recuperer_taux_sans_risque(), 0.025),
+}
+
+
+def configuration_donnees_marche():
+    configuration = dict(CONFIGURATION_DEFAUT)
+    configuration.update(getattr(settings, 'SOLVABILITE_DONNEES_MARCHE', {}))
+    return configuration
+
+
+class CacheDonneesMarche:
+    """Valeurs en mémoire du processus, dernière valeur valide en base, rafraîchissement asynchrone"""
+
+    def __init__(self, sources):
+        self.sources = sources
+        self._verrou = threading.Lock()
+        self._entrees = {}  # cle -> (valeur, obtenue_le (epoch), source)
+        self._rafraichissements = set()
+        self._dernier_echec = {}
+        self._compteurs = {'fraiches': 0, 'perimees': 0, 'par_defaut': 0, 'chargements_base': 0,
+                           'rafraichissements': 0, 'echecs': 0}
+
+    def lire(self, cle):
+        """(valeur, métadonnées de fraîcheur) sans jamais attendre le fournisseur"""
+        ttl = configuration_donnees_marche()['TTL']
+        with self._verrou:
+            entree = self._entrees.get(cle)
+        if entree is None:
+            entree = self._charger_depuis_base(cle)
+        valeur, obtenue_le, source = entree
+
+        # Une valeur relue en base peut être fraîche : un autre processus l'a rafraîchie
+        fraiche = source != 'defaut' and time.time() - obtenue_le < ttl
+        self._incrementer('fraiches' if fraiche else 'par_defaut' if source == 'defaut' else 'perimees')
+        if not fraiche:
+            self._rafraichir_en_arriere_plan(cle)
+        return valeur, self._metadonnees(valeur, obtenue_le, source, fraiche)
+
+    def metadonnees(self, *cles):
+        """Métadonnées de fraîcheur des données demandées (toutes par défaut), pour parametres_calcul"""
+        return {cle: self.lire(cle)[1] for cle in (cles or self.sources)}
+
+    @staticmethod
+    def _metadonnees(valeur, obtenue_le, source, fraiche):
+        return {
+            'valeur': valeur,
+            'source': source,
+            'obtenue_le': datetime.fromtimestamp(obtenue_le, tz.utc).isoformat() if obtenue_le else None,
+            'age_s': round(time.time() - obtenue_le) if obtenue_le else None,
+            'fraiche': fraiche,
+        }
+
+    def _incrementer(self, compteur):
+        with self._verrou:
+            self._compteurs[compteur] += 1
+        evenements_cache.inc('donnees_marche', compteur)
+
+    def _charger_depuis_base(self, cle):
+        derniere = DonneeMarche.objects.filter(cle=cle).first()
+        self._incrementer('chargements_base')
+        if derniere is not None:
+            entree = (derniere.valeur, derniere.date_obtention.timestamp(), 'base')
+        else:
+            entree = (self.sources[cle][1], 0.0, 'defaut')
+        with self._verrou:
+            # Une valeur obtenue entre-temps par un rafraîchissement l'emporte
+            return self._entrees.setdefault(cle, entree)
+
+    def _rafraichir_en_arriere_plan(self, cle):
+        with self._verrou:
+            if cle in self._rafraichissements:
+                return
+            echec = self._dernier_echec.get(cle)
+            if echec and time.time() - echec < configuration_donnees_marche()['DELAI_APRES_ECHEC']:
+                return
+            self._rafraichissements.add(cle)
+
+        def executer():
+            try:
+                self.rafraichir(cle)
+            except Exception:
+                pass
+            finally:
+                connection.close()
+                with self._verrou:
+                    self._rafraichissements.discard(cle)
+
+        threading.Thread(target=executer, name=f'donnees-marche-{cle}', daemon=True).start()
+
+    def rafraichir(self, cle):
+        """Interroge le fournisseur (bloquant) ; en cas de succès, met à jour la mémoire et la base"""
+        recuperer, _ = self.sources[cle]
+        try:
+            valeur = float(recuperer())
+        except Exception:
+            logger.warning("Donnée de marché %s indisponible, dernière valeur conservée", cle, exc_info=True)
+            with self._verrou:
+                self._dernier_echec[cle] = time.time()
+            self._incrementer('echecs')
+            raise
+        maintenant = time.time()
+        with self._verrou:
+            self._entrees[cle] = (valeur, maintenant, 'api')
+            self._dernier_echec.pop(cle, None)
+        self._incrementer('rafraichissements')
+        DonneeMarche.objects.update_or_create(
+            cle=cle, defaults={'valeur': valeur, 'date_obtention': datetime.fromtimestamp(maintenant, tz.utc)})
+        return valeur
+
+    def statistiques(self):
+        with self._verrou:
+            statistiques = dict(self._compteurs)
+            ttl = configuration_donnees_marche()['TTL']
+            statistiques['valeurs'] = {
+                cle: self._metadonnees(valeur, obtenue_le, source,
+                                       fraiche=source != 'defaut' and time.time() - obtenue_le < ttl)
+                for cle, (valeur, obtenue_le, source) in self._entrees.items()
+            }
+        return statistiques
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+            self._dernier_echec.clear()
+
+
+donnees_marche = CacheDonneesMarche(SOURCES)
+
+
+def taux_sans_risque():
+    """Taux sans risque courant (valeur seule, lecture non bloquante)"""
+    return donnees_marche.lire('taux_sans_risque')[0]
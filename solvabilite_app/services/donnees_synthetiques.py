@@ -0,0 +1,394 @@
+"""
+Données synthétiques de volumétrie (tests de charge, dimensionnement) :
+compagnies, utilisateurs et historique trimestriel de DonneesSolvabilite et
+CalculSCR, tirés avec numpy à partir d'une graine (même résultat pour les
+mêmes paramètres).
+
+Chaque compagnie a un profil (type, taille de bilan, sensibilité à chaque
+sous-risque, ratio de solvabilité visé). D'un trimestre à l'autre, la taille
+du bilan suit une marche aléatoire et les sous-risques reçoivent des chocs
+log-normaux corrélés : au sein d'un module, entre modules (corrélations de la
+formule standard) et par un facteur de marché commun à toutes les compagnies.
+Modules, SCR, MCR et ratio sont ensuite calculés comme pour un calcul par lot.
+
+Compagnies et utilisateurs passent par bulk_create. L'historique (jusqu'à
+des millions de lignes) est inséré par paquets avec executemany, valeurs
+préparées en numpy et identifiants attribués à l'avance : bulk_create
+convertit chaque DecimalField un à un, ce qui le limite à quelques milliers
+de lignes par seconde pour DonneesSolvabilite.
+"""
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, time as heure, timedelta
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from ..models import CalculSCR, Compagnie, DonneesSolvabilite, Utilisateur
+from .calcul_lot import CORRELATIONS, MODULES, RATIO_MAX, SOUS_RISQUES, calculer_lot
+from .indicateurs import SEUILS_STATUT, STATUT_NON_CONFORME
+
+TAILLE_PAQUET = 50000
+PREFIXE_AGREMENT = 'SYNTH-'
+PREFIXE_UTILISATEUR = 'synthetique'
+SIREN_DEBUT = 900000000
+
+# Sous-risques dans l'ordre de SOUS_RISQUES : (module, clé JSON, champ du modèle)
+SOUS_RISQUES_A_PLAT = [(module, cle, champ) for module, liste in SOUS_RISQUES.items() for cle, champ in liste]
+INDICE_MODULE = np.array([MODULES.index(module) for module, _, _ in SOUS_RISQUES_A_PLAT])
+
+# Part des placements de chaque sous-risque (compagnie moyenne, tous modules à pleine exposition)
+PARTS_SOUS_RISQUES = np.array([0.020, 0.035, 0.012, 0.008, 0.022, 0.004,
+                               0.006, 0.010, 0.015, 0.018, 0.022, 0.008])
+
+# Type de compagnie : (probabilité, exposition marché / crédit / vie / non-vie, primes / placements)
+PROFILS_TYPES = {
+    'ASSURANCE_VIE': (0.35, (1.0, 1.0, 1.0, 0.05), 0.10),
+    'ASSURANCE_NON_VIE': (0.35, (0.7, 0.8, 0.05, 1.0), 0.45),
+    'ASSURANCE_MIXTE': (0.20, (0.9, 0.9, 0.6, 0.6), 0.20),
+    'REASSUREUR': (0.05, (0.6, 0.8, 0.5, 1.3), 0.35),
+    'INSTITUTION_FINANCIERE': (0.05, (1.2, 1.2, 0.2, 0.2), 0.05),
+}
+
+STATUTS_REGLEMENTAIRES = {'AUTORISEE': 0.93, 'SURVEILLANCE': 0.05, 'SUSPENDUE': 0.015, 'RETRAIT': 0.005}
+
+ROLES_UTILISATEURS = {
+    'CLIENT': 0.30, 'ACTUAIRE': 0.15, 'RISK_MANAGER': 0.12, 'CONTROLEUR': 0.10, 'CONSULTANT': 0.10,
+    'DG': 0.05, 'RH': 0.05, 'REGULATEUR': 0.02, 'ADMIN': 0.01,
+}
+
+# Volatilités (log) : profil des compagnies, chocs trimestriels, facteur de marché commun
+VOLATILITE_PROFIL = 0.3
+VOLATILITE_TRIMESTRE = 0.12
+VOLATILITE_MARCHE = 0.08
+MONTANT_MAX = 5e12  # DecimalField(max_digits=15, decimal_places=2)
+
+
+def correlations_sous_risques():
+    """Corrélations des chocs : 0,5 au sein d'un module, moitié du coefficient de la formule standard entre modules"""
+    correlations = 0.5 * CORRELATIONS[np.ix_(INDICE_MODULE, INDICE_MODULE)]
+    correlations[INDICE_MODULE[:, None] == INDICE_MODULE[None, :]] = 0.5
+    np.fill_diagonal(correlations, 1.0)
+    return correlations
+
+
+def _fin_trimestre(indice):
+    """Dernier jour du trimestre numéro indice (annee * 4 + trimestre de 0 à 3)"""
+    annee, trimestre = divmod(indice, 4)
+    return date(annee + (trimestre == 3), (3 * trimestre + 3) % 12 + 1, 1) - timedelta(days=1)
+
+
+def fins_de_trimestre(nombre, date_fin=None):
+    """Les nombre dernières fins de trimestre antérieures ou égales à date_fin (défaut : aujourd'hui)"""
+    date_fin = date_fin or timezone.localdate()
+    dernier = date_fin.year * 4 + (date_fin.month - 1) // 3
+    if _fin_trimestre(dernier) > date_fin:
+        dernier -= 1
+    return [_fin_trimestre(indice) for indice in range(dernier - nombre + 1, dernier + 1)]
+
+
+def _tirer(generateur, probabilites, taille):
+    choix = list(probabilites)
+    poids = np.array(list(probabilites.values()))
+    return np.array(choix)[generateur.choice(len(choix), size=taille, p=poids / poids.sum())]
+
+
+def _statuts(ratio):
+    conditions = [ratio >= minimum for minimum, _, _ in SEUILS_STATUT]
+    return np.select(conditions, [statut for _, statut, _ in SEUILS_STATUT], STATUT_NON_CONFORME[0])
+
+
+def _premier_numero(modele, champ, prefixe):
+    """Numéro de la prochaine entité synthétique (les exécutions successives s'ajoutent)"""
+    return modele.objects.filter(**{f'{champ}__startswith': prefixe}).count()
+
+
+@contextmanager
+def pragmas_insertion_massive():
+    """
+    SQLite : pas de synchronisation disque à chaque validation et cache de pages
+    élargi le temps de l'insertion (un arrêt brutal du système pourrait corrompre la base).
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with connection.cursor() as curseur:
+        curseur.execute('PRAGMA synchronous')
+        synchronous = curseur.fetchone()[0]
+        curseur.execute('PRAGMA cache_size')
+        cache_size = curseur.fetchone()[0]
+        curseur.execute('PRAGMA synchronous = OFF')
+        curseur.execute('PRAGMA cache_size = -262144')
+        curseur.execute('PRAGMA temp_store = MEMORY')
+    try:
+        yield
+    finally:
+        with connection.cursor() as curseur:
+            curseur.execute(f'PRAGMA synchronous = {int(synchronous)}')
+            curseur.execute(f'PRAGMA cache_size = {int(cache_size)}')
+
+
+# =============================================
+# COMPAGNIES ET UTILISATEURS
+# =============================================
+
+def creer_compagnies(generateur, nombre):
+    """Crée les compagnies ; retourne leurs identifiants et leur type (tableaux numpy, ordre des SIREN)"""
+    premier = _premier_numero(Compagnie, 'agrement_acpr', PREFIXE_AGREMENT)
+    types = _tirer(generateur, {nom: profil[0] for nom, profil in PROFILS_TYPES.items()}, nombre)
+    statuts = _tirer(generateur, STATUTS_REGLEMENTAIRES, nombre)
+    annees_creation = generateur.integers(1820, 2015, size=nombre)
+    capitaux = np.round(np.exp(generateur.normal(np.log(5e7), 1.2, size=nombre)), -3)
+    # Environ 60 % des compagnies appartiennent à un groupe (SIREN voisins, 5 membres en moyenne)
+    groupes = np.where(generateur.random(nombre) < 0.6, (premier + np.arange(nombre)) // 8, -1)
+
+    compagnies = []
+    for indice in range(nombre):
+        numero = premier + indice
+        compagnies.append(Compagnie(
+            nom=f'Compagnie synthétique {numero}',
+            siren=str(SIREN_DEBUT + numero),
+            date_creation=date(int(annees_creation[indice]), 1, 1),
+            capital_social=float(capitaux[indice]),
+            type_compagnie=types[indice],
+            statut_reglementaire=statuts[indice],
+            agrement_acpr=f'{PREFIXE_AGREMENT}{numero}',
+            groupe=f'Groupe synthétique {groupes[indice]}' if groupes[indice] >= 0 else '',
+            date_agrement=date(max(int(annees_creation[indice]), 1995), 1, 1),
+        ))
+    Compagnie.objects.bulk_create(compagnies, batch_size=TAILLE_PAQUET)
+    identifiants = dict(Compagnie.objects.filter(
+        agrement_acpr__startswith=PREFIXE_AGREMENT, siren__gte=compagnies[0].siren, siren__lte=compagnies[-1].siren,
+    ).values_list('siren', 'id'))
+    return np.array([identifiants[compagnie.siren] for compagnie in compagnies]), types
+
+
+def creer_utilisateurs(generateur, nombre, compagnie_ids, mot_de_passe):
+    """Crée les utilisateurs, rattachés aux compagnies générées (sauf régulateurs)"""
+    premier = _premier_numero(Utilisateur, 'username', PREFIXE_UTILISATEUR)
+    roles = _tirer(generateur, ROLES_UTILISATEURS, nombre)
+    rattachements = compagnie_ids[generateur.integers(0, len(compagnie_ids), size=nombre)]
+    # Un seul hachage : PBKDF2 coûte des dizaines de millisecondes par appel
+    mot_de_passe_hache = make_password(mot_de_passe)
+    Utilisateur.objects.bulk_create([
+        Utilisateur(
+            username=f'{PREFIXE_UTILISATEUR}{premier + indice:07d}',
+            email=f'{PREFIXE_UTILISATEUR}{premier + indice:07d}@exemple.fr',
+            first_name='Utilisateur', last_name=f'Synthétique {premier + indice}',
+            password=mot_de_passe_hache,
+            role=roles[indice],
+            compagnie_id=None if roles[indice] == 'REGULATEUR' else int(rattachements[indice]),
+        )
+        for indice in range(nombre)
+    ], batch_size=TAILLE_PAQUET)
+    return nombre
+
+
+# =============================================
+# HISTORIQUE TRIMESTRIEL
+# =============================================
+
+def _profils(generateur, types):
+    """Paramètres fixes de chaque compagnie du paquet"""
+    nombre = len(types)
+    expositions = np.array([PROFILS_TYPES[type_compagnie][1] for type_compagnie in types])[:, INDICE_MODULE]
+    return {
+        'log_placements': np.clip(generateur.normal(np.log(8e8), 1.3, size=nombre), np.log(5e6), np.log(1e12)),
+        'croissance': generateur.normal(0.008, 0.004, size=nombre),
+        'sensibilites': PARTS_SOUS_RISQUES * expositions
+        * np.exp(generateur.normal(-VOLATILITE_PROFIL ** 2 / 2, VOLATILITE_PROFIL, size=(nombre, 12))),
+        'taux_primes': np.array([PROFILS_TYPES[type_compagnie][2] for type_compagnie in types])
+        * np.exp(generateur.normal(0, 0.1, size=nombre)),
+        'part_immobilisations': generateur.uniform(0.01, 0.06, size=nombre),
+        'log_ratio_cible': generateur.normal(np.log(1.9), 0.35, size=nombre),
+    }
+
+
+def generer_historique(generateur, types, nb_trimestres, choc_marche, cholesky):
+    """
+    Historique d'un paquet de compagnies : dictionnaire champ -> tableau
+    (compagnies, trimestres), plus 'scr' et 'ratio' pour CalculSCR.
+    """
+    nombre = len(types)
+    profils = _profils(generateur, types)
+    forme = (nombre, nb_trimestres)
+
+    log_placements = profils['log_placements'][:, None] + np.cumsum(
+        profils['croissance'][:, None] + generateur.normal(0, 0.03, size=forme), axis=1)
+    placements = np.minimum(np.exp(log_placements), MONTANT_MAX)
+
+    # Chocs corrélés entre sous-risques, plus le facteur commun sur les modules marché et crédit
+    chocs = generateur.standard_normal(size=forme + (12,)) @ cholesky.T * VOLATILITE_TRIMESTRE
+    chocs[..., INDICE_MODULE <= 1] += choc_marche[None, :, None]
+    sous_risques = np.round(placements[..., None] * profils['sensibilites'][:, None, :]
+                            * np.exp(chocs - VOLATILITE_TRIMESTRE ** 2 / 2), 2)
+    modules = np.stack([sous_risques[..., INDICE_MODULE == indice].sum(axis=-1) for indice in range(4)], axis=-1)
+
+    prime_annuelle = np.round(placements * profils['taux_primes'][:, None]
+                              * np.exp(generateur.normal(0, 0.05, size=forme)), 2)
+    immobilisations = np.round(placements * profils['part_immobilisations'][:, None], 2)
+    actif = placements + immobilisations
+
+    # Risque opérationnel simplifié : max(4 % des primes, 0,45 % des provisions), plafonné à 30 % du BSCR
+    bscr = np.sqrt(np.einsum('...i,ij,...j->...', modules, CORRELATIONS, modules))
+    scr_operational = np.round(np.minimum(0.3 * bscr, np.maximum(0.04 * prime_annuelle, 0.0045 * 0.8 * actif)), 2)
+
+    # Fonds propres du ratio visé (bruit autorégressif autour de la cible de la compagnie)
+    bruit = generateur.normal(0, 0.08, size=forme)
+    for trimestre in range(1, nb_trimestres):
+        bruit[:, trimestre] += 0.7 * bruit[:, trimestre - 1]
+    ratio_vise = np.exp(profils['log_ratio_cible'][:, None] + bruit)
+    fonds_propres = np.round(np.minimum(ratio_vise * (bscr + scr_operational), 0.6 * actif), 2)
+    passif_technique = np.round(actif - fonds_propres, 2)
+
+    scr, mcr, ratio = calculer_lot(modules.reshape(-1, 4), scr_operational.ravel(), fonds_propres.ravel(),
+                                   prime_annuelle.ravel(), passif_technique.ravel())
+    historique = {
+        'fonds_propres': fonds_propres,
+        'passif_technique': passif_technique,
+        'prime_annuelle': prime_annuelle,
+        'placements': np.round(placements, 2),
+        'immobilisations': immobilisations,
+        'charges_sinistres': np.round(prime_annuelle * np.clip(generateur.normal(0.7, 0.08, size=forme), 0.3, 1.2), 2),
+        'scr_operational': scr_operational,
+        'mcr': np.round(mcr, 2).reshape(forme),
+        'ratio_solvabilite': np.minimum(np.round(ratio, 2), RATIO_MAX).reshape(forme),
+        'scr': np.round(scr, 2).reshape(forme),
+    }
+    for indice, module in enumerate(MODULES):
+        historique[f'scr_{module}'] = np.round(modules[..., indice], 2)
+    for indice, (_, _, champ) in enumerate(SOUS_RISQUES_A_PLAT):
+        historique[champ] = sous_risques[..., indice]
+    return historique
+
+
+# details_risques tel que DonneesSolvabilite.save() le construit, formaté sans passer par json.dumps
+_MODELE_DETAILS = '{' + ', '.join(
+    f'"{module}": {{' + ', '.join(f'"{cle}": %.2f' for cle, _ in liste) + ', "total": %.2f}'
+    for module, liste in SOUS_RISQUES.items()
+) + '}'
+
+
+def _lignes_donnees(historique, identifiants, compagnie_ids, dates_reference, dates_saisie):
+    """Tuples des lignes de DonneesSolvabilite, dans l'ordre des colonnes du modèle"""
+    nombre, nb_trimestres = historique['fonds_propres'].shape
+    valeurs = {
+        'id': identifiants,
+        'compagnie': np.repeat(compagnie_ids, nb_trimestres).tolist(),
+        'date_reference': dates_reference * nombre,
+        'date_saisie': dates_saisie * nombre,
+        'date_modification': dates_saisie * nombre,
+    }
+    details = []
+    colonnes_details = []
+    for module, liste in SOUS_RISQUES.items():
+        colonnes_details += [historique[champ].ravel() for _, champ in liste] + [historique[f'scr_{module}'].ravel()]
+    for ligne in zip(*(colonne.tolist() for colonne in colonnes_details)):
+        details.append(_MODELE_DETAILS % ligne)
+    valeurs['details_risques'] = details
+    colonnes = []
+    for champ in DonneesSolvabilite._meta.concrete_fields:
+        colonnes.append(valeurs[champ.name] if champ.name in valeurs else historique[champ.name].ravel().tolist())
+    return list(zip(*colonnes))
+
+
+def _lignes_calculs(historique, identifiants, donnees_ids, dates_reference, dates_calcul, graine):
+    nombre, nb_trimestres = historique['scr'].shape
+    scr = historique['scr'].ravel().tolist()
+    mcr = historique['mcr'].ravel().tolist()
+    ratio = historique['ratio_solvabilite'].ravel().tolist()
+    statuts = _statuts(historique['ratio_solvabilite'].ravel()).tolist()
+    references = [date_reference.isoformat() for date_reference in dates_reference] * nombre
+    parametres = [
+        '{"scr": %.2f, "mcr": %.2f, "ratio": %.2f, "statut": "%s", "date_reference": "%s", "graine": %d}'
+        % ligne for ligne in zip(scr, mcr, ratio, statuts, references, [graine] * len(scr))
+    ]
+    valeurs = {
+        'id': identifiants,
+        'donnees': donnees_ids,
+        'methode_calcul': ['AVANCE'] * len(scr),
+        'parametres_calcul': parametres,
+        'resultat_scr': scr,
+        'date_calcul': dates_calcul * nombre,
+    }
+    return list(zip(*(valeurs[champ.name] for champ in CalculSCR._meta.concrete_fields)))
+
+
+def _requete_insertion(modele):
+    colonnes = [champ.column for champ in modele._meta.concrete_fields]
+    return 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(modele._meta.db_table),
+        ', '.join(connection.ops.quote_name(colonne) for colonne in colonnes),
+        ', '.join(['%s'] * len(colonnes)),
+    )
+
+
+def _prochain_identifiant(modele):
+    return (modele.objects.aggregate(maximum=Max('id'))['maximum'] or 0) + 1
+
+
+def generer_donnees_synthetiques(compagnies, utilisateurs=0, annees=10, graine=0, date_fin=None,
+                                 mot_de_passe='synthetique', taille_paquet=TAILLE_PAQUET, rappel=None):
+    """
+    Crée compagnies, utilisateurs et annees * 4 trimestres de données et de
+    calculs par compagnie. rappel(bilan) est appelé après chaque paquet.
+    Retourne le bilan (nombres de lignes, durée, lignes d'historique par seconde).
+    """
+    generateur = np.random.default_rng(graine)
+    nb_trimestres = annees * 4
+    dates_reference = fins_de_trimestre(nb_trimestres, date_fin)
+    # Saisie et calcul un mois après la clôture du trimestre (valeurs adaptées une fois par trimestre)
+    dates_saisie = [
+        connection.ops.adapt_datetimefield_value(timezone.make_aware(datetime.combine(
+            date_reference + timedelta(days=30), heure(10)))) for date_reference in dates_reference
+    ]
+    dates_reference_adaptees = [connection.ops.adapt_datefield_value(d) for d in dates_reference]
+    cholesky = np.linalg.cholesky(correlations_sous_risques())
+    choc_marche = np.cumsum(generateur.normal(0, VOLATILITE_MARCHE, size=nb_trimestres)) * 0.5
+
+    bilan = {'compagnies': 0, 'utilisateurs': 0, 'donnees': 0, 'calculs': 0, 'duree_s': 0.0}
+    debut = time.perf_counter()
+    with pragmas_insertion_massive():
+        with transaction.atomic():
+            compagnie_ids, types = creer_compagnies(generateur, compagnies)
+            if utilisateurs:
+                bilan['utilisateurs'] = creer_utilisateurs(generateur, utilisateurs, compagnie_ids, mot_de_passe)
+        bilan['compagnies'] = compagnies
+
+        requete_donnees = _requete_insertion(DonneesSolvabilite)
+        requete_calculs = _requete_insertion(CalculSCR)
+        id_donnees = _prochain_identifiant(DonneesSolvabilite)
+        id_calcul = _prochain_identifiant(CalculSCR)
+        compagnies_par_paquet = max(1, taille_paquet // nb_trimestres)
+        for debut_paquet in range(0, compagnies, compagnies_par_paquet):
+            paquet = slice(debut_paquet, debut_paquet + compagnies_par_paquet)
+            historique = generer_historique(generateur, types[paquet], nb_trimestres, choc_marche, cholesky)
+            nombre = historique['scr'].size
+            donnees_ids = list(range(id_donnees, id_donnees + nombre))
+            calcul_ids = list(range(id_calcul, id_calcul + nombre))
+            with transaction.atomic(), connection.cursor() as curseur:
+                curseur.executemany(requete_donnees, _lignes_donnees(
+                    historique, donnees_ids, compagnie_ids[paquet], dates_reference_adaptees, dates_saisie))
+                curseur.executemany(requete_calculs, _lignes_calculs(
+                    historique, calcul_ids, donnees_ids, dates_reference, dates_saisie, graine))
+            id_donnees += nombre
+            id_calcul += nombre
+            bilan['donnees'] += nombre
+            bilan['calculs'] += nombre
+            bilan['duree_s'] = round(time.perf_counter() - debut, 2)
+            if rappel:
+                rappel(bilan)
+
+        # Identifiants attribués explicitement : séquences à recaler (sans effet sur SQLite)
+        with connection.cursor() as curseur:
+            for requete in connection.ops.sequence_reset_sql(no_style(), [DonneesSolvabilite, CalculSCR]):
+                curseur.execute(requete)
+
+    bilan['duree_s'] = round(time.perf_counter() - debut, 2)
+    bilan['lignes_par_seconde'] = round((bilan['donnees'] + bilan['calculs']) / bilan['duree_s']) \
+        if bilan['duree_s'] else None
+    return bilan
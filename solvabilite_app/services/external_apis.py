@@ -1,56 +1,465 @@
+"""
+Clients des API externes (régulateur, données de marché).
+
+Chaque service partage, dans le processus, une requests.Session : connexions
+conservées (keep-alive) dans un pool, nouvelles tentatives bornées avec
+backoff exponentiel et gigue. Seules les requêtes idempotentes (GET) sont
+rejouées après une erreur de lecture ou un statut 429/5xx ; une déclaration
+(POST) n'est rejouée que si la connexion n'a pas pu s'établir, la requête
+n'ayant alors pas atteint le serveur. Les délais sont définis par point
+d'accès et chaque appel alimente les métriques de latence (metriques_api).
+
+Le transport sous-jacent (réel, enregistrement, rejeu ou simulation) est
+choisi par configuration (voir services.transport_api) : le comportement des
+clients est le même en développement, en test et en production.
+
+Chaque service est protégé par un disjoncteur, dont l'état est partagé entre
+processus par le cache Django : après SEUIL_ECHECS échecs (erreur réseau,
+délai dépassé ou statut 5xx/429) en FENETRE_ECHECS secondes, il s'ouvre et
+les appels échouent immédiatement ; au bout de DELAI_REOUVERTURE, un seul
+appel d'essai (demi-ouvert) décide de la fermeture ou d'une nouvelle
+ouverture. Une cloison (sémaphore par processus) borne en plus le nombre
+d'appels simultanés d'un service, pour qu'un fournisseur lent n'occupe pas
+tous les threads du serveur web.
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
 import requests
 from django.conf import settings
-from datetime import datetime
-import json
+from django.core.cache import caches
+from urllib3.util.retry import Retry
+
+from . import metriques
+from .cache_indicateurs import cache_indicateurs
+from .transport_api import creer_adaptateur
+
+logger = logging.getLogger(__name__)
+
+CONFIGURATION_DEFAUT = {
+    'TENTATIVES': 3,
+    'BACKOFF': 0.5,
+    'BACKOFF_MAX': 10,
+    'GIGUE': 0.5,
+    'TAILLE_POOL': 10,
+    # Délais (connexion, lecture) en secondes, par point d'accès
+    'DELAIS': {
+        'declaration': (3.05, 30),
+        'taux_sans_risque': (3.05, 5),
+    },
+    'DELAI_DEFAUT': (3.05, 10),
+    # Transport : 'reel', 'enregistrement', 'rejeu' ou 'simulation' (voir transport_api)
+    'TRANSPORT': 'reel',
+    'FICHIER_ECHANGES': None,
+    'LATENCE_INJECTEE': None,
+    'TAUX_ERREUR_INJECTE': 0.0,
+    'ERREUR_INJECTEE': 'statut',
+    'GRAINE': None,
+    # Disjoncteur (état partagé par le cache) et cloison (par processus)
+    'SEUIL_ECHECS': 5,
+    'FENETRE_ECHECS': 60,
+    'DELAI_REOUVERTURE': 30,
+    'CONCURRENCE_MAX': 4,
+    'ATTENTE_CLOISON': 0.5,
+}
+
+STATUTS_A_REJOUER = frozenset({429, 500, 502, 503, 504})
+METHODES_IDEMPOTENTES = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+
+def configuration_api():
+    configuration = dict(CONFIGURATION_DEFAUT)
+    configuration.update(getattr(settings, 'SOLVABILITE_API_EXTERNES', {}))
+    return configuration
+
+
+def delai(point_acces):
+    configuration = configuration_api()
+    return tuple(configuration['DELAIS'].get(point_acces, configuration['DELAI_DEFAUT']))
 
 
-class RegulateurAPIClient:
+# =============================================
+# SESSIONS PARTAGÉES
+# =============================================
+
+class RetryAvecGigue(Retry):
     """
-    Client pour l'API du régulateur (ACPR, EIOPA, etc.)
+    Backoff exponentiel plafonné, plus une gigue aléatoire : des clients
+    relancés ensemble ne retombent pas sur le serveur au même instant.
+    (backoff_jitter n'existe qu'à partir d'urllib3 2.)
+    """
+
+    def __init__(self, *args, gigue=0.0, backoff_plafond=CONFIGURATION_DEFAUT['BACKOFF_MAX'], **kwargs):
+        super().__init__(*args, **kwargs)
+        self.gigue = gigue
+        self.backoff_plafond = backoff_plafond
+
+    def new(self, **kwargs):
+        nouveau = super().new(**kwargs)
+        nouveau.gigue = self.gigue
+        nouveau.backoff_plafond = self.backoff_plafond
+        return nouveau
+
+    def get_backoff_time(self):
+        attente = super().get_backoff_time()
+        if attente <= 0:
+            return 0
+        return min(self.backoff_plafond, attente) + random.uniform(0, self.gigue)
+
+
+def creer_session():
+    configuration = configuration_api()
+    strategie = RetryAvecGigue(
+        total=configuration['TENTATIVES'],
+        connect=configuration['TENTATIVES'],
+        read=configuration['TENTATIVES'],
+        status=configuration['TENTATIVES'],
+        allowed_methods=METHODES_IDEMPOTENTES,
+        status_forcelist=STATUTS_A_REJOUER,
+        backoff_factor=configuration['BACKOFF'],
+        raise_on_status=False,
+        gigue=configuration['GIGUE'],
+        backoff_plafond=configuration['BACKOFF_MAX'],
+    )
+    adaptateur = creer_adaptateur(
+        configuration,
+        pool_connections=configuration['TAILLE_POOL'],
+        pool_maxsize=configuration['TAILLE_POOL'],
+        max_retries=strategie,
+    )
+    session = requests.Session()
+    session.mount('https://', adaptateur)
+    session.mount('http://', adaptateur)
+    return session
+
+
+_sessions = {}
+_verrou_sessions = threading.Lock()
+
+
+def session_partagee(service):
+    """Session du service, créée au premier appel puis partagée par les threads du processus"""
+    with _verrou_sessions:
+        session = _sessions.get(service)
+        if session is None:
+            session = _sessions[service] = creer_session()
+        return session
+
+
+def fermer_sessions():
+    """Ferme les connexions ouvertes (tests, changement de configuration)"""
+    with _verrou_sessions:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+# =============================================
+# DISJONCTEUR ET CLOISON
+# =============================================
+
+class ServiceIndisponible(requests.exceptions.RequestException):
+    """Appel refusé sans atteindre le service (traité par les clients comme une erreur de connexion)"""
+
+
+class CircuitOuvert(ServiceIndisponible):
+    pass
+
+
+class CloisonSaturee(ServiceIndisponible):
+    pass
+
+
+class Disjoncteur:
+    """
+    Disjoncteur fermé / ouvert / demi-ouvert d'un service. L'état et le compteur
+    d'échecs sont dans le cache Django (partagés entre processus avec un backend
+    partagé) ; l'appel d'essai du demi-ouvert est attribué par cache.add, atomique.
     """
+    FERME, OUVERT, DEMI_OUVERT = 'ferme', 'ouvert', 'demi_ouvert'
+
+    def __init__(self, service):
+        self.service = service
+        prefixe = f"{cache_indicateurs.prefixe}:disjoncteur:{service}"
+        self._cle_etat = f'{prefixe}:etat'
+        self._cle_echecs = f'{prefixe}:echecs'
+        self._cle_essai = f'{prefixe}:essai'
+
+    @property
+    def cache(self):
+        return caches[cache_indicateurs.alias]
+
+    def etat(self):
+        """(état, date d'ouverture en secondes epoch ou None)"""
+        etat = self.cache.get(self._cle_etat)
+        if etat is None:
+            return self.FERME, None
+        if time.time() - etat['ouvert_le'] >= configuration_api()['DELAI_REOUVERTURE']:
+            return self.DEMI_OUVERT, etat['ouvert_le']
+        return self.OUVERT, etat['ouvert_le']
+
+    def autoriser(self):
+        """Lève CircuitOuvert si l'appel doit échouer immédiatement"""
+        etat, ouvert_le = self.etat()
+        if etat == self.FERME:
+            return
+        if etat == self.DEMI_OUVERT and self.cache.add(self._cle_essai, True,
+                                                       configuration_api()['DELAI_REOUVERTURE']):
+            return
+        raise CircuitOuvert(f"Service {self.service} indisponible (disjoncteur ouvert depuis "
+                            f"{time.time() - ouvert_le:.0f} s)")
+
+    def succes(self):
+        if self.cache.get(self._cle_etat) is not None:
+            self.cache.delete_many([self._cle_etat, self._cle_essai])
+            logger.info("Disjoncteur %s refermé", self.service)
+        self.cache.delete(self._cle_echecs)
+
+    def echec(self):
+        configuration = configuration_api()
+        if self.cache.get(self._cle_etat) is not None:
+            # Essai du demi-ouvert en échec (ou échec tardif) : nouvelle ouverture
+            self._ouvrir()
+            return
+        self.cache.add(self._cle_echecs, 0, configuration['FENETRE_ECHECS'])
+        try:
+            echecs = self.cache.incr(self._cle_echecs)
+        except ValueError:  # compteur expiré entre add et incr
+            echecs = 1
+        if echecs >= configuration['SEUIL_ECHECS']:
+            self._ouvrir()
+
+    def _ouvrir(self):
+        # Sans expiration : seul un essai réussi referme le circuit
+        self.cache.set(self._cle_etat, {'ouvert_le': time.time()}, None)
+        self.cache.delete_many([self._cle_echecs, self._cle_essai])
+        logger.warning("Disjoncteur %s ouvert : appels suspendus %s s", self.service,
+                       configuration_api()['DELAI_REOUVERTURE'])
+
+    def reinitialiser(self):
+        self.cache.delete_many([self._cle_etat, self._cle_echecs, self._cle_essai])
+
+    def sante(self):
+        etat, ouvert_le = self.etat()
+        sante = {'etat': etat, 'echecs_recents': self.cache.get(self._cle_echecs, 0)}
+        if ouvert_le is not None:
+            sante['ouvert_depuis_s'] = round(time.time() - ouvert_le, 1)
+            sante['essai_dans_s'] = max(0.0, round(ouvert_le + configuration_api()['DELAI_REOUVERTURE']
+                                                   - time.time(), 1))
+        return sante
+
+
+class Cloison:
+    """Nombre borné d'appels simultanés vers un service, dans ce processus"""
+
+    def __init__(self, capacite):
+        self.capacite = capacite
+        self._semaphore = threading.BoundedSemaphore(capacite)
+        self._verrou = threading.Lock()
+        self.en_cours = 0
+
+    def entrer(self, service, attente):
+        """attente : secondes au plus pour obtenir une place (None : sans limite)"""
+        if not self._semaphore.acquire(timeout=attente):
+            raise CloisonSaturee(f"Service {service} : {self.capacite} appels déjà en cours")
+        with self._verrou:
+            self.en_cours += 1
+
+    def sortir(self):
+        with self._verrou:
+            self.en_cours -= 1
+        self._semaphore.release()
+
+
+_protections = {}
+_verrou_protections = threading.Lock()
+
+
+def protections(service):
+    """(disjoncteur, cloison) du service, créés au premier appel"""
+    with _verrou_protections:
+        if service not in _protections:
+            _protections[service] = (Disjoncteur(service), Cloison(configuration_api()['CONCURRENCE_MAX']))
+        return _protections[service]
+
+
+def sante_services():
+    """État des disjoncteurs et occupation des cloisons de chaque service"""
+    sante = {}
+    for service in (RegulateurAPIClient.service, MarketDataClient.service):
+        disjoncteur, cloison = protections(service)
+        sante[service] = disjoncteur.sante()
+        sante[service]['cloison'] = {'capacite': cloison.capacite, 'en_cours': cloison.en_cours}
+    return sante
+
+
+@metriques.registre.collecteur
+def _metriques_disjoncteurs(valeurs):
+    """État partagé par le cache : lu par le processus qui répond à /metrics"""
+    echantillons = []
+    for service in (RegulateurAPIClient.service, MarketDataClient.service):
+        etat, _ = protections(service)[0].etat()
+        echantillons.append(({'service': service}, 0 if etat == Disjoncteur.FERME else 1))
+    return [('disjoncteur_ouvert', "Disjoncteur ouvert ou demi-ouvert (1) ou fermé (0)", echantillons)]
+
+
+# =============================================
+# MÉTRIQUES DE LATENCE
+# =============================================
+
+class MetriquesAPI:
+    """Appels, erreurs, nouvelles tentatives et latences (fenêtre glissante) par service et point d'accès"""
+
+    TAILLE_FENETRE = 1000
 
     def __init__(self):
+        self._verrou = threading.Lock()
+        self._par_point = {}
+
+    def _compteurs(self, service, point_acces):
+        return self._par_point.setdefault((service, point_acces), {
+            'appels': 0, 'erreurs': 0, 'nouvelles_tentatives': 0, 'rejets': 0,
+            'latences': deque(maxlen=self.TAILLE_FENETRE),
+        })
+
+    def rejeter(self, service, point_acces):
+        """Appel refusé par le disjoncteur ou la cloison (sans latence réseau)"""
+        with self._verrou:
+            self._compteurs(service, point_acces)['rejets'] += 1
+        metriques.appels_api_externes.inc(service, point_acces, 'rejet')
+
+    def enregistrer(self, service, point_acces, duree, statut=None, tentatives=0):
+        with self._verrou:
+            compteurs = self._compteurs(service, point_acces)
+            compteurs['appels'] += 1
+            compteurs['nouvelles_tentatives'] += tentatives
+            if statut is None or statut >= 400:
+                compteurs['erreurs'] += 1
+            compteurs['latences'].append(duree)
+        metriques.duree_api_externes.observer(duree, service, point_acces)
+        metriques.appels_api_externes.inc(service, point_acces,
+                                          'erreur' if statut is None or statut >= 400 else 'succes')
+        if tentatives:
+            metriques.tentatives_api_externes.inc(service, point_acces, valeur=tentatives)
+
+    def statistiques(self):
+        with self._verrou:
+            instantane = {cle: (dict(compteurs), sorted(compteurs['latences']))
+                          for cle, compteurs in self._par_point.items()}
+
+        def centile(latences, rang):
+            return round(latences[min(len(latences) - 1, int(rang / 100 * len(latences)))] * 1000, 2)
+
+        resultat = {}
+        for (service, point_acces), (compteurs, latences) in instantane.items():
+            resultat.setdefault(service, {})[point_acces] = {
+                'appels': compteurs['appels'],
+                'erreurs': compteurs['erreurs'],
+                'nouvelles_tentatives': compteurs['nouvelles_tentatives'],
+                'rejets': compteurs['rejets'],
+                'latence_p50_ms': centile(latences, 50) if latences else 0.0,
+                'latence_p95_ms': centile(latences, 95) if latences else 0.0,
+                'latence_max_ms': round(latences[-1] * 1000, 2) if latences else 0.0,
+            }
+        return resultat
+
+    def reinitialiser(self):
+        with self._verrou:
+            self._par_point.clear()
+
+
+metriques_api = MetriquesAPI()
+
+
+def _echec_service(statut):
+    """Statuts qui signalent un service dégradé (et non une requête refusée)"""
+    return statut >= 500 or statut == 429
+
+
+class ClientAPI:
+    """Base des clients : session partagée, disjoncteur et cloison du service, délais, métriques"""
+    service = None
+
+    def __init__(self, attente_cloison=False):
+        """
+        attente_cloison : secondes d'attente au plus d'une place dans la cloison
+        (None : sans limite, pour les traitements par lots) ; défaut : configuration.
+        """
+        self.session = session_partagee(self.service)
+        self.disjoncteur, self.cloison = protections(self.service)
+        self.attente_cloison = configuration_api()['ATTENTE_CLOISON'] if attente_cloison is False \
+            else attente_cloison
+
+    def _requete(self, methode, point_acces, chemin, **kwargs):
+        try:
+            self.disjoncteur.autoriser()
+            self.cloison.entrer(self.service, self.attente_cloison)
+        except ServiceIndisponible:
+            metriques_api.rejeter(self.service, point_acces)
+            raise
+
+        headers = {'Authorization': f'Bearer {self.api_key}'}
+        headers.update(kwargs.pop('headers', {}))
+        debut = time.perf_counter()
+        try:
+            response = self.session.request(methode, f'{self.base_url}{chemin}', headers=headers,
+                                            timeout=delai(point_acces), **kwargs)
+        except requests.exceptions.RequestException:
+            metriques_api.enregistrer(self.service, point_acces, time.perf_counter() - debut)
+            self.disjoncteur.echec()
+            raise
+        finally:
+            self.cloison.sortir()
+
+        if _echec_service(response.status_code):
+            self.disjoncteur.echec()
+        else:
+            self.disjoncteur.succes()
+        retries = getattr(response.raw, 'retries', None)
+        metriques_api.enregistrer(self.service, point_acces, time.perf_counter() - debut,
+                                  statut=response.status_code,
+                                  tentatives=len(retries.history) if retries is not None else 0)
+        return response
+
+
+class RegulateurAPIClient(ClientAPI):
+    """
+    Client pour l'API du régulateur (ACPR, EIOPA, etc.)
+    """
+    service = 'regulateur'
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
         self.base_url = getattr(settings, 'REGULATEUR_API_URL', 'https://api.regulateur.demo')
         self.api_key = getattr(settings, 'REGULATEUR_API_KEY', 'demo-key')
 
-    def envoyer_declaration_solvabilite(self, donnees_solvabilite):
+    def envoyer_declaration_solvabilite(self, donnees_solvabilite, cle_idempotence=None):
         """
-        Envoie la déclaration de solvabilité au régulateur
+        Envoie la déclaration de solvabilité au régulateur.
+        cle_idempotence : transmise en en-tête Idempotency-Key ; le régulateur
+        ne compte qu'une fois les envois répétés d'une même clé.
         """
         try:
             # Préparation des données pour l'API régulateur
             payload = {
                 'compagnie_siren': donnees_solvabilite.compagnie.siren if hasattr(donnees_solvabilite.compagnie,
                                                                                   'siren') else '000000000',
-                'date_reference': datetime.now().strftime('%Y-%m-%d'),
+                'date_reference': (donnees_solvabilite.date_reference or datetime.now()).strftime('%Y-%m-%d'),
                 'scr_total': float(donnees_solvabilite.scr_total) if hasattr(donnees_solvabilite, 'scr_total') else 0,
-                'fonds_propres_tier1': float(donnees_solvabilite.fonds_propres_tier1) if hasattr(donnees_solvabilite,
-                                                                                                 'fonds_propres_tier1') else 0,
+                'fonds_propres': float(donnees_solvabilite.fonds_propres),
                 'ratio_solvabilite': float(donnees_solvabilite.ratio_solvabilite) if hasattr(donnees_solvabilite,
                                                                                              'ratio_solvabilite') else 0,
                 'mcr': float(donnees_solvabilite.mcr) if hasattr(donnees_solvabilite, 'mcr') else 0
             }
 
-            # En mode développement, simuler l'envoi
-            if settings.DEBUG:
-                return {
-                    'success': True,
-                    'reference': f"REF_{datetime.now().strftime('%Y%m%d%H%M%S')}",
-                    'message': 'Déclaration simulée avec succès (mode développement)'
-                }
-
             # Envoi réel à l'API (à adapter avec les vraies endpoints)
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
-
-            response = requests.post(
-                f'{self.base_url}/api/declarations/solvabilite',
-                json=payload,
-                headers=headers,
-                timeout=30
-            )
+            headers = {'Idempotency-Key': cle_idempotence} if cle_idempotence else {}
+            response = self._requete('POST', 'declaration', '/api/declarations/solvabilite', json=payload,
+                                     headers=headers)
 
             if response.status_code == 200:
                 return {
@@ -76,38 +485,33 @@ class RegulateurAPIClient:
             }
 
 
-class MarketDataClient:
+class MarketDataClient(ClientAPI):
     """
     Client pour les données de marché (taux, volatilités, etc.)
     """
+    service = 'donnees_marche'
 
-    def __init__(self):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
         self.base_url = getattr(settings, 'MARKET_DATA_URL', 'https://api.marketdata.demo')
         self.api_key = getattr(settings, 'MARKET_DATA_KEY', 'demo-key')
 
     def get_risk_free_rate(self):
         """
-        Récupère le taux sans risque (OAT 10 ans pour l'EUR)
+        Taux sans risque (OAT 10 ans pour l'EUR), lu dans le cache des données
+        de marché : jamais d'attente réseau, rafraîchi en arrière-plan.
         """
-        try:
-            # En mode développement, retourner une valeur simulée
-            if settings.DEBUG:
-                return 0.025  # 2.5%
+        from .donnees_marche import taux_sans_risque
+        return taux_sans_risque()
 
-            headers = {'Authorization': f'Bearer {self.api_key}'}
-            response = requests.get(
-                f'{self.base_url}/api/rates/risk-free',
-                headers=headers,
-                timeout=10
-            )
-
-            if response.status_code == 200:
-                return response.json().get('rate', 0.025)
-            else:
-                return 0.025  # Fallback
-
-        except:
-            return 0.025  # Fallback en cas d'erreur
+    def recuperer_taux_sans_risque(self):
+        """
+        Interroge le fournisseur (appel bloquant, utilisé par le rafraîchissement
+        du cache). Lève une exception si le taux n'a pas pu être obtenu.
+        """
+        response = self._requete('GET', 'taux_sans_risque', '/api/rates/risk-free')
+        response.raise_for_status()
+        return float(response.json()['rate'])
 
     def get_volatility_index(self, asset_class):
         """
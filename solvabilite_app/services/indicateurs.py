@@ -0,0 +1,237 @@
+"""
+Construction des indicateurs de solvabilité partagés par le tableau de bord,
+la page des indicateurs et les exports PDF. Les résultats sont mis en cache
+par compagnie et par version de données (voir cache_indicateurs).
+"""
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from ..autorisations import DUREE_HISTORIQUE_RESTREINT_JOURS, ROLES_HISTORIQUE_RESTREINT
+from ..models import CalculSCR, Compagnie, DonneesSolvabilite
+from ..utils.echantillonnage import lttb_indices
+from .cache_indicateurs import cache_indicateurs
+
+
+# Seuils du ratio de solvabilité (%), du plus élevé au plus bas : (minimum, statut, couleur)
+# Référence unique pour l'application, les API et les rapports PDF.
+SEUILS_STATUT = (
+    (180, "Très Solide", "success"),
+    (150, "Solide", "info"),
+    (120, "Conforme", "primary"),
+    (100, "Surveillance", "warning"),
+)
+STATUT_NON_CONFORME = ("Non Conforme", "danger")
+
+
+def determiner_statut_solvabilite(ratio):
+    """Détermine le statut de solvabilité basé sur le ratio"""
+    for minimum, statut, couleur in SEUILS_STATUT:
+        if ratio >= minimum:
+            return statut, couleur
+    return STATUT_NON_CONFORME
+
+
+def indicateurs_donnees(donnees):
+    """Dictionnaire d'indicateurs affiché pour une ligne de DonneesSolvabilite"""
+    statut, couleur_statut = determiner_statut_solvabilite(donnees.ratio_solvabilite)
+    return {
+        'ratio_solvabilite': donnees.ratio_solvabilite,
+        'scr_total': donnees.total_scr,
+        'mcr': donnees.mcr,
+        'statut': statut,
+        'couleur_statut': couleur_statut,
+        'fonds_propres': donnees.fonds_propres,
+    }
+
+
+def synthese_compagnie(compagnie_id, rafraichir=False):
+    """
+    Compagnie, dernière ligne de données, indicateurs et calculs récents.
+    Servi depuis le cache tant que les données de la compagnie n'ont pas changé
+    (rafraichir : reconstruit depuis la base et remplace l'entrée en cache).
+    """
+
+    def construire():
+        donnees_recentes = DonneesSolvabilite.objects.with_totals().select_related('compagnie').filter(
+            compagnie_id=compagnie_id
+        ).order_by('-date_reference').first()
+        if donnees_recentes:
+            compagnie = donnees_recentes.compagnie
+        else:
+            compagnie = Compagnie.objects.filter(pk=compagnie_id).first()
+
+        return {
+            'compagnie': compagnie,
+            'donnees_recentes': donnees_recentes,
+            'indicateurs': indicateurs_donnees(donnees_recentes) if donnees_recentes else {},
+            'calculs_recents': list(
+                CalculSCR.objects.filter(donnees__compagnie_id=compagnie_id).defer(
+                    'parametres_calcul'
+                ).order_by('-date_calcul')[:5]
+            ),
+        }
+
+    return cache_indicateurs.obtenir(compagnie_id, 'synthese', construire, rafraichir=rafraichir)
+
+
+def _variante_role(user_role):
+    if user_role == 'CLIENT':
+        return 'client'
+    elif user_role in ROLES_HISTORIQUE_RESTREINT:
+        return 'restreint'
+    return 'complet'
+
+
+def historique_compagnie(compagnie_id, user_role):
+    """Données et séries graphiques de la page des indicateurs, selon le rôle"""
+    variante = _variante_role(user_role)
+
+    def construire():
+        toutes_donnees = DonneesSolvabilite.objects.with_totals().filter(
+            compagnie_id=compagnie_id
+        ).order_by('date_reference')
+        if variante != 'complet':
+            # Clients et consultants : 12 derniers mois seulement
+            toutes_donnees = toutes_donnees.filter(
+                date_reference__gte=datetime.now() - timedelta(days=DUREE_HISTORIQUE_RESTREINT_JOURS)
+            )
+
+        # Prendre les 12 derniers mois seulement pour l'affichage
+        donnees = list(toutes_donnees[:12])
+        derniere_donnee = toutes_donnees.last()
+
+        dates = []
+        ratios = []
+        scr_totals = []
+        fonds_propres_list = []
+        modules_data = {
+            'marche': [],
+            'credit': [],
+            'vie': [],
+            'non_vie': []
+        }
+
+        for donnee in donnees:
+            dates.append(donnee.date_reference.strftime('%Y-%m'))
+            ratios.append(float(donnee.ratio_solvabilite))
+            scr_totals.append(float(donnee.total_scr))
+            fonds_propres_list.append(float(donnee.fonds_propres))
+
+            # Les clients ne voient pas le détail des modules
+            if variante != 'client':
+                modules_data['marche'].append(float(donnee.scr_marche))
+                modules_data['credit'].append(float(donnee.scr_credit))
+                modules_data['vie'].append(float(donnee.scr_vie))
+                modules_data['non_vie'].append(float(donnee.scr_non_vie))
+
+        repartition_modules = {}
+        if derniere_donnee and variante != 'client':
+            total_scr = float(derniere_donnee.total_scr)
+            if total_scr > 0:
+                repartition_modules = {
+                    'Marche': (float(derniere_donnee.scr_marche) / total_scr) * 100,
+                    'Credit': (float(derniere_donnee.scr_credit) / total_scr) * 100,
+                    'Vie': (float(derniere_donnee.scr_vie) / total_scr) * 100,
+                    'Non-Vie': (float(derniere_donnee.scr_non_vie) / total_scr) * 100,
+                }
+
+        return {
+            'donnees': donnees,
+            'graphiques_data': {
+                'dates': dates,
+                'ratios': ratios,
+                'scr_totals': scr_totals,
+                'fonds_propres': fonds_propres_list,
+                'modules': modules_data,
+                'repartition': repartition_modules,
+            }
+        }
+
+    return cache_indicateurs.obtenir(compagnie_id, f'historique:{variante}', construire)
+
+
+# Séries disponibles pour les graphiques : nom -> colonne (annotée ou non)
+SERIES_GRAPHIQUES = {
+    'ratios': 'ratio_solvabilite',
+    'scr_totals': 'scr_total',
+    'fonds_propres': 'fonds_propres',
+    'mcr': 'mcr',
+}
+
+SERIES_MODULES = {
+    'marche': 'scr_marche',
+    'credit': 'scr_credit',
+    'vie': 'scr_vie',
+    'non_vie': 'scr_non_vie',
+    'operational': 'scr_operational',
+}
+
+
+def _reduire_serie(x, y, nb_points):
+    indices = lttb_indices(x, y, nb_points)
+    return {
+        'dates': [date.fromordinal(int(jour)).isoformat() for jour in x[indices]],
+        'valeurs': [round(float(valeur), 2) for valeur in y[indices]],
+    }
+
+
+def series_graphiques(compagnie_id, user_role, nb_points, rafraichir=False):
+    """
+    Séries complètes de la compagnie réduites à nb_points chacune (LTTB).
+    Mises en cache par compagnie, variante de rôle et résolution.
+    """
+    variante = _variante_role(user_role)
+
+    def construire():
+        colonnes = list(SERIES_GRAPHIQUES.values())
+        if variante != 'client':
+            colonnes += list(SERIES_MODULES.values())
+
+        queryset = DonneesSolvabilite.objects.with_totals().filter(compagnie_id=compagnie_id)
+        if variante != 'complet':
+            queryset = queryset.filter(
+                date_reference__gte=datetime.now() - timedelta(days=DUREE_HISTORIQUE_RESTREINT_JOURS)
+            )
+        lignes = list(queryset.order_by('date_reference', 'id').values_list('date_reference', *colonnes))
+
+        series = {'nb_points_source': len(lignes), 'series': {}, 'modules': {}}
+        if not lignes:
+            return series
+
+        x = np.fromiter((ligne[0].toordinal() for ligne in lignes), dtype=float, count=len(lignes))
+        valeurs = np.array([ligne[1:] for ligne in lignes], dtype=float)
+
+        for position, nom in enumerate(SERIES_GRAPHIQUES):
+            series['series'][nom] = _reduire_serie(x, valeurs[:, position], nb_points)
+        if variante != 'client':
+            decalage = len(SERIES_GRAPHIQUES)
+            for position, nom in enumerate(SERIES_MODULES):
+                series['modules'][nom] = _reduire_serie(x, valeurs[:, decalage + position], nb_points)
+        return series
+
+    return cache_indicateurs.obtenir(compagnie_id, f'graphiques:{variante}:{nb_points}', construire,
+                                     rafraichir=rafraichir)
+
+
+def series_ratio_compagnies(compagnie_ids, nb_points):
+    """
+    Historique complet du ratio de plusieurs compagnies, en une requête, réduit
+    à nb_points par compagnie ; même format que series_graphiques (clé 'series').
+    Pour les générations en masse (packs de rapports).
+    """
+    lignes = DonneesSolvabilite.objects.filter(compagnie_id__in=compagnie_ids).order_by(
+        'compagnie_id', 'date_reference', 'id'
+    ).values_list('compagnie_id', 'date_reference', 'ratio_solvabilite')
+
+    par_compagnie = {}
+    for compagnie_id, date_reference, ratio in lignes.iterator(chunk_size=5000):
+        jours, ratios = par_compagnie.setdefault(compagnie_id, ([], []))
+        jours.append(date_reference.toordinal())
+        ratios.append(ratio)
+
+    return {
+        compagnie_id: {'series': {'ratios': _reduire_serie(np.array(jours, dtype=float),
+                                                           np.array(ratios, dtype=float), nb_points)}}
+        for compagnie_id, (jours, ratios) in par_compagnie.items()
+    }
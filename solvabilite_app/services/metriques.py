@@ -0,0 +1,337 @@
+"""
+Métriques d'exécution au format d'exposition texte de Prometheus (/metrics).
+
+Compteurs et histogrammes sont agrégés par thread : chaque thread écrit dans
+son propre dictionnaire, sans verrou, et la collecte additionne les
+dictionnaires de tous les threads (ceux des threads terminés sont fusionnés
+puis oubliés). Une mesure coûte quelques opérations de dictionnaire.
+
+Plusieurs processus (workers gunicorn) : avec
+SOLVABILITE_METRIQUES['REPERTOIRE_MULTIPROCESSUS'], chaque processus écrit
+périodiquement (INTERVALLE_ECRITURE secondes, et à sa sortie) un instantané
+metriques_<pid>_<aléa>.json dans ce répertoire partagé (l'aléa distingue un
+worker relancé qui reprendrait le pid d'un worker arrêté) ; le processus qui
+répond à /metrics additionne ses valeurs courantes et les instantanés des autres. Les
+instantanés des processus arrêtés sont conservés (les compteurs restent
+croissants) : vider le répertoire au démarrage du service.
+"""
+import atexit
+import json
+import os
+import secrets
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+
+CONFIGURATION_DEFAUT = {
+    'REPERTOIRE_MULTIPROCESSUS': None,
+    'INTERVALLE_ECRITURE': 5,
+    # Jeton exigé en en-tête « Authorization: Bearer ... » par /metrics ; sans
+    # jeton, accès réservé aux administrateurs connectés (libre avec DEBUG)
+    'JETON': None,
+}
+
+PREFIXE = 'solvabilite'
+BORNES_LATENCE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def configuration_metriques():
+    configuration = dict(CONFIGURATION_DEFAUT)
+    configuration.update(getattr(settings, 'SOLVABILITE_METRIQUES', {}))
+    return configuration
+
+
+class Compteur:
+    type = 'counter'
+
+    def __init__(self, registre, nom, aide, etiquettes=()):
+        self.registre = registre
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = tuple(etiquettes)
+
+    def inc(self, *valeurs_etiquettes, valeur=1):
+        """Étiquettes positionnelles, dans l'ordre de self.etiquettes"""
+        valeurs = self.registre.valeurs_du_thread()
+        cle = (self.nom, valeurs_etiquettes)
+        valeurs[cle] = valeurs.get(cle, 0) + valeur
+
+
+class Histogramme:
+    """Cellule par jeu d'étiquettes : effectifs par intervalle (non cumulés), puis +Inf, puis somme"""
+    type = 'histogram'
+
+    def __init__(self, registre, nom, aide, etiquettes=(), bornes=BORNES_LATENCE):
+        self.registre = registre
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = tuple(etiquettes)
+        self.bornes = tuple(sorted(bornes))
+
+    def observer(self, valeur, *valeurs_etiquettes):
+        valeurs = self.registre.valeurs_du_thread()
+        cle = (self.nom, valeurs_etiquettes)
+        cellule = valeurs.get(cle)
+        if cellule is None:
+            cellule = valeurs[cle] = [0] * (len(self.bornes) + 2)
+        cellule[bisect_left(self.bornes, valeur)] += 1
+        cellule[-1] += valeur
+
+
+def _additionner(total, cle, valeur):
+    if isinstance(valeur, list):
+        cellule = total.get(cle)
+        if cellule is None:
+            total[cle] = list(valeur)
+        else:
+            for indice, nombre in enumerate(valeur):
+                cellule[indice] += nombre
+    else:
+        total[cle] = total.get(cle, 0) + valeur
+
+
+def _echapper(valeur):
+    return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquettes(noms, valeurs, supplement=''):
+    paires = [f'{nom}="{_echapper(valeur)}"' for nom, valeur in zip(noms, valeurs)]
+    if supplement:
+        paires.append(supplement)
+    return '{' + ','.join(paires) + '}' if paires else ''
+
+
+def _nombre(valeur):
+    return repr(float(valeur)) if isinstance(valeur, float) else str(valeur)
+
+
+class Registre:
+    def __init__(self):
+        self._metriques = {}
+        self._collecteurs = []
+        self._verrou = threading.Lock()
+        self._initialiser_etat()
+        os.register_at_fork(after_in_child=self._initialiser_etat)
+
+    def _initialiser_etat(self):
+        """État propre au processus (aussi appelé dans un processus fils après fork)"""
+        self._local = threading.local()
+        self._par_thread = []
+        self._threads_termines = {}
+        self._ecriture_pid = None
+        self._nom_instantane = f'metriques_{os.getpid()}_{secrets.token_hex(4)}.json'
+
+    # ---- déclaration ----
+
+    def _declarer(self, classe, nom, aide, etiquettes, **options):
+        nom = f'{PREFIXE}_{nom}'
+        with self._verrou:
+            if nom not in self._metriques:
+                self._metriques[nom] = classe(self, nom, aide, etiquettes, **options)
+            return self._metriques[nom]
+
+    def compteur(self, nom, aide, etiquettes=()):
+        return self._declarer(Compteur, nom, aide, etiquettes)
+
+    def histogramme(self, nom, aide, etiquettes=(), bornes=BORNES_LATENCE):
+        return self._declarer(Histogramme, nom, aide, etiquettes, bornes=bornes)
+
+    def collecteur(self, fonction):
+        """
+        fonction(valeurs) -> [(nom, aide, [(étiquettes dict, valeur)])] : jauges
+        calculées à la collecte, par le processus qui répond (valeurs : compteurs fusionnés).
+        """
+        self._collecteurs.append(fonction)
+        return fonction
+
+    # ---- écriture (chemin critique) ----
+
+    def valeurs_du_thread(self):
+        try:
+            return self._local.valeurs
+        except AttributeError:
+            return self._nouveau_thread()
+
+    def _nouveau_thread(self):
+        valeurs = self._local.valeurs = {}
+        with self._verrou:
+            self._par_thread.append((threading.current_thread(), valeurs))
+        if self._ecriture_pid != os.getpid() and configuration_metriques()['REPERTOIRE_MULTIPROCESSUS']:
+            self._demarrer_ecriture()
+        return valeurs
+
+    # ---- collecte ----
+
+    def valeurs_processus(self):
+        """Somme des valeurs de tous les threads de ce processus"""
+        total = {}
+        with self._verrou:
+            actifs = []
+            for thread, valeurs in self._par_thread:
+                if thread.is_alive():
+                    actifs.append((thread, valeurs))
+                else:
+                    # Le thread n'écrira plus : ses valeurs rejoignent le cumul des threads terminés
+                    for cle, valeur in list(valeurs.items()):
+                        _additionner(self._threads_termines, cle, valeur)
+            self._par_thread = actifs
+            for cle, valeur in self._threads_termines.items():
+                _additionner(total, cle, valeur)
+        for _, valeurs in actifs:
+            # list(dict.items()) est atomique sous le GIL : le thread propriétaire peut écrire pendant la copie
+            for cle, valeur in list(valeurs.items()):
+                _additionner(total, cle, valeur)
+        return total
+
+    def valeurs(self):
+        """Valeurs de ce processus, plus les instantanés des autres processus (mode multiprocessus)"""
+        total = self.valeurs_processus()
+        repertoire = configuration_metriques()['REPERTOIRE_MULTIPROCESSUS']
+        if repertoire:
+            for chemin in Path(repertoire).glob('metriques_*.json'):
+                if chemin.name == self._nom_instantane:
+                    continue
+                try:
+                    with open(chemin, encoding='utf-8') as fichier:
+                        instantane = json.load(fichier)
+                except (OSError, ValueError):
+                    continue  # fichier en cours de remplacement ou illisible
+                for nom, etiquettes, valeur in instantane:
+                    _additionner(total, (nom, tuple(etiquettes)), valeur)
+        return total
+
+    def exposition(self):
+        """Texte au format d'exposition Prometheus 0.0.4"""
+        valeurs = self.valeurs()
+        par_metrique = {}
+        for (nom, etiquettes), valeur in valeurs.items():
+            par_metrique.setdefault(nom, []).append((etiquettes, valeur))
+
+        lignes = []
+        for nom, metrique in sorted(self._metriques.items()):
+            lignes.append(f'# HELP {nom} {metrique.aide}')
+            lignes.append(f'# TYPE {nom} {metrique.type}')
+            for etiquettes, valeur in sorted(par_metrique.get(nom, ()), key=lambda element: element[0]):
+                if metrique.type == 'counter':
+                    lignes.append(f'{nom}{_etiquettes(metrique.etiquettes, etiquettes)} {_nombre(valeur)}')
+                    continue
+                cumul = 0
+                for borne, effectif in zip(metrique.bornes + (float('inf'),), valeur[:-1]):
+                    cumul += effectif
+                    le = 'le="+Inf"' if borne == float('inf') else f'le="{_nombre(float(borne))}"'
+                    lignes.append(f'{nom}_bucket{_etiquettes(metrique.etiquettes, etiquettes, le)} {cumul}')
+                lignes.append(f'{nom}_sum{_etiquettes(metrique.etiquettes, etiquettes)} {_nombre(valeur[-1])}')
+                lignes.append(f'{nom}_count{_etiquettes(metrique.etiquettes, etiquettes)} {cumul}')
+
+        for collecteur in self._collecteurs:
+            for nom, aide, echantillons in collecteur(valeurs):
+                nom = f'{PREFIXE}_{nom}'
+                lignes.append(f'# HELP {nom} {aide}')
+                lignes.append(f'# TYPE {nom} gauge')
+                for etiquettes, valeur in echantillons:
+                    lignes.append(f'{nom}{_etiquettes(list(etiquettes), list(etiquettes.values()))} {_nombre(valeur)}')
+        return '\n'.join(lignes) + '\n'
+
+    # ---- mode multiprocessus ----
+
+    def ecrire_instantane(self):
+        repertoire = configuration_metriques()['REPERTOIRE_MULTIPROCESSUS']
+        if not repertoire:
+            return
+        os.makedirs(repertoire, exist_ok=True)
+        chemin = os.path.join(repertoire, self._nom_instantane)
+        temporaire = f'{chemin}.tmp'
+        with open(temporaire, 'w', encoding='utf-8') as fichier:
+            json.dump([[nom, list(etiquettes), valeur] for (nom, etiquettes), valeur
+                       in self.valeurs_processus().items()], fichier)
+        os.replace(temporaire, chemin)
+
+    def _demarrer_ecriture(self):
+        with self._verrou:
+            if self._ecriture_pid == os.getpid():
+                return
+            self._ecriture_pid = os.getpid()
+        intervalle = configuration_metriques()['INTERVALLE_ECRITURE']
+
+        def ecrire_periodiquement():
+            while True:
+                time.sleep(intervalle)
+                try:
+                    self.ecrire_instantane()
+                except OSError:
+                    pass
+
+        threading.Thread(target=ecrire_periodiquement, name='metriques-instantane', daemon=True).start()
+        atexit.register(self.ecrire_instantane)
+
+
+registre = Registre()
+
+
+# =============================================
+# MÉTRIQUES DE L'APPLICATION
+# =============================================
+
+requetes_http = registre.compteur('http_requetes_total', "Requêtes HTTP traitées", ('vue', 'methode', 'statut'))
+duree_requetes_http = registre.histogramme('http_requete_duree_secondes', "Durée de traitement des requêtes HTTP",
+                                           ('vue', 'methode'))
+requetes_sql = registre.histogramme('http_requetes_sql', "Requêtes SQL exécutées par requête HTTP", ('vue',),
+                                    bornes=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500))
+duree_sql = registre.compteur('sql_duree_secondes_total', "Temps passé dans les requêtes SQL", ('vue',))
+
+calculs = registre.compteur('calculs_total', "Calculs SCR / MCR effectués (lignes pour un lot)", ('calcul',))
+duree_calculs = registre.histogramme('calcul_duree_secondes', "Durée des calculs SCR / MCR", ('calcul',),
+                                     bornes=(1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1, 0.5, 1.0))
+
+duree_rendus_pdf = registre.histogramme('pdf_rendu_duree_secondes', "Durée des rendus PDF", ('moteur',))
+taille_rendus_pdf = registre.histogramme('pdf_taille_octets', "Taille des rapports PDF rendus", ('moteur',),
+                                         bornes=(1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7))
+echecs_rendus_pdf = registre.compteur('pdf_echecs_total', "Rendus PDF en échec", ('moteur', 'cause'))
+
+duree_api_externes = registre.histogramme('api_externe_duree_secondes', "Durée des appels aux API externes",
+                                          ('service', 'point_acces'))
+appels_api_externes = registre.compteur('api_externe_appels_total', "Appels aux API externes par résultat",
+                                        ('service', 'point_acces', 'resultat'))
+tentatives_api_externes = registre.compteur('api_externe_nouvelles_tentatives_total',
+                                            "Nouvelles tentatives des appels aux API externes",
+                                            ('service', 'point_acces'))
+
+evenements_cache = registre.compteur('cache_evenements_total', "Lectures et écritures des caches",
+                                     ('cache', 'evenement'))
+
+# Événements comptés comme succès / échecs de lecture de chaque cache
+LECTURES_CACHES = {
+    'indicateurs': (('succes_lru', 'succes_partage'), ('echecs',)),
+    'rapports_pdf': (('succes', 'succes_apres_attente'), ('rendus',)),
+    'donnees_marche': (('fraiches',), ('perimees', 'par_defaut')),
+}
+
+
+@registre.collecteur
+def taux_succes_caches(valeurs):
+    echantillons = []
+    for cache, (succes, echecs) in LECTURES_CACHES.items():
+        nombre_succes = sum(valeurs.get((evenements_cache.nom, (cache, evenement)), 0) for evenement in succes)
+        nombre_echecs = sum(valeurs.get((evenements_cache.nom, (cache, evenement)), 0) for evenement in echecs)
+        if nombre_succes + nombre_echecs:
+            echantillons.append(({'cache': cache}, round(nombre_succes / (nombre_succes + nombre_echecs), 4)))
+    return [('cache_taux_succes', "Part des lectures servies par le cache (tous processus)", echantillons)]
+
+
+def mesurer_calcul(calcul):
+    """Décorateur : compte et chronomètre un calcul"""
+    def decorateur(fonction):
+        @wraps(fonction)
+        def mesuree(*args, **kwargs):
+            debut = time.perf_counter()
+            try:
+                return fonction(*args, **kwargs)
+            finally:
+                duree_calculs.observer(time.perf_counter() - debut, calcul)
+                calculs.inc(calcul)
+        return mesuree
+    return decorateur
@@ -0,0 +1,230 @@
+"""
+Transports HTTP des clients d'API externes, choisis par
+SOLVABILITE_API_EXTERNES['TRANSPORT'] :
+- 'reel' : HTTPAdapter standard (production) ;
+- 'enregistrement' : appels réels, chaque échange (requête, réponse, durée)
+  ajouté en fin du fichier FICHIER_ECHANGES (une ligne JSON par échange) ;
+- 'rejeu' : réponses lues dans FICHIER_ECHANGES, sans réseau ;
+- 'simulation' : réponses synthétiques des points d'accès connus, sans
+  réseau ni fichier (développement).
+
+En rejeu et en simulation, seul l'envoi sur la connexion est remplacé (pool
+urllib3 dédié) : nouvelles tentatives, backoff, délais et exceptions restent
+ceux d'urllib3 et de requests, comme pour une réponse réelle. Une latence
+(LATENCE_INJECTEE, sinon la durée enregistrée) et des erreurs
+(TAUX_ERREUR_INJECTE, ERREUR_INJECTEE 'statut' ou 'connexion') peuvent être
+injectées, de façon reproductible avec GRAINE.
+"""
+import io
+import json
+import random
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from requests.adapters import DEFAULT_POOLBLOCK, HTTPAdapter
+from urllib3 import PoolManager
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NewConnectionError, ReadTimeoutError
+from urllib3.response import HTTPResponse
+
+TRANSPORTS = ('reel', 'enregistrement', 'rejeu', 'simulation')
+STATUT_ERREUR_INJECTEE = 503
+
+
+def cle_echange(methode, url):
+    """Clé de correspondance d'un échange : méthode et chemin (avec paramètres), hôte exclu"""
+    morceaux = urlsplit(url)
+    chemin = morceaux.path + (f'?{morceaux.query}' if morceaux.query else '')
+    return f'{methode.upper()} {chemin}'
+
+
+def lire_echanges(fichier):
+    """Échanges enregistrés d'un fichier JSON Lines (une ligne par échange)"""
+    with open(fichier, encoding='utf-8') as source:
+        return [json.loads(ligne) for ligne in source if ligne.strip()]
+
+
+class AdaptateurEnregistrement(HTTPAdapter):
+    """Transport réel qui ajoute chaque échange en fin de fichier (JSON Lines)"""
+
+    def __init__(self, fichier, **kwargs):
+        super().__init__(**kwargs)
+        self.fichier = fichier
+        self._verrou = threading.Lock()
+        self._sortie = None
+
+    def send(self, request, **kwargs):
+        debut = time.perf_counter()
+        response = super().send(request, **kwargs)
+        echange = {
+            'cle': cle_echange(request.method, request.url),
+            'statut': response.status_code,
+            'entetes': {nom: valeur for nom, valeur in response.headers.items()
+                        if nom.lower() in ('content-type', 'retry-after')},
+            'corps': response.content.decode('utf-8', errors='replace'),
+            'duree_ms': round((time.perf_counter() - debut) * 1000, 2),
+            'date': datetime.now().isoformat(timespec='seconds'),
+        }
+        ligne = json.dumps(echange, ensure_ascii=False) + '\n'
+        with self._verrou:
+            if self._sortie is None:
+                self._sortie = open(self.fichier, 'a', encoding='utf-8')
+            self._sortie.write(ligne)
+            self._sortie.flush()
+        return response
+
+    def close(self):
+        super().close()
+        with self._verrou:
+            if self._sortie is not None:
+                self._sortie.close()
+                self._sortie = None
+
+
+# =============================================
+# REJEU SANS RÉSEAU
+# =============================================
+
+class _PoolRejeuMixin:
+    """Pool urllib3 dont chaque tentative est servie par l'adaptateur de rejeu, sans connexion"""
+    adaptateur = None
+
+    def _make_request(self, conn, method, url, retries=None, timeout=None, response_conn=None,
+                      preload_content=True, decode_content=True, headers=None, **kwargs):
+        statut, corps, entetes = self.adaptateur.tentative(conn, method, url, headers or {}, timeout)
+        return HTTPResponse(
+            body=io.BytesIO(corps.encode('utf-8')), headers=entetes, status=statut, retries=retries,
+            preload_content=preload_content, decode_content=decode_content, original_response=None,
+            pool=self, connection=response_conn, request_method=method, request_url=url,
+        )
+
+
+class _PoolRejeuHTTP(_PoolRejeuMixin, HTTPConnectionPool):
+    pass
+
+
+class _PoolRejeuHTTPS(_PoolRejeuMixin, HTTPSConnectionPool):
+    pass
+
+
+class _GestionnaireRejeu(PoolManager):
+    def __init__(self, adaptateur, **kwargs):
+        super().__init__(**kwargs)
+        self.adaptateur = adaptateur
+        self.pool_classes_by_scheme = {'http': _PoolRejeuHTTP, 'https': _PoolRejeuHTTPS}
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context)
+        pool.adaptateur = self.adaptateur
+        return pool
+
+
+class AdaptateurRejeu(HTTPAdapter):
+    """
+    Transport sans réseau. reponses : {cle_echange: [échanges] ou fonction(entetes)} ;
+    les échanges d'une même clé sont servis à tour de rôle. Les nouvelles
+    tentatives (max_retries) sont celles d'urllib3.
+    """
+
+    def __init__(self, reponses, latence=None, taux_erreur=0.0, erreur='statut', graine=None, **kwargs):
+        self.reponses = reponses
+        self.latence = latence
+        self.taux_erreur = taux_erreur
+        self.erreur = erreur
+        self._aleatoire = random.Random(graine)
+        self._verrou = threading.Lock()
+        self._positions = {}
+        super().__init__(**kwargs)
+
+    @classmethod
+    def depuis_fichier(cls, fichier, **kwargs):
+        reponses = {}
+        for echange in lire_echanges(fichier):
+            reponses.setdefault(echange['cle'], []).append(echange)
+        return cls(reponses, **kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=DEFAULT_POOLBLOCK, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _GestionnaireRejeu(self, num_pools=connections, maxsize=maxsize, block=block,
+                                              **pool_kwargs)
+
+    def send(self, request, **kwargs):
+        # Aucun proxy : la requête ne quitte pas le processus
+        return super().send(request, **dict(kwargs, proxies=None))
+
+    def _echange(self, conn, methode, url, entetes):
+        cle = cle_echange(methode, url)
+        candidats = self.reponses.get(cle)
+        if not candidats:
+            raise NewConnectionError(conn, f"Aucun échange enregistré pour {cle}")
+        if callable(candidats):
+            return candidats(entetes)
+        with self._verrou:
+            position = self._positions.get(cle, 0)
+            self._positions[cle] = position + 1
+        return candidats[position % len(candidats)]
+
+    def _tirer_erreur(self):
+        if not self.taux_erreur:
+            return False
+        with self._verrou:
+            return self._aleatoire.random() < self.taux_erreur
+
+    def tentative(self, conn, methode, url, entetes, timeout):
+        """(statut, corps, en-têtes) d'une tentative ; lève les erreurs de connexion ou de lecture injectées"""
+        echange = self._echange(conn, methode, url, entetes)
+        latence = self.latence if self.latence is not None else echange.get('duree_ms', 0) / 1000
+        delai_lecture = timeout.read_timeout if timeout is not None else None
+        if self._tirer_erreur():
+            if self.erreur == 'connexion':
+                raise NewConnectionError(conn, "Connexion refusée (erreur injectée)")
+            return (STATUT_ERREUR_INJECTEE, '{"erreur": "Erreur injectée"}',
+                    {'Content-Type': 'application/json', 'Retry-After': '0'})
+        if delai_lecture is not None and latence > delai_lecture:
+            time.sleep(delai_lecture)
+            raise ReadTimeoutError(conn, url, f"Read timed out. (read timeout={delai_lecture})")
+        if latence:
+            time.sleep(latence)
+        return echange['statut'], echange['corps'], echange.get('entetes', {})
+
+
+# =============================================
+# SIMULATION (DÉVELOPPEMENT)
+# =============================================
+
+def _declaration_simulee(entetes):
+    cle = entetes.get('Idempotency-Key')
+    reference = f"REF_{cle[:12].upper()}" if cle else f"REF_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    return {'statut': 200, 'entetes': {'Content-Type': 'application/json'},
+            'corps': json.dumps({'reference': reference, 'message': 'Déclaration simulée (développement)'})}
+
+
+REPONSES_SIMULEES = {
+    'POST /api/declarations/solvabilite': _declaration_simulee,
+    'GET /api/rates/risk-free': [{'statut': 200, 'entetes': {'Content-Type': 'application/json'},
+                                  'corps': json.dumps({'rate': 0.025})}],
+}
+
+
+def creer_adaptateur(configuration, **kwargs):
+    """Adaptateur du transport configuré ; kwargs : paramètres HTTPAdapter (pool, max_retries)"""
+    transport = configuration['TRANSPORT']
+    injection = {
+        'latence': configuration['LATENCE_INJECTEE'],
+        'taux_erreur': configuration['TAUX_ERREUR_INJECTE'],
+        'erreur': configuration['ERREUR_INJECTEE'],
+        'graine': configuration['GRAINE'],
+    }
+    if transport == 'reel':
+        return HTTPAdapter(**kwargs)
+    if transport == 'enregistrement':
+        return AdaptateurEnregistrement(configuration['FICHIER_ECHANGES'], **kwargs)
+    if transport == 'rejeu':
+        return AdaptateurRejeu.depuis_fichier(configuration['FICHIER_ECHANGES'], **injection, **kwargs)
+    if transport == 'simulation':
+        return AdaptateurRejeu(REPONSES_SIMULEES, **injection, **kwargs)
+    raise ValueError(f"Transport inconnu : {transport} (attendu : {', '.join(TRANSPORTS)})")
@@ -0,0 +1,42 @@
+"""
+Moteur de sessions à écritures réduites (SESSION_ENGINE = 'solvabilite_app.sessions').
+
+Basé sur cached_db : lecture depuis le cache, base de données en secours.
+Avec SESSION_SAVE_EVERY_REQUEST, Django enregistre la session à chaque
+requête pour repousser son expiration ; ici, une session non modifiée n'est
+réécrite que si sa dernière écriture date de plus de
+SESSION_INTERVALLE_ECRITURE secondes. Les pages en lecture seule (tableaux de
+bord) ne font donc plus d'UPDATE sur django_session, qui sérialise tout le
+trafic sous SQLite. L'expiration en base peut avoir au plus cet intervalle de
+retard sur celle du cookie.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+INTERVALLE_ECRITURE_DEFAUT = 300
+
+# Horodatage de la dernière écriture, conservé avec les données de la session
+CLE_DERNIERE_ECRITURE = '_derniere_ecriture'
+
+
+class SessionStore(CachedDBStore):
+    """Session cached_db dont les réécritures sans modification sont regroupées"""
+
+    @property
+    def intervalle_ecriture(self):
+        return getattr(settings, 'SESSION_INTERVALLE_ECRITURE', INTERVALLE_ECRITURE_DEFAUT)
+
+    def ecriture_recente(self):
+        derniere_ecriture = (self._session_cache if hasattr(self, '_session_cache') else {}).get(
+            CLE_DERNIERE_ECRITURE
+        )
+        return derniere_ecriture is not None and time.time() - derniere_ecriture < self.intervalle_ecriture
+
+    def save(self, must_create=False):
+        if not must_create and not self.modified and self.session_key and self.ecriture_recente():
+            return
+        # Modification directe : ne marque pas la session comme modifiée
+        self._session[CLE_DERNIERE_ECRITURE] = int(time.time())
+        super().save(must_create)
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import CalculSCR, Compagnie, DonneesSolvabilite
+from .services.cache_indicateurs import cache_indicateurs
+
+
+@receiver([post_save, post_delete], sender=DonneesSolvabilite)
+def invalider_cache_donnees(sender, instance, **kwargs):
+    """Invalide le cache de la compagnie à chaque écriture de ses données"""
+    cache_indicateurs.invalider(instance.compagnie_id)
+
+
+@receiver([post_save, post_delete], sender=CalculSCR)
+def invalider_cache_calcul(sender, instance, **kwargs):
+    """Les calculs récents font partie de la synthèse mise en cache"""
+    try:
+        compagnie_id = instance.donnees.compagnie_id
+    except DonneesSolvabilite.DoesNotExist:
+        return
+    cache_indicateurs.invalider(compagnie_id)
+
+
+@receiver(post_save, sender=Compagnie)
+def invalider_cache_compagnie(sender, instance, created, **kwargs):
+    """Nom, SIREN et type figurent dans les rapports PDF mis en cache"""
+    if not created:
+        cache_indicateurs.invalider(instance.pk)
@@ -1,3 +1,1552 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import requests
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from reportlab.graphics import renderPDF
+from urllib3.util.retry import Retry
+
+from .autorisations import (
+    PERMISSIONS_ROLES, a_permission, limiter_historique, peut_voir_compagnie, permissions_role,
+    restreindre_aux_compagnies
+)
+from .models import (
+    CalculSCR, Compagnie, CourbeTaux, DonneeMarche, DonneesSolvabilite, SoumissionDeclaration, Utilisateur
+)
+from .services.cache_indicateurs import CacheLRU, cache_indicateurs
+from .services.cache_rapports import CacheRapports
+from .services.calcul_lot import traiter_lot
+from .services.courbe_taux import CourbeSmithWilson, actualiser
+from .services.declarations import (
+    LimiteurDebit, _reserver, cle_idempotence, preparer_soumissions, progression, soumettre_declarations
+)
+from .services.metriques import Registre
+from .services.donnees_marche import CacheDonneesMarche, donnees_marche
+from .services.external_apis import (
+    CircuitOuvert, Cloison, CloisonSaturee, Disjoncteur, MarketDataClient, RegulateurAPIClient, fermer_sessions
+)
+from .services.indicateurs import series_ratio_compagnies
+from .services.transport_api import AdaptateurEnregistrement, AdaptateurRejeu, lire_echanges
+from .sessions import SessionStore
+from .utils.echantillonnage import lttb_indices
+from .utils.graphiques_pdf import SEUIL_REGLEMENTAIRE, graphique_historique_ratio, graphique_repartition_modules
+from .utils.injecteur_charge import executer_palier
+from .utils.pdf_generator import MOTEURS, rendre_rapport, statistiques_rendu
+from .utils.rapport_pdf import (
+    NB_POINTS_GRAPHIQUES, BudgetRendu, BudgetRenduDepasse, ContexteRapport, SectionGraphiqueModules,
+    SectionGraphiqueRatio, construire_rapport_pdf
+)
+from .utils.serveur_api_factice import demarrer_serveur_factice
+from .views import COLONNES_EXPORT_HISTORIQUE, calculer_mcr, calculer_scr_standard
+
+
+def creer_compagnie(siren='123456789', **champs):
+    return Compagnie.objects.create(nom=f'Compagnie {siren}', siren=siren, date_creation=date(2000, 1, 1),
+                                    capital_social=1000000, **champs)
+
+
+def ligne_lot(**champs):
+    """Ligne de lot valide (bilan complet, sous-risques absents valant 0)"""
+    ligne = {'fonds_propres': '500', 'passif_technique': '1000', 'prime_annuelle': '200', 'placements': '1500',
+             'immobilisations': '100', 'charges_sinistres': '150', 'date_reference': '2024-12-31'}
+    ligne.update(champs)
+    return ligne
+
+
+def creer_utilisateur(username, role='ACTUAIRE', compagnie=None):
+    return Utilisateur.objects.create_user(username, password='motdepasse', role=role, compagnie=compagnie)
+
+
+# =============================================
+# AUTORISATIONS
+# =============================================
+
+class PermissionsRolesTests(SimpleTestCase):
+    def test_ensembles_par_role(self):
+        for role, permissions in PERMISSIONS_ROLES.items():
+            self.assertEqual(permissions_role(role), frozenset(permissions))
+        self.assertEqual(permissions_role('INCONNU'), frozenset())
+        self.assertIsInstance(permissions_role('ACTUAIRE'), frozenset)
+
+    def test_administrateur_a_toutes_les_permissions(self):
+        admin = permissions_role('ADMIN')
+        for role in PERMISSIONS_ROLES:
+            self.assertLessEqual(permissions_role(role), admin)
+        self.assertIn('envoyer_declarations', admin)
+        self.assertFalse(any('envoyer_declarations' in permissions_role(role) for role in PERMISSIONS_ROLES))
+
+
+class PerimetreDonneesTests(TestCase):
+    def setUp(self):
+        self.compagnie, self.autre = creer_compagnie('111111111'), creer_compagnie('222222222')
+        for compagnie in (self.compagnie, self.autre):
+            for date_reference in (date.today() - timedelta(days=30), date.today() - timedelta(days=800)):
+                donnees = DonneesSolvabilite.objects.create(compagnie=compagnie, date_reference=date_reference,
+                                                            fonds_propres=500, passif_technique=1000)
+                CalculSCR.objects.create(donnees=donnees, resultat_scr=100)
+
+    def test_permissions_memorisees_sur_l_utilisateur(self):
+        utilisateur = creer_utilisateur('client', role='CLIENT')
+        self.assertFalse(a_permission(utilisateur, 'calcul_scr'))
+        Utilisateur.objects.filter(pk=utilisateur.pk).update(role='ACTUAIRE')
+        self.assertFalse(a_permission(utilisateur, 'calcul_scr'))
+        utilisateur.refresh_from_db()
+        self.assertTrue(a_permission(utilisateur, 'calcul_scr'))
+
+    def test_restreindre_aux_compagnies(self):
+        donnees = DonneesSolvabilite.objects.all()
+        calculs = CalculSCR.objects.all()
+        for role in ('ADMIN', 'REGULATEUR'):
+            utilisateur = creer_utilisateur(role.lower(), role=role)
+            self.assertEqual(restreindre_aux_compagnies(donnees, utilisateur).count(), 4)
+        actuaire = creer_utilisateur('actuaire', compagnie=self.compagnie)
+        self.assertEqual(set(restreindre_aux_compagnies(donnees, actuaire).values_list('compagnie_id', flat=True)),
+                         {self.compagnie.pk})
+        self.assertEqual(restreindre_aux_compagnies(calculs, actuaire, 'donnees__compagnie').count(), 2)
+        self.assertFalse(restreindre_aux_compagnies(donnees, creer_utilisateur('sans_compagnie')).exists())
+
+    def test_limiter_historique(self):
+        donnees = DonneesSolvabilite.objects.filter(compagnie=self.compagnie)
+        for role, attendu in (('CLIENT', 1), ('CONSULTANT', 1), ('ACTUAIRE', 2), ('ADMIN', 2)):
+            utilisateur = creer_utilisateur(f'{role.lower()}', role=role, compagnie=self.compagnie)
+            with self.subTest(role=role):
+                self.assertEqual(limiter_historique(donnees, utilisateur, 'date_reference').count(), attendu)
+        client = Utilisateur.objects.get(username='client')
+        calculs = CalculSCR.objects.filter(donnees__compagnie=self.compagnie)
+        self.assertEqual(limiter_historique(calculs, client, 'donnees__date_reference').count(), 1)
+
+    def test_peut_voir_compagnie(self):
+        actuaire = creer_utilisateur('actuaire', compagnie=self.compagnie)
+        self.assertTrue(peut_voir_compagnie(actuaire, self.compagnie.pk))
+        self.assertFalse(peut_voir_compagnie(actuaire, self.autre.pk))
+        self.assertFalse(peut_voir_compagnie(creer_utilisateur('sans_compagnie'), None))
+        self.assertTrue(peut_voir_compagnie(creer_utilisateur('regulateur', role='REGULATEUR'), self.autre.pk))
+
+    def test_api_limitee_a_la_compagnie(self):
+        self.client.force_login(creer_utilisateur('actuaire', compagnie=self.compagnie))
+        reponse = self.client.get(reverse('solvabilite_app:api_indicateurs'), {'champs': 'id,compagnie_siren'})
+        self.assertEqual({ligne['compagnie_siren'] for ligne in reponse.json()['resultats']}, {'111111111'})
+
+    def test_permission_requise(self):
+        self.client.force_login(creer_utilisateur('client', role='CLIENT', compagnie=self.compagnie))
+        reponse = self.client.get(reverse('solvabilite_app:export_rapport_pdf', args=['synthese']))
+        self.assertRedirects(reponse, reverse('solvabilite_app:tableau_de_bord'), fetch_redirect_response=False)
+
+
+# =============================================
+# TOTAUX DES DONNÉES DE SOLVABILITÉ
+# =============================================
+
+class TotauxDonneesTests(TestCase):
+    def setUp(self):
+        DonneesSolvabilite.objects.create(
+            compagnie=creer_compagnie(), date_reference=date(2024, 3, 31), fonds_propres=500,
+            passif_technique=1000, placements=1400, immobilisations=150, scr_marche=100, scr_credit=50,
+            scr_operational=10,
+        )
+
+    def test_annotations_sql(self):
+        donnees = DonneesSolvabilite.objects.with_totals().get()
+        self.assertEqual((donnees.scr_total, donnees.actif_total, donnees.passif_total, donnees.ecart_bilan),
+                         (160, 1550, 1500, 50))
+        self.assertEqual(DonneesSolvabilite.objects.bilan_desequilibre(tolerance=49).count(), 1)
+        self.assertEqual(DonneesSolvabilite.objects.bilan_desequilibre(tolerance=50).count(), 0)
+
+    def test_proprietes_a_jour_apres_modification(self):
+        donnees = DonneesSolvabilite.objects.with_totals().get()
+        donnees.scr_credit = 150
+        donnees.placements = 1350
+        self.assertEqual(donnees.total_scr, 260)
+        self.assertEqual(donnees.equilibre_bilan, 0)
+        donnees.save()
+        self.assertEqual(donnees.total_actif, 1500)
+
+
+# =============================================
+# CACHE DES INDICATEURS
+# =============================================
+
+class CacheLRUTests(SimpleTestCase):
+    def test_entrees_expirees(self):
+        lru = CacheLRU(10, ttl=30)
+        with mock.patch('solvabilite_app.services.cache_indicateurs.time.monotonic', return_value=1000):
+            lru.set('cle', 'valeur')
+        with mock.patch('solvabilite_app.services.cache_indicateurs.time.monotonic', return_value=1029):
+            self.assertEqual(lru.get('cle'), 'valeur')
+        with mock.patch('solvabilite_app.services.cache_indicateurs.time.monotonic', return_value=1030):
+            self.assertIsNone(lru.get('cle'))
+        self.assertEqual(len(lru), 0)
+
+    def test_plus_ancienne_entree_evincee(self):
+        lru = CacheLRU(2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+
+
+class InvalidationCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        cache_indicateurs.reinitialiser()
+        self.compagnie = creer_compagnie()
+        self.donnees = DonneesSolvabilite.objects.create(compagnie=self.compagnie, date_reference=date(2024, 3, 31),
+                                                         fonds_propres=500, passif_technique=1000)
+        self.calcul = CalculSCR.objects.create(donnees=self.donnees, methode_calcul='STANDARD', resultat_scr=250)
+
+    def assertInvalide(self, ecriture):
+        """L'écriture change la version de la compagnie et force la reconstruction de la valeur en cache"""
+        version = cache_indicateurs.version(self.compagnie.pk)
+        construire = mock.Mock(return_value='synthese')
+        cache_indicateurs.obtenir(self.compagnie.pk, 'synthese', construire)
+        ecriture()
+        self.assertNotEqual(cache_indicateurs.version(self.compagnie.pk), version)
+        cache_indicateurs.obtenir(self.compagnie.pk, 'synthese', construire)
+        self.assertEqual(construire.call_count, 2)
+
+    def test_valeur_servie_sans_ecriture(self):
+        construire = mock.Mock(return_value='synthese')
+        for _ in range(3):
+            cache_indicateurs.obtenir(self.compagnie.pk, 'synthese', construire)
+        self.assertEqual(construire.call_count, 1)
+
+    def test_sauvegarde_des_donnees(self):
+        self.assertInvalide(self.donnees.save)
+
+    def test_suppression_des_donnees(self):
+        self.assertInvalide(self.donnees.delete)
+
+    def test_sauvegarde_d_un_calcul(self):
+        self.assertInvalide(self.calcul.save)
+
+    def test_suppression_d_un_calcul(self):
+        self.assertInvalide(self.calcul.delete)
+
+
+# =============================================
+# SESSIONS
+# =============================================
+
+@override_settings(SESSION_INTERVALLE_ECRITURE=300)
+class SessionStoreTests(TestCase):
+    def setUp(self):
+        session = SessionStore()
+        session['panier'] = 'scr'
+        session.save()
+        self.cle = session.session_key
+
+    def ecritures(self, modifier=False):
+        """Requêtes d'écriture sur django_session d'un enregistrement, comme en fin de requête"""
+        session = SessionStore(self.cle)
+        self.assertEqual(session['panier'], 'scr')
+        if modifier:
+            session['panier'] = 'mcr'
+        with CaptureQueriesContext(connection) as requetes:
+            session.save()
+        return [requete['sql'] for requete in requetes
+                if 'django_session' in requete['sql'] and not requete['sql'].startswith('SELECT')]
+
+    def test_session_non_modifiee_pas_reecrite(self):
+        self.assertEqual(self.ecritures(), [])
+
+    def test_session_modifiee_enregistree(self):
+        self.assertTrue(self.ecritures(modifier=True))
+        self.assertEqual(SessionStore(self.cle)['panier'], 'mcr')
+
+    def test_session_reecrite_apres_l_intervalle(self):
+        with override_settings(SESSION_INTERVALLE_ECRITURE=0):
+            self.assertTrue(self.ecritures())
+
+
+# =============================================
+# API PAGINÉES
+# =============================================
+
+class ApiIndicateursPaginationTests(TestCase):
+    def setUp(self):
+        compagnie = creer_compagnie()
+        self.donnees = [
+            DonneesSolvabilite.objects.create(compagnie=compagnie, date_reference=date(2024, mois, 1),
+                                              fonds_propres=500, passif_technique=1000)
+            for mois in range(1, 6)
+        ]
+        self.client.force_login(creer_utilisateur('admin', role='ADMIN'))
+        self.url = reverse('solvabilite_app:api_indicateurs')
+
+    def page(self, **parametres):
+        reponse = self.client.get(self.url, {'limite': 2, 'champs': 'date_reference', **parametres})
+        self.assertEqual(reponse.status_code, 200)
+        return reponse.json()
+
+    def dates(self, page):
+        return [ligne['date_reference'] for ligne in page['resultats']]
+
+    def test_curseurs_suivant_et_precedent(self):
+        premiere = self.page()
+        self.assertEqual(self.dates(premiere), ['2024-05-01', '2024-04-01'])
+        self.assertIsNone(premiere['curseur_precedent'])
+
+        deuxieme = self.page(curseur=premiere['curseur_suivant'])
+        self.assertEqual(self.dates(deuxieme), ['2024-03-01', '2024-02-01'])
+        derniere = self.page(curseur=deuxieme['curseur_suivant'])
+        self.assertEqual(self.dates(derniere), ['2024-01-01'])
+        self.assertIsNone(derniere['curseur_suivant'])
+
+        retour = self.page(avant=derniere['curseur_precedent'])
+        self.assertEqual(self.dates(retour), self.dates(deuxieme))
+        retour = self.page(avant=retour['curseur_precedent'])
+        self.assertEqual(self.dates(retour), self.dates(premiere))
+        self.assertIsNone(retour['curseur_precedent'])
+        self.assertEqual(retour['curseur_suivant'], premiere['curseur_suivant'])
+
+    def test_curseur_invalide(self):
+        for curseur in ('pas-un-curseur', 'WzFd'):
+            reponse = self.client.get(self.url, {'curseur': curseur})
+            self.assertEqual(reponse.status_code, 400)
+            self.assertIn('erreur', reponse.json())
+
+    def test_get_conditionnel(self):
+        reponse = self.client.get(self.url)
+        self.assertEqual(reponse.status_code, 200)
+        etag = reponse['ETag']
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        DonneesSolvabilite.objects.create(compagnie=self.donnees[0].compagnie, date_reference=date(2024, 6, 1))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_modification_change_l_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        donnees = self.donnees[0]
+        donnees.fonds_propres = 900
+        donnees.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+# =============================================
+# EXPORT DE L'HISTORIQUE
+# =============================================
+
+class ExportHistoriqueTests(TestCase):
+    url = reverse('solvabilite_app:export_historique')
+
+    def setUp(self):
+        self.compagnie, autre = creer_compagnie('111111111'), creer_compagnie('222222222')
+        for compagnie in (self.compagnie, autre):
+            for jours in (30, 60, 800):
+                DonneesSolvabilite.objects.create(compagnie=compagnie, fonds_propres=500, passif_technique=1000,
+                                                  date_reference=date.today() - timedelta(days=jours))
+
+    def exporter(self, parametres=None, role='ADMIN', compagnie=None):
+        self.client.force_login(creer_utilisateur(role.lower(), role=role, compagnie=compagnie))
+        return self.client.get(self.url, parametres or {})
+
+    def test_csv(self):
+        reponse = self.exporter()
+        self.assertIsInstance(reponse, StreamingHttpResponse)
+        self.assertEqual(reponse['Content-Type'], 'text/csv; charset=utf-8')
+        lignes = list(csv.reader(io.StringIO(b''.join(reponse.streaming_content).decode('utf-8'))))
+        self.assertEqual(lignes[0], [entete for entete, _ in COLONNES_EXPORT_HISTORIQUE])
+        self.assertEqual(len(lignes), 7)
+
+    def test_jsonl(self):
+        reponse = self.exporter({'format': 'jsonl', 'compagnie': '111111111'})
+        self.assertEqual(reponse['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lignes = [json.loads(ligne) for ligne in b''.join(reponse.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual(len(lignes), 3)
+        self.assertEqual({ligne['compagnie_siren'] for ligne in lignes}, {'111111111'})
+        self.assertEqual(lignes[0]['fonds_propres'], 500.0)
+
+    def test_gzip(self):
+        brut = b''.join(self.exporter().streaming_content)
+        reponse = self.client.get(self.url, {'gzip': '1'})
+        self.assertEqual(reponse['Content-Type'], 'application/gzip')
+        self.assertTrue(reponse['Content-Disposition'].endswith('.csv.gz"'))
+        self.assertEqual(gzip.decompress(b''.join(reponse.streaming_content)), brut)
+
+    def test_perimetre_par_role(self):
+        contenu = b''.join(self.exporter({'format': 'jsonl'}, 'ACTUAIRE', self.compagnie).streaming_content)
+        self.assertEqual(len(contenu.splitlines()), 3)
+        # Consultant : douze derniers mois seulement
+        contenu = b''.join(self.exporter({'format': 'jsonl'}, 'CONSULTANT', self.compagnie).streaming_content)
+        self.assertEqual(len(contenu.splitlines()), 2)
+        self.assertEqual(self.exporter(role='CLIENT', compagnie=self.compagnie).status_code, 302)
+
+    def test_lignes_lues_pendant_l_envoi(self):
+        self.client.force_login(creer_utilisateur('admin', role='ADMIN'))
+        with CaptureQueriesContext(connection) as requetes_vue:
+            reponse = self.client.get(self.url)
+        with CaptureQueriesContext(connection) as requetes_flux:
+            b''.join(reponse.streaming_content)
+        table = DonneesSolvabilite._meta.db_table
+        self.assertFalse(any(table in requete['sql'] for requete in requetes_vue.captured_queries))
+        self.assertTrue(any(table in requete['sql'] for requete in requetes_flux.captured_queries))
+
+    def test_parametres_invalides(self):
+        self.assertEqual(self.exporter({'format': 'xlsx'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'date_debut': '31/12/2024'}).status_code, 400)
+
+
+class HistoriqueCalculsTests(TestCase):
+    url = reverse('solvabilite_app:historique')
+
+    def setUp(self):
+        compagnie = creer_compagnie()
+        donnees = DonneesSolvabilite.objects.create(compagnie=compagnie, date_reference=date(2024, 12, 31),
+                                                    fonds_propres=500, passif_technique=1000)
+        self.calculs = [CalculSCR.objects.create(donnees=donnees, resultat_scr=100 + rang) for rang in range(5)]
+        # Trois calculs à la même date : seul l'id les départage
+        meme_date = timezone.now() - timedelta(days=1)
+        CalculSCR.objects.filter(pk__in=[calcul.pk for calcul in self.calculs[1:4]]).update(date_calcul=meme_date)
+        CalculSCR.objects.filter(pk=self.calculs[0].pk).update(date_calcul=meme_date - timedelta(days=1))
+        self.client.force_login(creer_utilisateur('actuaire', compagnie=compagnie))
+        taille = mock.patch('solvabilite_app.views.TAILLE_PAGE_HISTORIQUE', 2)
+        taille.start()
+        self.addCleanup(taille.stop)
+
+    def page(self, curseur=None):
+        reponse = self.client.get(self.url, {'curseur': curseur} if curseur else {})
+        return [calcul.pk for calcul in reponse.context['calculs']], reponse.context['curseur_suivant'], reponse
+
+    def test_egalites_sur_date_calcul(self):
+        ids = [calcul.pk for calcul in self.calculs]
+        vus = []
+        curseur = None
+        while True:
+            page, curseur, _ = self.page(curseur)
+            vus.append(page)
+            if curseur is None:
+                break
+        # Du plus récent au plus ancien, (date_calcul, id) décroissants, sans doublon ni oubli
+        self.assertEqual(vus, [[ids[4], ids[3]], [ids[2], ids[1]], [ids[0]]])
+
+    def test_derniere_page_pleine_sans_suite(self):
+        CalculSCR.objects.filter(pk=self.calculs[0].pk).delete()
+        _, curseur, _ = self.page()
+        page, curseur, reponse = self.page(curseur)
+        self.assertEqual(len(page), 2)
+        self.assertIsNone(curseur)
+        self.assertFalse(reponse.context['premiere_page'])
+
+    def test_curseur_invalide(self):
+        page, curseur, reponse = self.page('pas-un-curseur')
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(page, [self.calculs[4].pk, self.calculs[3].pk])
+        self.assertIsNotNone(curseur)
+        self.assertTrue(reponse.context['premiere_page'])
+        messages = [str(message) for message in reponse.context['messages']]
+        self.assertTrue(any(message.startswith('Lien de pagination invalide') for message in messages))
+
+
+# =============================================
+# RAPPORTS PDF
+# =============================================
+
+class ExportRapportPdfTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        reglages = override_settings(MEDIA_ROOT=media.name)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.client.force_login(creer_utilisateur('actuaire', compagnie=creer_compagnie()))
+
+    def test_type_connu(self):
+        reponse = self.client.get(reverse('solvabilite_app:export_rapport_pdf', args=['synthese']))
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(reponse.streaming_content).startswith(b'%PDF'))
+
+    def test_type_inconnu_ni_rendu_ni_mis_en_cache(self):
+        with mock.patch('solvabilite_app.views.cache_rapports.ouvrir') as ouvrir:
+            reponse = self.client.get(reverse('solvabilite_app:export_rapport_pdf', args=['inconnu']))
+        self.assertEqual(reponse.status_code, 404)
+        ouvrir.assert_not_called()
+
+    def telecharger(self, **entetes):
+        reponse = self.client.get(reverse('solvabilite_app:export_rapport_pdf', args=['synthese']), **entetes)
+        if reponse.status_code == 200:
+            b''.join(reponse.streaming_content)
+        return reponse
+
+    def test_rapport_resservi_depuis_le_disque(self):
+        with mock.patch('solvabilite_app.views.rendre_rapport', wraps=rendre_rapport) as rendu:
+            premiere = self.telecharger()
+            seconde = self.telecharger()
+            conditionnelle = self.telecharger(HTTP_IF_NONE_MATCH=premiere['ETag'])
+        self.assertEqual(rendu.call_count, 1)
+        self.assertEqual(seconde['ETag'], premiere['ETag'])
+        self.assertEqual(conditionnelle.status_code, 304)
+
+    def test_nouveau_rendu_apres_ecriture_sans_invalidation_locale(self):
+        # Écriture faite par un autre worker : la version locale du cache ne change pas
+        compagnie = Compagnie.objects.get()
+        with mock.patch('solvabilite_app.signals.cache_indicateurs.invalider'):
+            donnees = DonneesSolvabilite.objects.create(compagnie=compagnie, date_reference=date(2024, 3, 31),
+                                                        fonds_propres=500, passif_technique=1000)
+        premiere = self.telecharger()
+        with mock.patch('solvabilite_app.signals.cache_indicateurs.invalider'):
+            donnees.fonds_propres = 800
+            donnees.save()
+        with mock.patch('solvabilite_app.views.rendre_rapport', wraps=rendre_rapport) as rendu:
+            seconde = self.telecharger(HTTP_IF_NONE_MATCH=premiere['ETag'])
+        self.assertEqual(seconde.status_code, 200)
+        self.assertNotEqual(seconde['ETag'], premiere['ETag'])
+        self.assertEqual(rendu.call_args.args[2].fonds_propres, 800)
+
+
+class CacheRapportsTests(SimpleTestCase):
+    def setUp(self):
+        repertoire = tempfile.TemporaryDirectory()
+        self.addCleanup(repertoire.cleanup)
+        reglages = override_settings(SOLVABILITE_RAPPORTS_CACHE={'REPERTOIRE': repertoire.name, 'TAILLE_MAX': 250})
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.cache = CacheRapports()
+
+    def lire(self, cle, contenu=b'%PDF'):
+        with self.cache.ouvrir(cle, lambda: contenu) as fichier:
+            return fichier.read()
+
+    def test_rendus_simultanes_coalesces(self):
+        appels = []
+
+        def generer():
+            appels.append(1)
+            time.sleep(0.2)
+            return b'%PDF-rendu'
+
+        resultats = []
+
+        def demander():
+            with self.cache.ouvrir('cle', generer) as fichier:
+                resultats.append(fichier.read())
+
+        threads = [threading.Thread(target=demander) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(appels), 1)
+        self.assertEqual(resultats, [b'%PDF-rendu'] * 5)
+        stats = self.cache.statistiques()
+        self.assertEqual((stats['rendus'], stats['succes_apres_attente']), (1, 4))
+
+    def test_eviction_du_moins_recemment_servi(self):
+        for position, cle in enumerate(['a', 'b']):
+            self.lire(cle, b'x' * 100)
+            os.utime(self.cache.repertoire / f'{cle}.pdf', (1000 + position, 1000 + position))
+        self.lire('c', b'x' * 100)
+        restants = sorted(chemin.stem for chemin in self.cache.repertoire.glob('*.pdf'))
+        self.assertEqual(restants, ['b', 'c'])
+        self.assertEqual(self.cache.statistiques()['evictions'], 1)
+
+
+class RenduRapportTests(TestCase):
+    def setUp(self):
+        self.compagnie = creer_compagnie()
+        self.donnees = DonneesSolvabilite.objects.create(compagnie=self.compagnie, date_reference=date(2024, 3, 31),
+                                                         fonds_propres=500, passif_technique=1000)
+        statistiques_rendu.reinitialiser()
+        self.addCleanup(statistiques_rendu.reinitialiser)
+
+    def rendre(self, **options):
+        return rendre_rapport('synthese', self.compagnie, self.donnees, **options)
+
+    @staticmethod
+    def conversion_factice(pages):
+        """Remplace pisa.CreatePDF : écrit un PDF d'autant de pages"""
+        def creer_pdf(source, dest, encoding):
+            dest.write(b'%PDF-1.4\n' + b'<< /Type /Page >>\n' * pages)
+            return mock.Mock(err=0)
+        return mock.patch('xhtml2pdf.pisa.CreatePDF', side_effect=creer_pdf)
+
+    def test_moteur_de_secours_apres_echec(self):
+        with mock.patch.object(MOTEURS['xhtml2pdf'], 'rendre', side_effect=RuntimeError('conversion')), \
+                self.assertLogs('solvabilite_app.utils.pdf_generator', 'WARNING'):
+            pdf = self.rendre(moteur='xhtml2pdf', secours='reportlab')
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        stats = statistiques_rendu.statistiques()
+        self.assertEqual(stats['xhtml2pdf']['echecs'], 1)
+        self.assertEqual(stats['reportlab']['rendus'], 1)
+
+    def test_sans_secours_erreur_propagee(self):
+        with mock.patch.object(MOTEURS['xhtml2pdf'], 'rendre', side_effect=RuntimeError('conversion')):
+            with self.assertRaises(RuntimeError):
+                self.rendre(moteur='xhtml2pdf', secours='')
+        self.assertNotIn('reportlab', statistiques_rendu.statistiques())
+
+    def test_moteur_inconnu(self):
+        with self.assertRaises(ValueError):
+            self.rendre(moteur='inconnu')
+
+    def test_budget_pages_reportlab(self):
+        with self.assertRaises(BudgetRenduDepasse):
+            self.rendre(moteur='reportlab', secours='', budget=BudgetRendu(pages_max=0))
+        self.assertEqual(statistiques_rendu.statistiques()['reportlab']['budgets_depasses'], 1)
+
+    def test_budget_duree_reportlab(self):
+        with self.assertRaises(BudgetRenduDepasse):
+            self.rendre(moteur='reportlab', secours='', budget=BudgetRendu(duree_max=0))
+
+    def test_budget_pages_xhtml2pdf_verifie_apres_conversion(self):
+        with self.conversion_factice(pages=3) as conversion:
+            with self.assertRaisesRegex(BudgetRenduDepasse, 'plus de 2 pages'):
+                self.rendre(moteur='xhtml2pdf', secours='', budget=BudgetRendu(pages_max=2))
+        conversion.assert_called_once()
+        self.assertEqual(statistiques_rendu.statistiques()['xhtml2pdf']['budgets_depasses'], 1)
+
+    def test_budget_xhtml2pdf_depasse_puis_secours(self):
+        with self.conversion_factice(pages=3), self.assertLogs('solvabilite_app.utils.pdf_generator', 'WARNING'):
+            pdf = self.rendre(moteur='xhtml2pdf', secours='reportlab', budget=BudgetRendu(pages_max=2))
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertEqual(statistiques_rendu.statistiques()['reportlab']['rendus'], 1)
+
+    def test_budget_duree_xhtml2pdf_verifie_avant_conversion(self):
+        with self.conversion_factice(pages=1) as conversion:
+            with self.assertRaises(BudgetRenduDepasse):
+                self.rendre(moteur='xhtml2pdf', secours='', budget=BudgetRendu(duree_max=0))
+        conversion.assert_not_called()
+
+    def test_pages_xhtml2pdf_dans_le_budget(self):
+        with self.conversion_factice(pages=2):
+            pdf = self.rendre(moteur='xhtml2pdf', secours='', budget=BudgetRendu(pages_max=2))
+        self.assertEqual(pdf.count(b'/Type /Page'), 2)
+
+
+class GenererRapportsTests(TestCase):
+    def setUp(self):
+        repertoire = tempfile.TemporaryDirectory()
+        self.addCleanup(repertoire.cleanup)
+        self.repertoire = repertoire.name
+        for siren, fonds_propres in (('111111111', 500), ('222222222', 900)):
+            compagnie = creer_compagnie(siren)
+            for mois in (3, 6):
+                DonneesSolvabilite.objects.create(compagnie=compagnie, date_reference=date(2024, mois, 30),
+                                                  fonds_propres=fonds_propres, passif_technique=1000)
+
+    def generer(self, *arguments):
+        sortie = io.StringIO()
+        call_command('generer_rapports', *arguments, '--processus', '0', stdout=sortie)
+        return sortie.getvalue()
+
+    def test_repertoire_un_rapport_par_compagnie_et_type(self):
+        journal = self.generer('--sortie', self.repertoire, '--types', 'synthese', 'risques')
+        fichiers = sorted(chemin.parent.name for chemin in Path(self.repertoire).glob('*/*.pdf'))
+        self.assertEqual(fichiers, ['111111111'] * 2 + ['222222222'] * 2)
+        self.assertIn('4 rapports pour 2 compagnies', journal)
+
+    def test_archive_zip_limitee_aux_compagnies_demandees(self):
+        archive = os.path.join(self.repertoire, 'rapports.zip')
+        self.generer('--sortie', archive, '--types', 'synthese', '--compagnies', '222222222')
+        with zipfile.ZipFile(archive) as fichier:
+            noms = fichier.namelist()
+            self.assertEqual(len(noms), 1)
+            self.assertTrue(noms[0].startswith('222222222/'))
+            self.assertTrue(fichier.read(noms[0]).startswith(b'%PDF'))
+
+    def test_pack_un_pdf_par_type(self):
+        journal = self.generer('--sortie', self.repertoire, '--types', 'synthese', '--pack')
+        packs = list(Path(self.repertoire).glob('pack_rapports_synthese_*.pdf'))
+        self.assertEqual(len(packs), 1)
+        self.assertTrue(packs[0].read_bytes().startswith(b'%PDF'))
+        self.assertIn('1 packs pour 2 compagnies', journal)
+
+    def test_pack_reserve_au_moteur_reportlab(self):
+        with self.assertRaises(CommandError):
+            self.generer('--sortie', self.repertoire, '--pack', '--moteur', 'xhtml2pdf')
+
+    def test_aucune_compagnie(self):
+        with self.assertRaises(CommandError):
+            self.generer('--sortie', self.repertoire, '--compagnies', '999999999')
+
+
+class GraphiquesPdfTests(TestCase):
+    def setUp(self):
+        self.compagnie = creer_compagnie()
+        for mois in range(1, 13):
+            self.donnees = DonneesSolvabilite.objects.create(
+                compagnie=self.compagnie, date_reference=date(2023, mois, 28), fonds_propres=400 + 10 * mois,
+                passif_technique=1000, risque_taux=100, mortalite=50, risque_primes=0,
+            )
+
+    def test_historique_ratio_avec_seuil(self):
+        dessin = graphique_historique_ratio(['2023-01-31', '2023-06-30', '2023-12-31'], [80.0, 120.0, 150.0])
+        courbe = dessin.contents[0]
+        self.assertEqual(len(courbe.data), 2)
+        self.assertEqual([point[1] for point in courbe.data[1]], [SEUIL_REGLEMENTAIRE] * 2)
+        self.assertGreater(courbe.yValueAxis.valueMax, 150)
+        self.assertTrue(renderPDF.drawToString(dessin).startswith(b'%PDF'))
+
+    def test_repartition_modules_sans_montants_nuls(self):
+        camembert = graphique_repartition_modules([('Marché', 300.0), ('Crédit', 0.0), ('Vie', 100.0)]).contents[0]
+        self.assertEqual(camembert.data, [300.0, 100.0])
+        self.assertEqual(camembert.labels, ['Marché 75.0 %', 'Vie 25.0 %'])
+
+    def test_series_ratio_reduites_en_une_requete(self):
+        autre = creer_compagnie('987654321')
+        DonneesSolvabilite.objects.create(compagnie=autre, date_reference=date(2023, 6, 30), fonds_propres=500,
+                                          passif_technique=1000)
+        with self.assertNumQueries(1):
+            series = series_ratio_compagnies([self.compagnie.pk, autre.pk], 5)
+        ratios = series[self.compagnie.pk]['series']['ratios']
+        self.assertEqual(len(ratios['dates']), 5)
+        self.assertEqual((ratios['dates'][0], ratios['dates'][-1]), ('2023-01-28', '2023-12-28'))
+        self.assertEqual(len(series[autre.pk]['series']['ratios']['dates']), 1)
+
+    def test_sections_graphiques_applicables(self):
+        series = series_ratio_compagnies([self.compagnie.pk], NB_POINTS_GRAPHIQUES)[self.compagnie.pk]
+        contexte = ContexteRapport('synthese', self.compagnie, self.donnees, series=series)
+        self.assertTrue(SectionGraphiqueRatio().applicable(contexte))
+        self.assertTrue(SectionGraphiqueModules().applicable(contexte))
+        pdf = construire_rapport_pdf('synthese', self.compagnie, self.donnees, series=series)
+        self.assertTrue(pdf.startswith(b'%PDF'))
+
+    def test_sections_graphiques_ignorees_sans_donnees_suffisantes(self):
+        donnees = DonneesSolvabilite(compagnie=self.compagnie, date_reference=date(2024, 1, 31), fonds_propres=500,
+                                     passif_technique=1000)
+        serie_courte = {'series': {'ratios': {'dates': ['2024-01-31'], 'valeurs': [120.0]}}}
+        contexte = ContexteRapport('synthese', self.compagnie, donnees, series=serie_courte)
+        self.assertFalse(SectionGraphiqueRatio().applicable(contexte))
+        self.assertFalse(SectionGraphiqueModules().applicable(contexte))
+
+
+# =============================================
+# GRAPHIQUES (LTTB)
+# =============================================
+
+class LttbTests(SimpleTestCase):
+    def setUp(self):
+        self.x = np.arange(1000)
+        self.y = np.sin(self.x / 50) + np.random.default_rng(0).normal(0, 0.1, 1000)
+
+    def test_nombre_de_points_et_extremites(self):
+        for nb_points in (3, 10, 250, 999):
+            indices = lttb_indices(self.x, self.y, nb_points)
+            self.assertEqual(len(indices), nb_points)
+            self.assertEqual(indices[0], 0)
+            self.assertEqual(indices[-1], 999)
+            self.assertTrue(np.all(np.diff(indices) > 0))
+
+    def test_serie_courte_inchangee(self):
+        for nb_points in (1000, 5000):
+            np.testing.assert_array_equal(lttb_indices(self.x, self.y, nb_points), np.arange(1000))
+
+    def test_pic_conserve(self):
+        y = np.zeros(1000)
+        y[437] = 10
+        self.assertIn(437, lttb_indices(self.x, y, 20))
+
+
+class ApiGraphiquesTests(TestCase):
+    def setUp(self):
+        self.client.force_login(creer_utilisateur('actuaire', compagnie=creer_compagnie()))
+        self.url = reverse('solvabilite_app:api_graphiques')
+
+    def test_nombre_de_points_borne(self):
+        for demandes, attendus in (('1', 3), ('3', 3), ('500', 500), ('2000', 2000), ('100000', 2000)):
+            reponse = self.client.get(self.url, {'points': demandes})
+            self.assertEqual(reponse.status_code, 200)
+            self.assertEqual(reponse.json()['points'], attendus)
+
+    def test_nombre_de_points_invalide(self):
+        self.assertEqual(self.client.get(self.url, {'points': 'beaucoup'}).status_code, 400)
+
+
+# =============================================
+# COURBE DES TAUX (SMITH-WILSON)
+# =============================================
+
+class CourbeSmithWilsonTests(SimpleTestCase):
+    maturites = [1, 2, 3, 5, 10, 20]
+    taux = [0.030, 0.031, 0.0315, 0.032, 0.029, 0.027]
+
+    def setUp(self):
+        self.courbe = CourbeSmithWilson(self.maturites, self.taux, ufr=0.033, alpha=0.1)
+
+    def test_taux_observes_retrouves(self):
+        np.testing.assert_allclose(self.courbe.taux_zero_coupon(self.maturites), self.taux, atol=1e-12)
+        # Entre deux points de grille : interpolation proche du calcul exact
+        maturites = np.array([2.5, 7.3, 17.9])
+        np.testing.assert_allclose(self.courbe.facteurs_actualisation(maturites),
+                                   self.courbe._facteurs_exacts(maturites), rtol=1e-5)
+
+    def test_forward_converge_vers_ufr(self):
+        forwards = self.courbe.taux_forward([20, 60, 100, 149, 200])
+        self.assertTrue(np.all(np.diff(np.abs(forwards - 0.033)) < 0))
+        self.assertAlmostEqual(forwards[2], 0.033, delta=1e-4)
+        self.assertAlmostEqual(forwards[-1], 0.033, places=12)
+
+    def test_validation_des_entrees(self):
+        for maturites, taux in [([], []), ([1, 2], [0.03]), ([2, 1], [0.03, 0.03]), ([0, 1], [0.03, 0.03]),
+                                ([1, float('nan')], [0.03, 0.03]), ([[1, 2]], [[0.03, 0.03]])]:
+            with self.subTest(maturites=maturites), self.assertRaises(ValueError):
+                CourbeSmithWilson(maturites, taux, ufr=0.033, alpha=0.1)
+        with self.assertRaises(ValueError):
+            CourbeSmithWilson(self.maturites, self.taux, ufr=0.033, alpha=0)
+
+    def test_formes_actualiser(self):
+        facteurs = self.courbe.facteurs_actualisation([1, 2, 3])
+        flux = np.arange(24, dtype=float).reshape(2, 4, 3)
+        self.assertAlmostEqual(self.courbe.actualiser([100, 100, 100]), 100 * facteurs.sum())
+        self.assertEqual(self.courbe.actualiser(flux[0]).shape, (4,))
+        resultats = self.courbe.actualiser(flux)
+        self.assertEqual(resultats.shape, (2, 4))
+        np.testing.assert_allclose(resultats, (flux * facteurs).sum(axis=-1))
+        # Échéancier propre à chaque ligne
+        maturites = np.broadcast_to([0.5, 1.5, 2.5], flux.shape) + np.arange(4)[:, np.newaxis]
+        attendu = (flux * self.courbe.facteurs_actualisation(maturites)).sum(axis=-1)
+        np.testing.assert_allclose(self.courbe.actualiser(flux, maturites), attendu)
+        self.assertEqual(self.courbe.facteurs_actualisation(5.0).shape, ())
+
+
+class CourbeTauxBaseTests(TestCase):
+    def test_courbe_de_la_date(self):
+        for annee, taux in ((2023, 0.02), (2024, 0.03)):
+            CourbeTaux.objects.create(devise='EUR', date_reference=date(annee, 12, 31), maturites=[1, 10],
+                                      taux=[taux, taux], ufr=0.033)
+        self.assertAlmostEqual(actualiser([103], date_reference=date(2024, 12, 31)), 100)
+        self.assertAlmostEqual(actualiser([102], date_reference=date(2024, 6, 30)), 100)
+        with self.assertRaises(CourbeTaux.DoesNotExist):
+            actualiser([100], devise='USD')
+
+
+# =============================================
+# CALCUL PAR LOTS
+# =============================================
+
+class ApiCalculLotTests(TestCase):
+    def setUp(self):
+        self.compagnie = creer_compagnie()
+        self.client.force_login(creer_utilisateur('actuaire', compagnie=self.compagnie))
+
+    def test_lot_valide_enregistre_les_lignes(self):
+        lignes = [ligne_lot(risque_taux='40', mortalite='30'),
+                  ligne_lot(risque_primes='250', date_reference='2024-09-30')]
+        reponse = self.client.post(reverse('solvabilite_app:api_calcul_lot'), json.dumps(lignes),
+                                   content_type='application/json')
+
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.json()['nb_enregistres'], 2)
+        self.assertEqual(DonneesSolvabilite.objects.filter(compagnie=self.compagnie).count(), 2)
+        self.assertEqual(CalculSCR.objects.filter(methode_calcul='AVANCE').count(), 2)
+
+
+# =============================================
+# VUES ASYNCHRONES
+# =============================================
+
+class VuesAsyncTests(TestCase):
+    def test_non_servies_par_defaut(self):
+        self.client.force_login(creer_utilisateur('actuaire'))
+        self.assertEqual(self.client.get('/solvabilite/async/tableau-de-bord/').status_code, 404)
+
+
+# =============================================
+# FLUX SSE
+# =============================================
+
+class FluxIndicateursTests(TestCase):
+    def setUp(self):
+        self.compagnie = creer_compagnie()
+        self.utilisateur = creer_utilisateur('actuaire', compagnie=self.compagnie)
+        self.client.force_login(self.utilisateur)
+        self.url = reverse('solvabilite_app:flux_indicateurs', args=[self.compagnie.pk])
+
+    def lire(self, **entetes):
+        return b''.join(self.client.get(self.url, **entetes).streaming_content).decode()
+
+    def test_flux_wsgi_se_ferme_apres_la_position_initiale(self):
+        self.assertEqual(self.lire(), 'retry: 15000\n\nid: 0\n\n')
+
+    def test_reconnexion_recoit_les_calculs_manques(self):
+        traiter_lot(self.utilisateur, [ligne_lot(risque_taux='200')])
+        calcul = CalculSCR.objects.get()
+
+        contenu = self.lire(HTTP_LAST_EVENT_ID='0')
+        self.assertIn(f'id: {calcul.pk}\nevent: calcul\n', contenu)
+
+
+class TraiterLotTests(TestCase):
+    def setUp(self):
+        self.compagnie = creer_compagnie()
+        self.utilisateur = creer_utilisateur('actuaire', compagnie=self.compagnie)
+
+    def test_lot_mixte(self):
+        lignes = [
+            ligne_lot(risque_taux='120', longevite='80'),
+            ligne_lot(fonds_propres='abc'),
+            ligne_lot(passif_technique=''),
+            'pas une ligne',
+            ligne_lot(compagnie='999999999', risque_primes='150'),
+            ligne_lot(risque_primes='150', date_reference='2024-06-30'),
+        ]
+        rapport = traiter_lot(self.utilisateur, lignes)
+
+        self.assertEqual(rapport['nb_lignes'], 6)
+        self.assertEqual([resultat['ligne'] for resultat in rapport['resultats']], [1, 6])
+        erreurs = {erreur['ligne']: erreur['erreurs'] for erreur in rapport['erreurs']}
+        self.assertEqual(sorted(erreurs), [2, 3, 4, 5])
+        self.assertIn('fonds_propres', erreurs[2])
+        self.assertIn('passif_technique', erreurs[3])
+        self.assertIn('__all__', erreurs[4])
+        self.assertIn('compagnie', erreurs[5])
+        self.assertEqual(DonneesSolvabilite.objects.count(), 2)
+
+    def test_tout_ou_rien(self):
+        rapport = traiter_lot(self.utilisateur, [ligne_lot(risque_taux='120'), ligne_lot(fonds_propres='abc')],
+                              tout_ou_rien=True)
+        self.assertEqual(len(rapport['erreurs']), 1)
+        self.assertFalse(DonneesSolvabilite.objects.exists())
+
+    def test_resultats_identiques_au_calcul_unitaire(self):
+        ligne = ligne_lot(risque_taux='60', risque_actions='40', risque_contrepartie='30', mortalite='50',
+                          rachat='20', risque_primes='70', catastrophes='10', scr_operational='15')
+        traiter_lot(self.utilisateur, [ligne])
+
+        donnees = DonneesSolvabilite.objects.get()
+        scr = calculer_scr_standard(100, 30, 70, 80, 15)
+        self.assertAlmostEqual(float(CalculSCR.objects.get().resultat_scr), scr, places=2)
+        self.assertAlmostEqual(float(donnees.mcr), calculer_mcr(scr, 200, 1000), places=2)
+        self.assertAlmostEqual(float(donnees.ratio_solvabilite), 500 / scr * 100, places=2)
+        self.assertEqual((donnees.scr_marche, donnees.scr_credit, donnees.scr_vie, donnees.scr_non_vie),
+                         (100, 30, 70, 80))
+
+
+# =============================================
+# CLIENTS DES API EXTERNES (SERVEUR FACTICE)
+# =============================================
+
+class ClientsAPIServeurFacticeTests(TestCase):
+    configuration = {'TENTATIVES': 2, 'BACKOFF': 0, 'GIGUE': 0, 'TRANSPORT': 'reel',
+                     'DELAIS': {'declaration': (1, 2), 'taux_sans_risque': (1, 0.2)}}
+
+    def demarrer(self, **options):
+        serveur = demarrer_serveur_factice(**options)
+        self.addCleanup(serveur.server_close)
+        self.addCleanup(serveur.shutdown)
+        reglages = override_settings(SOLVABILITE_API_EXTERNES=self.configuration, REGULATEUR_API_URL=serveur.url,
+                                     MARKET_DATA_URL=serveur.url)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        # Sessions et disjoncteurs sont créés avec la configuration courante
+        fermer_sessions()
+        self.addCleanup(fermer_sessions)
+        cache.clear()
+        return serveur
+
+    def declarer(self, cle):
+        donnees = DonneesSolvabilite.objects.with_totals().select_related('compagnie').get()
+        return RegulateurAPIClient().envoyer_declaration_solvabilite(donnees, cle_idempotence=cle)
+
+    def creer_donnees(self):
+        DonneesSolvabilite.objects.create(compagnie=creer_compagnie(), date_reference=date(2024, 12, 31),
+                                          fonds_propres=500, passif_technique=1000)
+
+    def test_connexion_conservee_par_la_session_partagee(self):
+        serveur = self.demarrer(taux_sans_risque=0.031)
+        for _ in range(5):
+            self.assertEqual(MarketDataClient().recuperer_taux_sans_risque(), 0.031)
+        self.assertEqual(serveur.compteurs['requetes'], 5)
+        self.assertEqual(serveur.compteurs['connexions'], 1)
+
+    def test_get_rejoue_sur_503(self):
+        serveur = self.demarrer(taux_erreur=1.0)
+        with self.assertRaises(requests.HTTPError):
+            MarketDataClient().recuperer_taux_sans_risque()
+        self.assertEqual(serveur.compteurs['requetes'], 3)
+
+    def test_post_non_rejoue(self):
+        self.creer_donnees()
+        serveur = self.demarrer(taux_erreur=1.0)
+        self.assertFalse(self.declarer('cle')['success'])
+        self.assertEqual(serveur.compteurs['requetes'], 1)
+
+    def test_delais_par_point_acces(self):
+        # Réponse en 0,5 s : au-delà du délai de lecture du taux (0,2 s), en deçà de celui des déclarations (2 s)
+        self.creer_donnees()
+        serveur = self.demarrer(latence=0.5)
+        # GET idempotent : rejoué après chaque délai de lecture dépassé, puis abandonné
+        with self.assertRaisesRegex(requests.exceptions.ConnectionError, 'Read timed out'):
+            MarketDataClient().recuperer_taux_sans_risque()
+        self.assertEqual(serveur.compteurs['requetes'], 3)
+        self.assertTrue(self.declarer('cle')['success'])
+
+    def test_post_non_rejoue_apres_delai_de_lecture(self):
+        self.creer_donnees()
+        self.configuration = dict(self.configuration, DELAIS={'declaration': (1, 0.2)})
+        serveur = self.demarrer(latence=0.5)
+        resultat = self.declarer('cle')
+        self.assertFalse(resultat['success'])
+        self.assertIn('Erreur de connexion', resultat['error'])
+        self.assertEqual(serveur.compteurs['requetes'], 1)
+
+    def test_cle_idempotence_transmise(self):
+        self.creer_donnees()
+        serveur = self.demarrer()
+        premiere = self.declarer('cle-1')
+        self.assertEqual(self.declarer('cle-1')['reference'], premiere['reference'])
+        self.assertNotEqual(self.declarer('cle-2')['reference'], premiere['reference'])
+        self.assertEqual(serveur.compteurs['declarations'], 2)
+
+
+# =============================================
+# TRANSPORTS DES API EXTERNES
+# =============================================
+
+def echange_json(contenu, statut=200, duree_ms=0):
+    return {'statut': statut, 'entetes': {'Content-Type': 'application/json'}, 'corps': json.dumps(contenu),
+            'duree_ms': duree_ms}
+
+
+class TransportsAPITests(SimpleTestCase):
+    url = 'http://api.test/api/rates/risk-free'
+
+    def session(self, adaptateur):
+        session = requests.Session()
+        session.mount('http://', adaptateur)
+        self.addCleanup(session.close)
+        return session
+
+    def compteur(self, reponse):
+        """Réponse dynamique qui compte les tentatives reçues"""
+        appels = []
+
+        def repondre(entetes):
+            appels.append(entetes)
+            return reponse
+        return appels, repondre
+
+    def test_enregistrement_puis_rejeu(self):
+        serveur = demarrer_serveur_factice(taux_sans_risque=0.031)
+        self.addCleanup(serveur.server_close)
+        repertoire = tempfile.TemporaryDirectory()
+        self.addCleanup(repertoire.cleanup)
+        fichier = os.path.join(repertoire.name, 'echanges.jsonl')
+
+        enregistrement = self.session(AdaptateurEnregistrement(fichier))
+        enregistrement.get(f'{serveur.url}/api/rates/risk-free')
+        reference = enregistrement.post(f'{serveur.url}/api/declarations/solvabilite').json()['reference']
+        enregistrement.close()
+        serveur.shutdown()
+
+        self.assertEqual([echange['cle'] for echange in lire_echanges(fichier)],
+                         ['GET /api/rates/risk-free', 'POST /api/declarations/solvabilite'])
+        rejeu = self.session(AdaptateurRejeu.depuis_fichier(fichier, latence=0))
+        self.assertEqual(rejeu.get('http://autre.hote/api/rates/risk-free').json(), {'rate': 0.031})
+        self.assertEqual(rejeu.post('http://autre.hote/api/declarations/solvabilite').json()['reference'],
+                         reference)
+
+    def test_rejeu_a_tour_de_role(self):
+        session = self.session(AdaptateurRejeu({'GET /api/rates/risk-free': [
+            echange_json({'rate': 1}), echange_json({'rate': 2})]}))
+        self.assertEqual([session.get(self.url).json()['rate'] for _ in range(3)], [1, 2, 1])
+        with self.assertRaises(requests.ConnectionError):
+            session.get('http://api.test/inconnu')
+
+    def test_latence_injectee(self):
+        session = self.session(AdaptateurRejeu({'GET /api/rates/risk-free': [echange_json({}, duree_ms=50)]}))
+        debut = time.perf_counter()
+        session.get(self.url)
+        self.assertGreaterEqual(time.perf_counter() - debut, 0.05)
+
+    def test_delai_de_lecture_rejoue_seulement_en_get(self):
+        appels, repondre = self.compteur(echange_json({}))
+        reponses = {'GET /api/rates/risk-free': repondre, 'POST /api/rates/risk-free': repondre}
+        session = self.session(AdaptateurRejeu(reponses, latence=0.2, max_retries=Retry(total=2, backoff_factor=0)))
+        with self.assertRaisesRegex(requests.ConnectionError, 'Read timed out'):
+            session.get(self.url, timeout=(1, 0.05))
+        self.assertEqual(len(appels), 3)
+        with self.assertRaises(requests.ReadTimeout):
+            session.post(self.url, timeout=(1, 0.05))
+        self.assertEqual(len(appels), 4)
+
+    def test_erreurs_injectees(self):
+        strategie = Retry(total=2, backoff_factor=0, status_forcelist={503}, raise_on_status=False)
+        appels, repondre = self.compteur(echange_json({}))
+        session = self.session(AdaptateurRejeu({'GET /api/rates/risk-free': repondre}, latence=0, taux_erreur=1.0,
+                                               max_retries=strategie))
+        self.assertEqual(session.get(self.url).status_code, 503)
+        self.assertEqual(len(appels), 3)
+
+        appels, repondre = self.compteur(echange_json({}))
+        session = self.session(AdaptateurRejeu({'GET /api/rates/risk-free': repondre}, latence=0, taux_erreur=1.0,
+                                               erreur='connexion', max_retries=strategie))
+        with self.assertRaisesRegex(requests.ConnectionError, 'erreur injectée'):
+            session.get(self.url)
+        self.assertEqual(len(appels), 3)
+
+    def test_erreurs_reproductibles_avec_graine(self):
+        def statuts():
+            session = self.session(AdaptateurRejeu({'GET /api/rates/risk-free': [echange_json({})]}, latence=0,
+                                                   taux_erreur=0.5, graine=7))
+            return [session.get(self.url).status_code for _ in range(20)]
+        premiers = statuts()
+        self.assertEqual(premiers, statuts())
+        self.assertEqual(set(premiers), {200, 503})
+
+
+# =============================================
+# DONNÉES DE MARCHÉ
+# =============================================
+
+class DonneesMarcheTests(TransactionTestCase):
+    """Rafraîchissements dans de vrais threads : écritures en base hors transaction de test"""
+
+    def setUp(self):
+        self.fournisseur = mock.Mock(return_value=0.031)
+        self.cache = CacheDonneesMarche({'taux': (self.fournisseur, 0.025)})
+
+    def attendre_rafraichissement(self):
+        for thread in threading.enumerate():
+            if thread.name == 'donnees-marche-taux':
+                thread.join(5)
+
+    def test_valeur_fraiche_sans_appel_au_fournisseur(self):
+        self.cache.rafraichir('taux')
+        valeur, metadonnees = self.cache.lire('taux')
+        self.attendre_rafraichissement()
+        self.assertEqual(valeur, 0.031)
+        self.assertEqual((metadonnees['source'], metadonnees['fraiche']), ('api', True))
+        self.assertEqual(self.fournisseur.call_count, 1)
+
+    @override_settings(SOLVABILITE_DONNEES_MARCHE={'TTL': 0})
+    def test_valeur_perimee_servie_et_un_seul_rafraichissement(self):
+        self.cache.rafraichir('taux')
+        liberation = threading.Event()
+        self.fournisseur.side_effect = lambda: liberation.wait(5) and 0.035
+        for _ in range(5):
+            valeur, metadonnees = self.cache.lire('taux')
+            self.assertEqual((valeur, metadonnees['fraiche']), (0.031, False))
+        liberation.set()
+        self.attendre_rafraichissement()
+        self.assertEqual(self.fournisseur.call_count, 2)
+        self.assertEqual(self.cache.lire('taux')[0], 0.035)
+        self.assertEqual(DonneeMarche.objects.get(cle='taux').valeur, 0.035)
+
+    def test_derniere_valeur_valide_en_base(self):
+        DonneeMarche.objects.create(cle='taux', valeur=0.04, date_obtention=timezone.now())
+        valeur, metadonnees = self.cache.lire('taux')
+        self.assertEqual((valeur, metadonnees['source'], metadonnees['fraiche']), (0.04, 'base', True))
+        self.assertEqual(self.cache.statistiques()['chargements_base'], 1)
+        self.fournisseur.assert_not_called()
+
+    def test_valeur_par_defaut_puis_delai_apres_echec(self):
+        self.fournisseur.side_effect = ConnectionError('fournisseur indisponible')
+        with self.assertLogs('solvabilite_app.services.donnees_marche', 'WARNING'):
+            valeur, metadonnees = self.cache.lire('taux')
+            self.assertEqual((valeur, metadonnees['source']), (0.025, 'defaut'))
+            self.attendre_rafraichissement()
+            self.assertEqual(self.fournisseur.call_count, 1)
+            # Dans le délai après échec : aucune nouvelle tentative
+            self.cache.lire('taux')
+            self.attendre_rafraichissement()
+            self.assertEqual(self.fournisseur.call_count, 1)
+            with override_settings(SOLVABILITE_DONNEES_MARCHE={'DELAI_APRES_ECHEC': 0}):
+                self.cache.lire('taux')
+                self.attendre_rafraichissement()
+            self.assertEqual(self.fournisseur.call_count, 2)
+        self.assertEqual(self.cache.statistiques()['echecs'], 2)
+
+    def test_fraicheur_enregistree_avec_le_calcul(self):
+        DonneeMarche.objects.create(cle='taux_sans_risque', valeur=0.031, date_obtention=timezone.now())
+        donnees_marche.vider()
+        self.addCleanup(donnees_marche.vider)
+        utilisateur = creer_utilisateur('actuaire', compagnie=creer_compagnie())
+        traiter_lot(utilisateur, [ligne_lot()])
+        marche = CalculSCR.objects.get().parametres_calcul['donnees_marche']['taux_sans_risque']
+        self.assertEqual((marche['valeur'], marche['source'], marche['fraiche']), (0.031, 'base', True))
+        self.assertIsNotNone(marche['obtenue_le'])
+
+
+# =============================================
+# DISJONCTEUR ET CLOISON
+# =============================================
+
+@override_settings(SOLVABILITE_API_EXTERNES={'SEUIL_ECHECS': 3, 'FENETRE_ECHECS': 60, 'DELAI_REOUVERTURE': 30})
+class DisjoncteurTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.disjoncteur = Disjoncteur('test')
+        self.maintenant = time.time()
+        horloge = mock.patch('solvabilite_app.services.external_apis.time.time', lambda: self.maintenant)
+        horloge.start()
+        self.addCleanup(horloge.stop)
+
+    def ouvrir(self):
+        for _ in range(3):
+            self.disjoncteur.autoriser()
+            self.disjoncteur.echec()
+
+    def test_ouvert_apres_le_seuil(self):
+        self.disjoncteur.echec()
+        self.disjoncteur.echec()
+        self.assertEqual(self.disjoncteur.etat()[0], Disjoncteur.FERME)
+        self.disjoncteur.echec()
+        self.assertEqual(self.disjoncteur.etat()[0], Disjoncteur.OUVERT)
+        with self.assertRaises(CircuitOuvert):
+            self.disjoncteur.autoriser()
+
+    def test_succes_remet_le_compteur_a_zero(self):
+        self.disjoncteur.echec()
+        self.disjoncteur.echec()
+        self.disjoncteur.succes()
+        self.disjoncteur.echec()
+        self.assertEqual(self.disjoncteur.etat()[0], Disjoncteur.FERME)
+
+    def test_demi_ouvert_puis_ferme_sur_succes(self):
+        self.ouvrir()
+        self.maintenant += 31
+        self.assertEqual(self.disjoncteur.etat()[0], Disjoncteur.DEMI_OUVERT)
+        self.disjoncteur.autoriser()
+        # Un seul appel d'essai à la fois
+        with self.assertRaises(CircuitOuvert):
+            self.disjoncteur.autoriser()
+        self.disjoncteur.succes()
+        self.assertEqual(self.disjoncteur.etat()[0], Disjoncteur.FERME)
+        self.disjoncteur.autoriser()
+
+    def test_demi_ouvert_rouvert_sur_echec(self):
+        self.ouvrir()
+        self.maintenant += 31
+        self.disjoncteur.autoriser()
+        self.disjoncteur.echec()
+        self.assertEqual(self.disjoncteur.etat()[0], Disjoncteur.OUVERT)
+
+
+class CloisonTests(SimpleTestCase):
+    def test_rejet_au_dela_de_la_capacite(self):
+        cloison = Cloison(2)
+        cloison.entrer('test', attente=0)
+        cloison.entrer('test', attente=0)
+        with self.assertRaises(CloisonSaturee):
+            cloison.entrer('test', attente=0)
+        self.assertEqual(cloison.en_cours, 2)
+
+        cloison.sortir()
+        cloison.entrer('test', attente=0)
+        self.assertEqual(cloison.en_cours, 2)
+
+
+# =============================================
+# DÉCLARATIONS AU RÉGULATEUR
+# =============================================
+
+class HorlogeFactice:
+    """time.monotonic / time.sleep déterministes : sleep avance l'horloge"""
+
+    def __init__(self):
+        self.maintenant = 1000.0
+        self.attentes = []
+
+    def monotonic(self):
+        return self.maintenant
+
+    def sleep(self, duree):
+        self.attentes.append(duree)
+        self.maintenant += duree
+
+
+class LimiteurDebitTests(SimpleTestCase):
+    def test_debit_respecte_apres_la_rafale(self):
+        horloge = HorlogeFactice()
+        with mock.patch('solvabilite_app.services.declarations.time', horloge):
+            limiteur = LimiteurDebit(4, rafale=2)
+            for _ in range(6):
+                limiteur.acquerir()
+        # Deux jetons disponibles d'emblée, puis un tous les 250 ms
+        self.assertEqual(horloge.maintenant - 1000.0, 1.0)
+
+    def test_debit_nul_sans_limite(self):
+        horloge = HorlogeFactice()
+        with mock.patch('solvabilite_app.services.declarations.time', horloge):
+            limiteur = LimiteurDebit(0)
+            for _ in range(100):
+                limiteur.acquerir()
+        self.assertEqual(horloge.attentes, [])
+
+
+class DeclarationsTests(TestCase):
+    date_reference = date(2024, 12, 31)
+
+    def setUp(self):
+        self.compagnies = [creer_compagnie(siren) for siren in ('111111111', '222222222', '333333333')]
+        self.compagnies[2].actif = False
+        self.compagnies[2].save()
+        for compagnie in self.compagnies:
+            DonneesSolvabilite.objects.create(compagnie=compagnie, date_reference=self.date_reference,
+                                              fonds_propres=500, passif_technique=1000)
+        # Seconde saisie à la même date : c'est elle qui est déclarée
+        self.derniere = DonneesSolvabilite.objects.create(compagnie=self.compagnies[0],
+                                                          date_reference=self.date_reference,
+                                                          fonds_propres=600, passif_technique=1000)
+
+    def test_preparer_soumissions(self):
+        self.assertEqual(preparer_soumissions(self.date_reference), 2)
+        self.assertEqual(preparer_soumissions(self.date_reference), 0)
+        soumission = SoumissionDeclaration.objects.get(compagnie=self.compagnies[0])
+        self.assertEqual(soumission.donnees_id, self.derniere.pk)
+        self.assertEqual(soumission.cle_idempotence, cle_idempotence('111111111', self.date_reference))
+
+    def test_reserver_une_seule_execution_par_ligne(self):
+        preparer_soumissions(self.date_reference)
+        delai = timedelta(seconds=300)
+        premier = _reserver(self.date_reference, 'a', 1, True, delai)
+        second = _reserver(self.date_reference, 'b', 10, True, delai)
+        self.assertEqual(len(premier), 1)
+        self.assertEqual(len(second), 1)
+        self.assertNotEqual(premier[0].pk, second[0].pk)
+        self.assertEqual(_reserver(self.date_reference, 'c', 10, True, delai), [])
+        # Au-delà du délai de reprise, une ligne EN_COURS est reprise
+        SoumissionDeclaration.objects.filter(pk=premier[0].pk).update(date_maj=timezone.now() - delai * 2)
+        repris = _reserver(self.date_reference, 'c', 10, True, delai)
+        self.assertEqual([soumission.pk for soumission in repris], [premier[0].pk])
+
+    def test_reprise_apres_interruption(self):
+        preparer_soumissions(self.date_reference)
+        envoyee, interrompue = SoumissionDeclaration.objects.order_by('pk')
+        SoumissionDeclaration.objects.filter(pk=envoyee.pk).update(statut='ENVOYEE')
+        SoumissionDeclaration.objects.filter(pk=interrompue.pk).update(
+            statut='EN_COURS', execution='interrompue', date_maj=timezone.now() - timedelta(hours=1))
+
+        with mock.patch.object(RegulateurAPIClient, 'envoyer_declaration_solvabilite',
+                               return_value={'success': True, 'reference': 'REF-1'}) as envoyer:
+            bilan = soumettre_declarations(self.date_reference, threads=2, debit=0)
+
+        self.assertEqual((bilan['envoyees'], bilan['echecs']), (1, 0))
+        self.assertEqual(envoyer.call_args.kwargs['cle_idempotence'], interrompue.cle_idempotence)
+        interrompue.refresh_from_db()
+        self.assertEqual((interrompue.statut, interrompue.reference, interrompue.tentatives), ('ENVOYEE', 'REF-1', 1))
+        self.assertTrue(progression(self.date_reference)['termine'])
+
+    def test_echec_enregistre_puis_relance(self):
+        with mock.patch.object(RegulateurAPIClient, 'envoyer_declaration_solvabilite',
+                               return_value={'success': False, 'error': 'Erreur API: 503'}):
+            bilan = soumettre_declarations(self.date_reference, threads=2, debit=0)
+        self.assertEqual(bilan['echecs'], 2)
+        self.assertEqual(progression(self.date_reference)['par_statut']['ECHEC'], 2)
+        with mock.patch.object(RegulateurAPIClient, 'envoyer_declaration_solvabilite',
+                               return_value={'success': True}):
+            bilan = soumettre_declarations(self.date_reference, threads=2, debit=0)
+        self.assertEqual(bilan['envoyees'], 2)
+        self.assertEqual(set(SoumissionDeclaration.objects.values_list('tentatives', flat=True)), {2})
+
+    def test_charge_utile_envoyee(self):
+        reponse = mock.Mock(status_code=200)
+        reponse.json.return_value = {'reference': 'REF-2'}
+        donnees = DonneesSolvabilite.objects.with_totals().select_related('compagnie').get(pk=self.derniere.pk)
+        with mock.patch.object(RegulateurAPIClient, '_requete', return_value=reponse) as requete:
+            resultat = RegulateurAPIClient().envoyer_declaration_solvabilite(donnees, cle_idempotence='cle')
+        self.assertEqual(resultat['reference'], 'REF-2')
+        charge = requete.call_args.kwargs['json']
+        self.assertEqual((charge['compagnie_siren'], charge['fonds_propres']), ('111111111', 600.0))
+        self.assertEqual(requete.call_args.kwargs['headers'], {'Idempotency-Key': 'cle'})
+
+
+class VuesDeclarationsTests(TestCase):
+    def setUp(self):
+        DonneesSolvabilite.objects.create(compagnie=creer_compagnie(), date_reference=date(2024, 12, 31),
+                                          fonds_propres=500, passif_technique=1000)
+        self.url_envoi = reverse('solvabilite_app:envoyer_declaration_regulateur')
+        self.url_progression = reverse('solvabilite_app:api_progression_declarations')
+
+    def test_envoi_reserve_aux_administrateurs(self):
+        self.client.force_login(creer_utilisateur('regulateur', role='REGULATEUR'))
+        self.assertEqual(self.client.post(self.url_envoi).status_code, 403)
+        self.client.force_login(creer_utilisateur('admin', role='ADMIN'))
+        with mock.patch('solvabilite_app.views.lancer_en_arriere_plan', return_value=True) as lancer:
+            reponse = self.client.post(self.url_envoi)
+        self.assertEqual(reponse.status_code, 202)
+        lancer.assert_called_once_with(date(2024, 12, 31))
+        with mock.patch('solvabilite_app.views.lancer_en_arriere_plan', return_value=False):
+            self.assertEqual(self.client.post(self.url_envoi).status_code, 409)
+
+    def test_progression(self):
+        self.client.force_login(creer_utilisateur('actuaire'))
+        self.assertEqual(self.client.get(self.url_progression).status_code, 403)
+        self.client.force_login(creer_utilisateur('regulateur', role='REGULATEUR'))
+        preparer_soumissions(date(2024, 12, 31))
+        reponse = self.client.get(self.url_progression)
+        self.assertEqual(reponse.status_code, 200)
+        etat = reponse.json()
+        self.assertEqual((etat['total'], etat['par_statut']['EN_ATTENTE'], etat['termine']), (1, 1, False))
+        self.assertEqual(self.client.get(self.url_progression, {'date_reference': '31/12/2024'}).status_code, 400)
+
+
+# =============================================
+# DONNÉES SYNTHÉTIQUES
+# =============================================
+
+class GenererDonneesSynthetiquesTests(TransactionTestCase):
+    """TransactionTestCase : les pragmas SQLite ne peuvent pas changer au sein d'une transaction"""
+
+    def generer(self, graine=7):
+        call_command('generer_donnees_synthetiques', '--compagnies', '3', '--annees', '2', '--utilisateurs', '5',
+                     '--graine', str(graine), '--date-fin', '2024-12-31', '--taille-paquet', '8',
+                     stdout=io.StringIO())
+        return list(DonneesSolvabilite.objects.order_by('compagnie__siren', 'date_reference').values_list(
+            'compagnie__siren', 'compagnie__type_compagnie', 'date_reference', 'fonds_propres', 'scr_marche',
+            'risque_taux', 'ratio_solvabilite', 'calculscr__resultat_scr',
+        ))
+
+    def vider(self):
+        Utilisateur.objects.all().delete()
+        Compagnie.objects.all().delete()
+
+    def test_nombre_de_lignes(self):
+        lignes = self.generer()
+        self.assertEqual(Compagnie.objects.count(), 3)
+        self.assertEqual(Utilisateur.objects.count(), 5)
+        self.assertEqual(len(lignes), 3 * 2 * 4)
+        self.assertEqual(CalculSCR.objects.count(), 3 * 2 * 4)
+        self.assertEqual(lignes[-1][2], date(2024, 12, 31))
+        self.assertFalse(Utilisateur.objects.filter(role='REGULATEUR', compagnie__isnull=False).exists())
+
+    def test_meme_graine_memes_donnees(self):
+        premiere = self.generer()
+        self.vider()
+        self.assertEqual(self.generer(), premiere)
+        self.vider()
+        self.assertNotEqual(self.generer(graine=8), premiere)
+
+    def test_execution_suivante_ajoute_des_compagnies(self):
+        self.generer()
+        self.generer()
+        self.assertEqual(Compagnie.objects.values('siren').distinct().count(), 6)
+        self.assertEqual(DonneesSolvabilite.objects.count(), 48)
+
+    def test_parametres_invalides(self):
+        with self.assertRaises(CommandError):
+            call_command('generer_donnees_synthetiques', '--compagnies', '0', stdout=io.StringIO())
+
+
+# =============================================
+# TEST DE CHARGE
+# =============================================
+
+class ExecuterPalierTests(TransactionTestCase):
+    """TransactionTestCase : les utilisateurs virtuels lisent la base depuis leurs propres threads"""
+
+    def setUp(self):
+        compagnie = creer_compagnie()
+        DonneesSolvabilite.objects.create(compagnie=compagnie, date_reference=date(2024, 3, 31), fonds_propres=500,
+                                          passif_technique=1000)
+        for indice, role in enumerate(['CLIENT', 'CLIENT', 'CONTROLEUR']):
+            creer_utilisateur(f'charge{indice}', role=role, compagnie=compagnie)
+
+    def executer(self, concurrence=2, **options):
+        options.setdefault('poids_roles', {'CLIENT': 1, 'CONTROLEUR': 1})
+        return executer_palier(concurrence, 30, mot_de_passe='motdepasse', prefixe='charge', **options)
+
+    def test_palier_borne_par_requetes_max(self):
+        rapport = self.executer(requetes_max=3, graine=1)
+        self.assertLess(rapport['duree_s'], 30)
+        self.assertEqual(sum(rapport['roles'].values()), 2)
+        self.assertEqual(rapport['ensemble']['requetes'], 2 * 3)
+        self.assertEqual(rapport['ensemble']['erreurs'], 0)
+        self.assertEqual(rapport['ensemble']['redirections'], 0)
+        self.assertEqual(rapport['points_acces']['connexion']['requetes'], 2)
+        self.assertEqual(sum(point['requetes'] for nom, point in rapport['points_acces'].items()
+                             if nom != 'connexion'), 2 * 3)
+
+    def test_roles_sans_compte_ecartes(self):
+        rapport = self.executer(concurrence=1, requetes_max=1, poids_roles={'CLIENT': 1, 'DG': 1})
+        self.assertEqual(rapport['roles'], {'CLIENT': 1})
+        self.assertEqual(rapport['roles_sans_compte'], ['DG'])
+
+    def test_aucun_compte(self):
+        with self.assertRaises(ValueError):
+            self.executer(requetes_max=1, poids_roles={'DG': 1})
+
+    def test_transport_inconnu(self):
+        with self.assertRaises(ValueError):
+            self.executer(requetes_max=1, transport='websocket')
+
+
+# =============================================
+# MÉTRIQUES
+# =============================================
+
+class RegistreTests(SimpleTestCase):
+    def setUp(self):
+        self.registre = Registre()
+        self.compteur = self.registre.compteur('essais_total', "Essais", ('resultat',))
+        self.histogramme = self.registre.histogramme('essai_duree_secondes', "Durée", bornes=(0.1, 1))
+
+    def test_somme_des_threads_termines(self):
+        def travailler():
+            for _ in range(1000):
+                self.compteur.inc('succes')
+
+        threads = [threading.Thread(target=travailler) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for _ in range(2):
+            self.assertEqual(self.registre.valeurs_processus()[(self.compteur.nom, ('succes',))], 4000)
+
+    def test_exposition(self):
+        self.compteur.inc('erreur', valeur=2)
+        for duree in (0.05, 0.5, 5):
+            self.histogramme.observer(duree)
+        texte = self.registre.exposition()
+        self.assertIn('# TYPE solvabilite_essais_total counter\nsolvabilite_essais_total{resultat="erreur"} 2\n', texte)
+        self.assertIn('solvabilite_essai_duree_secondes_bucket{le="0.1"} 1\n'
+                      'solvabilite_essai_duree_secondes_bucket{le="1.0"} 2\n'
+                      'solvabilite_essai_duree_secondes_bucket{le="+Inf"} 3\n'
+                      'solvabilite_essai_duree_secondes_sum 5.55\n'
+                      'solvabilite_essai_duree_secondes_count 3\n', texte)
+
+    def test_instantanes_de_plusieurs_processus(self):
+        # Première mesure hors du mode multiprocessus : pas de thread d'écriture périodique
+        self.compteur.inc('succes')
+        with tempfile.TemporaryDirectory() as repertoire, \
+                override_settings(SOLVABILITE_METRIQUES={'REPERTOIRE_MULTIPROCESSUS': repertoire}):
+            # Instantanés d'un worker arrêté puis d'un worker relancé avec le même pid
+            for nom, nombre in (('metriques_4242_aaaaaaaa.json', 5), ('metriques_4242_bbbbbbbb.json', 2)):
+                with open(os.path.join(repertoire, nom), 'w', encoding='utf-8') as fichier:
+                    json.dump([[self.compteur.nom, ['succes'], nombre]], fichier)
+            self.registre.ecrire_instantane()
+
+            self.assertEqual(len(os.listdir(repertoire)), 3)
+            self.assertEqual(self.registre.valeurs()[(self.compteur.nom, ('succes',))], 8)
+
+
+class VueMetriquesTests(TestCase):
+    url = '/metrics'
+
+    def test_reservee_aux_administrateurs_sans_jeton(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_login(creer_utilisateur('actuaire'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_login(creer_utilisateur('admin', role='ADMIN'))
+        reponse = self.client.get(self.url)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertTrue(reponse['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+    @override_settings(SOLVABILITE_METRIQUES={'JETON': 'secret'})
+    def test_jeton(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer autre').status_code, 401)
+        reponse = self.client.get(self.url, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(reponse.status_code, 200)
+        self.assertIn(b'solvabilite_http_requetes_total', reponse.content)
@@ -1,5 +1,6 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, views_async
 
 app_name = 'solvabilite_app'
 
@@ -16,17 +17,37 @@ urlpatterns = [
     # Calculs SCR avec permissions
     path('calcul-scr/', views.calcul_scr, name='calcul_scr'),  # Actuaires, Risk Managers, Admin
     path('calcul-scr-avance/', views.calcul_scr_avance, name='calcul_scr_avance'),  # Actuaires, Admin seulement
+    path('historique/', views.historique_calculs, name='historique'),
 
     # Indicateurs avec filtrage par rôle
     path('indicateurs/', views.indicateurs_solvabilite, name='indicateurs'),
 
     # Rapports avec permissions
     path('export-pdf/<str:rapport_type>/', views.export_rapport_pdf, name='export_rapport_pdf'),
+    path('export-historique/', views.export_historique, name='export_historique'),
 
     # Pages complémentaires
     path('saisie-donnees/', views.saisie_donnees, name='saisie_donnees'),
     path('tableau-bord-executive/', views.tableau_bord_executive, name='tableau_bord_executive'),
     path('tableau-bord-graphiques/', views.tableau_bord_graphiques, name='tableau_bord_graphiques'),
+
     path('envoyer-declaration/', views.envoyer_declaration_regulateur, name='envoyer_declaration_regulateur'),
+    path('api/declarations/progression/', views.api_progression_declarations, name='api_progression_declarations'),
     path('api/indicateurs/', views.api_indicateurs, name='api_indicateurs'),
-]
\ No newline at end of file
+    path('api/calculs/', views.api_calculs, name='api_calculs'),
+    path('api/calculs/lot/', views.api_calcul_lot, name='api_calcul_lot'),
+    path('api/graphiques/', views.api_graphiques, name='api_graphiques'),
+    path('flux/compagnie/<int:compagnie_id>/', views.flux_indicateurs, name='flux_indicateurs'),
+    path('api/cache/statistiques/', views.api_statistiques_cache, name='api_statistiques_cache'),
+    path('api/sante/', views.api_sante, name='api_sante'),
+]
+
+# Versions asynchrones (ASGI) des tableaux de bord : expérimentales, plus lentes
+# que les vues synchrones sous charge (benchmarks/latence_async.py)
+if getattr(settings, 'SOLVABILITE_VUES_ASYNC', False):
+    urlpatterns += [
+        path('async/tableau-de-bord/', views_async.tableau_de_bord_async, name='tableau_de_bord_async'),
+        path('async/indicateurs/', views_async.indicateurs_solvabilite_async, name='indicateurs_async'),
+        path('async/tableau-bord-executive/', views_async.tableau_bord_executive_async,
+             name='tableau_bord_executive_async'),
+    ]
@@ -0,0 +1,55 @@
+import numpy as np
+
+
+def lttb_indices(x, y, nb_points):
+    """
+    Largest-Triangle-Three-Buckets : indices des points conservés pour
+    réduire la série (x, y) à nb_points en préservant sa forme visuelle.
+
+    Le premier et le dernier point sont toujours conservés. Pour chaque
+    seau intermédiaire, on garde le point qui forme le plus grand triangle
+    avec le point retenu précédemment et la moyenne du seau suivant ; le
+    calcul des aires est vectorisé sur tout le seau.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+
+    if nb_points >= n or nb_points < 3:
+        return np.arange(n)
+
+    # Bornes des nb_points - 2 seaux intermédiaires (points 1 .. n-2)
+    bornes = np.floor(np.linspace(1, n - 1, nb_points - 1)).astype(int)
+
+    # Moyennes de tous les seaux en une passe (cumuls), puis le dernier point
+    cumul_x = np.concatenate(([0.0], np.cumsum(x)))
+    cumul_y = np.concatenate(([0.0], np.cumsum(y)))
+    tailles = bornes[1:] - bornes[:-1]
+    moyennes_x = (cumul_x[bornes[1:]] - cumul_x[bornes[:-1]]) / tailles
+    moyennes_y = (cumul_y[bornes[1:]] - cumul_y[bornes[:-1]]) / tailles
+    moyennes_x = np.append(moyennes_x, x[-1])
+    moyennes_y = np.append(moyennes_y, y[-1])
+
+    indices = np.empty(nb_points, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+    precedent = 0
+
+    for i in range(nb_points - 2):
+        debut, fin = bornes[i], bornes[i + 1]
+        ax, ay = x[precedent], y[precedent]
+        cx, cy = moyennes_x[i + 1], moyennes_y[i + 1]
+        # Double aire du triangle (a, b, c) pour chaque candidat b du seau
+        aires = np.abs((ax - cx) * (y[debut:fin] - ay) - (ax - x[debut:fin]) * (cy - ay))
+        precedent = debut + int(np.argmax(aires))
+        indices[i + 1] = precedent
+
+    return indices
+
+
+def lttb(x, y, nb_points):
+    """Retourne (x, y) réduits à nb_points par Largest-Triangle-Three-Buckets"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    indices = lttb_indices(x, y, nb_points)
+    return x[indices], y[indices]
@@ -0,0 +1,100 @@
+"""
+Graphiques vectoriels des rapports PDF, dessinés directement avec
+reportlab.graphics (pas de passage par HTML ni par des images).
+
+Les courbes sont construites à partir des séries déjà réduites par
+services.indicateurs (LTTB, mises en cache) : quelques dizaines de points par
+graphique quel que soit l'historique, donc un rendu rapide et des fichiers légers.
+"""
+from datetime import date
+
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+
+# Largeur utile d'une page A4 avec les marges des rapports (points)
+LARGEUR = 450
+HAUTEUR = 180
+
+SEUIL_REGLEMENTAIRE = 100
+COULEUR_RATIO = colors.HexColor('#2c3e50')
+COULEUR_SEUIL = colors.HexColor('#e74c3c')
+COULEUR_GRILLE = colors.HexColor('#dee2e6')
+COULEURS_MODULES = [colors.HexColor(couleur) for couleur in
+                    ('#3498db', '#e67e22', '#27ae60', '#9b59b6', '#95a5a6')]
+
+
+def _etiquette_date(valeur):
+    return date.fromordinal(int(valeur)).strftime('%m/%Y')
+
+
+def _graduations(minimum, maximum, nombre=6):
+    if maximum <= minimum:
+        return [minimum]
+    pas = (maximum - minimum) / (nombre - 1)
+    return [minimum + pas * position for position in range(nombre)]
+
+
+def graphique_historique_ratio(dates, valeurs):
+    """
+    Courbe du ratio de solvabilité (%) avec le seuil réglementaire de 100 %.
+    dates : dates ISO (chaînes), valeurs : ratios, au moins deux points.
+    """
+    abscisses = [date.fromisoformat(jour).toordinal() for jour in dates]
+    debut, fin = abscisses[0], abscisses[-1]
+
+    courbe = LinePlot()
+    courbe.x, courbe.y = 45, 30
+    courbe.width, courbe.height = LARGEUR - 60, HAUTEUR - 45
+    courbe.data = [
+        list(zip(abscisses, valeurs)),
+        [(debut, SEUIL_REGLEMENTAIRE), (fin, SEUIL_REGLEMENTAIRE)],
+    ]
+    courbe.lines[0].strokeColor = COULEUR_RATIO
+    courbe.lines[0].strokeWidth = 1.5
+    courbe.lines[1].strokeColor = COULEUR_SEUIL
+    courbe.lines[1].strokeWidth = 1
+    courbe.lines[1].strokeDashArray = (4, 3)
+
+    courbe.xValueAxis.valueMin = debut
+    courbe.xValueAxis.valueMax = fin
+    courbe.xValueAxis.valueSteps = _graduations(debut, fin)
+    courbe.xValueAxis.labelTextFormat = _etiquette_date
+    courbe.xValueAxis.labels.fontSize = 7
+
+    courbe.yValueAxis.valueMin = min(0, min(valeurs))
+    courbe.yValueAxis.valueMax = max(max(valeurs), SEUIL_REGLEMENTAIRE) * 1.1
+    courbe.yValueAxis.labelTextFormat = '%d %%'
+    courbe.yValueAxis.labels.fontSize = 7
+    courbe.yValueAxis.visibleGrid = True
+    courbe.yValueAxis.gridStrokeColor = COULEUR_GRILLE
+
+    dessin = Drawing(LARGEUR, HAUTEUR)
+    dessin.add(courbe)
+    dessin.add(String(LARGEUR - 15, courbe.y + courbe.height + 4, f"Seuil réglementaire {SEUIL_REGLEMENTAIRE} %",
+                      fontSize=7, fillColor=COULEUR_SEUIL, textAnchor='end'))
+    return dessin
+
+
+def graphique_repartition_modules(montants):
+    """Camembert de la répartition du SCR ; montants : [(libellé, valeur)] de total positif"""
+    montants = [(libelle, valeur) for libelle, valeur in montants if valeur > 0]
+    total = sum(valeur for _, valeur in montants)
+
+    camembert = Pie()
+    camembert.x, camembert.y = LARGEUR / 2 - 65, 20
+    camembert.width = camembert.height = 130
+    camembert.data = [valeur for _, valeur in montants]
+    camembert.labels = [f"{libelle} {valeur / total * 100:.1f} %" for libelle, valeur in montants]
+    camembert.sideLabels = True
+    camembert.simpleLabels = False
+    camembert.slices.strokeWidth = 0.5
+    camembert.slices.strokeColor = colors.white
+    camembert.slices.fontSize = 8
+    for position in range(len(montants)):
+        camembert.slices[position].fillColor = COULEURS_MODULES[position % len(COULEURS_MODULES)]
+
+    dessin = Drawing(LARGEUR, HAUTEUR)
+    dessin.add(camembert)
+    return dessin
@@ -0,0 +1,329 @@
+"""
+Test de charge sur les URL réelles de l'application.
+
+Des utilisateurs virtuels (un thread chacun) se connectent sous un compte
+d'un rôle tiré selon POIDS_ROLES, puis enchaînent les actions du scénario de
+leur rôle (tableaux de bord, indicateurs, API, calculs SCR, exports PDF),
+tirées selon leurs poids. Chaque requête est chronométrée réponse
+entièrement lue (PDF et exports en flux compris).
+
+Deux transports :
+- 'client' : client de test Django dans le processus, sans serveur ni
+  réseau (mesure l'application seule, le GIL limite la concurrence réelle) ;
+- 'http' : requêtes HTTP vers un serveur démarré (runserver, gunicorn...),
+  avec la protection CSRF comme un navigateur.
+
+Les comptes sont lus dans la base configurée (en HTTP, celle du serveur) :
+par défaut ceux créés par generer_donnees_synthetiques.
+"""
+import random
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+import requests
+from django.conf import settings
+from django.db import connections
+from django.urls import reverse
+
+from ..models import Utilisateur
+
+Action = namedtuple('Action', 'methode nom_url args parametres donnees', defaults=((), None, None))
+
+
+def _donnees_calcul_scr(aleatoire):
+    echelle = aleatoire.lognormvariate(np.log(5e8), 1.0)
+    return {
+        'fonds_propres': round(echelle * 0.15, 2),
+        'passif_technique': round(echelle * 0.85, 2),
+        'prime_annuelle': round(echelle * 0.2, 2),
+        'capital_requis_marche': round(echelle * aleatoire.uniform(0.03, 0.07), 2),
+        'capital_requis_credit': round(echelle * aleatoire.uniform(0.01, 0.04), 2),
+        'capital_requis_vie': round(echelle * aleatoire.uniform(0.01, 0.03), 2),
+        'capital_requis_non_vie': round(echelle * aleatoire.uniform(0.01, 0.05), 2),
+        'date_reference': datetime.now().strftime('%Y-%m-%d'),
+    }
+
+
+def _donnees_calcul_avance(aleatoire):
+    echelle = aleatoire.lognormvariate(np.log(5e8), 1.0)
+    donnees = {
+        'fonds_propres': round(echelle * 0.15, 2),
+        'passif_technique': round(echelle * 0.85, 2),
+        'prime_annuelle': round(echelle * 0.2, 2),
+        'placements': round(echelle * 0.95, 2),
+        'immobilisations': round(echelle * 0.05, 2),
+        'charges_sinistres': round(echelle * 0.14, 2),
+        'scr_operational': round(echelle * 0.005, 2),
+        'date_reference': datetime.now().strftime('%Y-%m-%d'),
+    }
+    for champ in ('risque_taux', 'risque_actions', 'risque_immobilier', 'risque_contrepartie', 'risque_spread',
+                  'concentration', 'mortalite', 'longevite', 'rachat', 'risque_primes', 'risque_sinistres',
+                  'catastrophes'):
+        donnees[champ] = round(echelle * aleatoire.uniform(0.002, 0.03), 2)
+    return donnees
+
+
+# Points d'accès mesurés (clé : nom dans le rapport)
+ACTIONS = {
+    'tableau_de_bord': Action('GET', 'tableau_de_bord'),
+    'tableau_bord_executive': Action('GET', 'tableau_bord_executive'),
+    'indicateurs': Action('GET', 'indicateurs'),
+    'historique': Action('GET', 'historique'),
+    'api_indicateurs': Action('GET', 'api_indicateurs'),
+    'api_calculs': Action('GET', 'api_calculs'),
+    'api_graphiques': Action('GET', 'api_graphiques'),
+    'calcul_scr': Action('POST', 'calcul_scr', donnees=_donnees_calcul_scr),
+    'calcul_scr_avance': Action('POST', 'calcul_scr_avance', donnees=_donnees_calcul_avance),
+    'export_pdf_synthese': Action('GET', 'export_rapport_pdf', ('synthese',)),
+    'export_pdf_technique': Action('GET', 'export_rapport_pdf', ('technique',)),
+    'export_pdf_risques': Action('GET', 'export_rapport_pdf', ('risques',)),
+    'export_historique': Action('GET', 'export_historique', parametres={'format': 'csv'}),
+}
+
+# Part des utilisateurs virtuels de chaque rôle
+POIDS_ROLES = {
+    'ACTUAIRE': 0.30, 'RISK_MANAGER': 0.20, 'CONTROLEUR': 0.15, 'DG': 0.10, 'CONSULTANT': 0.10,
+    'CLIENT': 0.10, 'REGULATEUR': 0.05,
+}
+
+# Actions de chaque rôle et leurs poids (uniquement ce que le rôle est autorisé à faire)
+SCENARIOS = {
+    'ACTUAIRE': {'tableau_de_bord': 3, 'indicateurs': 2, 'api_indicateurs': 2, 'api_graphiques': 1,
+                 'historique': 1, 'calcul_scr': 1, 'calcul_scr_avance': 1, 'export_pdf_technique': 0.5,
+                 'export_pdf_synthese': 0.5},
+    'RISK_MANAGER': {'tableau_de_bord': 3, 'indicateurs': 2, 'api_graphiques': 1, 'api_calculs': 1,
+                     'calcul_scr': 1, 'export_pdf_risques': 1},
+    'CONTROLEUR': {'tableau_de_bord': 3, 'indicateurs': 3, 'api_indicateurs': 1, 'historique': 1,
+                   'export_pdf_synthese': 1, 'export_historique': 0.5},
+    'DG': {'tableau_bord_executive': 3, 'tableau_de_bord': 2, 'api_graphiques': 1, 'export_pdf_risques': 1},
+    'CONSULTANT': {'tableau_de_bord': 2, 'indicateurs': 2, 'api_indicateurs': 2, 'export_pdf_synthese': 1},
+    'CLIENT': {'tableau_de_bord': 3, 'indicateurs': 1},
+    'REGULATEUR': {'tableau_de_bord': 1, 'api_indicateurs': 3, 'api_calculs': 2, 'export_historique': 1},
+}
+
+
+# =============================================
+# TRANSPORTS
+# =============================================
+
+class TransportClient:
+    """Client de test Django, dans le processus"""
+
+    def __init__(self):
+        from django.test import Client
+
+        hotes = [hote for hote in settings.ALLOWED_HOSTS if hote not in ('*',) and not hote.startswith('.')]
+        self.client = Client(HTTP_HOST=hotes[0] if hotes else 'localhost', raise_request_exception=False)
+        self.securise = getattr(settings, 'SECURE_SSL_REDIRECT', False)
+
+    def connecter(self, username, mot_de_passe):
+        reponse = self.client.post(reverse('solvabilite_app:connexion'),
+                                   {'username': username, 'password': mot_de_passe}, secure=self.securise)
+        return reponse.status_code, '_auth_user_id' in self.client.session
+
+    def requete(self, methode, chemin, parametres=None, donnees=None):
+        if methode == 'POST':
+            reponse = self.client.post(chemin, donnees or {}, secure=self.securise)
+        else:
+            reponse = self.client.get(chemin, parametres or {}, secure=self.securise)
+        taille = sum(len(bloc) for bloc in reponse.streaming_content) if reponse.streaming else len(reponse.content)
+        reponse.close()
+        return reponse.status_code, taille
+
+    def fermer(self):
+        # Le client de test ne ferme pas les connexions de base en fin de requête
+        connections.close_all()
+
+
+class TransportHTTP:
+    """Requêtes HTTP vers un serveur en fonctionnement (cookies de session et jeton CSRF)"""
+
+    def __init__(self, url_base, delai=60):
+        self.url_base = url_base.rstrip('/')
+        self.delai = delai
+        self.session = requests.Session()
+
+    def _entetes_csrf(self):
+        return {'X-CSRFToken': self.session.cookies.get(settings.CSRF_COOKIE_NAME, ''),
+                'Referer': self.url_base + '/'}
+
+    def connecter(self, username, mot_de_passe):
+        url = self.url_base + reverse('solvabilite_app:connexion')
+        self.session.get(url, timeout=self.delai)
+        reponse = self.session.post(url, data={
+            'username': username, 'password': mot_de_passe,
+            'csrfmiddlewaretoken': self.session.cookies.get(settings.CSRF_COOKIE_NAME, ''),
+        }, headers=self._entetes_csrf(), allow_redirects=False, timeout=self.delai)
+        return reponse.status_code, reponse.status_code == 302 and settings.SESSION_COOKIE_NAME in self.session.cookies
+
+    def requete(self, methode, chemin, parametres=None, donnees=None):
+        entetes = self._entetes_csrf() if methode == 'POST' else None
+        reponse = self.session.request(methode, self.url_base + chemin, params=parametres, data=donnees,
+                                       headers=entetes, allow_redirects=False, timeout=self.delai)
+        return reponse.status_code, len(reponse.content)
+
+    def fermer(self):
+        self.session.close()
+
+
+# =============================================
+# UTILISATEURS VIRTUELS
+# =============================================
+
+def comptes_par_role(roles, prefixe):
+    """Identifiants de connexion disponibles pour chaque rôle"""
+    comptes = {role: [] for role in roles}
+    for username, role in Utilisateur.objects.filter(role__in=roles, is_active=True,
+                                                     username__startswith=prefixe).values_list('username', 'role'):
+        comptes[role].append(username)
+    return comptes
+
+
+def _tirer(aleatoire, poids):
+    return aleatoire.choices(list(poids), weights=list(poids.values()))[0]
+
+
+def _utilisateur_virtuel(indice, fabrique_transport, comptes, poids_roles, mot_de_passe, fin, depart,
+                         pause, graine, mesures, requetes_max):
+    """Connexion puis actions du scénario jusqu'à l'échéance ; mesures : dict propre au thread"""
+    aleatoire = random.Random(f'{graine}-{indice}')
+    role = _tirer(aleatoire, poids_roles)
+    mesures['role'] = role
+    time.sleep(max(0.0, depart - time.monotonic()))
+    transport = fabrique_transport()
+    try:
+        debut = time.perf_counter()
+        try:
+            statut, connecte = transport.connecter(aleatoire.choice(comptes[role]), mot_de_passe)
+        except requests.RequestException:
+            statut, connecte = None, False
+        mesures.setdefault('connexion', []).append((time.perf_counter() - debut, statut if connecte else None))
+        if not connecte:
+            return
+
+        scenario = SCENARIOS[role]
+        chemins = {}
+        while time.monotonic() < fin and (requetes_max is None or mesures['requetes'] < requetes_max):
+            nom = _tirer(aleatoire, scenario)
+            action = ACTIONS[nom]
+            if nom not in chemins:
+                chemins[nom] = reverse(f'solvabilite_app:{action.nom_url}', args=action.args)
+            donnees = action.donnees(aleatoire) if action.donnees else None
+            debut = time.perf_counter()
+            try:
+                statut, _ = transport.requete(action.methode, chemins[nom], action.parametres, donnees)
+            except requests.RequestException:
+                statut = None
+            mesures.setdefault(nom, []).append((time.perf_counter() - debut, statut))
+            mesures['requetes'] += 1
+            if pause:
+                time.sleep(aleatoire.expovariate(1 / pause))
+    finally:
+        transport.fermer()
+
+
+def _synthese(echantillons, duree):
+    durees = np.array([duree_requete for duree_requete, _ in echantillons]) * 1000
+    statuts = {}
+    for _, statut in echantillons:
+        statuts[str(statut)] = statuts.get(str(statut), 0) + 1
+    # Erreurs : exceptions de transport et statuts 4xx / 5xx ; une redirection
+    # (hors connexion) signale un refus de permission ou une session perdue
+    erreurs = sum(nombre for statut, nombre in statuts.items() if statut == 'None' or int(statut) >= 400)
+    redirections = sum(nombre for statut, nombre in statuts.items() if statut != 'None' and 300 <= int(statut) < 400)
+    p50, p95, p99 = np.percentile(durees, [50, 95, 99])
+    return {
+        'requetes': len(durees),
+        'erreurs': erreurs,
+        'redirections': redirections,
+        'statuts': statuts,
+        'debit_rps': round(len(durees) / duree, 2) if duree else None,
+        'moyenne_ms': round(float(durees.mean()), 2),
+        'p50_ms': round(float(p50), 2),
+        'p95_ms': round(float(p95), 2),
+        'p99_ms': round(float(p99), 2),
+        'max_ms': round(float(durees.max()), 2),
+    }
+
+
+def executer_palier(concurrence, duree, transport='client', url=None, poids_roles=None, mot_de_passe='synthetique',
+                    prefixe='synthetique', pause=0.0, montee=0.0, graine=0, requetes_max=None):
+    """
+    Lance concurrence utilisateurs virtuels pendant duree secondes (démarrages
+    étalés sur montee secondes) ; retourne le rapport du palier.
+    """
+    poids_roles = dict(poids_roles or POIDS_ROLES)
+    comptes = comptes_par_role(list(poids_roles), prefixe)
+    sans_compte = [role for role, liste in comptes.items() if not liste]
+    for role in sans_compte:
+        del poids_roles[role]
+    if not poids_roles:
+        raise ValueError(f"Aucun compte actif « {prefixe}* » pour les rôles demandés "
+                         "(voir la commande generer_donnees_synthetiques)")
+
+    if transport == 'client':
+        fabrique = TransportClient
+    elif transport == 'http':
+        if not url:
+            raise ValueError("Le transport 'http' demande l'URL du serveur")
+        fabrique = lambda: TransportHTTP(url)  # noqa: E731
+    else:
+        raise ValueError(f"Transport inconnu : {transport} (attendu : client ou http)")
+
+    # Une liste de mesures par thread : aucun verrou pendant le test, fusion à la fin
+    mesures = [{'requetes': 0} for _ in range(concurrence)]
+    maintenant = time.monotonic()
+    fin = maintenant + montee + duree
+    threads = [
+        threading.Thread(target=_utilisateur_virtuel, name=f'charge-{indice}', daemon=True, args=(
+            indice, fabrique, comptes, poids_roles, mot_de_passe, fin,
+            maintenant + montee * indice / concurrence, pause, graine, mesures[indice], requetes_max))
+        for indice in range(concurrence)
+    ]
+    debut = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duree_reelle = time.perf_counter() - debut
+
+    par_point = {}
+    roles = {}
+    for mesures_thread in mesures:
+        if 'role' in mesures_thread:
+            roles[mesures_thread['role']] = roles.get(mesures_thread['role'], 0) + 1
+        for nom, echantillons in mesures_thread.items():
+            if nom not in ('role', 'requetes'):
+                par_point.setdefault(nom, []).extend(echantillons)
+    points_acces = {nom: _synthese(echantillons, duree_reelle) for nom, echantillons in sorted(par_point.items())}
+    tous = [echantillon for nom, echantillons in par_point.items() if nom != 'connexion'
+            for echantillon in echantillons]
+    return {
+        'concurrence': concurrence,
+        'duree_s': round(duree_reelle, 2),
+        'roles': roles,
+        'roles_sans_compte': sans_compte,
+        'ensemble': _synthese(tous, duree_reelle) if tous else None,
+        'points_acces': points_acces,
+    }
+
+
+def executer_test_charge(paliers, duree, transport='client', url=None, etiquette='', **options):
+    """Un palier par niveau de concurrence ; rapport JSON comparable d'une version à l'autre"""
+    debut = datetime.now()
+    rapport = {
+        'etiquette': etiquette,
+        'date': debut.isoformat(timespec='seconds'),
+        'transport': transport,
+        'url': url,
+        'duree_palier_s': duree,
+        'options': {cle: valeur for cle, valeur in options.items() if cle != 'mot_de_passe'},
+        'paliers': [],
+    }
+    for concurrence in paliers:
+        rapport['paliers'].append(executer_palier(concurrence, duree, transport, url, **options))
+    rapport['duree_totale_s'] = round((datetime.now() - debut) / timedelta(seconds=1), 2)
+    return rapport
@@ -0,0 +1,78 @@
+import base64
+import json
+
+from django.db.models import Q
+
+
+def encoder_curseur(valeurs):
+    """Encode les valeurs de la dernière ligne servie en curseur opaque"""
+    brut = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in valeurs])
+    return base64.urlsafe_b64encode(brut.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decoder_curseur(curseur, model, champs):
+    """Décode un curseur et convertit chaque valeur au type du champ correspondant"""
+    try:
+        brut = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4))
+        valeurs = json.loads(brut.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Curseur invalide")
+
+    if not isinstance(valeurs, list) or len(valeurs) != len(champs):
+        raise ValueError("Curseur invalide")
+
+    try:
+        return [model._meta.get_field(champ).to_python(valeur) for champ, valeur in zip(champs, valeurs)]
+    except Exception:
+        raise ValueError("Curseur invalide")
+
+
+def filtre_apres_curseur(champs, valeurs, descendant=True):
+    """
+    Construit le prédicat « ligne strictement après le curseur » pour un tri
+    composite, ex. (date_reference, id) : date < d OR (date = d AND id < i)
+    """
+    operateur = 'lt' if descendant else 'gt'
+    condition = Q()
+    egalites = {}
+    for champ, valeur in zip(champs, valeurs):
+        condition |= Q(**egalites, **{f'{champ}__{operateur}': valeur})
+        egalites[champ] = valeur
+    return condition
+
+
+def paginer_par_curseur(queryset, champs, curseur=None, taille=50, descendant=True, valeurs=False, avant=None):
+    """
+    Pagination par clé (keyset) : le coût d'une page ne dépend pas de sa position.
+
+    Retourne (lignes, curseur_suivant, curseur_precedent). curseur lit la page
+    qui suit une position ; avant (le curseur_precedent d'une page) lit celle
+    qui la précède. Avec valeurs=True, le queryset est un queryset .values()
+    et les lignes sont des dicts.
+    """
+    def position(ligne):
+        return encoder_curseur([ligne[champ] if valeurs else getattr(ligne, champ) for champ in champs])
+
+    # La page précédente se lit dans l'ordre inverse, puis est remise dans l'ordre
+    en_arriere = bool(avant)
+    sens = descendant != en_arriere
+    queryset = queryset.order_by(*[f'-{champ}' if sens else champ for champ in champs])
+
+    depart = avant or curseur
+    if depart:
+        positions = decoder_curseur(depart, queryset.model, champs)
+        queryset = queryset.filter(filtre_apres_curseur(champs, positions, sens))
+
+    # Une ligne de plus que la page pour savoir s'il existe une suite
+    lignes = list(queryset[:taille + 1])
+    encore = len(lignes) > taille
+    lignes = lignes[:taille]
+    if en_arriere:
+        lignes.reverse()
+        curseur_suivant = position(lignes[-1]) if lignes else None
+        curseur_precedent = position(lignes[0]) if encore else None
+    else:
+        curseur_suivant = position(lignes[-1]) if encore else None
+        curseur_precedent = position(lignes[0]) if depart and lignes else None
+
+    return lignes, curseur_suivant, curseur_precedent
@@ -1,97 +1,214 @@
-from io import BytesIO
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-from xhtml2pdf import pisa
+"""
+Génération de rapports PDF de solvabilité à partir d'une ligne de données.
+
+Deux moteurs de rendu, choisis par stratégie (SOLVABILITE_RAPPORTS_PDF['MOTEUR']
+ou argument moteur) :
+- 'reportlab' : moteur commun des exports (utils/rapport_pdf), voie rapide
+  pour les générations en volume ;
+- 'xhtml2pdf' : gabarit HTML solvabilite_app/rapports/rapport_solvabilite.html.
+Chaque rendu est borné par un budget de durée et de pages ; en cas d'échec,
+le moteur de secours (SECOURS, None pour aucun) prend le relais. Durée et
+taille des rendus sont comptées par moteur (statistiques_rendu).
+"""
+import logging
+import re
+import threading
+import time
 from datetime import datetime
-import os
+from io import BytesIO
+
 from django.conf import settings
+from django.template.loader import render_to_string
+
+from ..services import metriques
+from ..services.indicateurs import determiner_statut_solvabilite
+from .rapport_pdf import BudgetRendu, BudgetRenduDepasse, construire_rapport_pdf
+
+logger = logging.getLogger(__name__)
+
+CONFIGURATION_DEFAUT = {
+    'MOTEUR': 'reportlab',
+    'SECOURS': 'reportlab',
+    'DUREE_MAX': 10,
+    'PAGES_MAX': 50,
+}
+
+GABARIT_HTML = 'solvabilite_app/rapports/rapport_solvabilite.html'
+
+_PAGE_PDF = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+
+
+def configuration_rendu():
+    configuration = dict(CONFIGURATION_DEFAUT)
+    configuration.update(getattr(settings, 'SOLVABILITE_RAPPORTS_PDF', {}))
+    return configuration
+
+
+def budget_par_defaut():
+    configuration = configuration_rendu()
+    return BudgetRendu(duree_max=configuration['DUREE_MAX'], pages_max=configuration['PAGES_MAX'])
+
+
+# =============================================
+# MOTEURS DE RENDU
+# =============================================
+
+class MoteurReportLab:
+    """Voie rapide : sections ReportLab partagées, budget vérifié pendant la construction"""
+    nom = 'reportlab'
+
+    def rendre(self, rapport_type, compagnie, donnees, role_affiche, budget, series=None):
+        return construire_rapport_pdf(rapport_type, compagnie, donnees, role_affiche, budget=budget, series=series)
 
 
-def generate_rapport_solvabilite_pdf(donnees, compagnie, rapport_type='DETAIL'):
+class MoteurXhtml2pdf:
     """
-    Génère un rapport PDF de solvabilité utilisant xhtml2pdf
+    Gabarit HTML converti par xhtml2pdf (tableaux seulement, sans graphiques).
+    La conversion ne peut pas être interrompue de l'extérieur : le budget de
+    durée est vérifié avant la conversion, puis durée et pages une fois le PDF produit.
     """
-    try:
-        # Préparation du contexte
-        context = {
+    nom = 'xhtml2pdf'
+
+    def rendre(self, rapport_type, compagnie, donnees, role_affiche, budget, series=None):
+        from xhtml2pdf import pisa
+
+        debut = time.perf_counter()
+        html = render_to_string(GABARIT_HTML, {
             'donnees': donnees,
             'compagnie': compagnie,
             'date_generation': datetime.now(),
             'rapport_type': rapport_type,
-            'statut': get_statut_ratio(donnees.ratio_solvabilite) if hasattr(donnees, 'ratio_solvabilite') else 'N/A'
-        }
-
-        # Rendu du template HTML
-        html_string = render_to_string('solvabilite_app/rapports/rapport_solvabilite.html', context)
-
-        # Création du PDF
+            'role_affiche': role_affiche,
+            'statut': get_statut_ratio(donnees.ratio_solvabilite) if donnees else 'N/A',
+        })
+        if budget is not None:
+            budget.verifier(debut, 0)
         buffer = BytesIO()
-        pdf = pisa.CreatePDF(
-            BytesIO(html_string.encode("UTF-8")),
-            dest=buffer,
-            encoding='UTF-8'
-        )
-
-        if pdf.err:
-            raise Exception("Erreur lors de la génération du PDF")
-
-        buffer.seek(0)
-        return buffer.getvalue()
-
-    except Exception as e:
-        # Fallback vers un PDF simple avec reportlab
-        return generate_rapport_simple(donnees, compagnie)
+        resultat = pisa.CreatePDF(BytesIO(html.encode('UTF-8')), dest=buffer, encoding='UTF-8')
+        if resultat.err:
+            raise ValueError(f"xhtml2pdf : {resultat.err} erreur(s) de conversion")
+        pdf = buffer.getvalue()
+        if budget is not None:
+            budget.verifier(debut, len(_PAGE_PDF.findall(pdf)))
+        return pdf
+
+
+MOTEURS = {moteur.nom: moteur for moteur in (MoteurReportLab(), MoteurXhtml2pdf())}
+
+
+# =============================================
+# STATISTIQUES PAR MOTEUR
+# =============================================
+
+class StatistiquesRendu:
+    """Nombre, durée, taille et échecs des rendus, par moteur"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._par_moteur = {}
+
+    def _compteurs(self, moteur):
+        return self._par_moteur.setdefault(moteur, {
+            'rendus': 0, 'echecs': 0, 'budgets_depasses': 0,
+            'duree_totale': 0.0, 'duree_max': 0.0, 'octets': 0,
+        })
+
+    def enregistrer(self, moteur, duree, taille=0, erreur=None):
+        with self._verrou:
+            compteurs = self._compteurs(moteur)
+            if erreur is None:
+                compteurs['rendus'] += 1
+                compteurs['octets'] += taille
+            elif isinstance(erreur, BudgetRenduDepasse):
+                compteurs['budgets_depasses'] += 1
+            else:
+                compteurs['echecs'] += 1
+            compteurs['duree_totale'] += duree
+            compteurs['duree_max'] = max(compteurs['duree_max'], duree)
+        metriques.duree_rendus_pdf.observer(duree, moteur)
+        if erreur is None:
+            metriques.taille_rendus_pdf.observer(taille, moteur)
+        else:
+            metriques.echecs_rendus_pdf.inc(moteur, 'budget' if isinstance(erreur, BudgetRenduDepasse) else 'erreur')
+
+    def statistiques(self):
+        with self._verrou:
+            resultat = {}
+            for moteur, compteurs in self._par_moteur.items():
+                essais = compteurs['rendus'] + compteurs['echecs'] + compteurs['budgets_depasses']
+                resultat[moteur] = {
+                    'rendus': compteurs['rendus'],
+                    'echecs': compteurs['echecs'],
+                    'budgets_depasses': compteurs['budgets_depasses'],
+                    'duree_moyenne_ms': round(compteurs['duree_totale'] / essais * 1000, 2) if essais else 0.0,
+                    'duree_max_ms': round(compteurs['duree_max'] * 1000, 2),
+                    'taille_moyenne_octets': compteurs['octets'] // compteurs['rendus'] if compteurs['rendus'] else 0,
+                }
+            return resultat
+
+    def reinitialiser(self):
+        with self._verrou:
+            self._par_moteur.clear()
+
+
+statistiques_rendu = StatistiquesRendu()
+
+
+def _rendre_avec(nom_moteur, rapport_type, compagnie, donnees, role_affiche, budget, series):
+    moteur = MOTEURS[nom_moteur]
+    debut = time.perf_counter()
+    try:
+        pdf = moteur.rendre(rapport_type, compagnie, donnees, role_affiche, budget, series)
+    except Exception as erreur:
+        statistiques_rendu.enregistrer(nom_moteur, time.perf_counter() - debut, erreur=erreur)
+        raise
+    statistiques_rendu.enregistrer(nom_moteur, time.perf_counter() - debut, taille=len(pdf))
+    return pdf
 
 
-def generate_rapport_simple(donnees, compagnie):
+def rendre_rapport(rapport_type, compagnie, donnees, role_affiche=None, moteur=None, secours=None, budget=None,
+                   series=None):
     """
-    Génère un rapport PDF simple avec reportlab (fallback)
+    Rapport PDF (octets) rendu par le moteur choisi, sous budget.
+    series : séries réduites de la compagnie pour les graphiques (voir series_graphiques).
+    secours : moteur utilisé si le premier échoue ('' pour aucun ; défaut : configuration).
     """
-    from reportlab.lib.pagesizes import A4
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.units import mm
-
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=A4)
+    configuration = configuration_rendu()
+    moteur = moteur or configuration['MOTEUR']
+    secours = configuration['SECOURS'] if secours is None else secours
+    budget = budget or budget_par_defaut()
+    if moteur not in MOTEURS:
+        raise ValueError(f"Moteur de rendu inconnu : {moteur}")
 
-    # En-tête
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(50, 800, "RAPPORT DE SOLVABILITÉ II")
-    p.setFont("Helvetica", 10)
-    p.drawString(50, 780, f"Compagnie: {compagnie.nom}")
-    p.drawString(50, 765, f"Date: {datetime.now().strftime('%d/%m/%Y')}")
+    try:
+        return _rendre_avec(moteur, rapport_type, compagnie, donnees, role_affiche, budget, series)
+    except Exception:
+        if not secours or secours == moteur:
+            raise
+        logger.warning("Rendu %s du rapport %s en échec, moteur de secours %s",
+                       moteur, rapport_type, secours, exc_info=True)
+    return _rendre_avec(secours, rapport_type, compagnie, donnees, role_affiche, budget, series)
 
-    # Résultats principaux
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, 730, "RÉSULTATS PRINCIPAUX")
-    p.setFont("Helvetica", 10)
 
-    y_position = 710
-    if hasattr(donnees, 'scr_total'):
-        p.drawString(50, y_position, f"SCR Total: {donnees.scr_total:,.2f} €")
-        y_position -= 15
+# =============================================
+# API HISTORIQUE
+# =============================================
 
-    if hasattr(donnees, 'fonds_propres_tier1'):
-        p.drawString(50, y_position, f"Fonds Propres Tier 1: {donnees.fonds_propres_tier1:,.2f} €")
-        y_position -= 15
+def generate_rapport_solvabilite_pdf(donnees, compagnie, rapport_type='DETAIL', moteur=None):
+    """
+    Génère un rapport PDF de solvabilité avec le moteur configuré
+    """
+    return rendre_rapport(rapport_type.lower(), compagnie, donnees, moteur=moteur)
 
-    if hasattr(donnees, 'ratio_solvabilite'):
-        statut = get_statut_ratio(donnees.ratio_solvabilite)
-        p.drawString(50, y_position, f"Ratio de Solvabilité: {donnees.ratio_solvabilite}% ({statut})")
-        y_position -= 15
 
-    p.save()
-    buffer.seek(0)
-    return buffer.getvalue()
+def generate_rapport_simple(donnees, compagnie):
+    """
+    Génère un rapport PDF de synthèse (voie rapide ReportLab)
+    """
+    return rendre_rapport('synthese', compagnie, donnees, moteur='reportlab')
 
 
 def get_statut_ratio(ratio):
-    """Détermine le statut basé sur le ratio"""
-    if ratio >= 180:
-        return "EXCELLENT"
-    elif ratio >= 150:
-        return "BON"
-    elif ratio >= 100:
-        return "SURVEILLANCE"
-    else:
-        return "CRITIQUE"
\ No newline at end of file
+    """Détermine le statut basé sur le ratio (mêmes seuils que le reste de l'application)"""
+    statut, _ = determiner_statut_solvabilite(ratio)
+    return statut
@@ -0,0 +1,451 @@
+"""
+Rendu ReportLab des rapports de solvabilité exportés en PDF.
+
+Moteur ReportLab des rapports, utilisé par défaut par utils/pdf_generator
+(export_rapport_pdf, commande generer_rapports) ; le gabarit xhtml2pdf en est
+l'alternative.
+Les styles de paragraphes et de tableaux sont construits une fois par
+processus ; un rapport est une suite de sections déclarées dans
+SECTIONS_PAR_TYPE, chacune produisant ses éléments à partir d'un contexte commun.
+"""
+import io
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from functools import lru_cache
+
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from ..services.indicateurs import determiner_statut_solvabilite
+from .graphiques_pdf import graphique_historique_ratio, graphique_repartition_modules
+
+# Flux de page compressés (zlib) sans ré-encodage ASCII85 : rendu plus rapide
+# et fichiers plus petits, lus par toutes les visionneuses PDF
+rl_config.useA85 = 0
+
+# Types de rapports proposés à l'export
+TYPES_RAPPORTS = ('synthese', 'detail', 'technique', 'risques')
+
+TITRES_RAPPORTS = {
+    'synthese': "RAPPORT DE SOLVABILITÉ - SYNTHÈSE",
+    'detail': "RAPPORT DE SOLVABILITÉ - DÉTAILLÉ",
+    'technique': "RAPPORT TECHNIQUE ACTUARIEL",
+    'risques': "RAPPORT D'ANALYSE DES RISQUES",
+}
+
+# Modules du SCR : (libellé, champ de DonneesSolvabilite)
+MODULES_SCR = [
+    ('Risque Marché', 'scr_marche'),
+    ('Risque Crédit', 'scr_credit'),
+    ('Risque Vie', 'scr_vie'),
+    ('Risque Non-Vie', 'scr_non_vie'),
+]
+
+# Points conservés par courbe (séries réduites par LTTB avant le rendu)
+NB_POINTS_GRAPHIQUES = 60
+
+MARGES_DOCUMENT = {'rightMargin': 72, 'leftMargin': 72, 'topMargin': 72, 'bottomMargin': 18}
+
+# Analyse selon le niveau de statut (couleur renvoyée par determiner_statut_solvabilite)
+ANALYSE_CRITIQUE = """
+<b>Analyse:</b> Situation critique nécessitant une intervention immédiate.<br/>
+<b>Recommandations:</b> Plan de redressement urgent. Augmentation de capital nécessaire.
+"""
+ANALYSES_STATUT = {
+    'success': """
+<b>Analyse:</b> La situation de solvabilité est excellente.
+Le ratio est bien au-dessus des exigences réglementaires.<br/>
+<b>Recommandations:</b> Maintenir la stratégie actuelle. Possibilité d'optimisation du capital.
+""",
+    'info': """
+<b>Analyse:</b> Situation conforme avec une marge de sécurité confortable.<br/>
+<b>Recommandations:</b> Surveillance continue. Renforcer la gestion des risques principaux.
+""",
+    'primary': """
+<b>Analyse:</b> Situation nécessitant une surveillance renforcée. Le ratio est proche du minimum requis.<br/>
+<b>Recommandations:</b> Plan d'action pour améliorer la solvabilité. Révision de la stratégie de risque.
+""",
+    'warning': ANALYSE_CRITIQUE,
+    'danger': ANALYSE_CRITIQUE,
+}
+
+
+# =============================================
+# STYLES (CONSTRUITS UNE FOIS PAR PROCESSUS)
+# =============================================
+
+@lru_cache(maxsize=None)
+def styles_rapport():
+    """Styles de paragraphes des rapports ; partagés, jamais modifiés après création"""
+    feuille = getSampleStyleSheet()
+    return {
+        'titre': ParagraphStyle(
+            'CustomTitle',
+            parent=feuille['Heading1'],
+            fontSize=16,
+            spaceAfter=30,
+            textColor=colors.HexColor('#2c3e50'),
+            alignment=1  # Centré
+        ),
+        'section': ParagraphStyle(
+            'CustomHeading',
+            parent=feuille['Heading2'],
+            fontSize=12,
+            spaceAfter=12,
+            textColor=colors.HexColor('#34495e')
+        ),
+        'normal': feuille['Normal'],
+        'italique': feuille['Italic'],
+    }
+
+
+def _style_tableau(fond_entete, taille_entete, fond_corps, grille, marge_entete=None, taille_corps=None):
+    commandes = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(fond_entete)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), taille_entete),
+    ]
+    if marge_entete is not None:
+        commandes.append(('BOTTOMPADDING', (0, 0), (-1, 0), marge_entete))
+    commandes.append(('BACKGROUND', (0, 1), (-1, -1), colors.HexColor(fond_corps)))
+    if taille_corps is not None:
+        commandes += [
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), taille_corps),
+        ]
+    commandes.append(('GRID', (0, 0), (-1, -1), 1, colors.HexColor(grille)))
+    return TableStyle(commandes)
+
+
+# Mises en page des tableaux : (style, largeurs de colonnes)
+TABLEAUX = {
+    'indicateurs': (
+        _style_tableau('#34495e', 12, '#ecf0f1', '#bdc3c7', marge_entete=12, taille_corps=10),
+        [2.5 * inch, 2 * inch, 2 * inch],
+    ),
+    'modules': (
+        _style_tableau('#34495e', 11, '#f8f9fa', '#dee2e6', marge_entete=10, taille_corps=9),
+        [2.5 * inch, 2 * inch, 1.5 * inch],
+    ),
+    'complement': (
+        _style_tableau('#7f8c8d', 10, '#f8f9fa', '#bdc3c7'),
+        [3 * inch, 3 * inch],
+    ),
+}
+
+
+def tableau(disposition, lignes):
+    style, largeurs = TABLEAUX[disposition]
+    table = Table(lignes, colWidths=largeurs)
+    table.setStyle(style)
+    return table
+
+
+# =============================================
+# CONTEXTE ET SECTIONS
+# =============================================
+
+class ContexteRapport:
+    """Données communes à toutes les sections d'un rapport"""
+
+    def __init__(self, rapport_type, compagnie, donnees, role_affiche=None, date_generation=None, series=None):
+        self.rapport_type = rapport_type
+        self.compagnie = compagnie
+        self.donnees = donnees
+        self.role_affiche = role_affiche
+        self.date_generation = date_generation or datetime.now()
+        # Séries réduites au format de services.indicateurs.series_graphiques
+        self.serie_ratio = ((series or {}).get('series') or {}).get('ratios')
+        if donnees:
+            self.ratio = float(donnees.ratio_solvabilite)
+            self.scr_total = float(donnees.total_scr)
+            self.mcr = float(donnees.mcr)
+            self.fonds_propres = float(donnees.fonds_propres)
+            self.statut, self.niveau_statut = determiner_statut_solvabilite(self.ratio)
+
+
+class Section(ABC):
+    """
+    Composant de rapport : titre optionnel, contenu, espacements.
+    avec_donnees : True (données requises), False (absence requise), None (toujours).
+    """
+    titre = None
+    espace_avant = 0
+    espace_apres = 0
+    avec_donnees = None
+
+    def applicable(self, contexte):
+        return self.avec_donnees is None or self.avec_donnees == bool(contexte.donnees)
+
+    @abstractmethod
+    def contenu(self, contexte, styles):
+        """Éléments Platypus propres à la section"""
+
+    def elements(self, contexte, styles):
+        elements = []
+        if self.espace_avant:
+            elements.append(Spacer(1, self.espace_avant))
+        if self.titre:
+            elements.append(Paragraph(self.titre, styles['section']))
+        elements.extend(self.contenu(contexte, styles))
+        if self.espace_apres:
+            elements.append(Spacer(1, self.espace_apres))
+        return elements
+
+
+class SectionTitre(Section):
+    espace_apres = 20
+
+    def contenu(self, contexte, styles):
+        titre = TITRES_RAPPORTS.get(
+            contexte.rapport_type, f"RAPPORT DE SOLVABILITÉ - {contexte.rapport_type.upper()}"
+        )
+        return [Paragraph(titre, styles['titre'])]
+
+
+class SectionInformations(Section):
+    espace_apres = 30
+
+    def contenu(self, contexte, styles):
+        date_rapport = contexte.date_generation.strftime('%d/%m/%Y %H:%M')
+        compagnie = contexte.compagnie
+        # Rapport partagé par profil : pas de nom d'utilisateur
+        if compagnie:
+            lignes = [
+                f"<b>Compagnie:</b> {compagnie.nom}",
+                f"<b>SIREN:</b> {compagnie.siren}",
+                f"<b>Type:</b> {compagnie.get_type_compagnie_display()}",
+                f"<b>Date du rapport:</b> {date_rapport}",
+            ]
+            if contexte.role_affiche:
+                lignes.append(f"<b>Généré pour le profil:</b> {contexte.role_affiche}")
+        else:
+            lignes = [f"<b>Date du rapport:</b> {date_rapport}"]
+            if contexte.role_affiche:
+                lignes.insert(0, f"<b>Profil:</b> {contexte.role_affiche}")
+        return [Paragraph('<br/>'.join(lignes), styles['normal'])]
+
+
+class SectionIndicateurs(Section):
+    titre = "INDICATEURS DE SOLVABILITÉ"
+    espace_apres = 20
+    avec_donnees = True
+
+    def contenu(self, contexte, styles):
+        marge = contexte.fonds_propres - contexte.scr_total
+        return [tableau('indicateurs', [
+            ['Indicateur', 'Valeur', 'Statut'],
+            ['Ratio de Solvabilité', f"{contexte.ratio:.1f}%", contexte.statut],
+            ['SCR Total', f"{contexte.scr_total:,.2f} €", 'Capital Requis'],
+            ['MCR', f"{contexte.mcr:,.2f} €", 'Minimum Réglementaire'],
+            ['Fonds Propres', f"{contexte.fonds_propres:,.2f} €", 'Capital Disponible'],
+            ['Marge de Solvabilité', f"{marge:,.2f} €", 'Excédent/Déficit'],
+        ])]
+
+
+class SectionRepartitionModules(Section):
+    titre = "RÉPARTITION DU SCR PAR MODULE DE RISQUE"
+    espace_apres = 25
+    avec_donnees = True
+
+    def contenu(self, contexte, styles):
+        donnees = contexte.donnees
+        montants = [(libelle, float(getattr(donnees, champ))) for libelle, champ in MODULES_SCR]
+        total_modules = sum(montant for _, montant in montants)
+
+        lignes = [['Module de Risque', 'Montant SCR (€)', 'Pourcentage']]
+        if total_modules > 0:
+            operationnel = float(donnees.scr_operational)
+            if operationnel > 0:
+                montants.append(('Risque Opérationnel', operationnel))
+            lignes += [
+                [libelle, f"{montant:,.2f}", f"{(montant / total_modules * 100):.1f}%"]
+                for libelle, montant in montants
+            ]
+        else:
+            lignes.append(['Aucune donnée disponible', '-', '-'])
+        return [tableau('modules', lignes)]
+
+
+class SectionGraphiqueRatio(Section):
+    titre = "ÉVOLUTION DU RATIO DE SOLVABILITÉ"
+    espace_apres = 20
+
+    def applicable(self, contexte):
+        return bool(contexte.serie_ratio) and len(contexte.serie_ratio['dates']) >= 2
+
+    def contenu(self, contexte, styles):
+        return [graphique_historique_ratio(contexte.serie_ratio['dates'], contexte.serie_ratio['valeurs'])]
+
+
+class SectionGraphiqueModules(Section):
+    espace_apres = 20
+    avec_donnees = True
+
+    def _montants(self, donnees):
+        champs = MODULES_SCR + [('Risque Opérationnel', 'scr_operational')]
+        return [(libelle.replace('Risque ', ''), float(getattr(donnees, champ))) for libelle, champ in champs]
+
+    def applicable(self, contexte):
+        return super().applicable(contexte) and sum(
+            valeur for _, valeur in self._montants(contexte.donnees) if valeur > 0
+        ) > 0
+
+    def contenu(self, contexte, styles):
+        return [graphique_repartition_modules(self._montants(contexte.donnees))]
+
+
+class SectionAnalyse(Section):
+    titre = "ANALYSE ET RECOMMANDATIONS"
+    avec_donnees = True
+
+    def contenu(self, contexte, styles):
+        return [Paragraph(ANALYSES_STATUT[contexte.niveau_statut], styles['normal'])]
+
+
+class SectionDonneesComplementaires(Section):
+    titre = "DONNÉES COMPLÉMENTAIRES"
+    espace_avant = 20
+    avec_donnees = True
+
+    def contenu(self, contexte, styles):
+        donnees = contexte.donnees
+        return [tableau('complement', [
+            ['Élément', 'Valeur'],
+            ['Prime Annuelle', f"{float(donnees.prime_annuelle):,.2f} €"],
+            ['Placements', f"{float(donnees.placements):,.2f} €"],
+            ['Immobilisations', f"{float(donnees.immobilisations):,.2f} €"],
+            ['Charges Sinistres', f"{float(donnees.charges_sinistres):,.2f} €"],
+            ['Date de référence', donnees.date_reference.strftime('%d/%m/%Y')],
+        ])]
+
+
+class SectionAucuneDonnee(Section):
+    titre = "AUCUNE DONNÉE DISPONIBLE"
+    avec_donnees = False
+
+    def contenu(self, contexte, styles):
+        return [
+            Spacer(1, 10),
+            Paragraph(
+                "Aucune donnée de solvabilité n'a été trouvée pour générer le rapport. "
+                "Veuillez effectuer des calculs SCR avant de générer un rapport.",
+                styles['normal']
+            ),
+        ]
+
+
+class SectionPiedDePage(Section):
+    espace_avant = 30
+
+    def contenu(self, contexte, styles):
+        return [Paragraph(
+            "<i>Rapport généré automatiquement par l'Application de Solvabilité II - "
+            f"{contexte.date_generation.strftime('%d/%m/%Y')}</i><br/>"
+            "<i>Ce document est confidentiel et destiné à un usage interne.</i>",
+            styles['italique']
+        )]
+
+
+SECTIONS_STANDARD = (
+    SectionTitre(),
+    SectionInformations(),
+    SectionIndicateurs(),
+    SectionGraphiqueRatio(),
+    SectionRepartitionModules(),
+    SectionGraphiqueModules(),
+    SectionAnalyse(),
+    SectionAucuneDonnee(),
+    SectionPiedDePage(),
+)
+
+SECTIONS_PAR_TYPE = {
+    'synthese': SECTIONS_STANDARD,
+    'detail': SECTIONS_STANDARD[:7] + (SectionDonneesComplementaires(),) + SECTIONS_STANDARD[7:],
+    'technique': SECTIONS_STANDARD,
+    'risques': SECTIONS_STANDARD,
+}
+
+
+# =============================================
+# RENDU
+# =============================================
+
+class BudgetRenduDepasse(Exception):
+    """Rendu interrompu : durée ou nombre de pages au-delà du budget"""
+
+
+class BudgetRendu:
+    """Limites d'un rendu : durée (secondes) et nombre de pages ; None = sans limite"""
+
+    def __init__(self, duree_max=None, pages_max=None):
+        self.duree_max = duree_max
+        self.pages_max = pages_max
+
+    def verifier(self, debut, pages):
+        if self.duree_max is not None and time.perf_counter() - debut > self.duree_max:
+            raise BudgetRenduDepasse(f"Durée de rendu supérieure à {self.duree_max} s")
+        if self.pages_max is not None and pages > self.pages_max:
+            raise BudgetRenduDepasse(f"Rapport de plus de {self.pages_max} pages")
+
+
+class DocumentBorne(SimpleDocTemplate):
+    """Document dont la construction s'arrête dès que le budget est dépassé"""
+
+    budget = None
+    debut = None
+
+    def afterFlowable(self, flowable):
+        if self.budget is not None:
+            self.budget.verifier(self.debut, self.page)
+
+
+def _elements_rapport(rapport_type, compagnie, donnees_recentes, role_affiche, series, styles):
+    contexte = ContexteRapport(rapport_type, compagnie, donnees_recentes, role_affiche, series=series)
+    elements = []
+    for section in SECTIONS_PAR_TYPE.get(rapport_type, SECTIONS_STANDARD):
+        if section.applicable(contexte):
+            elements.extend(section.elements(contexte, styles))
+    return elements
+
+
+def _construire(story, budget, debut):
+    buffer = io.BytesIO()
+    doc = DocumentBorne(buffer, pagesize=A4, **MARGES_DOCUMENT)
+    doc.budget = budget
+    doc.debut = debut
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def construire_rapport_pdf(rapport_type, compagnie, donnees_recentes, role_affiche=None, budget=None, series=None):
+    """
+    Construit le rapport PDF (octets) d'une compagnie pour un type de rapport et un profil.
+    series : séries réduites de la compagnie (graphiques), voir series_graphiques.
+    Lève BudgetRenduDepasse si un budget est fourni et dépassé.
+    """
+    debut = time.perf_counter()
+    story = _elements_rapport(rapport_type, compagnie, donnees_recentes, role_affiche, series, styles_rapport())
+    return _construire(story, budget, debut)
+
+
+def construire_pack_pdf(rapport_type, rapports, role_affiche=None, budget=None):
+    """
+    Un seul PDF regroupant le rapport de plusieurs compagnies, chacune sur une nouvelle page.
+    rapports : itérable de (compagnie, donnees_recentes, series).
+    """
+    debut = time.perf_counter()
+    styles = styles_rapport()
+    story = []
+    for compagnie, donnees_recentes, series in rapports:
+        if story:
+            story.append(PageBreak())
+        story.extend(_elements_rapport(rapport_type, compagnie, donnees_recentes, role_affiche, series, styles))
+    return _construire(story, budget, debut)
@@ -0,0 +1,108 @@
+"""
+Serveur HTTP factice des APIs externes, pour exercer les clients de
+services.external_apis hors production (pool de connexions, nouvelles
+tentatives, délais) sans dépendre des vrais services.
+
+Points d'accès :
+- POST /api/declarations/solvabilite -> {'reference': ...} (idempotent par
+  en-tête Idempotency-Key : un renvoi retourne la référence d'origine)
+- GET  /api/rates/risk-free          -> {'rate': ...}
+
+Le serveur parle HTTP/1.1 (keep-alive) et compte les connexions ouvertes :
+un client bien mutualisé en ouvre une par thread, pas une par requête.
+Une latence et un taux d'erreurs 503 peuvent être injectés.
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class GestionnaireFactice(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # En-têtes et corps sont écrits séparément : sans TCP_NODELAY, l'algorithme
+    # de Nagle ajoute ~40 ms par réponse sur une connexion conservée
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.compter('connexions')
+
+    def log_message(self, format, *args):
+        if self.server.verbeux:
+            super().log_message(format, *args)
+
+    def _repondre(self, statut, contenu):
+        corps = json.dumps(contenu).encode()
+        self.send_response(statut)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corps)))
+        if statut == 503:
+            self.send_header('Retry-After', '0')
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def _traiter(self, reponses):
+        longueur = int(self.headers.get('Content-Length') or 0)
+        if longueur:
+            self.rfile.read(longueur)
+        self.server.compter('requetes')
+        if self.server.latence:
+            time.sleep(self.server.latence)
+        if self.server.taux_erreur and random.random() < self.server.taux_erreur:
+            self.server.compter('erreurs')
+            return self._repondre(503, {'erreur': 'Service indisponible (injecté)'})
+        reponse = reponses.get(self.path.split('?')[0])
+        if reponse is None:
+            return self._repondre(404, {'erreur': 'Point d\'accès inconnu'})
+        return self._repondre(200, reponse())
+
+    def do_GET(self):
+        self._traiter({'/api/rates/risk-free': lambda: {'rate': self.server.taux_sans_risque}})
+
+    def do_POST(self):
+        self._traiter({'/api/declarations/solvabilite': lambda: {
+            'reference': self.server.reference(self.headers.get('Idempotency-Key'))}})
+
+
+class ServeurFactice(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, adresse, latence=0.0, taux_erreur=0.0, taux_sans_risque=0.025, verbeux=False):
+        super().__init__(adresse, GestionnaireFactice)
+        self.latence = latence
+        self.taux_erreur = taux_erreur
+        self.taux_sans_risque = taux_sans_risque
+        self.verbeux = verbeux
+        self._verrou = threading.Lock()
+        self.compteurs = {'connexions': 0, 'requetes': 0, 'erreurs': 0, 'declarations': 0}
+        self.references = {}
+
+    def compter(self, nom):
+        with self._verrou:
+            self.compteurs[nom] += 1
+
+    def reference(self, cle_idempotence):
+        """Référence de la déclaration ; un renvoi avec la même clé retrouve la première"""
+        with self._verrou:
+            if cle_idempotence in self.references:
+                return self.references[cle_idempotence]
+            self.compteurs['declarations'] += 1
+            reference = f"REF_{uuid.uuid4().hex[:12].upper()}"
+            if cle_idempotence:
+                self.references[cle_idempotence] = reference
+            return reference
+
+    @property
+    def url(self):
+        hote, port = self.server_address[:2]
+        return f'http://{hote}:{port}'
+
+
+def demarrer_serveur_factice(hote='127.0.0.1', port=0, **options):
+    """Serveur lancé dans un thread (port 0 : port libre) ; l'arrêter avec shutdown()"""
+    serveur = ServeurFactice((hote, port), **options)
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    return serveur
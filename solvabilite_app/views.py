@@ -1,26 +1,55 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm
-from django.db.models import Q, Sum, Avg, Max
-from django.http import HttpResponseForbidden, JsonResponse
+from django.db.models import Q, Sum, Avg, Max, Count, F
+from django.db.models.functions import Greatest
+from django.http import (
+    FileResponse, Http404, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+)
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
 from django.template.loader import render_to_string
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
 from django.core.paginator import Paginator
+from django.urls import reverse
 from .models import DonneesSolvabilite, CalculSCR, Compagnie, Utilisateur
+from .autorisations import (
+    a_permission, limiter_historique, peut_voir_compagnie, permissions_role, restreindre_aux_compagnies,
+    vision_globale
+)
 from .forms import InscriptionForm, DonneesSolvabiliteForm, CalculSCRForm, CalculSCRAvanceForm
+from .services.cache_indicateurs import cache_indicateurs
+from .services.cache_rapports import cache_rapports
+from .services.calcul_lot import TAILLE_LOT_MAX, traiter_lot
+from .services.declarations import date_reference_courante, envoi_en_cours, lancer_en_arriere_plan, progression
+from .services.donnees_marche import donnees_marche
+from .services.diffusion import (
+    AbonnementAsync, AbonnementThread, calculs_depuis, concentrateur, configuration_diffusion,
+    dernier_calcul_id, evenement_calcul, formater_sse
+)
+from .services.metriques import configuration_metriques, mesurer_calcul, registre
+from .services.indicateurs import (
+    determiner_statut_solvabilite, historique_compagnie, series_graphiques, synthese_compagnie
+)
+from .utils.pagination import paginer_par_curseur
+from .utils.pdf_generator import rendre_rapport, statistiques_rendu
+from .services.external_apis import metriques_api, sante_services
+from .utils.rapport_pdf import NB_POINTS_GRAPHIQUES, TYPES_RAPPORTS
 from decimal import Decimal
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 import csv
 from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
 import io
+import hashlib
+import hmac
+import time
+import zlib
+from asgiref.sync import sync_to_async
 from functools import wraps
 
 
@@ -28,32 +57,13 @@ from functools import wraps
 # DÉCORATEURS DE PERMISSIONS
 # =============================================
 
-def role_requis(roles_autorises):
-    """Décorateur pour restreindre l'accès aux rôles spécifiés"""
-
-    def decorator(view_func):
-        @wraps(view_func)
-        def _wrapped_view(request, *args, **kwargs):
-            if request.user.role not in roles_autorises:
-                messages.error(request, "Accès non autorisé pour votre rôle.")
-                return redirect('solvabilite_app:tableau_de_bord')
-            return view_func(request, *args, **kwargs)
-
-        return _wrapped_view
-
-    return decorator
-
-
 def permission_requise(permission_requise):
     """Décorateur basé sur les permissions métier"""
 
     def decorator(view_func):
         @wraps(view_func)
         def _wrapped_view(request, *args, **kwargs):
-            user_role = request.user.role
-            permissions = get_user_permissions(user_role)
-
-            if permission_requise not in permissions:
+            if not a_permission(request.user, permission_requise):
                 messages.error(request, "Vous n'avez pas les permissions nécessaires pour cette action.")
                 return redirect('solvabilite_app:tableau_de_bord')
             return view_func(request, *args, **kwargs)
@@ -64,21 +74,8 @@ def permission_requise(permission_requise):
 
 
 def get_user_permissions(role):
-    """Retourne les permissions selon le rôle"""
-    permissions_map = {
-        'ACTUAIRE': ['calcul_scr', 'calcul_avance', 'voir_indicateurs', 'exporter_rapports',
-                     'voir_rapports_techniques'],
-        'RISK_MANAGER': ['calcul_scr', 'voir_indicateurs', 'exporter_rapports', 'voir_rapports_risques',
-                         'gestion_risques'],
-        'CONTROLEUR': ['voir_indicateurs', 'exporter_rapports', 'voir_rapports_conformite'],
-        'DG': ['voir_indicateurs', 'exporter_rapports', 'voir_rapports_strategiques', 'prise_decision'],
-        'CLIENT': ['voir_indicateurs_publics', 'voir_rapports_publics'],
-        'CONSULTANT': ['voir_indicateurs', 'exporter_rapports', 'analyses_consultation'],
-        'REGULATEUR': ['voir_indicateurs', 'exporter_rapports', 'supervision', 'audit'],
-        'ADMIN': ['toutes_permissions'],
-        'RH': ['gestion_utilisateurs', 'voir_indicateurs_rh']
-    }
-    return permissions_map.get(role, [])
+    """Retourne les permissions selon le rôle (voir autorisations.PERMISSIONS_ROLES)"""
+    return permissions_role(role)
 
 
 # =============================================
@@ -140,30 +137,21 @@ def deconnexion(request):
 @login_required
 def tableau_de_bord(request):
     """Tableau de bord principal personnalisé par rôle"""
-    compagnie = getattr(request.user, 'compagnie', None)
+    compagnie = None
     donnees_recentes = None
     indicateurs = {}
+    synthese = None
     user_role = request.user.role
 
-    if compagnie:
-        donnees_recentes = DonneesSolvabilite.objects.filter(
-            compagnie=compagnie
-        ).order_by('-date_reference').first()
-
-        # Calcul des indicateurs
-        if donnees_recentes:
-            statut, couleur_statut = determiner_statut_solvabilite(donnees_recentes.ratio_solvabilite)
-            indicateurs = {
-                'ratio_solvabilite': donnees_recentes.ratio_solvabilite,
-                'scr_total': donnees_recentes.total_scr,
-                'mcr': donnees_recentes.mcr,
-                'statut': statut,
-                'couleur_statut': couleur_statut,
-                'fonds_propres': donnees_recentes.fonds_propres,
-            }
+    if request.user.compagnie_id:
+        # Servi depuis le cache tant que les données de la compagnie n'ont pas changé
+        synthese = synthese_compagnie(request.user.compagnie_id)
+        compagnie = synthese['compagnie']
+        donnees_recentes = synthese['donnees_recentes']
+        indicateurs = synthese['indicateurs']
 
     # Données spécifiques par rôle
-    donnees_specifiques = get_donnees_tableau_bord(user_role, compagnie, request.user)
+    donnees_specifiques = get_donnees_tableau_bord(user_role, compagnie, request.user, synthese)
 
     context = {
         'compagnie': compagnie,
@@ -171,21 +159,24 @@ def tableau_de_bord(request):
         'indicateurs': indicateurs,
         'user_role': user_role,
         'donnees_specifiques': donnees_specifiques,
-        'permissions': get_user_permissions(user_role)
+        'permissions': request.user.permissions_metier
     }
 
     return render(request, 'solvabilite_app/tableau_de_bord.html', context)
 
 
-def get_donnees_tableau_bord(role, compagnie, user):
+def get_donnees_tableau_bord(role, compagnie, user, synthese=None):
     """Retourne les données spécifiques au rôle pour le tableau de bord"""
     donnees = {}
 
     if role == 'ACTUAIRE':
         # Données pour les actuaires
-        donnees['calculs_recents'] = CalculSCR.objects.filter(
-            donnees__compagnie=compagnie
-        ).order_by('-date_calcul')[:5]
+        if synthese is not None:
+            donnees['calculs_recents'] = synthese['calculs_recents']
+        else:
+            donnees['calculs_recents'] = CalculSCR.objects.filter(
+                donnees__compagnie=compagnie
+            ).order_by('-date_calcul')[:5]
         donnees['alertes_calculs'] = [
             "Vérification des modèles requis",
             "Calcul du SCR trimestriel à planifier"
@@ -260,16 +251,11 @@ def get_donnees_tableau_bord(role, compagnie, user):
 # =============================================
 
 @login_required
-@role_requis(['ACTUAIRE', 'RISK_MANAGER', 'ADMIN'])
+@permission_requise('calcul_scr')
 def calcul_scr(request):
     """
     Vue pour le calcul standard du SCR - Réservé aux Actuaires, Risk Managers et Admin
     """
-    # Vérification supplémentaire dans la vue
-    if request.user.role not in ['ACTUAIRE', 'RISK_MANAGER', 'ADMIN']:
-        messages.error(request, "Accès réservé aux actuaires et risk managers.")
-        return redirect('solvabilite_app:tableau_de_bord')
-
     resultats = None
     compagnie_utilisateur = None
 
@@ -354,6 +340,9 @@ def calcul_scr(request):
                         'pourcentage': round((resultats['modules'][module] / total_modules) * 100, 1)
                     }
 
+            # Données de marché utilisées, avec leur fraîcheur (lecture non bloquante)
+            resultats['donnees_marche'] = donnees_marche.metadonnees()
+
             # Sauvegarde des résultats si l'utilisateur est authentifié et a une compagnie
             if request.user.is_authenticated and compagnie_utilisateur:
                 sauvegarder_calcul_scr(request.user, compagnie_utilisateur, resultats, 'STANDARD')
@@ -372,16 +361,11 @@ def calcul_scr(request):
 
 
 @login_required
-@role_requis(['ACTUAIRE', 'ADMIN'])
+@permission_requise('calcul_avance')
 def calcul_scr_avance(request):
     """
     Vue pour le calcul avancé du SCR - Réservé aux Actuaires et Admin seulement
     """
-    # Vérification supplémentaire
-    if request.user.role not in ['ACTUAIRE', 'ADMIN']:
-        messages.error(request, "Accès réservé aux actuaires.")
-        return redirect('solvabilite_app:tableau_de_bord')
-
     resultats = None
     compagnie_utilisateur = None
 
@@ -511,6 +495,8 @@ def calcul_scr_avance(request):
                         'pourcentage': round((resultats['modules'][module] / total_modules) * 100, 1)
                     }
 
+            resultats['donnees_marche'] = donnees_marche.metadonnees()
+
             # Sauvegarde des données détaillées
             if request.user.is_authenticated and compagnie_utilisateur:
                 sauvegarder_calcul_avance(request.user, compagnie_utilisateur, resultats)
@@ -530,6 +516,39 @@ def calcul_scr_avance(request):
     })
 
 
+TAILLE_PAGE_HISTORIQUE = 25
+
+
+@login_required
+def historique_calculs(request):
+    """Historique des calculs SCR, paginé par clé (date_calcul, id)"""
+    # Projection limitée : ni parametres_calcul ni details_risques (JSON volumineux)
+    calculs = CalculSCR.objects.select_related('donnees__compagnie').only(
+        'id', 'date_calcul', 'methode_calcul', 'resultat_scr', 'donnees',
+        'donnees__date_reference', 'donnees__fonds_propres', 'donnees__ratio_solvabilite', 'donnees__compagnie',
+        'donnees__compagnie__nom',
+    )
+    calculs = _restreindre_par_role(request, calculs, 'donnees__compagnie')
+    calculs = limiter_historique(calculs, request.user, 'donnees__date_reference')
+
+    curseur = request.GET.get('curseur')
+    try:
+        page, curseur_suivant, _ = paginer_par_curseur(calculs, ['date_calcul', 'id'], curseur=curseur,
+                                                       taille=TAILLE_PAGE_HISTORIQUE)
+    except ValueError:
+        messages.error(request, "Lien de pagination invalide, retour aux calculs les plus récents.")
+        curseur = None
+        page, curseur_suivant, _ = paginer_par_curseur(calculs, ['date_calcul', 'id'], taille=TAILLE_PAGE_HISTORIQUE)
+
+    return render(request, 'solvabilite_app/historique.html', {
+        'calculs': page,
+        'curseur_suivant': curseur_suivant,
+        'premiere_page': not curseur,
+        'vision_globale': vision_globale(request.user),
+        'user_role': request.user.role,
+    })
+
+
 # =============================================
 # INDICATEURS AVEC FILTRAGE PAR RÔLE
 # =============================================
@@ -537,81 +556,31 @@ def calcul_scr_avance(request):
 @login_required
 def indicateurs_solvabilite(request):
     """Vue pour afficher les indicateurs de solvabilité avec filtrage par rôle"""
-    compagnie = getattr(request.user, 'compagnie', None)
+    compagnie = None
     donnees = []
     user_role = request.user.role
-
-    if compagnie:
-        # Récupérer toutes les données selon le rôle
-        if user_role in ['CLIENT', 'CONSULTANT']:
-            # Clients et consultants : données limitées
-            toutes_donnees = DonneesSolvabilite.objects.filter(
-                compagnie=compagnie,
-                date_reference__gte=datetime.now() - timedelta(days=365)  # 12 derniers mois seulement
-            ).order_by('date_reference')
-        else:
-            # Autres rôles : toutes les données
-            toutes_donnees = DonneesSolvabilite.objects.filter(
-                compagnie=compagnie
-            ).order_by('date_reference')
-
-        # Prendre les 12 derniers mois seulement pour l'affichage
-        donnees = list(toutes_donnees[:12])
-
-        # Pour la dernière donnée, utiliser le queryset complet
-        derniere_donnee = toutes_donnees.last()
-    else:
-        derniere_donnee = None
-
-    # Préparation des données pour les graphiques
-    dates = []
-    ratios = []
-    scr_totals = []
-    fonds_propres_list = []
-    modules_data = {
-        'marche': [],
-        'credit': [],
-        'vie': [],
-        'non_vie': []
+    graphiques_data = {
+        'dates': [],
+        'ratios': [],
+        'scr_totals': [],
+        'fonds_propres': [],
+        'modules': {'marche': [], 'credit': [], 'vie': [], 'non_vie': []},
+        'repartition': {},
     }
 
-    for donnee in donnees:
-        dates.append(donnee.date_reference.strftime('%Y-%m'))
-        ratios.append(float(donnee.ratio_solvabilite))
-        scr_totals.append(float(donnee.total_scr))
-        fonds_propres_list.append(float(donnee.fonds_propres))
-
-        # Modules de risque (limités pour certains rôles)
-        if user_role not in ['CLIENT']:  # Les clients ne voient pas le détail des modules
-            modules_data['marche'].append(float(donnee.scr_marche))
-            modules_data['credit'].append(float(donnee.scr_credit))
-            modules_data['vie'].append(float(donnee.scr_vie))
-            modules_data['non_vie'].append(float(donnee.scr_non_vie))
-
-    # Dernière donnée pour la répartition (limitée pour clients)
-    repartition_modules = {}
-    if derniere_donnee and user_role not in ['CLIENT']:
-        total_scr = float(derniere_donnee.total_scr)
-        if total_scr > 0:
-            repartition_modules = {
-                'Marche': (float(derniere_donnee.scr_marche) / total_scr) * 100,
-                'Credit': (float(derniere_donnee.scr_credit) / total_scr) * 100,
-                'Vie': (float(derniere_donnee.scr_vie) / total_scr) * 100,
-                'Non-Vie': (float(derniere_donnee.scr_non_vie) / total_scr) * 100,
-            }
+    if request.user.compagnie_id:
+        # Données et séries filtrées par rôle, servies depuis le cache par compagnie
+        compagnie = synthese_compagnie(request.user.compagnie_id)['compagnie']
+        historique = historique_compagnie(request.user.compagnie_id, user_role)
+        donnees = historique['donnees']
+        graphiques_data = historique['graphiques_data']
 
     context = {
         'compagnie': compagnie,
         'donnees': donnees,
         'user_role': user_role,
-        'graphiques_data': {
-            'dates': dates,
-            'ratios': ratios,
-            'scr_totals': scr_totals,
-            'fonds_propres': fonds_propres_list,
-            'modules': modules_data,
-            'repartition': repartition_modules,
-        }
+        'graphiques_data': graphiques_data,
+        'permissions': request.user.permissions_metier,
     }
 
     return render(request, 'solvabilite_app/indicateurs.html', context)
@@ -625,302 +594,177 @@ def indicateurs_solvabilite(request):
 @permission_requise('exporter_rapports')
 def export_rapport_pdf(request, rapport_type):
     """Export de rapport en PDF avec vérification des permissions"""
-    user_role = request.user.role
+    # Type inconnu : ni rendu ni fichier en cache (la clé du cache inclut le type)
+    if rapport_type not in TYPES_RAPPORTS:
+        raise Http404("Type de rapport inconnu")
 
     # Vérification des permissions spécifiques par type de rapport
-    if rapport_type == 'technique' and user_role not in ['ACTUAIRE', 'ADMIN']:
+    if rapport_type == 'technique' and not a_permission(request.user, 'voir_rapports_techniques'):
         messages.error(request, "Accès aux rapports techniques réservé aux actuaires.")
         return redirect('solvabilite_app:tableau_de_bord')
 
-    elif rapport_type == 'risques' and user_role not in ['RISK_MANAGER', 'ADMIN', 'DG']:
+    elif rapport_type == 'risques' and not a_permission(request.user, 'voir_rapports_risques'):
         messages.error(request, "Accès aux rapports risques réservé aux risk managers et direction.")
         return redirect('solvabilite_app:tableau_de_bord')
 
+    compagnie = getattr(request.user, 'compagnie', None)
+    role_affiche = request.user.get_role_display()
+
+    # Un rapport ne dépend que de la compagnie, du type, du rôle et de l'état
+    # des données en base : il est rendu une fois puis resservi depuis le disque
+    cle = cache_rapports.cle(compagnie, rapport_type, request.user.role)
+    etag = f'W/"{cle}"'
+    reponse_conditionnelle = get_conditional_response(request, etag=etag)
+    if reponse_conditionnelle is not None:
+        reponse_conditionnelle['Cache-Control'] = 'private'
+        return reponse_conditionnelle
+
+    def generer():
+        if not compagnie:
+            return rendre_rapport(rapport_type, None, None, role_affiche)
+        # Relu en base : le fichier est partagé entre processus et ne doit pas
+        # figer une valeur du cache local en retard sur la clé
+        donnees_recentes = synthese_compagnie(compagnie.pk, rafraichir=True)['donnees_recentes']
+        series = series_graphiques(compagnie.pk, request.user.role, NB_POINTS_GRAPHIQUES, rafraichir=True)
+        return rendre_rapport(rapport_type, compagnie, donnees_recentes, role_affiche, series=series)
+
     try:
-        # Créer le buffer PDF
-        buffer = io.BytesIO()
-
-        # Créer le document PDF
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=18
-        )
+        fichier = cache_rapports.ouvrir(cle, generer)
+        filename = f"rapport_solvabilite_{rapport_type}_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
+        response = FileResponse(fichier, as_attachment=True, filename=filename, content_type='application/pdf')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private'
+        return response
 
-        # Styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            spaceAfter=30,
-            textColor=colors.HexColor('#2c3e50'),
-            alignment=1  # Centered
-        )
+    except Exception as e:
+        # En cas d'erreur, retourner un message d'erreur
+        messages.error(request, f"Erreur lors de la génération du PDF: {str(e)}")
+        return redirect('solvabilite_app:tableau_de_bord')
 
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=12,
-            spaceAfter=12,
-            textColor=colors.HexColor('#34495e')
-        )
 
-        normal_style = styles["Normal"]
+# Colonnes de l'export d'historique : (en-tête, expression values_list)
+COLONNES_EXPORT_HISTORIQUE = [
+    ('date_reference', 'date_reference'),
+    ('compagnie_siren', 'compagnie__siren'),
+    ('compagnie_nom', 'compagnie__nom'),
+    ('fonds_propres', 'fonds_propres'),
+    ('passif_technique', 'passif_technique'),
+    ('prime_annuelle', 'prime_annuelle'),
+    ('placements', 'placements'),
+    ('immobilisations', 'immobilisations'),
+    ('charges_sinistres', 'charges_sinistres'),
+    ('scr_marche', 'scr_marche'),
+    ('scr_credit', 'scr_credit'),
+    ('scr_vie', 'scr_vie'),
+    ('scr_non_vie', 'scr_non_vie'),
+    ('scr_operational', 'scr_operational'),
+    ('scr_total', 'scr_total'),
+    ('mcr', 'mcr'),
+    ('ratio_solvabilite', 'ratio_solvabilite'),
+    ('ecart_bilan', 'ecart_bilan'),
+    ('date_saisie', 'date_saisie'),
+]
+
+TAILLE_LOT_EXPORT = 2000
+
+
+class _TamponEcho:
+    """Pseudo-fichier pour csv.writer : renvoie la ligne au lieu de l'écrire"""
+
+    def write(self, valeur):
+        return valeur
+
+
+def _lignes_csv(entetes, lignes):
+    writer = csv.writer(_TamponEcho())
+    yield writer.writerow(entetes)
+    for ligne in lignes:
+        yield writer.writerow(ligne)
+
+
+def _lignes_jsonl(entetes, lignes):
+    for ligne in lignes:
+        yield json.dumps(
+            {entete: _serialiser_valeur(valeur) for entete, valeur in zip(entetes, ligne)},
+            default=str, ensure_ascii=False
+        ) + '\n'
+
+
+def _regrouper(morceaux, taille=64 * 1024):
+    """Regroupe les petites lignes en blocs d'environ 64 Ko encodés en UTF-8"""
+    tampon = []
+    longueur = 0
+    for morceau in morceaux:
+        tampon.append(morceau)
+        longueur += len(morceau)
+        if longueur >= taille:
+            yield ''.join(tampon).encode('utf-8')
+            tampon = []
+            longueur = 0
+    if tampon:
+        yield ''.join(tampon).encode('utf-8')
+
+
+def _compresser_gzip(blocs):
+    """Compression gzip à la volée, bloc par bloc"""
+    compresseur = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for bloc in blocs:
+        compresse = compresseur.compress(bloc)
+        if compresse:
+            yield compresse
+    yield compresseur.flush()
 
-        # Contenu du PDF
-        story = []
 
-        # Titre principal selon le type de rapport
-        if rapport_type == 'synthese':
-            title_text = "RAPPORT DE SOLVABILITÉ - SYNTHÈSE"
-        elif rapport_type == 'detail':
-            title_text = "RAPPORT DE SOLVABILITÉ - DÉTAILLÉ"
-        elif rapport_type == 'technique':
-            title_text = "RAPPORT TECHNIQUE ACTUARIEL"
-        elif rapport_type == 'risques':
-            title_text = "RAPPORT D'ANALYSE DES RISQUES"
-        else:
-            title_text = f"RAPPORT DE SOLVABILITÉ - {rapport_type.upper()}"
-
-        title = Paragraph(title_text, title_style)
-        story.append(title)
-        story.append(Spacer(1, 20))
-
-        # Informations de base
-        compagnie = getattr(request.user, 'compagnie', None)
-        if compagnie:
-            info_text = f"""
-            <b>Compagnie:</b> {compagnie.nom}<br/>
-            <b>SIREN:</b> {compagnie.siren}<br/>
-            <b>Type:</b> {compagnie.get_type_compagnie_display()}<br/>
-            <b>Date du rapport:</b> {datetime.now().strftime('%d/%m/%Y %H:%M')}<br/>
-            <b>Généré par:</b> {request.user.get_full_name()} ({request.user.get_role_display()})
-            """
-        else:
-            info_text = f"""
-            <b>Utilisateur:</b> {request.user.get_full_name()}<br/>
-            <b>Rôle:</b> {request.user.get_role_display()}<br/>
-            <b>Date du rapport:</b> {datetime.now().strftime('%d/%m/%Y %H:%M')}
-            """
-
-        info_paragraph = Paragraph(info_text, normal_style)
-        story.append(info_paragraph)
-        story.append(Spacer(1, 30))
-
-        # Données récentes
-        donnees_recentes = None
-        if compagnie:
-            donnees_recentes = DonneesSolvabilite.objects.filter(
-                compagnie=compagnie
-            ).order_by('-date_reference').first()
-
-        if donnees_recentes:
-            # Section indicateurs de solvabilité
-            story.append(Paragraph("INDICATEURS DE SOLVABILITÉ", heading_style))
-
-            # Calcul des indicateurs
-            ratio = float(donnees_recentes.ratio_solvabilite)
-            scr_total = float(donnees_recentes.total_scr)
-            mcr = float(donnees_recentes.mcr)
-            fonds_propres = float(donnees_recentes.fonds_propres)
+@login_required
+@permission_requise('exporter_rapports')
+def export_historique(request):
+    """
+    Export en flux (CSV ou JSONL, gzip optionnel) de tout l'historique de
+    solvabilité visible par l'utilisateur, en mémoire constante.
+    """
+    format_export = request.GET.get('format', 'csv')
+    if format_export not in ('csv', 'jsonl'):
+        return HttpResponseBadRequest("Format d'export inconnu (csv ou jsonl)")
 
-            # Détermination du statut
-            if ratio >= 180:
-                statut = "Très Solide"
-                couleur_statut = "#27ae60"
-            elif ratio >= 150:
-                statut = "Solide"
-                couleur_statut = "#2ecc71"
-            elif ratio >= 120:
-                statut = "Conforme"
-                couleur_statut = "#3498db"
-            elif ratio >= 100:
-                statut = "Surveillance"
-                couleur_statut = "#f39c12"
-            else:
-                statut = "Non Conforme"
-                couleur_statut = "#e74c3c"
-
-            # Tableau des indicateurs principaux
-            indicateurs_data = [
-                ['Indicateur', 'Valeur', 'Statut'],
-                ['Ratio de Solvabilité', f"{ratio:.1f}%", statut],
-                ['SCR Total', f"{scr_total:,.2f} €", 'Capital Requis'],
-                ['MCR', f"{mcr:,.2f} €", 'Minimum Réglementaire'],
-                ['Fonds Propres', f"{fonds_propres:,.2f} €", 'Capital Disponible'],
-                ['Marge de Solvabilité', f"{(fonds_propres - scr_total):,.2f} €", 'Excédent/Déficit']
-            ]
-
-            indicateurs_table = Table(indicateurs_data, colWidths=[2.5 * inch, 2 * inch, 2 * inch])
-            indicateurs_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#34495e')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#ecf0f1')),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 10),
-                ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#bdc3c7'))
-            ]))
-
-            story.append(indicateurs_table)
-            story.append(Spacer(1, 20))
-
-            # Répartition des risques
-            story.append(Paragraph("RÉPARTITION DU SCR PAR MODULE DE RISQUE", heading_style))
-
-            # Calcul des pourcentages
-            total_scr_modules = sum([
-                float(donnees_recentes.scr_marche),
-                float(donnees_recentes.scr_credit),
-                float(donnees_recentes.scr_vie),
-                float(donnees_recentes.scr_non_vie)
-            ])
-
-            if total_scr_modules > 0:
-                modules_data = [
-                    ['Module de Risque', 'Montant SCR (€)', 'Pourcentage'],
-                    ['Risque Marché', f"{float(donnees_recentes.scr_marche):,.2f}",
-                     f"{(float(donnees_recentes.scr_marche) / total_scr_modules * 100):.1f}%"],
-                    ['Risque Crédit', f"{float(donnees_recentes.scr_credit):,.2f}",
-                     f"{(float(donnees_recentes.scr_credit) / total_scr_modules * 100):.1f}%"],
-                    ['Risque Vie', f"{float(donnees_recentes.scr_vie):,.2f}",
-                     f"{(float(donnees_recentes.scr_vie) / total_scr_modules * 100):.1f}%"],
-                    ['Risque Non-Vie', f"{float(donnees_recentes.scr_non_vie):,.2f}",
-                     f"{(float(donnees_recentes.scr_non_vie) / total_scr_modules * 100):.1f}%"]
-                ]
-
-                if float(donnees_recentes.scr_operational) > 0:
-                    modules_data.append([
-                        'Risque Opérationnel',
-                        f"{float(donnees_recentes.scr_operational):,.2f}",
-                        f"{(float(donnees_recentes.scr_operational) / total_scr_modules * 100):.1f}%"
-                    ])
-            else:
-                modules_data = [
-                    ['Module de Risque', 'Montant SCR (€)', 'Pourcentage'],
-                    ['Aucune donnée disponible', '-', '-']
-                ]
-
-            modules_table = Table(modules_data, colWidths=[2.5 * inch, 2 * inch, 1.5 * inch])
-            modules_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#34495e')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 11),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-                ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#dee2e6'))
-            ]))
-
-            story.append(modules_table)
-            story.append(Spacer(1, 25))
-
-            # Analyse et recommandations
-            story.append(Paragraph("ANALYSE ET RECOMMANDATIONS", heading_style))
-
-            if ratio >= 180:
-                analyse_text = """
-                <b>Analyse:</b> La situation de solvabilité est excellente. Le ratio est bien au-dessus des exigences réglementaires.<br/>
-                <b>Recommandations:</b> Maintenir la stratégie actuelle. Possibilité d'optimisation du capital.
-                """
-            elif ratio >= 150:
-                analyse_text = """
-                <b>Analyse:</b> Situation conforme avec une marge de sécurité confortable.<br/>
-                <b>Recommandations:</b> Surveillance continue. Renforcer la gestion des risques principaux.
-                """
-            elif ratio >= 120:
-                analyse_text = """
-                <b>Analyse:</b> Situation nécessitant une surveillance renforcée. Le ratio est proche du minimum requis.<br/>
-                <b>Recommandations:</b> Plan d'action pour améliorer la solvabilité. Révision de la stratégie de risque.
-                """
-            else:
-                analyse_text = """
-                <b>Analyse:</b> Situation critique nécessitant une intervention immédiate.<br/>
-                <b>Recommandations:</b> Plan de redressement urgent. Augmentation de capital nécessaire.
-                """
-
-            analyse_paragraph = Paragraph(analyse_text, normal_style)
-            story.append(analyse_paragraph)
-
-            # Données complémentaires pour rapport détaillé
-            if rapport_type == 'detail':
-                story.append(Spacer(1, 20))
-                story.append(Paragraph("DONNÉES COMPLÉMENTAIRES", heading_style))
-
-                complement_data = [
-                    ['Élément', 'Valeur'],
-                    ['Prime Annuelle', f"{float(donnees_recentes.prime_annuelle):,.2f} €"],
-                    ['Placements', f"{float(donnees_recentes.placements):,.2f} €"],
-                    ['Immobilisations', f"{float(donnees_recentes.immobilisations):,.2f} €"],
-                    ['Charges Sinistres', f"{float(donnees_recentes.charges_sinistres):,.2f} €"],
-                    ['Date de référence', donnees_recentes.date_reference.strftime('%d/%m/%Y')]
-                ]
-
-                complement_table = Table(complement_data, colWidths=[3 * inch, 3 * inch])
-                complement_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#7f8c8d')),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 10),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#bdc3c7'))
-                ]))
-
-                story.append(complement_table)
+    colonnes = COLONNES_EXPORT_HISTORIQUE
+    if request.user.role == 'CLIENT':
+        colonnes = [(entete, expr) for entete, expr in colonnes if entete in CHAMPS_API_PUBLICS]
 
-        else:
-            # Aucune donnée disponible
-            story.append(Paragraph("AUCUNE DONNÉE DISPONIBLE", heading_style))
-            story.append(Spacer(1, 10))
-            story.append(Paragraph(
-                "Aucune donnée de solvabilité n'a été trouvée pour générer le rapport. "
-                "Veuillez effectuer des calculs SCR avant de générer un rapport.",
-                normal_style
-            ))
-
-        # Pied de page
-        story.append(Spacer(1, 30))
-        footer_text = f"""
-        <i>Rapport généré automatiquement par l'Application de Solvabilité II - {datetime.now().strftime('%d/%m/%Y')}</i><br/>
-        <i>Ce document est confidentiel et destiné à un usage interne.</i>
-        """
-        footer_paragraph = Paragraph(footer_text, styles["Italic"])
-        story.append(footer_paragraph)
-
-        # Générer le PDF
-        doc.build(story)
-
-        # Récupérer le PDF du buffer
-        pdf = buffer.getvalue()
-        buffer.close()
-
-        # CRÉER LA RÉPONSE HTTP (PARTIE MANQUANTE)
-        response = HttpResponse(content_type='application/pdf')
-        filename = f"rapport_solvabilite_{rapport_type}_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        response.write(pdf)
+    queryset = _restreindre_par_role(request, DonneesSolvabilite.objects.with_totals(), 'compagnie')
+    queryset = limiter_historique(queryset, request.user, 'date_reference')
+    try:
+        queryset = _filtrer_periode(request, queryset, 'date_reference')
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    entetes = [entete for entete, _ in colonnes]
+    lignes = queryset.order_by('compagnie_id', 'date_reference', 'id').values_list(
+        *[expr for _, expr in colonnes]
+    ).iterator(chunk_size=TAILLE_LOT_EXPORT)
+
+    if format_export == 'csv':
+        contenu = _regrouper(_lignes_csv(entetes, lignes))
+        content_type = 'text/csv; charset=utf-8'
+    else:
+        contenu = _regrouper(_lignes_jsonl(entetes, lignes))
+        content_type = 'application/x-ndjson; charset=utf-8'
+
+    filename = f"historique_solvabilite_{datetime.now().strftime('%Y%m%d_%H%M')}.{format_export}"
+    if request.GET.get('gzip') in ('1', 'true', 'oui'):
+        contenu = _compresser_gzip(contenu)
+        content_type = 'application/gzip'
+        filename += '.gz'
+
+    response = StreamingHttpResponse(contenu, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
-        return response
 
-    except Exception as e:
-        # En cas d'erreur, retourner un message d'erreur
-        messages.error(request, f"Erreur lors de la génération du PDF: {str(e)}")
-        return redirect('solvabilite_app:tableau_de_bord')
 # =============================================
 # FONCTIONS UTILITAIRES (inchangées)
 # =============================================
 
+@mesurer_calcul('scr')
 def calculer_scr_standard(scr_marche, scr_credit, scr_vie, scr_non_vie, scr_operational=0):
     """Calcule le SCR total selon la formule standard Solvabilité II"""
     scr_marche = float(scr_marche)
@@ -949,6 +793,7 @@ def calculer_scr_standard(scr_marche, scr_credit, scr_vie, scr_non_vie, scr_oper
     return scr_total
 
 
+@mesurer_calcul('mcr')
 def calculer_mcr(scr, prime_annuelle, passif_technique):
     """Calcule le Minimum Capital Requirement selon Solvabilité II"""
     scr_decimal = Decimal(str(scr))
@@ -966,18 +811,10 @@ def calculer_mcr(scr, prime_annuelle, passif_technique):
     return float(mcr_final)
 
 
-def determiner_statut_solvabilite(ratio):
-    """Détermine le statut de solvabilité basé sur le ratio"""
-    if ratio >= 180:
-        return "Très Solide", "success"
-    elif ratio >= 150:
-        return "Solide", "info"
-    elif ratio >= 120:
-        return "Conforme", "primary"
-    elif ratio >= 100:
-        return "Surveillance", "warning"
-    else:
-        return "Non Conforme", "danger"
+def publier_calcul(calcul, donnees):
+    """Diffuse le calcul aux tableaux de bord ouverts, une fois la transaction validée"""
+    evenement = evenement_calcul(calcul, donnees)
+    transaction.on_commit(lambda: concentrateur.publier(donnees.compagnie_id, evenement))
 
 
 def sauvegarder_calcul_scr(utilisateur, compagnie, resultats, methode):
@@ -1002,12 +839,13 @@ def sauvegarder_calcul_scr(utilisateur, compagnie, resultats, methode):
             ratio_solvabilite=resultats['ratio']
         )
 
-        CalculSCR.objects.create(
+        calcul = CalculSCR.objects.create(
             donnees=donnees,
             methode_calcul=methode,
             parametres_calcul=resultats,
             resultat_scr=resultats['scr']
         )
+        publier_calcul(calcul, donnees)
 
     except Exception as e:
         print(f"Erreur sauvegarde calcul SCR: {str(e)}")
@@ -1052,12 +890,13 @@ def sauvegarder_calcul_avance(utilisateur, compagnie, resultats):
             details_risques=resultats['sous_risques']
         )
 
-        CalculSCR.objects.create(
+        calcul = CalculSCR.objects.create(
             donnees=donnees,
             methode_calcul="AVANCE",
             parametres_calcul=resultats,
             resultat_scr=resultats['scr']
         )
+        publier_calcul(calcul, donnees)
 
     except Exception as e:
         print(f"Erreur sauvegarde calcul avancé: {str(e)}")
@@ -1073,10 +912,26 @@ def saisie_donnees(request):
     return render(request, 'solvabilite_app/saisie_donnees.html')
 
 
+def contexte_tableau_bord_executive(synthese):
+    """Contexte du tableau de bord exécutif à partir de la synthèse de la compagnie"""
+    donnees = synthese['donnees_recentes'] if synthese else None
+    if not donnees:
+        return {'derniere_donnee': None}
+
+    statut, _ = determiner_statut_solvabilite(donnees.ratio_solvabilite)
+    return {
+        'derniere_donnee': donnees,
+        'total_scr': round(donnees.total_scr, 2),
+        'ratio_scr': donnees.ratio_solvabilite,
+        'statut_scr': statut,
+    }
+
+
 @login_required
 def tableau_bord_executive(request):
     """Tableau de bord exécutif"""
-    return render(request, 'solvabilite_app/tableau_bord_executive.html')
+    synthese = synthese_compagnie(request.user.compagnie_id) if request.user.compagnie_id else None
+    return render(request, 'solvabilite_app/tableau_bord_executive.html', contexte_tableau_bord_executive(synthese))
 
 
 @login_required
@@ -1085,13 +940,466 @@ def tableau_bord_graphiques(request):
     return render(request, 'solvabilite_app/tableau_bord_graphiques.html')
 
 
+def _date_reference_demandee(request):
+    valeur = request.POST.get('date_reference') or request.GET.get('date_reference')
+    return datetime.strptime(valeur, '%Y-%m-%d').date() if valeur else date_reference_courante()
+
+
 @login_required
 def envoyer_declaration_regulateur(request):
-    """Envoi de déclaration au régulateur"""
-    return HttpResponse("Déclaration envoyée")
+    """
+    Lance (POST) l'envoi en arrière-plan des déclarations de toutes les
+    compagnies pour une date de référence (la plus récente par défaut).
+    La progression se suit sur api_progression_declarations.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'erreur': "Méthode non autorisée"}, status=405)
+    if not a_permission(request.user, 'envoyer_declarations'):
+        return JsonResponse({'erreur': "Accès réservé aux administrateurs"}, status=403)
+    try:
+        date_reference = _date_reference_demandee(request)
+    except ValueError:
+        return JsonResponse({'erreur': "date_reference attendue au format AAAA-MM-JJ"}, status=400)
+    if date_reference is None:
+        return JsonResponse({'erreur': "Aucune donnée à déclarer"}, status=404)
+
+    if not lancer_en_arriere_plan(date_reference):
+        return JsonResponse({'erreur': "Un envoi est déjà en cours"}, status=409)
+    suivi = f"{reverse('solvabilite_app:api_progression_declarations')}?date_reference={date_reference.isoformat()}"
+    return JsonResponse({'message': "Envoi des déclarations lancé", 'progression': suivi}, status=202)
+
+
+@login_required
+def api_progression_declarations(request):
+    """Progression de l'envoi des déclarations d'une date de référence (administrateurs, régulateur)"""
+    if not vision_globale(request.user):
+        return JsonResponse({'erreur': "Accès non autorisé"}, status=403)
+    try:
+        date_reference = _date_reference_demandee(request)
+    except ValueError:
+        return JsonResponse({'erreur': "date_reference attendue au format AAAA-MM-JJ"}, status=400)
+    if date_reference is None:
+        return JsonResponse({'erreur': "Aucune donnée à déclarer"}, status=404)
+    etat = progression(date_reference)
+    etat['envoi_en_cours'] = envoi_en_cours()
+    return JsonResponse(etat)
+
+
+# =============================================
+# API JSON (lecture seule)
+# =============================================
+
+TAILLE_PAGE_API = 100
+TAILLE_PAGE_API_MAX = 1000
+
+CHAMPS_API_INDICATEURS = {
+    'id': 'id',
+    'date_reference': 'date_reference',
+    'date_saisie': 'date_saisie',
+    'compagnie_siren': F('compagnie__siren'),
+    'compagnie_nom': F('compagnie__nom'),
+    'type_compagnie': F('compagnie__type_compagnie'),
+    'fonds_propres': 'fonds_propres',
+    'passif_technique': 'passif_technique',
+    'prime_annuelle': 'prime_annuelle',
+    'placements': 'placements',
+    'immobilisations': 'immobilisations',
+    'charges_sinistres': 'charges_sinistres',
+    'scr_marche': 'scr_marche',
+    'scr_credit': 'scr_credit',
+    'scr_vie': 'scr_vie',
+    'scr_non_vie': 'scr_non_vie',
+    'scr_operational': 'scr_operational',
+    'scr_total': 'scr_total',
+    'mcr': 'mcr',
+    'ratio_solvabilite': 'ratio_solvabilite',
+    'actif_total': 'actif_total',
+    'passif_total': 'passif_total',
+    'ecart_bilan': 'ecart_bilan',
+}
+
+CHAMPS_API_CALCULS = {
+    'id': 'id',
+    'date_calcul': 'date_calcul',
+    'methode_calcul': 'methode_calcul',
+    'resultat_scr': 'resultat_scr',
+    'parametres_calcul': 'parametres_calcul',
+    'date_reference': F('donnees__date_reference'),
+    'compagnie_siren': F('donnees__compagnie__siren'),
+    'compagnie_nom': F('donnees__compagnie__nom'),
+    'type_compagnie': F('donnees__compagnie__type_compagnie'),
+    'fonds_propres': F('donnees__fonds_propres'),
+    'mcr': F('donnees__mcr'),
+    'ratio_solvabilite': F('donnees__ratio_solvabilite'),
+}
+
+# Champs visibles par les clients (pas de détail des modules de risque)
+CHAMPS_API_PUBLICS = {'id', 'date_reference', 'date_calcul', 'compagnie_siren', 'compagnie_nom',
+                      'type_compagnie', 'fonds_propres', 'scr_total', 'resultat_scr', 'mcr',
+                      'ratio_solvabilite'}
+
+CHAMPS_API_INDICATEURS_DEFAUT = ['date_reference', 'compagnie_siren', 'fonds_propres', 'scr_total', 'mcr',
+                                 'ratio_solvabilite']
+CHAMPS_API_CALCULS_DEFAUT = ['date_calcul', 'methode_calcul', 'resultat_scr', 'date_reference',
+                             'compagnie_siren', 'ratio_solvabilite']
+
+
+def _restreindre_par_role(request, queryset, champ_compagnie):
+    """Limite un queryset aux compagnies visibles par l'utilisateur, puis aux filtres ?compagnie / ?type"""
+    queryset = restreindre_aux_compagnies(queryset, request.user, champ_compagnie)
+
+    siren = request.GET.get('compagnie')
+    if siren:
+        queryset = queryset.filter(**{f'{champ_compagnie}__siren': siren})
+
+    type_compagnie = request.GET.get('type')
+    if type_compagnie:
+        queryset = queryset.filter(**{f'{champ_compagnie}__type_compagnie': type_compagnie})
+
+    return queryset
+
+
+def _filtrer_periode(request, queryset, champ_date):
+    """Applique les filtres date_debut / date_fin (format AAAA-MM-JJ)"""
+    for parametre, lookup in (('date_debut', 'gte'), ('date_fin', 'lte')):
+        valeur = request.GET.get(parametre)
+        if valeur:
+            try:
+                date_valeur = datetime.strptime(valeur, '%Y-%m-%d').date()
+            except ValueError:
+                raise ValueError(f"Paramètre {parametre} invalide (format attendu AAAA-MM-JJ)")
+            queryset = queryset.filter(**{f'{champ_date}__{lookup}': date_valeur})
+    return queryset
+
+
+def _champs_demandes(request, champs_disponibles, champs_defaut):
+    """Résout le paramètre ?champs=a,b,c en tenant compte du rôle"""
+    demandes = [c for c in request.GET.get('champs', '').split(',') if c] or champs_defaut
+    inconnus = [c for c in demandes if c not in champs_disponibles]
+    if inconnus:
+        raise ValueError(f"Champs inconnus : {', '.join(inconnus)}")
+    if request.user.role == 'CLIENT':
+        interdits = [c for c in demandes if c not in CHAMPS_API_PUBLICS]
+        if interdits:
+            raise PermissionError(f"Champs non autorisés pour votre rôle : {', '.join(interdits)}")
+    return demandes
+
+
+def _taille_page(request):
+    try:
+        taille = int(request.GET.get('limite', TAILLE_PAGE_API))
+    except ValueError:
+        raise ValueError("Paramètre limite invalide")
+    return max(1, min(taille, TAILLE_PAGE_API_MAX))
+
+
+def _serialiser_valeur(valeur):
+    if isinstance(valeur, Decimal):
+        return float(valeur)
+    return valeur
+
+
+def _reponse_api_paginee(request, queryset, champs_disponibles, champs_defaut, cle_tri, champ_maj):
+    """
+    Réponse JSON commune aux API : sélection de champs, pagination par clé
+    (cle_tri, id) et GET conditionnel (ETag / Last-Modified) calculé sur champ_maj
+    (champ ou expression de date de dernière modification des lignes).
+    """
+    try:
+        champs = _champs_demandes(request, champs_disponibles, champs_defaut)
+        taille = _taille_page(request)
+    except ValueError as e:
+        return JsonResponse({'erreur': str(e)}, status=400)
+    except PermissionError as e:
+        return JsonResponse({'erreur': str(e)}, status=403)
+
+    # Une seule agrégation suffit à décider du 304 : aucune ligne n'est sérialisée
+    etat = queryset.aggregate(derniere_maj=Max(champ_maj), total=Count('id'))
+    derniere_maj = etat['derniere_maj']
+    signature = '|'.join([
+        str(derniere_maj.timestamp() if derniere_maj else ''),
+        str(etat['total']),
+        request.user.role,
+        str(request.user.compagnie_id),
+        request.GET.urlencode(),
+    ])
+    etag = quote_etag(hashlib.md5(signature.encode('utf-8')).hexdigest())
+    last_modified = int(derniere_maj.timestamp()) if derniere_maj else None
+
+    reponse_conditionnelle = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if reponse_conditionnelle is not None:
+        patch_vary_headers(reponse_conditionnelle, ['Cookie'])
+        return reponse_conditionnelle
+
+    cles = list(dict.fromkeys(champs + [cle_tri, 'id']))
+    simples = [c for c in cles if isinstance(champs_disponibles[c], str) and champs_disponibles[c] == c]
+    expressions = {c: champs_disponibles[c] for c in cles if c not in simples}
+
+    try:
+        lignes, curseur_suivant, curseur_precedent = paginer_par_curseur(
+            queryset.values(*simples, **expressions),
+            [cle_tri, 'id'],
+            curseur=request.GET.get('curseur'),
+            taille=taille,
+            valeurs=True,
+            avant=request.GET.get('avant'),
+        )
+    except ValueError as e:
+        return JsonResponse({'erreur': str(e)}, status=400)
+
+    resultats = [{champ: _serialiser_valeur(ligne[champ]) for champ in champs} for ligne in lignes]
+    response = JsonResponse({
+        'resultats': resultats,
+        'nombre': len(resultats),
+        'curseur_suivant': curseur_suivant,
+        'curseur_precedent': curseur_precedent,
+    })
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ['Cookie'])
+    return response
 
 
 @login_required
 def api_indicateurs(request):
-    """API pour les indicateurs"""
-    return JsonResponse({'status': 'ok'})
\ No newline at end of file
+    """API des indicateurs de solvabilité (DonneesSolvabilite), paginée par (date_reference, id)"""
+    queryset = _restreindre_par_role(request, DonneesSolvabilite.objects.with_totals(), 'compagnie')
+    queryset = limiter_historique(queryset, request.user, 'date_reference')
+
+    try:
+        queryset = _filtrer_periode(request, queryset, 'date_reference')
+    except ValueError as e:
+        return JsonResponse({'erreur': str(e)}, status=400)
+
+    return _reponse_api_paginee(request, queryset, CHAMPS_API_INDICATEURS, CHAMPS_API_INDICATEURS_DEFAUT,
+                                'date_reference', 'date_modification')
+
+
+@login_required
+def api_calculs(request):
+    """API de l'historique des calculs SCR (CalculSCR), paginée par (date_calcul, id)"""
+    queryset = _restreindre_par_role(request, CalculSCR.objects.all(), 'donnees__compagnie')
+    queryset = limiter_historique(queryset, request.user, 'donnees__date_reference')
+
+    methode = request.GET.get('methode')
+    if methode:
+        queryset = queryset.filter(methode_calcul=methode)
+
+    try:
+        queryset = _filtrer_periode(request, queryset, 'donnees__date_reference')
+    except ValueError as e:
+        return JsonResponse({'erreur': str(e)}, status=400)
+
+    return _reponse_api_paginee(request, queryset, CHAMPS_API_CALCULS, CHAMPS_API_CALCULS_DEFAUT,
+                                'date_calcul', Greatest('date_calcul', 'donnees__date_modification'))
+
+
+NB_POINTS_GRAPHIQUES_DEFAUT = 200
+NB_POINTS_GRAPHIQUES_MAX = 2000
+
+
+@login_required
+def api_graphiques(request):
+    """Séries des graphiques d'indicateurs, réduites côté serveur à ?points=N (LTTB)"""
+    if not request.user.compagnie_id:
+        return JsonResponse({'erreur': "Aucune compagnie associée à votre compte"}, status=404)
+
+    try:
+        nb_points = int(request.GET.get('points', NB_POINTS_GRAPHIQUES_DEFAUT))
+    except ValueError:
+        return JsonResponse({'erreur': "Paramètre points invalide"}, status=400)
+    nb_points = max(3, min(nb_points, NB_POINTS_GRAPHIQUES_MAX))
+
+    donnees = series_graphiques(request.user.compagnie_id, request.user.role, nb_points)
+    return JsonResponse({'points': nb_points, **donnees})
+
+
+# Corps JSON / CSV d'un lot : lu directement, hors limite DATA_UPLOAD_MAX_MEMORY_SIZE
+TAILLE_CORPS_LOT_MAX = 32 * 1024 * 1024
+
+
+def _lire_lignes_lot(request):
+    """Lignes d'un lot depuis un corps JSON, un corps CSV ou un fichier CSV envoyé (champ 'fichier')"""
+    if 'fichier' in request.FILES:
+        contenu = request.FILES['fichier'].read(TAILLE_CORPS_LOT_MAX + 1)
+        format_lot = 'csv'
+    else:
+        contenu = request.read(TAILLE_CORPS_LOT_MAX + 1)
+        format_lot = 'csv' if request.content_type in ('text/csv', 'application/csv') else 'json'
+    if len(contenu) > TAILLE_CORPS_LOT_MAX:
+        raise ValueError("Lot trop volumineux")
+
+    texte = contenu.decode('utf-8-sig')
+    if format_lot == 'csv':
+        return list(csv.DictReader(io.StringIO(texte), delimiter=';' if ';' in texte.split('\n', 1)[0] else ','))
+
+    corps = json.loads(texte)
+    if isinstance(corps, dict):
+        corps = corps.get('lignes')
+    if not isinstance(corps, list):
+        raise ValueError("Le corps doit être une liste de lignes ou un objet {\"lignes\": [...]}")
+    return corps
+
+
+@login_required
+def api_calcul_lot(request):
+    """
+    Calcul SCR avancé par lots (POST JSON ou CSV, TAILLE_LOT_MAX lignes au plus).
+    Les lignes valides sont enregistrées ensemble ; ?tout_ou_rien=1 n'enregistre
+    rien dès qu'une ligne est invalide.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'erreur': "Méthode non autorisée"}, status=405)
+    if not a_permission(request.user, 'calcul_avance'):
+        return JsonResponse({'erreur': "Accès réservé aux actuaires"}, status=403)
+
+    try:
+        lignes = _lire_lignes_lot(request)
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return JsonResponse({'erreur': f"Lot illisible : {e}"}, status=400)
+    if not lignes:
+        return JsonResponse({'erreur': "Le lot est vide"}, status=400)
+    if len(lignes) > TAILLE_LOT_MAX:
+        return JsonResponse({'erreur': f"Le lot dépasse {TAILLE_LOT_MAX} lignes"}, status=413)
+
+    tout_ou_rien = request.GET.get('tout_ou_rien') in ('1', 'true', 'oui')
+    debut = time.perf_counter()
+    rapport = traiter_lot(request.user, lignes, tout_ou_rien=tout_ou_rien)
+    rapport['nb_enregistres'] = len(rapport['resultats'])
+    rapport['nb_erreurs'] = len(rapport['erreurs'])
+    rapport['duree_ms'] = round((time.perf_counter() - debut) * 1000, 1)
+
+    status = 422 if rapport['erreurs'] and not rapport['resultats'] else 200
+    return JsonResponse(rapport, status=status)
+
+
+@login_required
+def api_statistiques_cache(request):
+    """Compteurs des caches, temps de rendu PDF, latences des API externes et données de marché (administrateurs)"""
+    if request.user.role != 'ADMIN':
+        return JsonResponse({'erreur': "Accès réservé aux administrateurs"}, status=403)
+    statistiques = cache_indicateurs.statistiques()
+    statistiques['rapports_pdf'] = cache_rapports.statistiques()
+    statistiques['rendu_pdf'] = statistiques_rendu.statistiques()
+    statistiques['api_externes'] = metriques_api.statistiques()
+    statistiques['donnees_marche'] = donnees_marche.statistiques()
+    return JsonResponse(statistiques)
+
+
+def api_sante(request):
+    """
+    État des dépendances externes (disjoncteurs, cloisons), sans authentification
+    pour les sondes de supervision. 200 si tous les circuits sont fermés, 503 sinon.
+    """
+    services = sante_services()
+    degrade = any(service['etat'] != 'ferme' for service in services.values())
+    return JsonResponse({'statut': 'degrade' if degrade else 'ok', 'services': services},
+                        status=503 if degrade else 200)
+
+
+def metriques(request):
+    """
+    Métriques au format d'exposition Prometheus, pour tous les processus (voir
+    services.metriques). Protégé par le jeton Bearer SOLVABILITE_METRIQUES['JETON'] ;
+    sans jeton configuré, réservé aux administrateurs hors DEBUG.
+    """
+    jeton = configuration_metriques()['JETON']
+    if jeton:
+        fourni = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(fourni.encode(), jeton.encode()):
+            return JsonResponse({'erreur': 'Jeton de métriques invalide'}, status=401)
+    elif not settings.DEBUG and not (request.user.is_authenticated and request.user.role == 'ADMIN'):
+        return JsonResponse({'erreur': "Métriques réservées aux administrateurs (ou jeton à configurer)"},
+                            status=403)
+    return HttpResponse(registre.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# =============================================
+# FLUX EN DIRECT (SERVER-SENT EVENTS)
+# =============================================
+
+def _dernier_evenement_recu(request):
+    """Identifiant du dernier calcul reçu par le client (reconnexion EventSource), None à la première connexion"""
+    valeur = request.headers.get('Last-Event-ID') or request.GET.get('depuis')
+    if not valeur:
+        return None
+    try:
+        return int(valeur)
+    except ValueError:
+        return 0
+
+
+def _flux_sse(compagnie_id, dernier_id, configuration):
+    """
+    Flux synchrone (WSGI) : occupe un thread du serveur tant qu'il est ouvert,
+    donc au plus DUREE_MAX_WSGI secondes ; le client se reconnecte ensuite
+    après RECONNEXION_WSGI_MS et reçoit les calculs manqués.
+    """
+    yield f"retry: {configuration['RECONNEXION_WSGI_MS']}\n\n"
+    if dernier_id is not None:
+        for evenement in calculs_depuis([compagnie_id], dernier_id):
+            dernier_id = evenement['id']
+            yield formater_sse(evenement)
+    else:
+        # Trame sans données : fixe le Last-Event-ID de la prochaine reconnexion
+        dernier_id = dernier_calcul_id(compagnie_id)
+        yield f"id: {dernier_id}\n\n"
+    if configuration['DUREE_MAX_WSGI'] <= 0:
+        return
+
+    abonnement = concentrateur.abonner(AbonnementThread(compagnie_id, configuration['TAILLE_FILE']))
+    try:
+        fin = time.monotonic() + configuration['DUREE_MAX_WSGI']
+        while (reste := fin - time.monotonic()) > 0:
+            evenement = abonnement.attendre(min(configuration['BATTEMENT'], reste))
+            if evenement is not None and evenement['id'] > dernier_id:
+                dernier_id = evenement['id']
+                yield formater_sse(evenement)
+    finally:
+        concentrateur.desabonner(abonnement)
+
+
+async def _flux_sse_async(compagnie_id, dernier_id, configuration):
+    """Flux asynchrone (ASGI) : une coroutine en attente par client, sans thread"""
+    abonnement = concentrateur.abonner(AbonnementAsync(compagnie_id, configuration['TAILLE_FILE']))
+    try:
+        yield f"retry: {configuration['RECONNEXION_MS']}\n\n"
+        if dernier_id:
+            for evenement in await sync_to_async(calculs_depuis)([compagnie_id], dernier_id):
+                dernier_id = evenement['id']
+                yield formater_sse(evenement)
+
+        fin = time.monotonic() + configuration['DUREE_MAX']
+        while time.monotonic() < fin:
+            evenement = await abonnement.attendre(configuration['BATTEMENT'])
+            if evenement is None:
+                yield ": battement\n\n"
+            elif evenement['id'] > dernier_id:
+                dernier_id = evenement['id']
+                yield formater_sse(evenement)
+    finally:
+        concentrateur.desabonner(abonnement)
+
+
+@login_required
+def flux_indicateurs(request, compagnie_id):
+    """
+    Flux SSE des nouveaux calculs (ratio, SCR, MCR) d'une compagnie.
+    Le flux se ferme après DUREE_MAX secondes (DUREE_MAX_WSGI sous WSGI) ;
+    EventSource se reconnecte seul et reçoit les calculs manqués grâce à Last-Event-ID.
+    """
+    if not peut_voir_compagnie(request.user, compagnie_id):
+        return HttpResponseForbidden("Accès non autorisé aux données de cette compagnie")
+
+    configuration = configuration_diffusion()
+    dernier_id = _dernier_evenement_recu(request)
+    if isinstance(request, ASGIRequest):
+        flux = _flux_sse_async(compagnie_id, dernier_id or 0, configuration)
+    else:
+        flux = _flux_sse(compagnie_id, dernier_id, configuration)
+
+    response = StreamingHttpResponse(flux, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
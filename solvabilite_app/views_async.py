@@ -0,0 +1,181 @@
+"""
+Versions asynchrones (ASGI) des tableaux de bord.
+
+Les lectures ORM indépendantes d'une même page sont lancées en parallèle,
+chacune dans un thread du pool (sync_to_async(thread_sensitive=False)) :
+la latence d'une page tend vers celle de sa requête la plus lente au lieu
+de la somme de toutes. Le rendu du gabarit reste dans le thread synchrone
+principal, où les accès paresseux (session, messages, user.compagnie) sont permis.
+"""
+import asyncio
+from datetime import datetime
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections
+from django.shortcuts import render
+
+from .models import CalculSCR, Compagnie, Utilisateur
+from .services.indicateurs import historique_compagnie, synthese_compagnie
+from .views import contexte_tableau_bord_executive, get_donnees_tableau_bord
+
+
+# =============================================
+# OUTILS
+# =============================================
+
+def _dans_un_thread(fonction, *args):
+    """Appel synchrone isolé : connexions ouvertes et fermées comme pour une requête"""
+
+    def appel():
+        close_old_connections()
+        try:
+            return fonction(*args)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(appel, thread_sensitive=False)()
+
+
+async def en_parallele(*appels):
+    """Exécute des lectures indépendantes en parallèle : appels = [(fonction, *args), ...]"""
+    return await asyncio.gather(*(_dans_un_thread(*appel) for appel in appels))
+
+
+def _charger_utilisateur(request):
+    """Résout l'utilisateur de la session (requêtes synchrones)"""
+    user = request.user
+    if user.is_authenticated:
+        user.compagnie_id  # noqa: B018 - force le chargement de l'utilisateur
+    return user
+
+
+def connexion_requise_async(view_func):
+    """Équivalent asynchrone de login_required"""
+
+    @wraps(view_func)
+    async def _wrapped_view(request, *args, **kwargs):
+        user = await sync_to_async(_charger_utilisateur)(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+
+    return _wrapped_view
+
+
+async def _rendre(request, template, context):
+    return await sync_to_async(render)(request, template, context)
+
+
+# =============================================
+# VUES ASYNCHRONES
+# =============================================
+
+async def _donnees_tableau_bord_async(role, compagnie_id, user):
+    """Données par rôle ; les comptages administrateur sont lancés en parallèle"""
+    if role == 'ADMIN':
+        utilisateurs_actifs, calculs_jour, compagnies_actives = await en_parallele(
+            (lambda: Utilisateur.objects.filter(is_active=True).count(),),
+            (lambda: CalculSCR.objects.filter(date_calcul__date=datetime.now().date()).count(),),
+            (lambda: Compagnie.objects.filter(utilisateur__is_active=True).distinct().count(),),
+        )
+        return {
+            'stats_systeme': {
+                'utilisateurs_actifs': utilisateurs_actifs,
+                'calculs_jour': calculs_jour,
+                'compagnies_actives': compagnies_actives,
+            }
+        }
+
+    def lire():
+        # Évaluer les querysets ici : le gabarit ne doit plus interroger la base
+        return _evaluer(get_donnees_tableau_bord(role, compagnie_id, user))
+
+    return (await en_parallele((lire,)))[0]
+
+
+def _evaluer(valeur):
+    if hasattr(valeur, 'query'):
+        return list(valeur)
+    if isinstance(valeur, dict):
+        return {cle: _evaluer(element) for cle, element in valeur.items()}
+    return valeur
+
+
+@connexion_requise_async
+async def tableau_de_bord_async(request):
+    """Tableau de bord principal, lectures synthèse et données de rôle en parallèle"""
+    user = request.user
+    user_role = user.role
+
+    if not user.compagnie_id:
+        synthese = None
+        donnees_specifiques = await _donnees_tableau_bord_async(user_role, None, user)
+    elif user_role == 'ACTUAIRE':
+        # Les calculs récents font partie de la synthèse : une seule lecture
+        synthese = (await en_parallele((synthese_compagnie, user.compagnie_id)))[0]
+        donnees_specifiques = get_donnees_tableau_bord(user_role, synthese['compagnie'], user, synthese)
+    else:
+        synthese, donnees_specifiques = await asyncio.gather(
+            _dans_un_thread(synthese_compagnie, user.compagnie_id),
+            _donnees_tableau_bord_async(user_role, user.compagnie_id, user),
+        )
+
+    context = {
+        'compagnie': synthese['compagnie'] if synthese else None,
+        'donnees_recentes': synthese['donnees_recentes'] if synthese else None,
+        'indicateurs': synthese['indicateurs'] if synthese else {},
+        'user_role': user_role,
+        'donnees_specifiques': donnees_specifiques,
+        'permissions': user.permissions_metier
+    }
+
+    return await _rendre(request, 'solvabilite_app/tableau_de_bord.html', context)
+
+
+@connexion_requise_async
+async def indicateurs_solvabilite_async(request):
+    """Page des indicateurs, synthèse et historique lus en parallèle"""
+    user = request.user
+    compagnie = None
+    donnees = []
+    graphiques_data = {
+        'dates': [],
+        'ratios': [],
+        'scr_totals': [],
+        'fonds_propres': [],
+        'modules': {'marche': [], 'credit': [], 'vie': [], 'non_vie': []},
+        'repartition': {},
+    }
+
+    if user.compagnie_id:
+        synthese, historique = await en_parallele(
+            (synthese_compagnie, user.compagnie_id),
+            (historique_compagnie, user.compagnie_id, user.role),
+        )
+        compagnie = synthese['compagnie']
+        donnees = historique['donnees']
+        graphiques_data = historique['graphiques_data']
+
+    context = {
+        'compagnie': compagnie,
+        'donnees': donnees,
+        'user_role': user.role,
+        'graphiques_data': graphiques_data,
+        'permissions': user.permissions_metier,
+    }
+
+    return await _rendre(request, 'solvabilite_app/indicateurs.html', context)
+
+
+@connexion_requise_async
+async def tableau_bord_executive_async(request):
+    """Tableau de bord exécutif asynchrone"""
+    user = request.user
+    synthese = None
+    if user.compagnie_id:
+        synthese = (await en_parallele((synthese_compagnie, user.compagnie_id)))[0]
+
+    return await _rendre(request, 'solvabilite_app/tableau_bord_executive.html',
+                         contexte_tableau_bord_executive(synthese))